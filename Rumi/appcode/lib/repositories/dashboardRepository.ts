@@ -19,6 +19,18 @@ type ClientRow = Database['public']['Tables']['clients']['Row'];
 type TierRow = Database['public']['Tables']['tiers']['Row'];
 type RewardRow = Database['public']['Tables']['rewards']['Row'];
 
+/**
+ * Clients whose dashboard is served from post-sync snapshots
+ * (get_dashboard_snapshot). Comma-separated client UUIDs; every other client
+ * uses get_dashboard_data.
+ */
+const SNAPSHOT_CLIENT_IDS = new Set(
+  (process.env.DASHBOARD_SNAPSHOT_CLIENT_IDS || '')
+    .split(',')
+    .map((id) => id.trim())
+    .filter(Boolean)
+);
+
 /**
  * User dashboard data (raw from DB, service layer transforms)
  */
@@ -340,6 +352,11 @@ export const dashboardRepository = {
    * Reduces 6+ sequential queries to 1 database round-trip.
    * Returns raw data for service layer transformation.
    *
+   * Calls get_dashboard_data. Clients listed in DASHBOARD_SNAPSHOT_CLIENT_IDS
+   * call get_dashboard_snapshot instead, which serves the payload built after
+   * the daily sync (dashboard_snapshots.py) and falls back to
+   * get_dashboard_data when there is none or its inputs changed since.
+   *
    * @param userId - User UUID
    * @param clientId - Client UUID for multi-tenant isolation
    * @returns Dashboard data from RPC or null if not found
@@ -356,7 +373,8 @@ export const dashboardRepository = {
     // Cast to Function to bypass Supabase type checking until RPC is deployed
     // The function will be properly typed once migration is applied and types regenerated
     const t1 = Date.now();
-    const { data, error } = await (supabase.rpc as Function)('get_dashboard_data', {
+    const rpcName = SNAPSHOT_CLIENT_IDS.has(clientId) ? 'get_dashboard_snapshot' : 'get_dashboard_data';
+    const { data, error } = await (supabase.rpc as Function)(rpcName, {
       p_user_id: userId,
       p_client_id: clientId,
     });
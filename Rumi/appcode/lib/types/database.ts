@@ -970,6 +970,7 @@ export type Database = {
           id: string
           records_processed: number | null
           source: string
+          stage_timings: Json | null
           started_at: string
           status: string
           triggered_by: string | null
@@ -983,6 +984,7 @@ export type Database = {
           id?: string
           records_processed?: number | null
           source?: string
+          stage_timings?: Json | null
           started_at?: string
           status?: string
           triggered_by?: string | null
@@ -996,6 +998,7 @@ export type Database = {
           id?: string
           records_processed?: number | null
           source?: string
+          stage_timings?: Json | null
           started_at?: string
           status?: string
           triggered_by?: string | null
@@ -1656,6 +1659,10 @@ export type Database = {
         Args: { p_client_id: string; p_user_id: string }
         Returns: Json
       }
+      get_dashboard_snapshot: {
+        Args: { p_client_id: string; p_user_id: string }
+        Returns: Json
+      }
       get_mission_history: {
         Args: { p_client_id: string; p_user_id: string }
         Returns: {
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Auth Token Store Load Model and Compaction
+otp_codes and password_reset_tokens get a row on every signup, OTP resend
+and forgot-password request (auth_create_otp, auth_create_reset_token),
+and nothing deletes them: otpRepository.deleteExpired() and
+passwordResetRepository.deleteExpired() exist but no route or cron calls
+them. This tool measures what that growth costs and removes expired rows.
+
+--simulate grows both tables with synthetic history (expired, mostly used
+rows of one client's users, tagged 'sim-') to each --sizes step, then
+replays auth traffic through the same RPCs and in the same order as
+authService.ts:
+- signup: auth_create_otp
+- verify: auth_find_otp_by_session, then auth_increment_otp_attempts or
+  auth_mark_otp_used
+- resend: auth_find_otp_by_session, auth_mark_otp_used, auth_create_otp
+  with the same session_id
+- forgot-password: auth_find_recent_reset_tokens (3 per hour),
+  auth_invalidate_user_reset_tokens, auth_create_reset_token
+- reset-password: auth_find_valid_reset_tokens (every returned row is one
+  bcrypt.compare in resetPassword), auth_mark_reset_token_used,
+  auth_invalidate_user_reset_tokens
+Per step it reports p50/p95/p99 per RPC and the table and index sizes.
+The last step runs the compaction job while traffic continues, so its
+effect on the RPCs' latency is measured, then measures again afterwards.
+
+--compact deletes rows that expired more than --retention-minutes ago:
+- Keyset batches over the expires_at indexes (idx_otp_expires,
+  idx_password_reset_expires_at). Each batch resumes after the last
+  deleted expires_at, so it does not re-walk the dead index entries left
+  by earlier batches. The job stops at the first batch that deletes
+  nothing, not at a short one.
+- One short transaction per batch. FOR UPDATE SKIP LOCKED leaves rows
+  that a request is updating for the next run, and lock_timeout stops the
+  job instead of queueing behind DDL (and everything queued behind it).
+- The cutoff is fixed when the job starts, so it always finishes.
+- Deleting does not shrink the files. --vacuum makes the space reusable,
+  --reindex rebuilds the indexes concurrently at their new size.
+- Reset tokens are kept for at least 45 minutes after expiry: they expire
+  after 15 minutes, and forgot-password counts the last hour's tokens for
+  its rate limit. Deleting them at expiry, as deleteExpired() would,
+  resets that limit.
+
+Usage:
+    python auth_token_compaction.py --simulate --client-id <uuid> --sizes 0 250000 1000000 3000000
+    python auth_token_compaction.py --compact --dry-run
+    python auth_token_compaction.py --compact --batch-size 5000 --pause-ms 50 --vacuum --reindex
+"""
+
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+
+# authService.ts
+OTP_EXPIRY_MINUTES = 5
+RESET_TOKEN_EXPIRY_MINUTES = 15
+RESET_TOKEN_RATE_LIMIT = 3
+RESET_RATE_WINDOW_MINUTES = 60
+
+RETENTION_MINUTES = 60
+BATCH_SIZE = 5_000
+LOCK_TIMEOUT_MS = 1_000
+STATEMENT_TIMEOUT_MS = 10_000
+SIM_TAG = 'sim-'
+PERCENTILES = [50, 95, 99]
+
+TABLES = ['otp_codes', 'password_reset_tokens']
+
+# Keyset batch: the next batch_size expired rows after the last one deleted, in expires_at index order
+COMPACT_SQL = """
+    WITH batch AS (
+        SELECT id FROM {table}
+        WHERE expires_at >= %(after)s AND expires_at < %(cutoff)s
+        ORDER BY expires_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM {table} t USING batch WHERE t.id = batch.id
+    RETURNING t.expires_at
+"""
+
+
+def compaction_cutoffs(conn, retention_minutes=RETENTION_MINUTES):
+    """Per table, the expires_at before which rows can be deleted (fixed at the database's now())."""
+    reset_minutes = max(retention_minutes, RESET_RATE_WINDOW_MINUTES - RESET_TOKEN_EXPIRY_MINUTES)
+    with conn.cursor() as cur:
+        cur.execute("SELECT now() - make_interval(mins => %s), now() - make_interval(mins => %s)",
+                    (retention_minutes, reset_minutes))
+        otp_cutoff, reset_cutoff = cur.fetchone()
+    return {'otp_codes': otp_cutoff, 'password_reset_tokens': reset_cutoff}
+
+
+def count_expired(conn, cutoffs):
+    with conn.cursor() as cur:
+        counts = {}
+        for table, cutoff in cutoffs.items():
+            cur.execute(f"SELECT count(*) FROM {table} WHERE expires_at < %s", (cutoff,))
+            counts[table] = cur.fetchone()[0]
+    return counts
+
+
+def compact_table(conn, table, cutoff, batch_size=BATCH_SIZE, pause=0.0, lock_timeout_ms=LOCK_TIMEOUT_MS):
+    """
+    Delete rows of table with expires_at < cutoff in keyset batches, one
+    transaction each. conn must be in autocommit mode. Stops early (and
+    says so in 'stopped') if a batch cannot get its locks in time.
+    """
+    import psycopg
+
+    result = {'table': table, 'deleted': 0, 'batches': 0, 'batch_ms': [], 'stopped': None}
+    sql = COMPACT_SQL.format(table=table)
+    after = '-infinity'
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(f"SET lock_timeout = {int(lock_timeout_ms)}")
+        cur.execute(f"SET statement_timeout = {STATEMENT_TIMEOUT_MS}")
+        while True:
+            batch_start = time.perf_counter()
+            try:
+                cur.execute(sql, {'after': after, 'cutoff': cutoff, 'limit': batch_size})
+            except (psycopg.errors.LockNotAvailable, psycopg.errors.QueryCanceled) as e:
+                result['stopped'] = f"{type(e).__name__}: {str(e).strip()}"
+                break
+            deleted = [row[0] for row in cur.fetchall()]
+            result['batch_ms'].append((time.perf_counter() - batch_start) * 1000)
+            result['batches'] += 1
+            result['deleted'] += len(deleted)
+            if not deleted:
+                break
+            # A short batch does not mean the range is drained: SKIP LOCKED may have passed over rows
+            after = max(deleted)
+            if pause:
+                time.sleep(pause)
+        cur.execute("RESET lock_timeout")
+        cur.execute("RESET statement_timeout")
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def compact(conn, retention_minutes=RETENTION_MINUTES, batch_size=BATCH_SIZE, pause=0.0,
+            lock_timeout_ms=LOCK_TIMEOUT_MS, vacuum=False, reindex=False):
+    """
+    Compact both tables. vacuum: VACUUM (ANALYZE) each afterwards, so the
+    freed space is reused (the files do not shrink). reindex: also REINDEX
+    CONCURRENTLY, which rebuilds the indexes at their new size without
+    blocking writes.
+    """
+    cutoffs = compaction_cutoffs(conn, retention_minutes)
+    results = []
+    for table, cutoff in cutoffs.items():
+        result = compact_table(conn, table, cutoff, batch_size, pause, lock_timeout_ms)
+        if result['deleted']:
+            for enabled, key, sql in [(vacuum, 'vacuum_seconds', f"VACUUM (ANALYZE) {table}"),
+                                      (reindex, 'reindex_seconds', f"REINDEX TABLE CONCURRENTLY {table}")]:
+                if enabled:
+                    step_start = time.perf_counter()
+                    conn.execute(sql)
+                    result[key] = time.perf_counter() - step_start
+        results.append(result)
+    return results
+
+
+def print_compaction(results):
+    for r in results:
+        batch_ms = r['batch_ms'] or [0.0]
+        rate = r['deleted'] / max(r['seconds'], 1e-9)
+        line = (f"  {r['table']:22s} {r['deleted']:>10,} deleted in {r['batches']:,} batches, {r['seconds']:.1f}s "
+                f"({rate:,.0f} rows/s); batch p50 {np.percentile(batch_ms, 50):.0f} ms, max {max(batch_ms):.0f} ms")
+        if 'vacuum_seconds' in r:
+            line += f"; VACUUM {r['vacuum_seconds']:.1f}s"
+        if 'reindex_seconds' in r:
+            line += f"; REINDEX {r['reindex_seconds']:.1f}s"
+        print(line)
+        if r['stopped']:
+            print(f"    stopped early, rerun to continue: {r['stopped']}")
+
+
+# ============================================================================
+# LOAD MODEL
+# ============================================================================
+
+def table_stats(conn):
+    """table -> rows, dead rows, heap+toast MB, index MB."""
+    with conn.cursor() as cur:
+        stats = {}
+        for table in TABLES:
+            cur.execute(f"SELECT count(*) FROM {table}")
+            rows = cur.fetchone()[0]
+            cur.execute("""
+                SELECT coalesce(s.n_dead_tup, 0), pg_table_size(c.oid), pg_indexes_size(c.oid)
+                FROM pg_class c LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+                WHERE c.oid = %s::regclass
+            """, (table,))
+            dead, heap, indexes = cur.fetchone()
+            stats[table] = {'rows': rows, 'dead': dead, 'heap_mb': heap / 1e6, 'index_mb': indexes / 1e6}
+    return stats
+
+
+def grow_history(conn, user_ids, table, target_rows, age_days=180, chunk=500_000):
+    """Insert synthetic expired rows until table has target_rows tagged rows. Returns how many were added."""
+    with conn.cursor() as cur:
+        if table == 'otp_codes':
+            cur.execute("SELECT count(*) FROM otp_codes WHERE session_id LIKE %s", (SIM_TAG + 'h%',))
+        else:
+            cur.execute("SELECT count(*) FROM password_reset_tokens WHERE ip_address = %s", (SIM_TAG + 'h',))
+        have = cur.fetchone()[0]
+        params = {'ids': user_ids, 'n': len(user_ids), 'age': f"{age_days} days", 'tag': SIM_TAG}
+        for start in range(have, target_rows, chunk):
+            params.update(start=start, end=min(start + chunk, target_rows) - 1)
+            if table == 'otp_codes':
+                # 90% verified (tokens cleared by auth_mark_otp_used); abandoned signups keep their encrypted tokens
+                cur.execute("""
+                    INSERT INTO otp_codes (user_id, session_id, code_hash, expires_at, attempts, used, created_at,
+                                           access_token_encrypted, refresh_token_encrypted)
+                    SELECT (%(ids)s::uuid[])[ui], %(tag)s || 'h' || md5(g::text), '$2b$10$' || md5(g::text),
+                           c + interval '5 minutes', floor(r * 3)::int, r < 0.9, c,
+                           CASE WHEN r >= 0.9 THEN repeat(md5(g::text), 24) END,
+                           CASE WHEN r >= 0.9 THEN repeat(md5(g::text), 3) END
+                    FROM (SELECT g, now() - random() * %(age)s::interval AS c, random() AS r,
+                                 1 + floor(random() * %(n)s)::int AS ui
+                          FROM generate_series(%(start)s::int, %(end)s::int) g) s
+                """, params)
+            else:
+                cur.execute("""
+                    INSERT INTO password_reset_tokens (user_id, token_hash, created_at, expires_at, used_at,
+                                                       ip_address)
+                    SELECT (%(ids)s::uuid[])[ui], '$2b$10$' || md5(g::text) || left(md5(r::text), 21), c,
+                           c + interval '15 minutes', CASE WHEN r < 0.6 THEN c + r * interval '20 minutes' END,
+                           %(tag)s || 'h'
+                    FROM (SELECT g, now() - random() * %(age)s::interval AS c, random() AS r,
+                                 1 + floor(random() * %(n)s)::int AS ui
+                          FROM generate_series(%(start)s::int, %(end)s::int) g) s
+                """, params)
+            conn.commit()
+        cur.execute(f"ANALYZE {table}")
+    conn.commit()
+    return max(target_rows - have, 0)
+
+
+class AuthTraffic:
+    """authService.ts flows as RPC calls on one autocommit connection, timing every call."""
+
+    # Simulated time does not pass, so no token expires: resets slightly outnumber forgot-password
+    # requests and skip when none is pending, which keeps the number of valid tokens level
+    MIX = {'signup': 0.33, 'verify': 0.3, 'resend': 0.05, 'forgot': 0.15, 'reset': 0.17}
+
+    def __init__(self, conn, user_ids, seed=0):
+        self.conn = conn
+        self.user_ids = user_ids
+        self.rng = np.random.default_rng(seed)
+        self.sessions = deque(maxlen=2_000)
+        self.resets = deque(maxlen=2_000)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.latency = {}
+        self.rows = {}
+        self.errors = {}
+        self.rate_limited = 0
+        self.bcrypt_compares = []
+
+    def _call(self, name, sql, params):
+        start = time.perf_counter()
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        self.latency.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        self.rows.setdefault(name, []).append(len(rows))
+        return rows
+
+    def _user(self):
+        return self.user_ids[self.rng.integers(len(self.user_ids))]
+
+    def signup(self):
+        session_id = f"{SIM_TAG}live-{uuid.uuid4().hex}"
+        self._call('auth_create_otp', "SELECT auth_create_otp(%s, %s, %s, now() + make_interval(mins => %s), %s, %s)",
+                   (self._user(), session_id, '$2b$10$' + uuid.uuid4().hex, OTP_EXPIRY_MINUTES, 'a' * 768, 'r' * 96))
+        self.sessions.append(session_id)
+
+    def verify(self):
+        if not self.sessions:
+            return self.signup()
+        session_id = self.sessions.popleft()
+        self._call('auth_find_otp_by_session', "SELECT * FROM auth_find_otp_by_session(%s)", (session_id,))
+        if self.rng.random() < 0.2:
+            self._call('auth_increment_otp_attempts', "SELECT auth_increment_otp_attempts(%s)", (session_id,))
+            self.sessions.append(session_id)
+        else:
+            self._call('auth_mark_otp_used', "SELECT auth_mark_otp_used(%s)", (session_id,))
+
+    def resend(self):
+        """As resendOTP: mark the old code used, insert a new one under the same session_id."""
+        import psycopg
+
+        if not self.sessions:
+            return self.signup()
+        session_id = self.sessions[-1]
+        rows = self._call('auth_find_otp_by_session', "SELECT * FROM auth_find_otp_by_session(%s)", (session_id,))
+        if not rows:
+            return
+        self._call('auth_mark_otp_used', "SELECT auth_mark_otp_used(%s)", (session_id,))
+        try:
+            self._call('auth_create_otp', "SELECT auth_create_otp(%s, %s, %s, now() + make_interval(mins => %s))",
+                       (rows[0][1], session_id, '$2b$10$' + uuid.uuid4().hex, OTP_EXPIRY_MINUTES))
+        except psycopg.errors.UniqueViolation as e:
+            error = f"resend auth_create_otp: {e.diag.constraint_name} violated"
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def forgot(self):
+        user_id = self._user()
+        recent = self._call('auth_find_recent_reset_tokens', "SELECT * FROM auth_find_recent_reset_tokens(%s)",
+                            (user_id,))
+        if len(recent) >= RESET_TOKEN_RATE_LIMIT:
+            self.rate_limited += 1
+            return
+        self._call('auth_invalidate_user_reset_tokens', "SELECT auth_invalidate_user_reset_tokens(%s)", (user_id,))
+        token_hash = '$2b$10$' + uuid.uuid4().hex + uuid.uuid4().hex[:21]
+        self._call('auth_create_reset_token',
+                   "SELECT auth_create_reset_token(%s, %s, now() + make_interval(mins => %s), %s)",
+                   (user_id, token_hash, RESET_TOKEN_EXPIRY_MINUTES, SIM_TAG + 'live'))
+        self.resets.append(token_hash)
+
+    def reset(self):
+        if not self.resets:
+            return
+        token_hash = self.resets.popleft()
+        valid = self._call('auth_find_valid_reset_tokens', "SELECT * FROM auth_find_valid_reset_tokens()", ())
+        # resetPassword bcrypt-compares each valid token until one matches; hash equality stands in for it
+        for compares, row in enumerate(valid, 1):
+            if row[2] == token_hash:
+                self.bcrypt_compares.append(compares)
+                self._call('auth_mark_reset_token_used', "SELECT auth_mark_reset_token_used(%s)", (row[0],))
+                self._call('auth_invalidate_user_reset_tokens', "SELECT auth_invalidate_user_reset_tokens(%s)",
+                           (row[1],))
+                break
+        else:
+            self.bcrypt_compares.append(len(valid))
+
+    def run(self, n_flows=None, until=None):
+        """n_flows flows, or flows until until() returns true, in MIX proportions."""
+        names = list(self.MIX)
+        weights = np.array(list(self.MIX.values()))
+        done = 0
+        while (n_flows is None or done < n_flows) and not (until and until()):
+            getattr(self, names[self.rng.choice(len(names), p=weights / weights.sum())])()
+            done += 1
+        return done
+
+
+def print_latency(traffic, label):
+    print(f"  {label}")
+    for name in sorted(traffic.latency):
+        ms = traffic.latency[name]
+        p = np.percentile(ms, PERCENTILES)
+        rows = np.mean(traffic.rows[name])
+        print(f"    {name:34s} {len(ms):>6,} calls  p50 {p[0]:6.2f}  p95 {p[1]:6.2f}  p99 {p[2]:7.2f} ms"
+              f"  rows {rows:6.1f}")
+    if traffic.bcrypt_compares:
+        print(f"    reset-password bcrypt compares: mean {np.mean(traffic.bcrypt_compares):.1f}, "
+              f"max {max(traffic.bcrypt_compares)}")
+    for error, count in traffic.errors.items():
+        print(f"    {count:,} failed: {error}")
+
+
+def print_tables(stats):
+    for table, s in stats.items():
+        print(f"    {table:22s} {s['rows']:>10,} rows ({s['dead']:,} dead), heap {s['heap_mb']:8.1f} MB, "
+              f"indexes {s['index_mb']:7.1f} MB")
+
+
+def remove_simulated(conn):
+    """Delete the simulation's remaining rows (live flows and history inside the retention window)."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM otp_codes WHERE session_id LIKE %s", (SIM_TAG + '%',))
+        otp = cur.rowcount
+        cur.execute("DELETE FROM password_reset_tokens WHERE ip_address LIKE %s", (SIM_TAG + '%',))
+        reset = cur.rowcount
+    conn.commit()
+    return otp, reset
+
+
+def simulate(dsn, client_id, sizes, flows, batch_size, pause, keep=False):
+    import threading
+
+    from local_db import connect
+
+    with connect(dsn, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM users WHERE client_id = %s ORDER BY id", (client_id,))
+            user_ids = [str(row[0]) for row in cur.fetchall()]
+        if not user_ids:
+            raise SystemExit(f"client {client_id} has no users")
+        print(f"Auth traffic for {len(user_ids):,} users of {client_id}, {flows:,} flows per step")
+        traffic_conn = connect(dsn, autocommit=True)
+        traffic = AuthTraffic(traffic_conn, user_ids)
+        traffic.run(200)  # warm up
+        for size in sizes:
+            start = time.perf_counter()
+            added = sum(grow_history(conn, user_ids, table, size) for table in TABLES)
+            print(f"\n{size:,} history rows per table (+{added:,} in {time.perf_counter() - start:.1f}s)")
+            print_tables(table_stats(conn))
+            traffic.reset_stats()
+            traffic.run(flows)
+            print_latency(traffic, 'RPC latency')
+
+        # Compact while the traffic keeps running on its own connection
+        compaction_conn = connect(dsn, autocommit=True)
+        done = threading.Event()
+        traffic.reset_stats()
+        worker = threading.Thread(target=traffic.run, kwargs={'until': done.is_set})
+        worker.start()
+        results = compact(compaction_conn, batch_size=batch_size, pause=pause)
+        done.set()
+        worker.join()
+        print(f"\nCompaction (batch {batch_size:,}, pause {pause * 1000:.0f} ms) with traffic running")
+        print_compaction(results)
+        print_latency(traffic, 'RPC latency during compaction')
+        for sql in ['VACUUM (ANALYZE) {table}', 'REINDEX TABLE CONCURRENTLY {table}']:
+            step_start = time.perf_counter()
+            for table in TABLES:
+                compaction_conn.execute(sql.format(table=table))
+            print(f"  {sql.format(table='')} {time.perf_counter() - step_start:.1f}s")
+            print_tables(table_stats(conn))
+        traffic.reset_stats()
+        traffic.run(flows)
+        print_latency(traffic, 'RPC latency after compaction')
+        compaction_conn.close()
+        traffic_conn.close()
+        if not keep:
+            otp, reset = remove_simulated(conn)
+            print(f"\nRemoved {otp:,} otp_codes and {reset:,} password_reset_tokens simulation rows")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Model auth token table growth; compact expired OTPs and reset tokens')
+    parser.add_argument('--simulate', action='store_true', help='grow the tables and replay auth traffic')
+    parser.add_argument('--compact', action='store_true', help='delete expired rows in batches')
+    parser.add_argument('--client-id', help='client whose users the simulated traffic uses (--simulate)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 250_000, 1_000_000, 3_000_000],
+                        help='history rows per table at each step (--simulate)')
+    parser.add_argument('--flows', type=int, default=3_000, help='auth flows replayed per step (--simulate)')
+    parser.add_argument('--keep', action='store_true', help='keep the simulation rows (--simulate)')
+    parser.add_argument('--retention-minutes', type=int, default=RETENTION_MINUTES,
+                        help='keep rows this long after they expire (reset tokens: at least '
+                             f'{RESET_RATE_WINDOW_MINUTES - RESET_TOKEN_EXPIRY_MINUTES})')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--pause-ms', type=int, default=0, help='sleep between batches')
+    parser.add_argument('--lock-timeout-ms', type=int, default=LOCK_TIMEOUT_MS)
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM (ANALYZE) each compacted table (--compact)')
+    parser.add_argument('--reindex', action='store_true', help='REINDEX CONCURRENTLY each compacted table (--compact)')
+    parser.add_argument('--dry-run', action='store_true', help='count what --compact would delete')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+    if args.simulate == args.compact:
+        parser.error('pass one of --simulate, --compact')
+    if args.simulate and not args.client_id:
+        parser.error('--simulate needs --client-id')
+
+    if args.simulate:
+        simulate(args.dsn, args.client_id, args.sizes, args.flows, args.batch_size, args.pause_ms / 1000,
+                 args.keep)
+    else:
+        with connect(args.dsn, autocommit=True) as conn:
+            if args.dry_run:
+                cutoffs = compaction_cutoffs(conn, args.retention_minutes)
+                for table, count in count_expired(conn, cutoffs).items():
+                    print(f"  {table:22s} {count:>10,} rows expired before {cutoffs[table]:%Y-%m-%d %H:%M:%S%z}")
+            else:
+                print_compaction(compact(conn, args.retention_minutes, args.batch_size, args.pause_ms / 1000,
+                                         args.lock_timeout_ms, args.vacuum, args.reindex))
+                print_tables(table_stats(conn))
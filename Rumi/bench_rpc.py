@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+RPC Latency Benchmark
+Measures the hot-path RPCs against a local Postgres loaded with synthetic
+tenants (generate_tenant_data.py), per tenant size:
+
+- latency: each read RPC called concurrently through a psycopg_pool
+  ConnectionPool, sampled users, p50/p95/p99 and throughput
+- cost: one profiled call per RPC inside a rolled-back transaction, with
+  EXPLAIN (ANALYZE, BUFFERS) for time and buffers and pg_stat_xact_user_tables
+  deltas for the rows each table scan read (this sees inside the plpgsql/sql
+  functions, which a top-level EXPLAIN does not)
+- scaling: p50 against tenant size, with the fitted exponent
+  (~0 flat, ~1 linear in users)
+
+The sync RPCs (update_mission_progress, create_mission_progress_for_eligible_users)
+work on a whole tenant, so they run one at a time per tenant as the daily cron
+does, each in a transaction that is rolled back so the dataset stays fixed.
+
+With --plans DIR, auto_explain (if the server has it) also records the plan of
+every statement run inside each profiled RPC.
+
+Usage:
+    python bench_rpc.py --data /tmp/bench --users 1000 10000 100000 --setup --dsn postgresql://.../bench
+    python bench_rpc.py --data /tmp/bench --rpcs get_dashboard_data --calls 500 --concurrency 16
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from generate_tenant_data import generate, load_dataset
+from local_db import apply_migrations, connect
+
+# name -> (SQL, scope). 'user' RPCs run per sampled user, 'tenant' RPCs once per tenant.
+# Arguments as passed by the repositories (dashboardRepository, missionRepository,
+# rewardRepository, syncRepository).
+RPCS = {
+    'get_dashboard_data': (
+        "SELECT get_dashboard_data(%(user_id)s, %(client_id)s)", 'user'),
+    'get_available_missions': (
+        "SELECT * FROM get_available_missions(%(user_id)s, %(client_id)s, %(tier)s)", 'user'),
+    'get_available_rewards': (
+        "SELECT * FROM get_available_rewards(%(user_id)s, %(client_id)s, %(tier)s, %(tier_order)s)", 'user'),
+    'get_mission_history': (
+        "SELECT * FROM get_mission_history(%(user_id)s, %(client_id)s)", 'user'),
+    'update_mission_progress': (
+        "SELECT update_mission_progress(%(client_id)s, %(user_ids)s::uuid[])", 'tenant'),
+    'create_mission_progress_for_eligible_users': (
+        "SELECT create_mission_progress_for_eligible_users(%(client_id)s)", 'tenant'),
+}
+
+PERCENTILES = [50, 95, 99]
+STAT_COLUMNS = ['seq_scan', 'seq_tup_read', 'idx_scan', 'idx_tup_fetch', 'n_tup_ins', 'n_tup_upd', 'n_tup_del']
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+def prepare_dataset(data, user_counts, seed, dsn, setup):
+    """Generate data/ if it has no manifest; with setup, migrate and COPY it into dsn."""
+    manifest_path = os.path.join(data, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        if not user_counts:
+            raise SystemExit(f"{data} has no manifest.json; pass --users to generate a dataset")
+        print(f"Generating {', '.join(f'{n:,}' for n in user_counts)} user tenants into {data}...")
+        manifest = generate(data, user_counts, seed=seed)
+    if setup:
+        with connect(dsn) as conn:
+            print(f"Applying {len(apply_migrations(conn))} migrations...")
+            for table, seconds in load_dataset(conn, data, manifest).items():
+                print(f"  loaded {table:30s} {seconds:7.1f}s")
+            conn.autocommit = True
+            conn.execute('ANALYZE')
+    return manifest
+
+
+def sample_users(conn, client_id, n, rng):
+    """n random users of one tenant with their tier, as RPC parameter dicts."""
+    rows = conn.execute("""
+        SELECT u.id, u.current_tier, t.tier_order
+        FROM users u JOIN tiers t ON t.client_id = u.client_id AND t.tier_id = u.current_tier
+        WHERE u.client_id = %s ORDER BY u.id
+    """, (client_id,)).fetchall()
+    picks = rng.choice(len(rows), size=min(n, len(rows)), replace=False)
+    return [{'client_id': client_id, 'user_id': rows[i][0], 'tier': rows[i][1], 'tier_order': rows[i][2]}
+            for i in picks]
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+def run_concurrent(pool, sql, params_list, concurrency):
+    """Call sql once per params through the pool. Returns latencies in ms, in call order, and wall seconds."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(params):
+        with pool.connection() as conn:
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, params_list))
+    return np.array(latencies), time.perf_counter() - start
+
+
+def _xact_stats(conn):
+    rows = conn.execute(f"SELECT relname, {', '.join(STAT_COLUMNS)} FROM pg_stat_xact_user_tables").fetchall()
+    return {row[0]: np.array([v or 0 for v in row[1:]]) for row in rows}
+
+
+def profile_call(conn, sql, params, plans=None):
+    """
+    EXPLAIN ANALYZE one call in a rolled-back transaction. Returns time,
+    buffers and per-table scan counters; with plans (a list) also appends
+    the auto_explain notices raised by the call.
+    """
+    captured = []
+    handler = (lambda diag: captured.append(diag.message_primary)) if plans is not None else None
+    if handler:
+        conn.add_notice_handler(handler)
+    try:
+        with conn.transaction(force_rollback=True):
+            before = _xact_stats(conn)
+            plan = conn.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params).fetchone()[0][0]
+            after = _xact_stats(conn)
+    finally:
+        if handler:
+            conn.remove_notice_handler(handler)
+    if plans is not None:
+        plans.extend(captured)
+
+    tables = {}
+    for rel, counts in after.items():
+        delta = counts - before.get(rel, 0)
+        if delta.any():
+            tables[rel] = dict(zip(STAT_COLUMNS, delta.tolist()))
+    return {
+        'ms': plan['Execution Time'],
+        'shared_hit': plan['Plan'].get('Shared Hit Blocks', 0),
+        'shared_read': plan['Plan'].get('Shared Read Blocks', 0),
+        'rows_scanned': sum(t['seq_tup_read'] + t['idx_tup_fetch'] for t in tables.values()),
+        'seq_scanned': sorted(rel for rel, t in tables.items() if t['seq_scan']),
+        'tables': tables,
+    }
+
+
+def enable_auto_explain(conn):
+    """Route nested statement plans to this session as NOTICEs. False if auto_explain is unavailable."""
+    try:
+        conn.execute("LOAD 'auto_explain'")
+    except Exception as e:
+        conn.rollback()
+        print(f"auto_explain unavailable ({str(e).strip()}); continuing without statement plans")
+        return False
+    for setting, value in (('log_min_duration', '0'), ('log_analyze', 'on'), ('log_buffers', 'on'),
+                           ('log_nested_statements', 'on'), ('log_format', 'json'), ('log_level', 'notice')):
+        conn.execute(f"SET auto_explain.{setting} = {value}")
+    conn.execute("SET client_min_messages = notice")
+    conn.commit()
+    return True
+
+
+def bench_tenant(dsn, tenant, rpcs, calls, concurrency, write_calls, sync_users, seed, plan_dir=None):
+    """Latency and cost for every RPC on one tenant. Returns {rpc: result}."""
+    from psycopg_pool import ConnectionPool
+
+    rng = np.random.default_rng([seed, tenant['tenant']])
+    client_id = tenant['client_id']
+    results = {}
+    with connect(dsn) as conn:
+        users = sample_users(conn, client_id, calls, rng)
+        explain = plan_dir is not None and enable_auto_explain(conn)
+        synced = [u['user_id'] for u in users[:sync_users]] if sync_users else None
+
+        for name in rpcs:
+            sql, scope = RPCS[name]
+            plans = [] if explain else None
+            if scope == 'user':
+                profile = profile_call(conn, sql, users[0], plans)
+            else:
+                params = {'client_id': client_id, 'user_ids': synced}
+                profile = profile_call(conn, sql, params, plans)
+                # Tenant-wide writes: sequential, rolled back, like one cron run at a time
+                latencies = []
+                for _ in range(write_calls):
+                    with conn.transaction(force_rollback=True):
+                        start = time.perf_counter()
+                        conn.execute(sql, params).fetchall()
+                        latencies.append((time.perf_counter() - start) * 1000)
+                results[name] = {'latency_ms': np.array(latencies), 'seconds': sum(latencies) / 1000,
+                                 'profile': profile}
+            if plans:
+                os.makedirs(plan_dir, exist_ok=True)
+                with open(os.path.join(plan_dir, f"{tenant['tenant']:03d}-{name}.json"), 'w') as f:
+                    json.dump([json.loads(p) if p.lstrip().startswith('{') else p for p in plans], f, indent=1)
+            if scope == 'user':
+                results[name] = {'profile': profile}
+
+    user_rpcs = [name for name in rpcs if RPCS[name][1] == 'user']
+    if user_rpcs:
+        with ConnectionPool(dsn, min_size=concurrency, max_size=concurrency, open=True) as pool:
+            pool.wait()
+            for name in user_rpcs:
+                sql = RPCS[name][0]
+                run_concurrent(pool, sql, users[:concurrency * 2], concurrency)   # warm-up
+                latencies, seconds = run_concurrent(pool, sql, users, concurrency)
+                results[name].update(latency_ms=latencies, seconds=seconds)
+    return results
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+def summarize(results):
+    """Flatten {tenant: (users, {rpc: result})} into report rows."""
+    rows = []
+    for tenant, (n_users, per_rpc) in results.items():
+        for name, r in per_rpc.items():
+            lat = r['latency_ms']
+            p = np.percentile(lat, PERCENTILES) if len(lat) else [np.nan] * len(PERCENTILES)
+            rows.append({
+                'rpc': name, 'tenant': tenant, 'users': n_users, 'calls': len(lat),
+                **{f"p{q}_ms": float(v) for q, v in zip(PERCENTILES, p)},
+                'calls_per_s': len(lat) / r['seconds'] if r['seconds'] else 0.0,
+                'rows_scanned': r['profile']['rows_scanned'],
+                'buffers': r['profile']['shared_hit'] + r['profile']['shared_read'],
+                'seq_scanned': r['profile']['seq_scanned'],
+                'tables': r['profile']['tables'],
+            })
+    return rows
+
+
+def scaling_exponent(sizes, values):
+    """Slope of log(value) against log(tenant users): ~0 flat, ~1 linear."""
+    sizes, values = np.asarray(sizes, dtype=float), np.asarray(values, dtype=float)
+    ok = (sizes > 0) & (values > 0)
+    if ok.sum() < 2:
+        return float('nan')
+    return float(np.polyfit(np.log(sizes[ok]), np.log(values[ok]), 1)[0])
+
+
+def print_report(rows):
+    print(f"\n{'rpc':44s} {'users':>9s} {'calls':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+          f"{'calls/s':>8s} {'rows read':>10s} {'buffers':>8s}  seq scans")
+    for r in rows:
+        print(f"{r['rpc']:44s} {r['users']:>9,d} {r['calls']:>6d} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+              f"{r['p99_ms']:8.2f} {r['calls_per_s']:8.1f} {r['rows_scanned']:>10,d} {r['buffers']:>8,d}  "
+              f"{', '.join(r['seq_scanned'])}")
+
+    sizes = sorted({r['users'] for r in rows})
+    if len(sizes) < 2:
+        return
+    print("\nScaling with tenant size (exponent of p50 / rows read vs users; ~0 flat, ~1 linear):")
+    print(f"{'rpc':44s} " + ' '.join(f"{n:>10,d}" for n in sizes) + f" {'p50 exp':>8s} {'rows exp':>8s}")
+    for name in dict.fromkeys(r['rpc'] for r in rows):
+        by_size = {r['users']: r for r in rows if r['rpc'] == name}
+        p50 = [by_size[n]['p50_ms'] if n in by_size else np.nan for n in sizes]
+        scanned = [by_size[n]['rows_scanned'] if n in by_size else np.nan for n in sizes]
+        print(f"{name:44s} " + ' '.join(f"{v:10.2f}" for v in p50)
+              + f" {scaling_exponent(sizes, p50):8.2f} {scaling_exponent(sizes, scanned):8.2f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from local_db import add_dsn_argument
+
+    parser = argparse.ArgumentParser(description='Benchmark the hot-path RPCs against a local Postgres')
+    parser.add_argument('--data', required=True, help='dataset directory (generated here if empty)')
+    parser.add_argument('--users', type=int, nargs='+', help='tenant sizes when generating a dataset')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--setup', action='store_true',
+                        help='apply supabase/migrations and load the dataset into --dsn (empty database)')
+    parser.add_argument('--rpcs', nargs='+', choices=list(RPCS), default=list(RPCS))
+    parser.add_argument('--calls', type=int, default=200, help='calls per user-scoped RPC per tenant')
+    parser.add_argument('--concurrency', type=int, default=8, help='pool size and concurrent callers')
+    parser.add_argument('--write-calls', type=int, default=3, help='runs per tenant-wide RPC per tenant')
+    parser.add_argument('--sync-users', type=int, default=0,
+                        help='users passed to update_mission_progress (default 0 = all, p_user_ids NULL)')
+    parser.add_argument('--plans', metavar='DIR', help='write auto_explain statement plans here')
+    parser.add_argument('--json', metavar='PATH', help='write the report rows as JSON')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    manifest = prepare_dataset(args.data, args.users, args.seed, args.dsn, args.setup)
+    results = {}
+    for tenant in sorted(manifest['tenants'], key=lambda t: t['users']):
+        print(f"Tenant {tenant['tenant']} ({tenant['users']:,} users)...")
+        results[tenant['tenant']] = (tenant['users'], bench_tenant(
+            args.dsn, tenant, args.rpcs, args.calls, args.concurrency, args.write_calls, args.sync_users,
+            args.seed, args.plans))
+    rows = summarize(results)
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+            f.write('\n')
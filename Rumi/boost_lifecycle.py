@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Commission Boost Lifecycle
+Replays commission_boost_redemptions through the boost state machine from a
+table snapshot. The daily cron (app/api/cron/daily-automation, after the
+sales sync) runs activate_scheduled_boosts, expire_active_boosts and
+transition_expired_to_pending_info (00000000000000_baseline.sql) once per
+run. The last two steps are manual (savePaymentInfo, admin payout):
+
+    scheduled -> active        first run with CURRENT_DATE >= scheduled_activation_date;
+                               activated_at = NOW(), expires_at = NOW() + duration_days,
+                               sales_at_activation = users.total_sales
+    active -> expired          first run with expires_at <= NOW(); sales_at_expiration =
+                               users.total_sales, final_payout_amount =
+                               GREATEST(0, expiration - activation) * boost_rate / 100
+    expired -> pending_info    the same run
+    pending_info -> pending_payout   payment_info_collected_at
+    pending_payout -> paid           payout_sent_at
+
+Every boost's transition instants are one row of an int64 microsecond
+array (NEVER for steps not taken), so its state at any instant is a
+row-wise count. The state counts over a whole timeline are one
+searchsorted per status column. Cron run instants come from the
+snapshot's successful auto sync_logs, or daily at 19:00 UTC without them.
+
+Payouts are computed in cents. admin_adjusted_commission overrides the
+computed amount. Active boosts accrue against users.total_sales.
+
+--check is the reconciliation oracle:
+- boost rows the cron should have moved by --as-of
+- wrong expires_at / final_payout_amount
+- commission_boost_state_history rows that are missing, duplicated, off
+  the state machine, or off the boost's own timestamps
+
+activate_scheduled_boosts as defined in the baseline declares activated_at
+and expires_at as timestamp without time zone, while the columns are
+timestamptz. The RETURN QUERY fails, the UPDATE rolls back, and the cron
+logs the error as non-fatal. Until that is fixed, every due boost shows
+up as not_activated.
+
+log_boost_transition types a row 'cron' only when app.current_user_id is
+set to ''. Nothing sets it, and current_setting(..., true) is NULL in a
+fresh session, so cron transitions are logged as 'manual'. Transition
+types are reported, not failed on.
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/today
+    python boost_lifecycle.py snapshots/today --check
+    python boost_lifecycle.py snapshots/today --json boost_costs.json --history-out expected_history.csv
+    python boost_lifecycle.py snapshots/today --out model_configs/boosts.yaml --base model_configs/base.yaml
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_snapshot import read_table, table_path
+
+CRON_HOUR_UTC = 19   # vercel.json "0 19 * * *"
+
+STATUSES = ['scheduled', 'active', 'expired', 'pending_info', 'pending_payout', 'paid']
+# Who moves a boost into STATUSES[k] (step k, from STATUSES[k - 1])
+STEP_ACTOR = [None, 'cron', 'cron', 'cron', 'manual', 'manual']
+
+US_PER_HOUR = 3_600_000_000
+US_PER_DAY = 24 * US_PER_HOUR
+NEVER = np.iinfo(np.int64).max
+
+
+def _numpy(column, fill, dtype=np.int64):
+    return pc.fill_null(column, fill).to_numpy(zero_copy_only=False).astype(dtype)
+
+
+def _us(column):
+    """Timestamp or date column -> int64 microseconds since epoch; NULL -> NEVER."""
+    if pa.types.is_date(column.type):
+        days = _numpy(pc.cast(column, pa.int32()), np.iinfo(np.int32).max)
+        return np.where(days == np.iinfo(np.int32).max, NEVER, days * US_PER_DAY)
+    return _numpy(pc.cast(column, pa.int64()), NEVER)
+
+
+def _cents(column):
+    """numeric(_, 2) column -> (int64 cents, null mask)."""
+    values = pc.fill_null(column, 0.0).to_numpy(zero_copy_only=False)
+    return np.round(values * 100).astype(np.int64), pc.is_null(column).to_numpy(zero_copy_only=False)
+
+
+def _iso(us):
+    return '' if us == NEVER else str(np.datetime64(int(us), 'us')) + 'Z'
+
+
+def _month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+def load_boosts(directory, client_id=None):
+    """One client's boosts as arrays, with the redeeming user's current total_sales."""
+    boosts = read_table(directory, 'commission_boost_redemptions', None, client_id)
+    redemptions = read_table(directory, 'redemptions', ['id', 'user_id', 'client_id', 'claimed_at'], client_id)
+    users = read_table(directory, 'users', ['id', 'client_id', 'total_sales'], client_id)
+
+    redemption = pc.index_in(boosts['redemption_id'], value_set=redemptions['id'])
+    user_id = pc.take(redemptions['user_id'], redemption)
+    user = pc.index_in(user_id, value_set=users['id'])
+    total_sales, _ = _cents(pc.take(users['total_sales'], user))
+
+    status = boosts['boost_status'].to_pylist()
+    code = np.array([STATUSES.index(s) if s in STATUSES else -1 for s in status], dtype=np.int8)
+    rate = _numpy(boosts['boost_rate'], 0.0, np.float64)
+    sales_at_activation, no_activation = _cents(boosts['sales_at_activation'])
+    sales_at_expiration, no_expiration = _cents(boosts['sales_at_expiration'])
+    adjusted, no_adjustment = _cents(boosts['admin_adjusted_commission'])
+    final, no_final = _cents(boosts['final_payout_amount'])
+    return {
+        'client_id': client_id or (boosts['client_id'][0].as_py() if boosts.num_rows else None),
+        'id': np.array(boosts['id'].to_pylist(), dtype='U36'),
+        'status': code,
+        'unknown_status': sorted({s for s, c in zip(status, code) if c < 0}),
+        'claimed': _us(pc.take(redemptions['claimed_at'], redemption)),
+        'scheduled': _us(boosts['scheduled_activation_date']),
+        'activated': _us(boosts['activated_at']),
+        'expires': _us(boosts['expires_at']),
+        'collected': _us(boosts['payment_info_collected_at']),
+        'paid': _us(boosts['payout_sent_at']),
+        'duration_days': _numpy(boosts['duration_days'], 0),
+        # boost_rate is numeric(5,2): hundredths of a percent
+        'rate_bp': np.round(rate * 100).astype(np.int64),
+        'sales_at_activation': np.where(no_activation, -1, sales_at_activation),
+        'sales_at_expiration': np.where(no_expiration, -1, sales_at_expiration),
+        'adjusted': np.where(no_adjustment, -1, adjusted),
+        'final': np.where(no_final, -1, final),
+        'total_sales': np.where(pc.is_null(user).to_numpy(zero_copy_only=False), -1, total_sales),
+    }
+
+
+def load_history(directory, boosts, client_id=None):
+    """commission_boost_state_history rows as arrays (None when the snapshot has no history)."""
+    if not os.path.exists(table_path(directory, 'commission_boost_state_history')):
+        return None
+    rows = read_table(directory, 'commission_boost_state_history', None, client_id)
+    ids = np.array(rows['boost_redemption_id'].to_pylist(), dtype='U36')
+    order = np.argsort(boosts['id'])
+    pos = np.minimum(np.searchsorted(boosts['id'], ids, sorter=order), max(len(order) - 1, 0))
+    boost = order[pos] if len(order) else pos
+    found = boosts['id'][boost] == ids if len(order) else np.zeros(len(ids), dtype=bool)
+    pairs = {(STATUSES[k - 1], STATUSES[k]): k for k in range(1, len(STATUSES))}
+    step = [pairs.get(p, -1) for p in zip(rows['from_status'].to_pylist(), rows['to_status'].to_pylist())]
+    return {
+        'boost': np.where(found, boost, -1),
+        'step': np.array(step, dtype=np.int8),
+        'at': _us(rows['transitioned_at']),
+        'type': np.array(rows['transition_type'].fill_null('').to_pylist(), dtype=object),
+    }
+
+
+def cron_runs(directory, client_id=None):
+    """
+    Completion instants of the client's successful auto syncs, after which
+    the boost steps run; None when the snapshot has no sync_logs.
+    """
+    if not os.path.exists(table_path(directory, 'sync_logs')):
+        return None
+    logs = read_table(directory, 'sync_logs', ['client_id', 'status', 'source', 'completed_at'], client_id)
+    ok = pc.and_(pc.equal(logs['status'], 'success'), pc.equal(logs['source'], 'auto'))
+    runs = _us(logs['completed_at'].filter(ok))
+    return np.unique(runs[runs != NEVER])
+
+
+def daily_runs(start, end, hour=CRON_HOUR_UTC):
+    """One run per day at hour:00 UTC covering [start, end]."""
+    first = start // US_PER_DAY * US_PER_DAY + hour * US_PER_HOUR
+    if first < start:
+        first += US_PER_DAY
+    return np.arange(first, end + 1, US_PER_DAY, dtype=np.int64)
+
+
+# ============================================================================
+# LIFECYCLE
+# ============================================================================
+class BoostLifecycle:
+    """
+    Transition instants of every boost. times[i, k] is when boost i entered
+    STATUSES[k], NEVER if it has not. Recorded columns (activated_at,
+    payment_info_collected_at, payout_sent_at) are used as-is. The expiry
+    steps have no column and are put at the first cron run at or after
+    expires_at. due[i, k] is when the cron should have made its step k
+    (activation and expiry), regardless of what the row says.
+    """
+
+    def __init__(self, boosts, runs):
+        self.boosts = boosts
+        # Sentinel keeps searchsorted in range: no run after the last one
+        self.runs = np.append(np.sort(runs), NEVER)
+        status = boosts['status']
+        n = len(status)
+        reached = status[:, None] >= np.arange(len(STATUSES))
+
+        expiry_run = self.next_run(boosts['expires'])
+        raw = np.full((n, len(STATUSES)), NEVER, dtype=np.int64)
+        raw[:, 0] = boosts['claimed']
+        raw[:, 1] = boosts['activated']
+        raw[:, 2] = expiry_run
+        raw[:, 3] = expiry_run
+        raw[:, 4] = boosts['collected']
+        raw[:, 5] = boosts['paid']
+        raw[~reached] = NEVER
+        self.raw = raw
+        # Steps cannot precede the one before them; a reached step with a NULL column (reported
+        # by check()) holds back the rest. claimed_at missing from an export starts at the epoch.
+        times = raw.copy()
+        times[:, 0] = np.where(reached[:, 0] & (raw[:, 0] == NEVER), 0, raw[:, 0])
+        self.times = np.maximum.accumulate(times, axis=1)
+
+        self.due = np.full((n, len(STATUSES)), NEVER, dtype=np.int64)
+        self.due[:, 1] = self.next_run(boosts['scheduled'])
+        self.due[:, 2] = expiry_run
+        self.due[:, 3] = expiry_run
+        self._sorted = [np.sort(self.times[:, k]) for k in range(len(STATUSES))]
+
+    def next_run(self, instants):
+        """First cron run at or after each instant (NEVER for NEVER or past the last run)."""
+        runs = self.runs[np.searchsorted(self.runs, instants, side='left')]
+        return np.where(instants == NEVER, NEVER, runs)
+
+    def state_at(self, instant):
+        """Status index of every boost at instant (-1: not claimed yet)."""
+        return (self.times <= instant).sum(axis=1) - 1
+
+    def state_counts(self, instants):
+        """[len(instants), len(STATUSES)] number of boosts in each status at each instant."""
+        instants = np.asarray(instants, dtype=np.int64)
+        entered = np.stack([np.searchsorted(s, instants, side='right') for s in self._sorted], axis=1)
+        return entered - np.append(entered[:, 1:], np.zeros((len(instants), 1), dtype=np.int64), axis=1)
+
+    def expected_payout(self):
+        """Cents final_payout_amount should hold (expire_active_boosts), -1 before expiry."""
+        b = self.boosts
+        ended = b['sales_at_expiration'] >= 0
+        delta = np.maximum(0, b['sales_at_expiration'] - np.maximum(b['sales_at_activation'], 0))
+        # numeric(10,2) rounds half away from zero; the product is never negative
+        return np.where(ended, (delta * b['rate_bp'] + 5000) // 10000, -1)
+
+    def owed(self):
+        """Cents owed per boost: the admin adjustment if any, else the expected payout."""
+        return np.where(self.boosts['adjusted'] >= 0, self.boosts['adjusted'], self.expected_payout())
+
+    def accrued(self):
+        """Cents an active boost would pay if it expired on the snapshot's total_sales (-1 otherwise)."""
+        b = self.boosts
+        active = (b['status'] == STATUSES.index('active')) & (b['total_sales'] >= 0)
+        delta = np.maximum(0, b['total_sales'] - np.maximum(b['sales_at_activation'], 0))
+        return np.where(active, (delta * b['rate_bp'] + 5000) // 10000, -1)
+
+    def expected_history(self, as_of):
+        """(boost index, step, instant) of every transition log_boost_transition should have written."""
+        boost, step = np.nonzero(self.times[:, 1:] <= as_of)
+        step = step + 1
+        order = np.lexsort((step, self.times[boost, step], boost))
+        return boost[order], step[order], self.times[boost, step][order]
+
+    # ------------------------------------------------------------------
+    # ORACLE
+    # ------------------------------------------------------------------
+    def check(self, as_of, tolerance_us=US_PER_HOUR):
+        """Masks over boosts of rows inconsistent with the RPCs as of as_of."""
+        b = self.boosts
+        status = b['status']
+        expected = self.expected_payout()
+        started = status >= STATUSES.index('active')
+        ended = status >= STATUSES.index('expired')
+        # Latest recorded instant up to each step
+        recorded = np.maximum.accumulate(np.where(self.raw == NEVER, np.iinfo(np.int64).min, self.raw), axis=1)
+        return {
+            # The cron should already have moved these
+            'not_activated': (status == STATUSES.index('scheduled')) & (self.due[:, 1] <= as_of),
+            'not_expired': (status == STATUSES.index('active')) & (self.due[:, 2] <= as_of),
+            'left_expired': (status == STATUSES.index('expired')) & (self.due[:, 3] <= as_of),
+            # Activated before its date, or later than the run that was due
+            'early_activation': started & (b['activated'] < b['scheduled']),
+            'late_activation': started & (b['activated'] != NEVER) & (b['activated'] > self.due[:, 1] + tolerance_us),
+            'wrong_expires_at': started & (b['expires'] != b['activated'] + b['duration_days'] * US_PER_DAY),
+            'missing_timestamps': (started & (b['activated'] == NEVER))
+                                  | ((status >= STATUSES.index('pending_payout')) & (b['collected'] == NEVER))
+                                  | ((status == STATUSES.index('paid')) & (b['paid'] == NEVER)),
+            'out_of_order': ((self.raw[:, 1:] != NEVER) & (self.raw[:, 1:] < recorded[:, :-1])).any(axis=1),
+            'missing_expiration_sales': ended & (expected < 0),
+            'missing_payout': ended & (expected >= 0) & (b['final'] < 0),
+            'wrong_payout': ended & (expected >= 0) & (b['final'] >= 0) & (b['final'] != expected),
+        }
+
+    def reconcile_history(self, history, as_of, tolerance_us=US_PER_HOUR):
+        """
+        Diff commission_boost_state_history against expected_history(as_of).
+        Returns counts and example indices; transitions are keyed
+        (boost, step), so a repeated step is a duplicate.
+        """
+        width = len(STATUSES)
+        boost, step, at = self.expected_history(as_of)
+        expected_key = boost.astype(np.int64) * width + step
+
+        known = (history['boost'] >= 0) & (history['step'] > 0)
+        key = np.where(known, history['boost'].astype(np.int64) * width + history['step'], -1)
+        uniq, count = np.unique(key, return_counts=True)
+        duplicated = np.isin(key, uniq[count > 1]) & known
+        matched = np.isin(key, expected_key) & known
+
+        order = np.argsort(expected_key)
+        where = order[np.searchsorted(expected_key, key[matched], sorter=order)]
+        off = np.abs(history['at'][matched] - at[where])
+        mistimed = np.zeros(len(key), dtype=bool)
+        mistimed[np.flatnonzero(matched)] = off > tolerance_us
+        actor = np.array(STEP_ACTOR, dtype=object)[np.maximum(history['step'], 0)]
+        wrong_type = matched & (history['type'] != actor)
+        return {
+            'expected': len(expected_key),
+            'logged': len(key),
+            'missing': np.flatnonzero(~np.isin(expected_key, key)),
+            'unknown_boost': np.flatnonzero(history['boost'] < 0),
+            'illegal_step': np.flatnonzero((history['boost'] >= 0) & (history['step'] <= 0)),
+            'unexpected': np.flatnonzero(known & ~matched),
+            'duplicated': np.flatnonzero(duplicated),
+            'mistimed': np.flatnonzero(mistimed),
+            'wrong_type': np.flatnonzero(wrong_type),
+            'expected_rows': (boost, step, at),
+        }
+
+
+# ============================================================================
+# COSTS
+# ============================================================================
+def monthly_costs(lifecycle, as_of):
+    """
+    Per month up to as_of: boosts activated and expired, sales delta and
+    payout owed at expiry, amount paid out, and the state counts at month
+    end. Amounts in dollars.
+    """
+    times = lifecycle.times
+    owed = lifecycle.owed()
+    b = lifecycle.boosts
+    delta = np.where(b['sales_at_expiration'] >= 0,
+                     np.maximum(0, b['sales_at_expiration'] - np.maximum(b['sales_at_activation'], 0)), 0)
+    first = times[:, 0][times[:, 0] > 0]
+    if not len(first):
+        return []
+    months = np.arange(np.datetime64(int(first.min()), 'us').astype('datetime64[M]'),
+                       np.datetime64(int(as_of), 'us').astype('datetime64[M]') + 1)
+    month_start = months.astype('datetime64[us]').astype(np.int64)
+    month_end = np.minimum(np.append(month_start[1:], NEVER) - 1, as_of)
+    counts = lifecycle.state_counts(month_end)
+
+    def by_month(instants, weights=None):
+        sel = (instants != NEVER) & (instants <= as_of)
+        month = np.searchsorted(month_start, instants[sel], side='right') - 1
+        return np.bincount(month, weights=None if weights is None else weights[sel], minlength=len(months))
+
+    expired = times[:, 2]
+    activated = by_month(times[:, 1])
+    ended = by_month(expired)
+    sales = by_month(expired, delta)
+    payout = by_month(expired, np.maximum(owed, 0))
+    paid = by_month(times[:, 5], np.maximum(owed, 0))
+    rows = []
+    for m in range(len(months)):
+        rows.append({'month': _month_label(months[m].astype(np.int64)), 'activations': int(activated[m]),
+                     'expirations': int(ended[m]), 'sales_delta': round(sales[m] / 100, 2),
+                     'payout': round(payout[m] / 100, 2), 'paid_out': round(paid[m] / 100, 2),
+                     'states': {s: int(c) for s, c in zip(STATUSES, counts[m])}})
+    return rows
+
+
+def cost_summary(lifecycle, as_of):
+    """Totals at as_of: paid, owed (expired .. pending_payout), accruing on active boosts."""
+    status = lifecycle.state_at(as_of)
+    owed = np.maximum(lifecycle.owed(), 0)
+    accrued = np.maximum(lifecycle.accrued(), 0)
+    b = lifecycle.boosts
+    ended = b['sales_at_expiration'] >= 0
+    delta = np.maximum(0, b['sales_at_expiration'] - np.maximum(b['sales_at_activation'], 0))
+    return {
+        'boosts': len(status),
+        'paid': round(owed[status == STATUSES.index('paid')].sum() / 100, 2),
+        'owed': round(owed[(status >= STATUSES.index('expired')) & (status < STATUSES.index('paid'))].sum() / 100, 2),
+        'accruing': round(accrued.sum() / 100, 2),
+        'ended': int(ended.sum()),
+        'avg_sales_delta': round(float(delta[ended].mean()) / 100, 2) if ended.any() else 0.0,
+        # sum(delta * rate) / sum(rate): what the model's rate x sales x AOV cost averages over
+        'rate_weighted_sales_delta': round(float((delta * b['rate_bp'])[ended].sum() / b['rate_bp'][ended].sum())
+                                           / 100, 2) if ended.any() and b['rate_bp'][ended].sum() else 0.0,
+    }
+
+
+def calibrated_boost_sales(config, summary):
+    """
+    Set the model's 'Avg Sales During Commission Boost' (orders) so that
+    rate x sales x Net AOV matches the rate-weighted sales delta of ended
+    boosts. Returns the new value, or None without ended boosts.
+    """
+    from loyalty_model import evaluate
+
+    if not summary['ended']:
+        return None
+    net_aov = evaluate(config)['Revenue']['Net AOV (weighted avg)'][0]
+    value = round(summary['rate_weighted_sales_delta'] / net_aov, 2) if net_aov else 0.0
+    config['inputs']['Avg Sales During Commission Boost'] = value
+    return value
+
+
+def write_history(path, lifecycle, rows):
+    """Expected history rows, loadable with \\copy commission_boost_state_history (...) FROM ... CSV HEADER."""
+    boost, step, at = rows
+    ids = lifecycle.boosts['id']
+    client_id = lifecycle.boosts['client_id']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['boost_redemption_id', 'client_id', 'from_status', 'to_status', 'transitioned_at',
+                         'transition_type'])
+        for i, k, t in zip(boost.tolist(), step.tolist(), at.tolist()):
+            writer.writerow([ids[i], client_id, STATUSES[k - 1], STATUSES[k], _iso(t), STEP_ACTOR[k]])
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Replay commission boosts through the boost RPCs')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--as-of', help='instant to evaluate at (default: the latest timestamp in the snapshot)')
+    parser.add_argument('--tolerance-hours', type=float, default=1.0,
+                        help='allowed gap between a logged transition and the boost\'s own timestamp')
+    parser.add_argument('--check', action='store_true', help='reconcile boost rows and state history (exit 1 if off)')
+    parser.add_argument('--history-out', help='write the transitions the history should hold (CSV)')
+    parser.add_argument('--json', help='write monthly boost costs and totals (JSON)')
+    parser.add_argument('--out', help='write a model config with the measured Avg Sales During Commission Boost')
+    parser.add_argument('--base', help='config to start from for --out (default: built-in v3 config)')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    boosts = load_boosts(args.snapshot, args.client_id)
+    if boosts['unknown_status']:
+        print(f"Unknown boost_status values (ignored): {', '.join(map(str, boosts['unknown_status']))}")
+    recorded = np.concatenate([boosts[c][boosts[c] != NEVER] for c in ('claimed', 'activated', 'collected', 'paid')])
+    as_of = (int(np.datetime64(args.as_of, 'us').astype(np.int64)) if args.as_of
+             else int(recorded.max()) if len(recorded) else 0)
+    runs = cron_runs(args.snapshot, args.client_id)
+    source = 'sync_logs'
+    if runs is None or not len(runs):
+        source = f"daily at {CRON_HOUR_UTC}:00 UTC"
+        start = min(int(boosts['scheduled'].min()), int(recorded.min())) if len(recorded) else as_of
+        runs = daily_runs(start, max(as_of, int(boosts['expires'][boosts['expires'] != NEVER].max(initial=0)))
+                          + US_PER_DAY)
+    lifecycle = BoostLifecycle(boosts, runs)
+    tolerance = int(args.tolerance_hours * US_PER_HOUR)
+    print(f"{len(boosts['id']):,} boosts, {len(runs):,} cron runs ({source}), as of {_iso(as_of)} "
+          f"in {time.perf_counter() - start_time:.2f}s\n")
+
+    rows = monthly_costs(lifecycle, as_of)
+    print(f"{'month':8s} {'activated':>9s} {'expired':>8s} {'sales delta':>12s} {'payout':>10s} {'paid out':>10s}  "
+          + ' '.join(f"{s[:10]:>10s}" for s in STATUSES))
+    for row in rows:
+        print(f"{row['month']:8s} {row['activations']:>9,d} {row['expirations']:>8,d} {row['sales_delta']:>12,.2f} "
+              f"{row['payout']:>10,.2f} {row['paid_out']:>10,.2f}  "
+              + ' '.join(f"{row['states'][s]:>10,d}" for s in STATUSES))
+    summary = cost_summary(lifecycle, as_of)
+    print(f"\nPaid ${summary['paid']:,.2f}, owed ${summary['owed']:,.2f}, accruing on active boosts "
+          f"${summary['accruing']:,.2f}; {summary['ended']:,} ended boosts averaged "
+          f"${summary['avg_sales_delta']:,.2f} of sales (rate-weighted ${summary['rate_weighted_sales_delta']:,.2f})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'as_of': _iso(as_of), 'cron_runs': source, 'summary': summary, 'months': rows}, f, indent=2)
+            f.write('\n')
+        print(f"Report written to {args.json}")
+    if args.history_out:
+        expected = lifecycle.expected_history(as_of)
+        write_history(args.history_out, lifecycle, expected)
+        print(f"{len(expected[0]):,} expected transitions written to {args.history_out}")
+    if args.out:
+        from loyalty_config import load_config, save_config, validate_config
+        from loyalty_model import default_config
+
+        config = load_config(args.base) if args.base else default_config()
+        value = calibrated_boost_sales(config, summary)
+        errors = validate_config(config)
+        if errors:
+            print("Config is invalid:\n  - " + '\n  - '.join(errors))
+            sys.exit(1)
+        save_config(config, args.out)
+        print(f"Config written: {args.out} (Avg Sales During Commission Boost: "
+              f"{'unchanged, no ended boosts' if value is None else value})")
+
+    if args.check:
+        failed = False
+        print("\nBoost rows:")
+        for name, mask in lifecycle.check(as_of, tolerance).items():
+            if mask.any():
+                failed = True
+                print(f"  {name:26s} {int(mask.sum()):>8,d}  e.g. {boosts['id'][np.flatnonzero(mask)[0]]}")
+        if not failed:
+            print("  consistent with the boost RPCs")
+        history = load_history(args.snapshot, boosts, args.client_id)
+        if history is None:
+            print("\nNo commission_boost_state_history.csv in the snapshot")
+        else:
+            result = lifecycle.reconcile_history(history, as_of, tolerance)
+            print(f"\nState history: {result['logged']:,} rows logged, {result['expected']:,} expected")
+            for name in ('missing', 'unknown_boost', 'illegal_step', 'unexpected', 'duplicated', 'mistimed'):
+                if len(result[name]):
+                    failed = True
+                    print(f"  {name:26s} {len(result[name]):>8,d}")
+            if len(result['wrong_type']):
+                print(f"  {'typed other than its actor':26s} {len(result['wrong_type']):>8,d}  "
+                      f"(log_boost_transition: cron steps log as 'manual' unless app.current_user_id = '')")
+        sys.exit(1 if failed else 0)
@@ -5,14 +5,38 @@ FIXES:
 - Mission reward type breakdown calculated from Missions sheet
 - Costs sheet references Missions summary (no hardcoded percentages)
 - Mission cost formula references actual Net AOV
+
+Parameter values come from a model config (see loyalty_config.py):
+    python build_loyalty_excel_v3.py --config model_configs/loyalty_v3.yaml
+Without --config the built-in v3 values (loyalty_model.DEFAULT_CONFIG) are used.
+
+Per-sheet timing/memory report (off by default, see build_profiler.py):
+    python build_loyalty_excel_v3.py --profile-report build_profile.json [--cprofile build.prof]
 """
 
+import argparse
+
 from openpyxl import Workbook
 from openpyxl.styles import Font, Fill, PatternFill, Border, Side, Alignment
 from openpyxl.utils import get_column_letter
 from openpyxl.workbook.defined_name import DefinedName
 
+from build_profiler import BuildProfiler
+from loyalty_config import load_config
+from loyalty_model import LEVEL_NAMES, OPTIONAL_INPUTS, default_config
+
+parser = argparse.ArgumentParser(description='Build the loyalty program financial model workbook')
+parser.add_argument('--config', help='YAML/JSON model config (default: built-in v3 values)')
+parser.add_argument('--output', default='/home/jorge/Loyalty/Rumi/LoyaltyProgramModel_v3.xlsx')
+parser.add_argument('--profile-report', help='write per-sheet build timings/memory as JSON')
+parser.add_argument('--cprofile', help='also dump cProfile stats to this path')
+args = parser.parse_args()
+
+config = load_config(args.config) if args.config else default_config()
+inp = dict(OPTIONAL_INPUTS, **config['inputs'])
+
 wb = Workbook()
+profiler = BuildProfiler(wb, enabled=bool(args.profile_report), cprofile_path=args.cprofile)
 
 # Styles
 header_font = Font(bold=True, size=12, color="FFFFFF")
@@ -52,6 +76,7 @@ def style_section(cell):
 # ============================================================================
 # SHEET 1: INPUTS DASHBOARD
 # ============================================================================
+profiler.stage('Inputs')
 ws1 = wb.active
 ws1.title = "Inputs"
 
@@ -68,12 +93,12 @@ for col, header in enumerate(headers, 1):
     style_header(cell)
 
 acquisition_inputs = [
-    ('Samples Sent - Month 1', 150, 'samples', 'Initial month sample distribution'),
-    ('Samples Sent - Month 2+', 100, 'samples', 'Ongoing monthly sample distribution'),
-    ('Sample-to-Affiliate Conversion Rate', 0.20, '%', 'Percentage of samples that convert to affiliates'),
-    ('Flywheel Affiliates per Month', 10, 'affiliates', 'Organic inbound affiliates monthly'),
-    ('Time to First Sale', 14, 'days', 'Lag between conversion and first sale'),
-    ('Affiliate Attrition Rate', 0.05, '%', 'Monthly churn rate of affiliates'),
+    ('Samples Sent - Month 1', inp['Samples Sent - Month 1'], 'samples', 'Initial month sample distribution'),
+    ('Samples Sent - Month 2+', inp['Samples Sent - Month 2+'], 'samples', 'Ongoing monthly sample distribution'),
+    ('Sample-to-Affiliate Conversion Rate', inp['Sample-to-Affiliate Conversion Rate'], '%', 'Percentage of samples that convert to affiliates'),
+    ('Flywheel Affiliates per Month', inp['Flywheel Affiliates per Month'], 'affiliates', 'Organic inbound affiliates monthly'),
+    ('Time to First Sale', inp['Time to First Sale'], 'days', 'Lag between conversion and first sale'),
+    ('Affiliate Attrition Rate', inp['Affiliate Attrition Rate'], '%', 'Monthly churn rate of affiliates'),
 ]
 
 for i, (param, value, unit, desc) in enumerate(acquisition_inputs, 5):
@@ -93,9 +118,9 @@ for col, header in enumerate(headers, 1):
     style_header(cell)
 
 performance_inputs = [
-    ('Average Sales per Affiliate per Month', 5, 'sales', 'Monthly sales velocity per active affiliate'),
-    ('Gross AOV', 100, '$', 'Average order value before discounts'),
-    ('Rolling Window Duration', 30, 'days', 'Time period for VIP level qualification'),
+    ('Average Sales per Affiliate per Month', inp['Average Sales per Affiliate per Month'], 'sales', 'Monthly sales velocity per active affiliate'),
+    ('Gross AOV', inp['Gross AOV'], '$', 'Average order value before discounts'),
+    ('Rolling Window Duration', inp['Rolling Window Duration'], 'days', 'Time period for VIP level qualification'),
 ]
 
 for i, (param, value, unit, desc) in enumerate(performance_inputs, 14):
@@ -115,9 +140,9 @@ for col, header in enumerate(headers, 1):
     style_header(cell)
 
 redemption_inputs = [
-    ('Discount Redemption Rate', 0.30, '%', 'Percentage of discount coupons redeemed'),
-    ('Default Mission Completion Rate', 0.25, '%', 'Default completion rate for missions'),
-    ('Avg Sales During Commission Boost', 3, 'sales', 'Expected sales an affiliate makes during boost period'),
+    ('Discount Redemption Rate', inp['Discount Redemption Rate'], '%', 'Percentage of discount coupons redeemed'),
+    ('Default Mission Completion Rate', inp['Default Mission Completion Rate'], '%', 'Default completion rate for missions'),
+    ('Avg Sales During Commission Boost', inp['Avg Sales During Commission Boost'], 'sales', 'Expected sales an affiliate makes during boost period'),
 ]
 
 for i, (param, value, unit, desc) in enumerate(redemption_inputs, 21):
@@ -137,7 +162,9 @@ for col, header in enumerate(headers, 1):
     style_header(cell)
 
 cost_inputs = [
-    ('Cost per Sample', 15, '$', 'Cost of each sample sent (product + shipping)'),
+    ('Cost per Sample', inp['Cost per Sample'], '$', 'Cost of each sample sent (product + shipping)'),
+    ('Raffles per Month', inp['Raffles per Month'], 'raffles', 'Raffle missions drawn each month'),
+    ('Avg Raffle Prize Cost', inp['Avg Raffle Prize Cost'], '$', 'Average prize cost per raffle drawn'),
 ]
 
 for i, (param, value, unit, desc) in enumerate(cost_inputs, 28):
@@ -159,12 +186,13 @@ for col, header in enumerate(level_dist_headers, 1):
     cell = ws1.cell(row=33, column=col, value=header)
     style_header(cell)
 
+dist = config['level_distribution']
 level_distribution = [
-    ('Bronze', 0.40, 'Affiliates below Silver threshold'),
-    ('Silver', 0.30, 'Affiliates at Silver, below Gold'),
-    ('Gold', 0.18, 'Affiliates at Gold, below Platinum'),
-    ('Platinum', 0.09, 'Affiliates at Platinum, below Diamond'),
-    ('Diamond', 0.03, 'Top performers at Diamond'),
+    ('Bronze', dist['Bronze'], 'Affiliates below Silver threshold'),
+    ('Silver', dist['Silver'], 'Affiliates at Silver, below Gold'),
+    ('Gold', dist['Gold'], 'Affiliates at Gold, below Platinum'),
+    ('Platinum', dist['Platinum'], 'Affiliates at Platinum, below Diamond'),
+    ('Diamond', dist['Diamond'], 'Top performers at Diamond'),
 ]
 
 for i, (level, pct, desc) in enumerate(level_distribution, 34):
@@ -197,6 +225,7 @@ ws1.column_dimensions['D'].width = 45
 # ============================================================================
 # SHEET 2: VIP LEVEL CONFIGURATION
 # ============================================================================
+profiler.stage('VIP Levels')
 ws2 = wb.create_sheet("VIP Levels")
 
 ws2['A1'] = "VIP LEVEL CONFIGURATION"
@@ -212,11 +241,8 @@ for col, header in enumerate(level_headers, 1):
     style_header(cell)
 
 levels = [
-    (1, 'Bronze', 0, 0.10),
-    (2, 'Silver', 5, 0.12),
-    (3, 'Gold', 20, 0.18),
-    (4, 'Platinum', 50, 0.22),
-    (5, 'Diamond', 100, 0.25),
+    (i, level['name'], level['sales_threshold'], level['commission_rate'])
+    for i, level in enumerate(config['levels'], 1)
 ]
 
 for i, (level, name, threshold, commission) in enumerate(levels, 5):
@@ -242,13 +268,7 @@ for col, header in enumerate(reward_headers, 1):
     cell = ws2.cell(row=13, column=col, value=header)
     style_header(cell)
 
-welcome_rewards = [
-    ('Bronze', 1, 0.10, 30, 0, 0, 2, 0.15, 0, 0, 0, 0, 0, 0),
-    ('Silver', 2, 0.15, 30, 1, 50, 2, 0.15, 1, 25, 0, 0, 0, 0),
-    ('Gold', 1, 0.20, 30, 1, 100, 2, 0.20, 1, 50, 1, 50, 0, 0),
-    ('Platinum', 2, 0.25, 45, 2, 150, 3, 0.25, 2, 75, 1, 75, 1, 100),
-    ('Diamond', 3, 0.30, 60, 2, 200, 3, 0.30, 2, 100, 1, 100, 1, 200),
-]
+welcome_rewards = [(name, *config['welcome_rewards'][name]) for name in LEVEL_NAMES]
 
 for i, rewards in enumerate(welcome_rewards, 14):
     for col, val in enumerate(rewards, 1):
@@ -289,6 +309,7 @@ ws2.column_dimensions['A'].width = 45
 # ============================================================================
 # SHEET 3: MISSION CONFIGURATION
 # ============================================================================
+profiler.stage('Missions')
 ws3 = wb.create_sheet("Missions")
 
 ws3['A1'] = "MISSION CONFIGURATION"
@@ -307,16 +328,9 @@ for col, header in enumerate(mission_headers, 1):
     style_header(cell)
 
 missions = [
-    ('Bronze', 'Videos', 5, 'Monthly', 0.25, 'Gift Card', 50, 0, 'Yes'),
-    ('Bronze', 'Likes', 100, 'Monthly', 0.20, 'Gift Card', 50, 0, 'Yes'),
-    ('Silver', 'Videos', 10, 'Monthly', 0.20, 'Commission Boost', 0.20, 30, 'Yes'),
-    ('Silver', 'Likes', 100, 'Monthly', 0.15, 'Gift Card', 50, 0, 'Yes'),
-    ('Gold', 'Sales', 100, 'One-time', 0.10, 'Commission Boost', 0.30, 45, 'Yes'),
-    ('Gold', 'Views', 1000, 'Monthly', 0.15, 'Spark Ads', 50, 0, 'Yes'),
-    ('Platinum', 'Sales', 200, 'One-time', 0.08, 'Gift Card', 200, 0, 'Yes'),
-    ('Platinum', 'Videos', 20, 'Monthly', 0.12, 'Commission Boost', 0.25, 30, 'Yes'),
-    ('Diamond', 'Sales', 500, 'One-time', 0.05, 'Gift Card', 300, 0, 'Yes'),
-    ('Diamond', 'Views', 5000, 'Monthly', 0.10, 'Spark Ads', 100, 0, 'Yes'),
+    (m['level'], m['mission_type'], m['target'], m['repeatability'], m['completion_rate'],
+     m['reward_type'], m['reward_value'], m['reward_duration'], 'Yes' if m['active'] else 'No')
+    for m in config['missions']
 ]
 
 for i, mission in enumerate(missions, 5):
@@ -343,7 +357,7 @@ for i, mission in enumerate(missions, 5):
     cell.number_format = '$#,##0.00'
 
 # Empty rows for additional missions
-for i in range(15, 25):
+for i in range(5 + len(missions), 25):
     for col in range(1, 10):
         cell = ws3.cell(row=i, column=col, value='')
         style_input(cell)
@@ -360,7 +374,7 @@ for col, header in enumerate(summary_headers, 1):
     cell = ws3.cell(row=28, column=col, value=header)
     style_header(cell)
 
-levels_list = ['Bronze', 'Silver', 'Gold', 'Platinum', 'Diamond']
+levels_list = LEVEL_NAMES
 for i, level in enumerate(levels_list, 29):
     ws3.cell(row=i, column=1, value=level).border = thin_border
     cell = ws3.cell(row=i, column=2)
@@ -434,6 +448,7 @@ for col in range(1, 11):
 # ============================================================================
 # SHEET 4: AFFILIATE PROJECTION
 # ============================================================================
+profiler.stage('Affiliate Projection')
 ws4 = wb.create_sheet("Affiliate Projection")
 
 ws4['A1'] = "AFFILIATE PROJECTION (12 MONTHS)"
@@ -551,6 +566,7 @@ for col in range(2, 14):
 # ============================================================================
 # SHEET 5: REWARD TRIGGERS
 # ============================================================================
+profiler.stage('Reward Triggers')
 ws5 = wb.create_sheet("Reward Triggers")
 
 ws5['A1'] = "REWARD TRIGGERS (12 MONTHS)"
@@ -629,6 +645,7 @@ for col in range(2, 14):
 # ============================================================================
 # SHEET 6: REVENUE CALCULATION
 # ============================================================================
+profiler.stage('Revenue')
 ws6 = wb.create_sheet("Revenue")
 
 ws6['A1'] = "REVENUE PROJECTION (12 MONTHS)"
@@ -699,6 +716,7 @@ for col in range(2, 14):
 # ============================================================================
 # SHEET 7: COST CALCULATION - NOW USES MISSIONS SHEET BREAKDOWN
 # ============================================================================
+profiler.stage('Costs')
 ws7 = wb.create_sheet("Costs")
 
 ws7['A1'] = "COST PROJECTION (12 MONTHS)"
@@ -728,6 +746,7 @@ cost_metrics = [
     'Spark Ads Cost (Missions)',
     'Physical Gift Cost',
     'Experience Cost',
+    'Raffle Prize Cost',
     'Sample Cost',
     'Total Marketing OpEx',
     '',
@@ -820,22 +839,27 @@ for col in range(2, 14):
     style_calc(ws7.cell(row=21, column=col))
     ws7.cell(row=21, column=col).number_format = '$#,##0'
 
-    # Sample Cost
-    ws7.cell(row=22, column=col, value=f"='Affiliate Projection'!{ml}4*Inputs!$B$28")
+    # Raffle Prize Cost - raffles drawn per month * avg prize cost
+    ws7.cell(row=22, column=col, value="=Inputs!$B$29*Inputs!$B$30")
     style_calc(ws7.cell(row=22, column=col))
     ws7.cell(row=22, column=col).number_format = '$#,##0'
 
-    # Total Marketing OpEx
-    ws7.cell(row=23, column=col, value=f"=SUM({ml}18:{ml}22)")
+    # Sample Cost
+    ws7.cell(row=23, column=col, value=f"='Affiliate Projection'!{ml}4*Inputs!$B$28")
     style_calc(ws7.cell(row=23, column=col))
     ws7.cell(row=23, column=col).number_format = '$#,##0'
-    ws7.cell(row=23, column=col).font = Font(bold=True)
+
+    # Total Marketing OpEx
+    ws7.cell(row=24, column=col, value=f"=SUM({ml}18:{ml}23)")
+    style_calc(ws7.cell(row=24, column=col))
+    ws7.cell(row=24, column=col).number_format = '$#,##0'
+    ws7.cell(row=24, column=col).font = Font(bold=True)
 
     # Total Program Cost
-    ws7.cell(row=26, column=col, value=f"={ml}9+{ml}15+{ml}23")
-    style_calc(ws7.cell(row=26, column=col))
-    ws7.cell(row=26, column=col).number_format = '$#,##0'
-    ws7.cell(row=26, column=col).font = Font(bold=True)
+    ws7.cell(row=27, column=col, value=f"={ml}9+{ml}15+{ml}24")
+    style_calc(ws7.cell(row=27, column=col))
+    ws7.cell(row=27, column=col).number_format = '$#,##0'
+    ws7.cell(row=27, column=col).font = Font(bold=True)
 
 ws7.column_dimensions['A'].width = 35
 for col in range(2, 14):
@@ -844,6 +868,7 @@ for col in range(2, 14):
 # ============================================================================
 # SHEET 8: SUMMARY DASHBOARD
 # ============================================================================
+profiler.stage('Summary')
 ws8 = wb.create_sheet("Summary")
 
 ws8['A1'] = "SUMMARY DASHBOARD"
@@ -869,8 +894,8 @@ summary_metrics = [
     ('', '', None),
     ('Total CM1 Costs', "=SUM(Costs!B9:M9)", '$#,##0'),
     ('Total Loyalty Program Costs', "=SUM(Costs!B15:M15)", '$#,##0'),
-    ('Total Marketing OpEx', "=SUM(Costs!B23:M23)", '$#,##0'),
-    ('Total Program Cost', "=SUM(Costs!B26:M26)", '$#,##0'),
+    ('Total Marketing OpEx', "=SUM(Costs!B24:M24)", '$#,##0'),
+    ('Total Program Cost', "=SUM(Costs!B27:M27)", '$#,##0'),
 ]
 
 for i, (metric, formula, fmt) in enumerate(summary_metrics, 5):
@@ -931,7 +956,7 @@ for col in range(2, 14):
     ws8.cell(row=33, column=col, value=f"=Revenue!{ml}11")
     style_calc(ws8.cell(row=33, column=col))
     ws8.cell(row=33, column=col).number_format = '$#,##0'
-    ws8.cell(row=34, column=col, value=f"=Costs!{ml}26")
+    ws8.cell(row=34, column=col, value=f"=Costs!{ml}27")
     style_calc(ws8.cell(row=34, column=col))
     ws8.cell(row=34, column=col).number_format = '$#,##0'
     ws8.cell(row=35, column=col, value=f"=IF({ml}33>0,{ml}34/{ml}33,0)")
@@ -958,11 +983,15 @@ for col in range(3, 15):
     ws8.column_dimensions[get_column_letter(col)].width = 10
 
 # Save
-wb.save('/home/jorge/Loyalty/Rumi/LoyaltyProgramModel_v3.xlsx')
-print("Excel file created successfully: LoyaltyProgramModel_v3.xlsx")
+profiler.stage('Save')
+wb.save(args.output)
+profiler.finish()
+profiler.write_report(args.profile_report)
+print(f"Excel file created successfully: {args.output}")
 print("\nV3 FIXES:")
 print("- Missions sheet now has REWARD TYPE BREAKDOWN section (rows 36-41)")
 print("- Costs Row 7 (Comm Boost Missions): Now references Missions!$C$39*Missions!$D$39")
 print("- Costs Row 13 (Gift Card Missions): Now references Missions!$C$38*Missions!$D$38")
 print("- Costs Row 19 (Spark Ads Missions): Now references Missions!$C$40*Missions!$D$40")
 print("- Missions Col J (Cost formula): Now references Revenue!$B$10 for Net AOV")
+profiler.print_summary()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Loyalty Program Financial Model - Calibration from Sync Data
+Derives Inputs sheet parameters from a table snapshot (table_snapshot.py)
+instead of guessing them, and writes a config build_loyalty_excel_v3.py
+can use directly (--config).
+
+Calibrated:
+- Average Sales per Affiliate per Month: units_sold per active affiliate-month
+- Gross AOV: SUM(gmv) / SUM(units_sold)
+- Affiliate Attrition Rate: affiliates whose last active month was the
+  previous month / affiliates active in the previous month, over the months
+  followed by at least --churn-months months of data. Near the end of the
+  data a pause between videos looks the same as churn, so an affiliate only
+  counts as churned after that many months without a video.
+- level_distribution: share of active affiliate-months at each tier,
+  tier at month end reconstructed from tier_checkpoints
+
+An affiliate is active from the month of their first video to the month of
+their last one, the same meaning as Active Affiliates on the Affiliate
+Projection sheet (nobody comes back after churning).
+
+videos.csv is streamed in blocks and reduced to (user, month) partial sums
+per block, so memory follows the number of affiliate-months rather than
+the number of videos. A per-tier report (monthly units/GMV percentiles)
+can be written next to the config.
+
+Usage:
+    python calibrate_model.py snapshots/2025-12-31 --out model_configs/calibrated.yaml
+    python calibrate_model.py snapshots/2025-12-31 --out cal.yaml --report cal_report.json --last-months 6
+"""
+
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from loyalty_config import DISTRIBUTION_TOLERANCE, validate_config
+from loyalty_model import LEVEL_NAMES, default_config
+from table_snapshot import iter_table_batches, read_table, table_path
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+
+def _month_index(days):
+    """Day numbers (days since epoch) -> months since 1970-01."""
+    return np.asarray(days).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+# (user code, month) packed into one int64 key; months since 1970 fit in 16 bits
+_MONTH_BITS = 16
+
+
+def _merge(parts):
+    """Sum (keys, units, gmv, videos) parts into one part with unique, sorted keys."""
+    keys = np.concatenate([p[0] for p in parts])
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return (uniq,) + tuple(np.bincount(inverse, weights=np.concatenate([p[i] for p in parts]),
+                                       minlength=len(uniq)) for i in (1, 2, 3))
+
+
+def aggregate_user_months(directory, user_ids, client_id=None, block_size=4 << 20):
+    """
+    Stream videos.csv into (user code, month) -> (units, gmv, videos).
+    Returns a dict of numpy arrays sorted by (user, month), plus the last
+    post_date seen.
+
+    Each block is reduced to its distinct affiliate-months, and block
+    results are merged whenever they outgrow the merged total, so memory
+    follows the number of affiliate-months rather than the number of videos.
+    """
+    code_of = {user_id: i for i, user_id in enumerate(user_ids.to_pylist())}
+    parts = []
+    pending_rows = merged_rows = 0
+    last_day = None
+    for batch in iter_table_batches(directory, 'videos', ['user_id', 'client_id', 'post_date', 'units_sold', 'gmv'],
+                                    client_id, block_size):
+        # Look up each distinct id of the block once
+        encoded = pc.dictionary_encode(batch['user_id'])
+        codes = np.array([code_of.get(user_id, -1) for user_id in encoded.dictionary.to_pylist()] + [-1])
+        user = codes[pc.fill_null(encoded.indices, len(codes) - 1).to_numpy()]
+        keep = user >= 0
+        if not keep.any():
+            continue
+        days = pc.cast(batch['post_date'], pa.int32()).to_numpy(zero_copy_only=False)[keep]
+        last_day = max(last_day or days.max(), days.max())
+        keys = (user[keep] << _MONTH_BITS) | _month_index(days)
+        units = pc.fill_null(batch['units_sold'], 0).to_numpy(zero_copy_only=False)[keep]
+        gmv = pc.fill_null(batch['gmv'], 0).to_numpy(zero_copy_only=False)[keep]
+        parts.append(_merge([(keys, units, gmv, np.ones(len(keys)))]))
+        pending_rows += len(parts[-1][0])
+        if pending_rows > max(merged_rows, 1 << 20):
+            parts = [_merge(parts)]
+            merged_rows = pending_rows = len(parts[0][0])
+
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return {'user': empty, 'month': empty, 'units': empty.astype(float), 'gmv': empty.astype(float),
+                'videos': empty}, None
+    keys, units, gmv, videos = _merge(parts)
+    return {
+        'user': keys >> _MONTH_BITS,
+        'month': keys & ((1 << _MONTH_BITS) - 1),
+        'units': units,
+        'gmv': gmv,
+        'videos': videos.astype(np.int64),
+    }, int(last_day)
+
+
+def tier_at(user, day, checkpoints, user_ids, fallback):
+    """
+    Tier code of each (user, day): tier_after of the user's last checkpoint
+    on or before day, tier_before of their first one if day precedes it, or
+    fallback[user] (users.current_tier) for users with no checkpoints.
+    """
+    result = fallback[user].copy()
+    if checkpoints is None or not len(checkpoints['user']):
+        return result
+    cp_user, cp_day = checkpoints['user'], checkpoints['day']
+    order = np.lexsort((cp_day, cp_user))
+    cp_user, cp_day = cp_user[order], cp_day[order]
+    before, after = checkpoints['before'][order], checkpoints['after'][order]
+
+    # (user, day) keys sort together, so one searchsorted finds the last checkpoint <= day
+    span = int(max(cp_day.max(), day.max()) + 1)
+    pos = np.searchsorted(cp_user * span + cp_day, user * span + day, side='right') - 1
+    hit = (pos >= 0) & (cp_user[np.maximum(pos, 0)] == user)
+    result[hit] = after[pos[hit]]
+
+    # Before a user's first checkpoint they were at that checkpoint's tier_before
+    first = np.searchsorted(cp_user, user, side='left')
+    has_any = (first < len(cp_user)) & (cp_user[np.minimum(first, len(cp_user) - 1)] == user)
+    early = ~hit & has_any
+    result[early] = before[first[early]]
+    return result
+
+
+def _load_checkpoints(directory, client_id, user_ids, tier_code):
+    if not os.path.exists(table_path(directory, 'tier_checkpoints')):
+        return None
+    cps = read_table(directory, 'tier_checkpoints', ['user_id', 'client_id', 'checkpoint_date', 'tier_before',
+                                                     'tier_after'], client_id)
+    users = pc.index_in(cps['user_id'], value_set=user_ids)
+    keep = pc.is_valid(users)
+    cps = cps.filter(keep)
+
+    def codes(column):
+        return np.array([tier_code.get(t, 0) for t in column.to_pylist()], dtype=np.int64)
+
+    return {
+        'user': pc.filter(users, keep).to_numpy().astype(np.int64),
+        'day': pc.cast(cps['checkpoint_date'], pa.int32()).to_numpy().astype(np.int64),
+        'before': codes(cps['tier_before']),
+        'after': codes(cps['tier_after']),
+    }
+
+
+def calibrate(directory, client_id=None, last_months=None, block_size=4 << 20, churn_months=3):
+    """
+    Returns (calibrated values, per-tier report). Months are calendar
+    months; the month of the last post_date is left out when it is not
+    complete. Attrition is None when no month has churn_months months of
+    data after it, and level_distribution is None without any active
+    affiliate-month.
+    """
+    users = read_table(directory, 'users', ['id', 'client_id', 'current_tier'], client_id)
+    tiers = read_table(directory, 'tiers', ['tier_id', 'client_id', 'tier_order'], client_id).sort_by('tier_order')
+    user_ids = users['id']
+
+    # Client tiers map onto the model's five levels by tier_order; any
+    # tiers beyond the fifth are counted as the top level
+    tier_list = tiers['tier_id'].to_pylist() or ['tier_1']
+    tier_code = {tier_id: i for i, tier_id in enumerate(tier_list)}
+    level_of_tier = np.minimum(np.arange(len(tier_list)), len(LEVEL_NAMES) - 1)
+    fallback = np.array([tier_code.get(t, 0) for t in users['current_tier'].to_pylist()], dtype=np.int64)
+
+    um, last_day = aggregate_user_months(directory, user_ids, client_id, block_size)
+    if last_day is None:
+        raise ValueError(f"{directory}: no videos matched a user")
+
+    last_month = int(_month_index(last_day))
+    if np.datetime64(last_day + 1, 'D').astype('datetime64[M]').astype(np.int64) == last_month:
+        last_month -= 1  # partial month
+    n_users = len(user_ids)
+
+    # Active span per affiliate: first to last month with a video
+    first_active = np.full(n_users, np.iinfo(np.int64).max)
+    last_active = np.full(n_users, -1)
+    np.minimum.at(first_active, um['user'], um['month'])
+    np.maximum.at(last_active, um['user'], um['month'])
+    seen = last_active >= 0
+    start_month = int(first_active[seen].min())
+    if last_months:
+        start_month = max(start_month, last_month - last_months + 1)
+    months = np.arange(start_month, last_month + 1)
+    if not len(months):
+        raise ValueError(f"{directory}: no complete month of data")
+
+    # Active affiliates per month: +1 at the first month, -1 after the last
+    base = int(first_active[seen].min())
+    diff = np.zeros(last_month - base + 3, dtype=np.int64)
+    np.add.at(diff, first_active[seen] - base, 1)
+    np.add.at(diff, np.minimum(last_active[seen], last_month + 1) - base + 1, -1)
+    alive = np.cumsum(diff)[start_month - base:last_month - base + 1]
+
+    in_window = (um['month'] >= start_month) & (um['month'] <= last_month)
+    units_by_month = np.bincount(um['month'][in_window] - start_month, weights=um['units'][in_window],
+                                 minlength=len(months))
+    gmv_total = um['gmv'][in_window].sum()
+    units_total = units_by_month.sum()
+
+    # An affiliate churns in month m when m-1 was their last active month
+    # (churned[i] is churn in months[i + 1]); gaps inside the span are not churn.
+    # Only months up to observed_last are counted, in the numerator and the
+    # denominator: a later last video may just be a pause (right-censored).
+    observed_last = last_month - churn_months
+    last_seen = last_active[seen]
+    last_seen = last_seen[(last_seen >= start_month) & (last_seen <= observed_last)]
+    churned = np.bincount(last_seen - start_month, minlength=len(months) - 1)
+    prev_alive = alive[:max(0, observed_last - start_month + 1)].sum()
+    attrition = churned.sum() / prev_alive if prev_alive else None
+
+    # Level distribution over active affiliate-months, tier at month end
+    checkpoints = _load_checkpoints(directory, client_id, user_ids, tier_code)
+    month_end = (np.arange(start_month, last_month + 1) + 1).astype('datetime64[M]').astype('datetime64[D]') \
+        .astype(np.int64) - 1
+    alive_user, alive_month = [], []
+    for i, month in enumerate(months):
+        members = np.flatnonzero(seen & (first_active <= month) & (last_active >= month))
+        alive_user.append(members)
+        alive_month.append(np.full(len(members), i))
+    alive_user = np.concatenate(alive_user)
+    alive_month = np.concatenate(alive_month)
+    alive_tier = tier_at(alive_user, month_end[alive_month], checkpoints, user_ids, fallback)
+    alive_level = level_of_tier[alive_tier]
+    level_counts = np.bincount(alive_level, minlength=len(LEVEL_NAMES))
+    distribution = level_counts / level_counts.sum() if level_counts.sum() else None
+
+    values = {
+        'Average Sales per Affiliate per Month': float(units_total / alive.sum()) if alive.sum() else 0.0,
+        'Gross AOV': float(gmv_total / units_total) if units_total else 0.0,
+        'Affiliate Attrition Rate': None if attrition is None else float(attrition),
+        'churn_months': churn_months,
+        'level_distribution': None if distribution is None else dict(zip(LEVEL_NAMES, distribution.tolist())),
+        'months': [_month_label(months[0]), _month_label(months[-1])],
+        'affiliate_months': int(alive.sum()),
+        'checkpoints_used': checkpoints is not None and len(checkpoints['user']) > 0,
+    }
+
+    # Per-tier monthly distributions. Affiliate-months with no video are zero.
+    key_alive = alive_user * len(months) + alive_month
+    key_um = um['user'][in_window] * len(months) + (um['month'][in_window] - start_month)
+    order = np.argsort(key_alive)
+    pos = order[np.searchsorted(key_alive[order], key_um)]
+    units = np.zeros(len(key_alive))
+    gmv = np.zeros(len(key_alive))
+    videos = np.zeros(len(key_alive))
+    units[pos] = um['units'][in_window]
+    gmv[pos] = um['gmv'][in_window]
+    videos[pos] = um['videos'][in_window]
+
+    report = {'months': values['months'], 'tiers': {}}
+    for code, tier_id in enumerate(tier_list):
+        mask = alive_tier == code
+        if not mask.any():
+            continue
+        report['tiers'][tier_id] = {
+            'model_level': LEVEL_NAMES[level_of_tier[code]],
+            'affiliate_months': int(mask.sum()),
+            'units_per_month': _describe(units[mask]),
+            'gmv_per_month': _describe(gmv[mask]),
+            'videos_per_month': _describe(videos[mask]),
+        }
+    report['monthly'] = [
+        {'month': _month_label(m), 'active_affiliates': int(alive[i]), 'units': float(units_by_month[i]),
+         'churned': int(churned[i - 1]) if i and months[i - 1] <= observed_last else None}
+        for i, m in enumerate(months)
+    ]
+    return values, report
+
+
+def _describe(values):
+    stats = {'mean': float(values.mean())}
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f"p{p}"] = float(v)
+    return stats
+
+
+def calibrated_config(values, base=None, scenario=None):
+    """Copy of base (default: the v3 config) with the calibrated inputs and distribution."""
+    config = base or default_config()
+    inputs = config['inputs']
+    inputs['Average Sales per Affiliate per Month'] = round(values['Average Sales per Affiliate per Month'], 2)
+    inputs['Gross AOV'] = round(values['Gross AOV'], 2)
+    if values['Affiliate Attrition Rate'] is not None:
+        inputs['Affiliate Attrition Rate'] = round(values['Affiliate Attrition Rate'], 4)
+
+    if values['level_distribution'] is not None:
+        # Round to 0.01% and put the rounding remainder on the largest level so the sheet sums to 100%
+        dist = {name: round(pct, 4) for name, pct in values['level_distribution'].items()}
+        largest = max(dist, key=dist.get)
+        dist[largest] = round(dist[largest] + 1 - sum(dist.values()), 4)
+        assert abs(sum(dist.values()) - 1) <= DISTRIBUTION_TOLERANCE
+        config['level_distribution'] = dist
+
+    if scenario:
+        config['scenario'] = scenario
+    config['description'] = f"Calibrated from sync data {values['months'][0]} to {values['months'][1]}"
+    return config
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+    import time
+
+    from loyalty_config import load_config, save_config
+
+    parser = argparse.ArgumentParser(description='Calibrate model inputs from a table snapshot')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--out', required=True, help='config to write (.yaml/.json)')
+    parser.add_argument('--base', help='config to start from (default: built-in v3 config)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--last-months', type=int, help='only use the most recent N complete months')
+    parser.add_argument('--churn-months', type=int, default=3,
+                        help='months without a video before an affiliate counts as churned (default 3)')
+    parser.add_argument('--block-mb', type=int, default=4, help='CSV block size streamed per step')
+    parser.add_argument('--report', help='write per-tier distributions and monthly counts (JSON)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.churn_months < 1:
+        parser.error('--churn-months must be at least 1')
+    values, report = calibrate(args.snapshot, args.client_id, args.last_months, args.block_mb << 20,
+                               args.churn_months)
+    base = load_config(args.base) if args.base else None
+    config = calibrated_config(values, base, os.path.splitext(os.path.basename(args.out))[0])
+    errors = validate_config(config)
+    if errors:
+        print("Calibrated config is invalid:\n  - " + '\n  - '.join(errors))
+        sys.exit(1)
+    save_config(config, args.out)
+
+    print(f"Calibrated from {values['months'][0]} to {values['months'][1]} "
+          f"({values['affiliate_months']:,} affiliate-months) in {time.perf_counter() - start:.1f}s")
+    for name in ('Average Sales per Affiliate per Month', 'Gross AOV', 'Affiliate Attrition Rate'):
+        print(f"  {name:40s} {config['inputs'][name]}")
+    if values['Affiliate Attrition Rate'] is None:
+        print(f"  Attrition kept from the base config: no month has {args.churn_months} months of data after it")
+    source = 'tier_checkpoints' if values['checkpoints_used'] else 'users.current_tier'
+    if values['level_distribution'] is None:
+        source = 'kept from the base config: no active affiliate-months'
+    print(f"  Level distribution ({source}): " +
+          ', '.join(f"{name} {pct:.1%}" for name, pct in config['level_distribution'].items()))
+    print(f"Config written: {args.out}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Report written: {args.report}")
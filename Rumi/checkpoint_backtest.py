@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Evaluation Backtester
+Replays the daily tier jobs over a table snapshot (see table_snapshot.py)
+to see what every historical checkpoint would have produced, e.g. with
+different tier thresholds or checkpoint_months.
+
+Each simulated day runs the same steps as the daily cron:
+1. Videos posted that day and sales adjustments applied that day are added
+   (total_sales / total_units, manual_adjustments_*)
+2. checkForPromotions: lifetime value (videos + adjustments) against the
+   thresholds; promotion resets tier_achieved_at / next_checkpoint_at
+3. runCheckpointEvaluation for non-tier_1 users whose next_checkpoint_at is
+   today: checkpoint value = videos posted after tier_achieved_at
+   + manual adjustments (calculateCheckpointValue), highest qualifying tier
+   (findHighestQualifyingTier), then updateUserTierAfterCheckpoint
+
+A video counts on its post_date. Everyone starts at the lowest tier on
+their first activity. Work is vectorised across users: per-day changes come
+from one grouped aggregation of the snapshot, and tiers are looked up with
+searchsorted against the ascending thresholds.
+
+Usage:
+    python checkpoint_backtest.py snapshots/2025-12-31
+    python checkpoint_backtest.py snapshots/2025-12-31 --metric both --log checkpoints.parquet
+    python checkpoint_backtest.py snapshots/2025-12-31 --sales-thresholds 0 1000 3000 6000
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_snapshot import read_table
+
+VIP_METRICS = ['sales', 'units']
+DEFAULT_CHECKPOINT_MONTHS = 4  # clients.checkpoint_months default
+
+LOG_SCHEMA = pa.schema([
+    ('user_id', pa.string()),
+    ('checkpoint_date', pa.date32()),
+    ('period_start_date', pa.date32()),
+    ('vip_metric', pa.string()),
+    ('source', pa.string()),          # 'promotion' | 'checkpoint'
+    ('value', pa.float64()),
+    ('threshold_required', pa.float64()),
+    ('tier_before', pa.string()),
+    ('tier_after', pa.string()),
+    ('status', pa.string()),          # 'promoted' | 'maintained' | 'demoted'
+])
+STATUSES = np.array(['demoted', 'maintained', 'promoted'])
+
+
+def add_months(days, months):
+    """
+    Date.setMonth(getMonth() + months) on day numbers (days since epoch),
+    including its overflow (Jan 31 + 1 month = Mar 3).
+    """
+    d = np.asarray(days).astype('datetime64[D]')
+    month = d.astype('datetime64[M]')
+    day_of_month = d - month.astype('datetime64[D]')
+    return ((month + months).astype('datetime64[D]') + day_of_month).astype(np.int64)
+
+
+def _days(array):
+    return pc.cast(array, pa.int32()).to_numpy(zero_copy_only=False)
+
+
+class Snapshot:
+    """Numeric view of one client's snapshot: user codes, tiers and daily deltas."""
+
+    def __init__(self, directory, client_id=None):
+        clients = read_table(directory, 'clients', client_id=client_id)
+        users = read_table(directory, 'users', ['id', 'current_tier', 'created_at'], client_id)
+        tiers = read_table(directory, 'tiers', client_id=client_id)
+        videos = read_table(directory, 'videos', ['user_id', 'post_date', 'gmv', 'units_sold'], client_id)
+        adjustments = read_table(directory, 'sales_adjustments',
+                                 ['user_id', 'amount', 'amount_units', 'created_at', 'applied_at'], client_id)
+        if clients.num_rows > 1:
+            raise ValueError(f"{directory}: snapshot has {clients.num_rows} clients, pass client_id")
+
+        self.vip_metric = clients['vip_metric'][0].as_py() if clients.num_rows else 'sales'
+        months = clients['checkpoint_months'][0].as_py() if clients.num_rows else None
+        self.checkpoint_months = months or DEFAULT_CHECKPOINT_MONTHS
+
+        tiers = tiers.sort_by('tier_order')
+        self.tier_ids = np.array(tiers['tier_id'].to_pylist() or ['tier_1'], dtype=object)
+        self.thresholds = {
+            'sales': pc.fill_null(tiers['sales_threshold'], 0).to_numpy().astype(np.float64),
+            'units': pc.fill_null(tiers['units_threshold'], 0).to_numpy().astype(np.float64),
+        }
+        if not tiers.num_rows:
+            self.thresholds = {metric: np.zeros(1) for metric in VIP_METRICS}
+
+        self.user_ids = users['id']
+        self.current_tier = np.array(users['current_tier'].to_pylist(), dtype=object)
+        n_users = len(self.user_ids)
+
+        # Videos with no user (unmatched handles) never count toward a tier
+        video_user = pc.index_in(videos['user_id'], value_set=self.user_ids)
+        keep = pc.is_valid(video_user).to_numpy(zero_copy_only=False)
+        video_user = video_user.to_numpy(zero_copy_only=False)[keep].astype(np.int64)
+        video_day = _days(videos['post_date']).astype(np.int64)[keep]
+
+        # An adjustment takes effect when apply_pending_sales_adjustments ran;
+        # pending ones are assumed applied on the day they were created.
+        adj_user = pc.index_in(adjustments['user_id'], value_set=self.user_ids)
+        adj_keep = pc.is_valid(adj_user).to_numpy(zero_copy_only=False)
+        adj_user = adj_user.to_numpy(zero_copy_only=False)[adj_keep].astype(np.int64)
+        adj_day = _days(pc.coalesce(adjustments['applied_at'], adjustments['created_at'])).astype(np.int64)[adj_keep]
+
+        # One grouped aggregation to (day, user) rows: [video sales, video units, adj sales, adj units]
+        key = np.concatenate([video_day * n_users + video_user, adj_day * n_users + adj_user])
+        groups, inverse = np.unique(key, return_inverse=True)
+        values = np.zeros((len(groups), 4))
+        n_videos = len(video_user)
+        columns = [
+            (slice(0, n_videos), videos['gmv'], 0),
+            (slice(0, n_videos), videos['units_sold'], 1),
+            (slice(n_videos, None), adjustments['amount'], 2),
+            (slice(n_videos, None), adjustments['amount_units'], 3),
+        ]
+        for rows, column, j in columns:
+            weights = pc.fill_null(column, 0).to_numpy(zero_copy_only=False).astype(np.float64)
+            weights = weights[keep] if j < 2 else weights[adj_keep]
+            values[:, j] = np.bincount(inverse[rows], weights=weights, minlength=len(groups))
+        self.event_day = groups // n_users if n_users else groups
+        self.event_user = groups % n_users if n_users else groups
+        self.event_values = values
+
+        # A user's history starts at created_at or their first activity, whichever is earlier
+        created = pc.cast(users['created_at'], pa.int32()).to_numpy(zero_copy_only=False).astype(np.float64)
+        first_event = np.full(n_users, np.inf)
+        np.minimum.at(first_event, self.event_user, self.event_day)
+        self.start_day = np.fmin(np.where(np.isnan(created), np.inf, created), first_event)
+
+    @property
+    def first_day(self):
+        finite = self.start_day[np.isfinite(self.start_day)]
+        return int(finite.min()) if len(finite) else None
+
+    @property
+    def last_day(self):
+        return int(self.event_day.max()) if len(self.event_day) else self.first_day
+
+
+def tier_index(values, thresholds):
+    """findHighestQualifyingTier for ascending thresholds; falls back to the lowest tier."""
+    return np.maximum(np.searchsorted(thresholds, values, side='right') - 1, 0)
+
+
+def replay(snapshot, vip_metric=None, thresholds=None, checkpoint_months=None, end_day=None):
+    """
+    Run the daily promotion + checkpoint steps from the snapshot's first day
+    to end_day (default: last activity). Returns (log table, final tier index
+    per user).
+    """
+    vip_metric = vip_metric or snapshot.vip_metric
+    months = checkpoint_months or snapshot.checkpoint_months
+    thr = np.asarray(thresholds if thresholds is not None else snapshot.thresholds[vip_metric], dtype=np.float64)
+    if len(thr) != len(snapshot.tier_ids):
+        raise ValueError(f"expected {len(snapshot.tier_ids)} thresholds, got {len(thr)}")
+    if np.any(np.diff(thr) < 0):
+        raise ValueError("thresholds must not decrease with tier_order")
+    video_col = 0 if vip_metric == 'sales' else 1
+    adj_col = video_col + 2
+
+    n_users = len(snapshot.user_ids)
+    videos_total = np.zeros(n_users)      # SUM(videos) lifetime
+    adjustments = np.zeros(n_users)       # manual_adjustments_* (never reset)
+    period_base = np.zeros(n_users)       # SUM(videos) up to tier_achieved_at
+    period_start = np.full(n_users, -1, dtype=np.int64)
+    tier = np.zeros(n_users, dtype=np.int64)
+    next_checkpoint = np.full(n_users, np.iinfo(np.int64).max)
+    due_by_day = {}                       # day -> user indices scheduled that day
+
+    log = {name: [] for name in ('user', 'day', 'start', 'source', 'value', 'required', 'before', 'after', 'status')}
+
+    def record(users, day, source, value, before, after):
+        log['user'].append(users)
+        log['day'].append(np.full(len(users), day))
+        log['start'].append(period_start[users].copy())
+        log['source'].append(np.full(len(users), source, dtype=object))
+        log['value'].append(value)
+        log['required'].append(thr[before])
+        log['before'].append(before)
+        log['after'].append(after)
+        log['status'].append(np.sign(after - before) + 1)
+
+    def reset_period(users, day, changed):
+        # tier_achieved_at moves only when the tier changes; the checkpoint
+        # total restarts from videos posted after it
+        moved = users[changed]
+        period_start[moved] = day
+        period_base[moved] = videos_total[moved]
+        nxt = int(add_months(day, months))
+        next_checkpoint[users] = nxt
+        due_by_day.setdefault(nxt, []).append(users)
+
+    first = snapshot.first_day
+    if first is None:
+        return _log_table(snapshot, vip_metric, log), tier
+    last = end_day if end_day is not None else snapshot.last_day
+    period_start[:] = np.where(np.isfinite(snapshot.start_day), snapshot.start_day, first).astype(np.int64)
+    day_bounds = np.searchsorted(snapshot.event_day, np.arange(first, last + 2))
+    recheck = np.empty(0, dtype=np.int64)
+
+    for offset, day in enumerate(range(first, last + 1)):
+        lo, hi = day_bounds[offset], day_bounds[offset + 1]
+        users = snapshot.event_user[lo:hi]
+        videos_total[users] += snapshot.event_values[lo:hi, video_col]
+        adjustments[users] += snapshot.event_values[lo:hi, adj_col]
+
+        # checkForPromotions: anyone whose lifetime total moved today, plus
+        # users demoted yesterday (their lifetime total may still qualify)
+        candidates = np.union1d(users, recheck) if len(recheck) else users
+        if len(candidates):
+            lifetime = videos_total[candidates] + adjustments[candidates]
+            qualifies = tier_index(lifetime, thr)
+            up = qualifies > tier[candidates]
+            if up.any():
+                promoted = candidates[up]
+                record(promoted, day, 'promotion', lifetime[up], tier[promoted], qualifies[up])
+                tier[promoted] = qualifies[up]
+                reset_period(promoted, day, np.ones(len(promoted), dtype=bool))
+
+        # runCheckpointEvaluation: non-tier_1 users whose checkpoint is today
+        recheck = np.empty(0, dtype=np.int64)
+        scheduled = due_by_day.pop(day, None)
+        if scheduled:
+            due = np.unique(np.concatenate(scheduled))
+            due = due[(next_checkpoint[due] == day) & (tier[due] > 0)]
+            if len(due):
+                value = videos_total[due] - period_base[due] + adjustments[due]
+                new_tier = tier_index(value, thr)
+                before = tier[due]
+                record(due, day, 'checkpoint', value, before, new_tier)
+                tier[due] = new_tier
+                changed = new_tier != before
+                reset_period(due, day, changed)
+                recheck = due[new_tier < before]
+
+    return _log_table(snapshot, vip_metric, log), tier
+
+
+def _log_table(snapshot, vip_metric, log):
+    if not log['user']:
+        return LOG_SCHEMA.empty_table()
+    cat = {name: np.concatenate(parts) for name, parts in log.items()}
+    order = np.lexsort((cat['user'], cat['day']))
+    n = len(order)
+    return pa.Table.from_arrays([
+        snapshot.user_ids.take(pa.array(cat['user'][order])),
+        pa.array(cat['day'][order].astype(np.int32)).cast(pa.date32()),
+        pa.array(cat['start'][order].astype(np.int32)).cast(pa.date32()),
+        pa.array(np.full(n, vip_metric, dtype=object), pa.string()),
+        pa.array(cat['source'][order], pa.string()),
+        pa.array(cat['value'][order], pa.float64()),
+        pa.array(cat['required'][order], pa.float64()),
+        pa.array(snapshot.tier_ids[cat['before'][order]], pa.string()),
+        pa.array(snapshot.tier_ids[cat['after'][order]], pa.string()),
+        pa.array(STATUSES[cat['status'][order]], pa.string()),
+    ], schema=LOG_SCHEMA)
+
+
+def summarize(snapshot, log, final_tier):
+    """Per-month status counts, final tier distribution and agreement with users.current_tier."""
+    checkpoints = log.filter(pc.equal(log['source'], 'checkpoint'))
+    months = pc.strftime(pc.cast(checkpoints['checkpoint_date'], pa.timestamp('s')), format='%Y-%m')
+    by_month = pa.table({'month': months, 'status': checkpoints['status']}) \
+        .group_by(['month', 'status']).aggregate([([], 'count_all')]).sort_by('month')
+    counts = {}
+    for row in by_month.to_pylist():
+        counts.setdefault(row['month'], {})[row['status']] = row['count_all']
+    promotions = log.filter(pc.equal(log['source'], 'promotion')).num_rows
+
+    final_ids = snapshot.tier_ids[final_tier]
+    distribution = {tier_id: int(np.sum(final_ids == tier_id)) for tier_id in snapshot.tier_ids}
+    known = snapshot.current_tier != None  # noqa: E711 (elementwise on object array)
+    agreement = float(np.mean(final_ids[known] == snapshot.current_tier[known])) if known.any() else None
+    return {
+        'promotions': promotions,
+        'checkpoints_by_month': counts,
+        'final_distribution': distribution,
+        'agreement_with_current_tier': agreement,
+    }
+
+
+def write_log(log, path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        pq.write_table(log, path, compression='zstd')
+    else:
+        import pyarrow.csv as pv
+        pv.write_csv(log, path)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description='Replay historical tier checkpoints from a table snapshot')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id', help='client to replay when the snapshot holds several')
+    parser.add_argument('--metric', choices=VIP_METRICS + ['both'], help="default: the client's vip_metric")
+    parser.add_argument('--sales-thresholds', type=float, nargs='+', help='override, one per tier in tier_order')
+    parser.add_argument('--units-thresholds', type=float, nargs='+', help='override, one per tier in tier_order')
+    parser.add_argument('--checkpoint-months', type=int)
+    parser.add_argument('--end', help='last day to simulate, YYYY-MM-DD (default: last activity)')
+    parser.add_argument('--log', help='write the checkpoint log (.parquet or .csv; metric is added to the name for both)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = Snapshot(args.snapshot, args.client_id)
+    load_s = time.perf_counter() - start
+    print(f"Loaded {len(snapshot.user_ids):,} users, {len(snapshot.event_day):,} user-days, "
+          f"{len(snapshot.tier_ids)} tiers in {load_s:.2f}s")
+
+    end_day = int(np.datetime64(args.end, 'D').astype(np.int64)) if args.end else None
+    metrics = VIP_METRICS if args.metric == 'both' else [args.metric or snapshot.vip_metric]
+    overrides = {'sales': args.sales_thresholds, 'units': args.units_thresholds}
+    for metric in metrics:
+        start = time.perf_counter()
+        log, final_tier = replay(snapshot, metric, overrides[metric], args.checkpoint_months, end_day)
+        elapsed = time.perf_counter() - start
+        summary = summarize(snapshot, log, final_tier)
+
+        thresholds = overrides[metric] if overrides[metric] is not None else snapshot.thresholds[metric]
+        print(f"\n=== vip_metric={metric}  thresholds={[float(t) for t in thresholds]}  "
+              f"checkpoint_months={args.checkpoint_months or snapshot.checkpoint_months} ===")
+        print(f"Replayed in {elapsed:.2f}s: {summary['promotions']:,} promotions, "
+              f"{log.num_rows - summary['promotions']:,} checkpoints")
+        print(f"{'Month':8s} {'promoted':>9s} {'maintained':>11s} {'demoted':>8s}")
+        for month, counts in summary['checkpoints_by_month'].items():
+            print(f"{month:8s} {counts.get('promoted', 0):9,d} {counts.get('maintained', 0):11,d} "
+                  f"{counts.get('demoted', 0):8,d}")
+        print("Final tiers: " + ', '.join(f"{t}={n:,}" for t, n in summary['final_distribution'].items()))
+        if summary['agreement_with_current_tier'] is not None:
+            print(f"Matches users.current_tier for {summary['agreement_with_current_tier']:.1%} of users")
+
+        if args.log:
+            path = args.log
+            if len(metrics) > 1:
+                root, ext = os.path.splitext(path)
+                path = f"{root}_{metric}{ext}"
+            write_log(log, path)
+            print(f"Log written: {path}")
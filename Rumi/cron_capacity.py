@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Daily Automation Capacity Model
+Predicts how long /api/cron/daily-automation takes for a tenant, step by step,
+and flags tenants that will run past the function timeout (vercel.json
+maxDuration, 300s).
+
+The run is processDailySales (CSV download, a per-row find/create user +
+upsert video loop, then the precomputed-field, leaderboard and mission RPCs
+and a per-mission redemption loop), then checkForPromotions,
+runCheckpointEvaluation (per-user update + log), and the boost transitions.
+Each step's time is fixed + sum(ms per unit x tenant feature), so a whole
+grid of hypothetical tenants is one matrix product.
+
+Calibration:
+- sync_logs.stage_timings: seconds per refresh RPC of each
+  sync_orchestrator.py run. The route calls the same four RPCs, so each
+  one's fixed cost and per-unit scale is fitted to them. The user-scoped
+  ones are fitted against the run's processed_users, not the tenant's
+  users, since a delta run refreshes only a few. (The orchestrator's
+  download, parse and ingest stages work differently from the route's and
+  are not used.)
+- sync_logs: (completed_at - started_at) of successful auto syncs, against
+  records_processed, fits the download time and per-row cost (sync_logs span
+  processDailySales only)
+- bench_rpc.py --json output: ms per user / per user x mission for the RPCs
+  it measures
+- anything else stays at the defaults below; DEFAULT_STEPS notes where each
+  one comes from. The calibration section of a saved model records what was
+  fitted.
+
+Usage:
+    python cron_capacity.py --from-db                      # calibrate + check current tenants
+    python cron_capacity.py --grid-rows 1000 200000 --grid-users 1000 1000000 --missions 20
+    python cron_capacity.py --calibrate-db --bench bench.json --save model.json
+"""
+
+import json
+
+import numpy as np
+
+FUNCTION_TIMEOUT_S = 300   # vercel.json functions."api/cron/daily-automation.js".maxDuration
+
+FEATURES = ['rows', 'new_users', 'users', 'videos', 'users_log_users', 'user_missions', 'completions',
+            'promotions', 'users_due', 'tier_changes']
+
+# step -> (stage, fixed ms, {feature: ms per unit}), in route.ts order.
+# Sources of the defaults:
+# - rt: estimate of one REST round trip from the function to Supabase
+#   (~25ms, 30-50ms for inserts and multi-statement calls); these steps are
+#   one round trip, or one per row/user, with no measurement behind them
+# - bench: bench_rpc.py p50 on the local 2k/30k-user tenants (21 missions),
+#   divided by the feature; replaced by --bench / --calibrate-db when available
+# - est: order-of-magnitude estimate of the SQL work, until --calibrate-db
+#   fits it to sync_logs.stage_timings
+DEFAULT_STEPS = {
+    'download_csv': ('sync', 45_000, {}),                      # est: puppeteer login + export; fitted to sync_logs
+    'parse_csv': ('sync', 0, {'rows': 0.02}),                  # est: in-process CSV parse
+    'find_user': ('sync', 0, {'rows': 25}),                    # rt per row; row scale fitted to sync_logs
+    'create_user': ('sync', 0, {'new_users': 30}),             # rt per new user (insert)
+    'upsert_video': ('sync', 0, {'rows': 30}),                 # rt per row (upsert)
+    'update_precomputed_fields': ('sync', 50, {'users': 0.05, 'videos': 0.002}),   # est; stage_timings
+    'update_leaderboard_ranks': ('sync', 30, {'users_log_users': 0.0005}),        # est (sort); stage_timings
+    'create_mission_progress': ('sync', 30, {'user_missions': 0.0062}),           # bench; stage_timings
+    'update_mission_progress': ('sync', 30, {'user_missions': 0.0046}),           # bench; stage_timings
+    'create_redemptions': ('sync', 25, {'completions': 50}),   # rt: select + insert per completion
+    'update_sync_log': ('sync', 50, {}),                       # rt
+    'check_promotions': ('tiers', 75, {'promotions': 50}),     # rt: scan + one update per promotion
+    'apply_adjustments': ('tiers', 30, {'users': 0.001}),      # rt + est
+    'checkpoint_evaluation': ('tiers', 60, {'users_due': 50}),  # rt: update + log insert per user due
+    'tier_notifications': ('tiers', 0, {'tier_changes': 400}),  # est: one email API call per change
+    'raffle_calendar': ('boosts', 25, {}),                     # rt
+    'boost_transitions': ('boosts', 90, {'users': 0.0005}),    # rt + est
+}
+
+# Steps inside sync_logs' started_at..completed_at window
+SYNC_LOG_STEPS = [name for name, (stage, _, _) in DEFAULT_STEPS.items() if stage == 'sync']
+# Steps fitted to sync_logs.stage_timings (sync_orchestrator.py records them under these names)
+STAGE_STEPS = ['update_precomputed_fields', 'update_leaderboard_ranks', 'create_mission_progress',
+               'update_mission_progress']
+# Refresh RPCs called with processedUserIds only (salesService.ts Steps 5 and 6); their
+# 'users' features come from stage_timings' processed_users when fitting
+USER_SCOPED_STEPS = ['update_precomputed_fields', 'update_mission_progress']
+# Steps whose per-row cost the sync_logs fit rescales
+ROW_STEPS = ['parse_csv', 'find_user', 'create_user', 'upsert_video']
+# bench_rpc.py rpc -> (step, feature its p50 is divided by)
+BENCH_STEPS = {
+    'update_mission_progress': ('update_mission_progress', 'user_missions'),
+    'create_mission_progress_for_eligible_users': ('create_mission_progress', 'user_missions'),
+}
+
+
+def tenant_features(rows, users, missions, new_user_rate=0.01, videos_per_user=20, completion_rate=0.02,
+                    promotion_rate=0.005, checkpoint_months=4):
+    """
+    Feature matrix (n, len(FEATURES)) for tenants described by daily CSV rows,
+    users and enabled missions (arrays or scalars). The rates turn those into
+    daily new users, completed missions, promotions and checkpoints.
+    """
+    rows, users, missions = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (rows, users, missions)))
+    users_due = users / (checkpoint_months * 30.4)
+    promotions = rows * promotion_rate
+    columns = {
+        'rows': rows,
+        'new_users': rows * new_user_rate,
+        'users': users,
+        'videos': users * videos_per_user,
+        'users_log_users': users * np.log2(np.maximum(users, 2)),
+        'user_missions': users * missions,
+        'completions': rows * completion_rate,
+        'promotions': promotions,
+        'users_due': users_due,
+        'tier_changes': promotions + users_due * 0.3,
+    }
+    return np.column_stack([columns[f].ravel() for f in FEATURES])
+
+
+class CronCapacityModel:
+    def __init__(self, steps=None, timeout_s=FUNCTION_TIMEOUT_S):
+        steps = steps or DEFAULT_STEPS
+        self.steps = list(steps)
+        self.stages = [steps[s][0] for s in self.steps]
+        self.fixed = np.array([steps[s][1] for s in self.steps], dtype=np.float64)
+        self.weights = np.zeros((len(FEATURES), len(self.steps)))
+        for j, name in enumerate(self.steps):
+            for feature, ms in steps[name][2].items():
+                self.weights[FEATURES.index(feature), j] = ms
+        self.timeout_s = timeout_s
+        self.calibration = {}
+
+    # ---- prediction ----
+    def step_ms(self, features):
+        """(n, steps) predicted ms per step."""
+        return np.atleast_2d(features) @ self.weights + self.fixed
+
+    def predict(self, features):
+        """Predicted seconds per tenant."""
+        return self.step_ms(features).sum(axis=1) / 1000
+
+    def evaluate(self, rows, users, missions, margin=0.8, **rates):
+        """
+        Runtime, status and the largest daily CSV each tenant fits in the
+        timeout. status: 'ok', 'at_risk' (> margin x timeout) or 'over'.
+        """
+        features = tenant_features(rows, users, missions, **rates)
+        seconds = self.predict(features)
+        # Runtime is affine in rows for fixed users/missions: solve for the timeout
+        base = self.predict(tenant_features(0, users, missions, **rates))
+        per_row = self.predict(tenant_features(1, users, missions, **rates)) - base
+        max_rows = np.where(per_row > 0, np.floor((self.timeout_s - base) / np.where(per_row > 0, per_row, 1)), np.inf)
+        status = np.where(seconds > self.timeout_s, 'over', np.where(seconds > margin * self.timeout_s, 'at_risk', 'ok'))
+        return {'seconds': seconds, 'status': status, 'max_rows': np.maximum(max_rows, 0),
+                'step_ms': self.step_ms(features)}
+
+    # ---- calibration ----
+    def fit_sync_logs(self, rows, users, missions, seconds, **rates):
+        """
+        Fit download time and per-row cost to observed sync durations,
+        holding the RPC steps at their current values:
+            seconds = download + row_scale x (per-row steps) + RPC steps
+        """
+        rows, seconds = np.asarray(rows, dtype=np.float64), np.asarray(seconds, dtype=np.float64)
+        features = tenant_features(rows, users, missions, **rates)
+        step_ms = self.step_ms(features)
+        index = {name: j for j, name in enumerate(self.steps)}
+        row_ms = step_ms[:, [index[s] for s in ROW_STEPS]].sum(axis=1)
+        other = [index[s] for s in SYNC_LOG_STEPS if s not in ROW_STEPS and s != 'download_csv']
+        residual = seconds * 1000 - step_ms[:, other].sum(axis=1)
+
+        if len(rows) >= 2 and np.ptp(row_ms) > 0:
+            design = np.column_stack([np.ones(len(rows)), row_ms])
+            (download, scale), *_ = np.linalg.lstsq(design, residual, rcond=None)
+        else:
+            download, scale = residual.mean() - row_ms.mean(), 1.0
+        if scale <= 0:
+            # Noise swamped the row term: keep the per-row defaults, refit only the constant
+            scale = 1.0
+            download = (residual - row_ms).mean()
+        download = max(download, 0.0)
+        self.fixed[index['download_csv']] = download
+        for s in ROW_STEPS:
+            self.weights[:, index[s]] *= scale
+
+        predicted = self.step_ms(features)[:, [index[s] for s in SYNC_LOG_STEPS]].sum(axis=1) / 1000
+        self.calibration['sync_logs'] = {
+            'runs': int(len(rows)), 'download_ms': float(download), 'row_scale': float(scale),
+            'mean_abs_error_s': float(np.abs(predicted - seconds).mean()),
+        }
+        return self.calibration['sync_logs']
+
+    def fit_stage_timings(self, users, missions, stage_timings, **rates):
+        """
+        Fit each STAGE_STEPS step to its measured seconds in stage_timings
+        (one dict per run, as stored in sync_logs), keeping the step's mix of
+        features: ms = fixed + scale x (current per-unit part).
+        USER_SCOPED_STEPS use the run's processed_users instead of users;
+        runs that did not record it are left out of their fit.
+        """
+        features = tenant_features(0, users, missions, **rates)
+        processed = [(timings or {}).get('processed_users') for timings in stage_timings]
+        scoped = tenant_features(0, [u if u is not None else 0 for u in processed], missions, **rates)
+        index = {name: j for j, name in enumerate(self.steps)}
+        fitted = {}
+        for step in STAGE_STEPS:
+            j = index[step]
+            step_features = scoped if step in USER_SCOPED_STEPS else features
+            runs = [k for k, timings in enumerate(stage_timings) if timings and step in timings
+                    and (step not in USER_SCOPED_STEPS or processed[k] is not None)]
+            if not runs:
+                continue
+            observed = np.array([stage_timings[k][step] * 1000 for k in runs])
+            variable = self.step_ms(step_features[runs])[:, j] - self.fixed[j]
+            if len(runs) >= 2 and np.ptp(variable) > 0:
+                design = np.column_stack([np.ones(len(runs)), variable])
+                (fixed, scale), *_ = np.linalg.lstsq(design, observed, rcond=None)
+            else:
+                fixed, scale = -1.0, 0.0
+            if scale <= 0 or fixed < 0:
+                # One tenant size (or noise): keep the fixed cost, scale the per-unit part to the mean time
+                fixed = self.fixed[j]
+                scale = max(observed.mean() - fixed, 0.0) / variable.mean() if variable.mean() > 0 else 1.0
+            self.fixed[j] = fixed
+            self.weights[:, j] *= scale
+            predicted = self.step_ms(step_features[runs])[:, j]
+            fitted[step] = {'runs': len(runs), 'fixed_ms': float(fixed), 'scale': float(scale),
+                            'mean_abs_error_ms': float(np.abs(predicted - observed).mean())}
+        self.calibration['stage_timings'] = fitted
+        return fitted
+
+    def apply_bench(self, bench_rows, missions):
+        """
+        Per-unit RPC costs from bench_rpc.py --json rows (p50 at each tenant
+        size); missions is the enabled mission count of the benchmarked tenants.
+        """
+        index = {name: j for j, name in enumerate(self.steps)}
+        applied = {}
+        for rpc, (step, feature) in BENCH_STEPS.items():
+            points = [r for r in bench_rows if r['rpc'] == rpc and r['users'] > 0]
+            if not points:
+                continue
+            units = tenant_features(0, [r['users'] for r in points], missions)[:, FEATURES.index(feature)]
+            per_unit = float(np.median(np.array([r['p50_ms'] for r in points]) / units))
+            self.weights[:, index[step]] = 0
+            self.weights[FEATURES.index(feature), index[step]] = per_unit
+            applied[step] = per_unit
+        self.calibration['bench'] = applied
+        return applied
+
+    # ---- persistence ----
+    def to_dict(self):
+        return {
+            'timeout_s': self.timeout_s,
+            'steps': {name: [self.stages[j], float(self.fixed[j]),
+                             {f: float(self.weights[i, j]) for i, f in enumerate(FEATURES) if self.weights[i, j]}]
+                      for j, name in enumerate(self.steps)},
+            'calibration': self.calibration,
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        model = cls({name: tuple(v) for name, v in data['steps'].items()}, data['timeout_s'])
+        model.calibration = data.get('calibration', {})
+        return model
+
+
+# ============================================================================
+# DATABASE
+# ============================================================================
+def load_sync_runs(conn, days=90):
+    """Successful processDailySales syncs with the tenant's current users / enabled missions."""
+    return conn.execute("""
+        SELECT s.client_id, s.records_processed,
+               extract(epoch FROM s.completed_at - s.started_at)::float8,
+               (SELECT count(*) FROM users u WHERE u.client_id = s.client_id),
+               (SELECT count(*) FROM missions m WHERE m.client_id = s.client_id AND m.enabled)
+        FROM sync_logs s
+        WHERE s.status = 'success' AND s.source = 'auto' AND s.completed_at IS NOT NULL
+          AND s.stage_timings IS NULL  -- sync_orchestrator.py runs do not use the route's per-row loop
+          AND s.started_at > now() - make_interval(days => %s)
+        ORDER BY s.started_at
+    """, (days,)).fetchall()
+
+
+def load_stage_timings(conn, days=90):
+    """sync_orchestrator.py runs: current users / enabled missions and the stage_timings dict."""
+    return conn.execute("""
+        SELECT (SELECT count(*) FROM users u WHERE u.client_id = s.client_id),
+               (SELECT count(*) FROM missions m WHERE m.client_id = s.client_id AND m.enabled),
+               s.stage_timings
+        FROM sync_logs s
+        WHERE s.status = 'success' AND s.stage_timings IS NOT NULL
+          AND s.started_at > now() - make_interval(days => %s)
+        ORDER BY s.started_at
+    """, (days,)).fetchall()
+
+
+def current_tenants(conn, days=14):
+    """Per client: name, p90 of recent daily rows, users, enabled missions."""
+    return conn.execute("""
+        SELECT c.id, c.name,
+               coalesce((SELECT percentile_cont(0.9) WITHIN GROUP (ORDER BY s.records_processed)
+                         FROM sync_logs s WHERE s.client_id = c.id AND s.status = 'success'
+                           AND s.started_at > now() - make_interval(days => %s)), 0),
+               (SELECT count(*) FROM users u WHERE u.client_id = c.id),
+               (SELECT count(*) FROM missions m WHERE m.client_id = c.id AND m.enabled)
+        FROM clients c ORDER BY c.name
+    """, (days,)).fetchall()
+
+
+def print_tenants(names, rows, users, missions, result, model):
+    print(f"\n{'tenant':30s} {'rows/day':>9s} {'users':>9s} {'missions':>8s} {'predicted':>10s} "
+          f"{'max rows':>9s}  status")
+    for k, name in enumerate(names):
+        print(f"{name[:30]:30s} {rows[k]:>9,.0f} {users[k]:>9,.0f} {missions[k]:>8,.0f} "
+              f"{result['seconds'][k]:>9.1f}s {result['max_rows'][k]:>9,.0f}  {result['status'][k]}")
+    worst = int(np.argmax(result['seconds']))
+    print(f"\nSlowest ({names[worst]}) by step:")
+    for j in np.argsort(-result['step_ms'][worst])[:6]:
+        print(f"  {model.steps[j]:28s} {result['step_ms'][worst, j] / 1000:8.1f}s")
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Predict daily-automation runtime and flag timeouts')
+    parser.add_argument('--model', help='calibrated model JSON (default: built-in defaults)')
+    parser.add_argument('--calibrate-db', action='store_true',
+                        help='fit the refresh RPCs to sync_logs.stage_timings, then download/per-row costs '
+                             'to sync_logs')
+    parser.add_argument('--bench', help='bench_rpc.py --json output for the mission RPC costs')
+    parser.add_argument('--bench-missions', type=int, default=21, help='enabled missions in the bench tenants')
+    parser.add_argument('--save', help='write the calibrated model JSON')
+    parser.add_argument('--from-db', action='store_true', help='evaluate the tenants in the database')
+    parser.add_argument('--grid-rows', type=float, nargs=2, metavar=('MIN', 'MAX'))
+    parser.add_argument('--grid-users', type=float, nargs=2, metavar=('MIN', 'MAX'))
+    parser.add_argument('--grid-points', type=int, default=60, help='log-spaced points per grid axis')
+    parser.add_argument('--missions', type=float, default=20, help='enabled missions for grid tenants')
+    parser.add_argument('--timeout', type=float, default=FUNCTION_TIMEOUT_S)
+    parser.add_argument('--margin', type=float, default=0.8, help='flag at_risk above this share of the timeout')
+    parser.add_argument('--new-user-rate', type=float, default=0.01)
+    parser.add_argument('--completion-rate', type=float, default=0.02)
+    parser.add_argument('--checkpoint-months', type=int, default=4)
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    model = CronCapacityModel.load(args.model) if args.model else CronCapacityModel()
+    model.timeout_s = args.timeout
+    rates = {'new_user_rate': args.new_user_rate, 'completion_rate': args.completion_rate,
+             'checkpoint_months': args.checkpoint_months}
+
+    if args.bench:
+        with open(args.bench) as f:
+            applied = model.apply_bench(json.load(f), args.bench_missions)
+        print("From bench: " + ', '.join(f"{s} {v:.5f} ms/unit" for s, v in applied.items()))
+    tenants = None
+    if args.calibrate_db or args.from_db:
+        with connect(args.dsn) as conn:
+            if args.calibrate_db:
+                staged = load_stage_timings(conn)
+                if staged:
+                    fitted = model.fit_stage_timings([r[0] for r in staged], [r[1] for r in staged],
+                                                     [r[2] for r in staged], **rates)
+                    for step, fit in fitted.items():
+                        print(f"Fitted {step} to {fit['runs']} runs: fixed {fit['fixed_ms']:.0f} ms, "
+                              f"per-unit x{fit['scale']:.2f}, mean abs error {fit['mean_abs_error_ms']:.0f} ms")
+                else:
+                    print("No sync_logs.stage_timings (sync_orchestrator.py runs); keeping default RPC costs")
+                runs = load_sync_runs(conn)
+                if runs:
+                    runs = np.array([run[1:] for run in runs], dtype=np.float64)
+                    fit = model.fit_sync_logs(runs[:, 0], runs[:, 2], runs[:, 3], runs[:, 1], **rates)
+                    print(f"Fitted to {fit['runs']} syncs: download {fit['download_ms'] / 1000:.1f}s, "
+                          f"per-row x{fit['row_scale']:.2f}, mean abs error {fit['mean_abs_error_s']:.1f}s")
+                else:
+                    print("No successful auto syncs in sync_logs; keeping default costs")
+            if args.from_db:
+                tenants = current_tenants(conn)
+    if args.save:
+        model.save(args.save)
+
+    if tenants:
+        names = [t[1] for t in tenants]
+        rows, users, missions = (np.array([float(t[i]) for t in tenants]) for i in (2, 3, 4))
+        print_tenants(names, rows, users, missions, model.evaluate(rows, users, missions, args.margin, **rates), model)
+
+    if args.grid_rows and args.grid_users:
+        start = time.perf_counter()
+        rows = np.geomspace(*args.grid_rows, args.grid_points)
+        users = np.geomspace(*args.grid_users, args.grid_points)
+        rr, uu = (a.ravel() for a in np.meshgrid(rows, users))
+        result = model.evaluate(rr, uu, args.missions, args.margin, **rates)
+        elapsed = time.perf_counter() - start
+        counts = {s: int((result['status'] == s).sum()) for s in ('ok', 'at_risk', 'over')}
+        print(f"\nEvaluated {len(rr):,} hypothetical tenants in {elapsed * 1000:.1f} ms: {counts}")
+        print(f"Largest daily CSV within {model.timeout_s:g}s ({args.missions:g} missions):")
+        max_rows = result['max_rows'].reshape(len(users), len(rows))[:, 0]
+        for k in np.unique(np.linspace(0, len(users) - 1, 8).round().astype(int)):
+            print(f"  {users[k]:>12,.0f} users: {max_rows[k]:>10,.0f} rows/day")
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+CRUVA CSV Backfill Ingester
+Streams historical CRUVA exports into the videos table in bulk. This is the
+backfill path; the daily cron keeps using salesService.processDailySales.
+
+Per batch (default 50,000 rows):
+1. Parse rows with the same CRUVA_COLUMN_MAP / skip rules as
+   appcode/lib/utils/csvParser.ts
+2. Resolve tiktok_handle -> user_id from an in-memory index loaded once
+   (same normalisation as syncRepository.findUserByTiktokHandle)
+3. Create missing users in one INSERT (same defaults as createUserFromCruva)
+4. COPY videos into a temp staging table, then one
+   INSERT ... ON CONFLICT (video_url) DO UPDATE into videos
+
+Each batch commits on its own, so an interrupted backfill keeps the batches
+already written and can simply be re-run.
+
+--resolve-renames resolves handles with identity_index.py instead, so
+renamed creators (handle_changes) and handles that differ only in case map
+to the existing user rather than creating a duplicate.
+
+Usage:
+    python cruva_ingest.py --client-id <uuid> exports/2025-*.csv
+    python cruva_ingest.py --client-id <uuid> --resolve-renames exports/2025-*.csv
+"""
+
+import csv
+import re
+import time
+
+from local_db import add_dsn_argument, connect
+
+# Mirror of CRUVA_COLUMN_MAP in appcode/lib/utils/csvParser.ts.
+# If CRUVA renames a column, update both.
+CRUVA_COLUMN_MAP = {
+    'Handle': 'tiktok_handle',
+    'Video': 'video_url',
+    'Views': 'views',
+    'Likes': 'likes',
+    'Comments': 'comments',
+    'GMV': 'gmv',
+    'CTR': 'ctr',
+    'Units Sold': 'units_sold',
+    'Post Date': 'post_date',
+    'Video Title': 'video_title',
+}
+DB_TO_CRUVA = {db: cruva for cruva, db in CRUVA_COLUMN_MAP.items()}
+
+# Same sentinel as syncRepository.CRUVA_AUTO_CREATED_NO_PASSWORD
+CRUVA_AUTO_CREATED_NO_PASSWORD = 'CRUVA_AUTO_CREATED_NO_PASSWORD_SET'
+
+VIDEO_COLUMNS = ['user_id', 'video_url', 'video_title', 'post_date', 'views', 'likes',
+                 'comments', 'gmv', 'ctr', 'units_sold']
+
+# Numeric prefixes JS parseInt / parseFloat read before ignoring the rest
+_INT_PREFIX = re.compile(r'\s*[-+]?\d+')
+_FLOAT_PREFIX = re.compile(r'\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def parse_int_safe(value, default=0):
+    """parseInt(value without commas, 10): the leading integer, ignoring trailing text."""
+    match = _INT_PREFIX.match(value.replace(',', '')) if value else None
+    return int(match.group()) if match else default
+
+
+def parse_float_safe(value, default=0.0):
+    """parseFloat(value without '$' and commas): the leading number, e.g. '1.5%' -> 1.5."""
+    match = _FLOAT_PREFIX.match(value.replace('$', '').replace(',', '')) if value else None
+    return float(match.group()) if match else default
+
+
+def normalize_handle(handle):
+    """Same as findUserByTiktokHandle / createUserFromCruva: drop a leading '@'."""
+    return handle[1:] if handle.startswith('@') else handle
+
+
+def iter_cruva_rows(path, errors):
+    """
+    Stream a CRUVA CSV as dicts keyed by database column names.
+    Rows missing Handle/Video/Post Date are skipped and reported in errors,
+    using the TS parser's "Row N: Missing <CRUVA column>" messages.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        missing = [col for col in CRUVA_COLUMN_MAP if col not in header]
+        if missing:
+            errors.append(f"Missing expected columns: {', '.join(missing)}")
+        pos = {CRUVA_COLUMN_MAP[h]: i for i, h in enumerate(header) if h in CRUVA_COLUMN_MAP}
+
+        def get(raw, column):
+            i = pos.get(column)
+            return raw[i].strip() if i is not None and i < len(raw) else ''
+
+        for row_number, raw in enumerate(reader, 2):
+            if not any(raw):
+                continue
+            handle = get(raw, 'tiktok_handle')
+            video_url = get(raw, 'video_url')
+            post_date = get(raw, 'post_date')
+            for column, value in (('tiktok_handle', handle), ('video_url', video_url), ('post_date', post_date)):
+                if not value:
+                    errors.append(f"Row {row_number}: Missing {DB_TO_CRUVA[column]}")
+                    break
+            else:
+                yield {
+                    'tiktok_handle': handle,
+                    'video_url': video_url,
+                    'views': parse_int_safe(get(raw, 'views')),
+                    'likes': parse_int_safe(get(raw, 'likes')),
+                    'comments': parse_int_safe(get(raw, 'comments')),
+                    'gmv': parse_float_safe(get(raw, 'gmv')),
+                    'ctr': parse_float_safe(get(raw, 'ctr')),
+                    'units_sold': parse_int_safe(get(raw, 'units_sold')),
+                    'post_date': post_date,
+                    'video_title': get(raw, 'video_title'),
+                }
+
+
+def load_handle_index(conn, client_id):
+    """{tiktok_handle: user_id} for one client, loaded in a single query."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT tiktok_handle, id FROM users WHERE client_id = %s", (client_id,))
+        return {handle: str(user_id) for handle, user_id in cur}
+
+
+class CruvaIngester:
+    """
+    Bulk CRUVA ingester for one client.
+
+    handle_index only needs get(handle) and __setitem__(handle, user_id), so
+    a richer resolver can be passed in place of the plain dict (e.g.
+    identity_index.IdentityIndex). If it has key(handle), handles with the
+    same key in one batch create a single user.
+    """
+
+    def __init__(self, conn, client_id, handle_index=None, batch_size=50_000):
+        self.conn = conn
+        self.client_id = client_id
+        self.batch_size = batch_size
+        self.handle_index = handle_index if handle_index is not None else load_handle_index(conn, client_id)
+        self.result = {
+            'recordsProcessed': 0,
+            'usersUpdated': 0,
+            'newUsersCreated': 0,
+            'errors': [],
+        }
+        self.processed_user_ids = set()
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS cruva_staging (
+                    user_id uuid, video_url text, video_title text, post_date date,
+                    views integer, likes integer, comments integer,
+                    gmv numeric(10,2), ctr numeric(5,2), units_sold integer
+                ) ON COMMIT DELETE ROWS
+            """)
+        conn.commit()
+
+    def _create_users(self, cur, first_dates):
+        """Insert users for unknown handles. first_dates: {handle: earliest post_date in batch}."""
+        handles = list(first_dates)
+        cur.execute("""
+            INSERT INTO users (client_id, tiktok_handle, email, password_hash, current_tier,
+                               first_video_date, created_at, updated_at)
+            SELECT %s, h.handle, NULL, %s, 'tier_1', h.first_date::date, now(), now()
+            FROM unnest(%s::text[], %s::text[]) AS h(handle, first_date)
+            RETURNING tiktok_handle, id
+        """, (self.client_id, CRUVA_AUTO_CREATED_NO_PASSWORD, handles, [first_dates[h] for h in handles]))
+        for handle, user_id in cur.fetchall():
+            self.handle_index[handle] = str(user_id)
+        self.result['newUsersCreated'] += len(handles)
+
+    def _write_batch(self, rows):
+        # Handle resolution happens entirely in memory; only unknown handles hit the DB
+        key = getattr(self.handle_index, 'key', None) or (lambda handle: handle)
+        unknown = {}
+        for row in rows:
+            handle = normalize_handle(row['tiktok_handle'])
+            row['tiktok_handle'] = handle
+            if self.handle_index.get(handle) is None and key(handle) not in unknown:
+                unknown[key(handle)] = (handle, row['post_date'])
+
+        # ON CONFLICT cannot touch the same video twice in one statement: last row wins,
+        # matching the sequential upserts in processDailySales
+        videos = {}
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            if unknown:
+                self._create_users(cur, dict(unknown.values()))
+            for row in rows:
+                user_id = self.handle_index.get(row['tiktok_handle'])
+                row['user_id'] = user_id
+                videos[row['video_url']] = row
+                if user_id not in self.processed_user_ids:
+                    self.processed_user_ids.add(user_id)
+                    self.result['usersUpdated'] += 1
+
+            with cur.copy(f"COPY cruva_staging ({', '.join(VIDEO_COLUMNS)}) FROM STDIN") as copy:
+                for row in videos.values():
+                    copy.write_row([row[c] for c in VIDEO_COLUMNS])
+
+            cur.execute("""
+                INSERT INTO videos (client_id, user_id, video_url, video_title, post_date, views, likes,
+                                    comments, gmv, ctr, units_sold, sync_date, updated_at)
+                SELECT %s, user_id, video_url, video_title, post_date, views, likes,
+                       comments, gmv, ctr, units_sold, now(), now()
+                FROM cruva_staging
+                ON CONFLICT (video_url) DO UPDATE SET
+                    client_id = EXCLUDED.client_id,
+                    user_id = EXCLUDED.user_id,
+                    video_title = EXCLUDED.video_title,
+                    post_date = EXCLUDED.post_date,
+                    views = EXCLUDED.views,
+                    likes = EXCLUDED.likes,
+                    comments = EXCLUDED.comments,
+                    gmv = EXCLUDED.gmv,
+                    ctr = EXCLUDED.ctr,
+                    units_sold = EXCLUDED.units_sold,
+                    sync_date = EXCLUDED.sync_date,
+                    updated_at = EXCLUDED.updated_at
+            """, (self.client_id,))
+        self.result['recordsProcessed'] += len(rows)
+
+    def ingest_rows(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        return self.result
+
+    def ingest_file(self, path):
+        return self.ingest_rows(iter_cruva_rows(path, self.result['errors']))
+
+
+def create_sync_log(conn, client_id, file_name):
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO sync_logs (client_id, status, source, file_name, started_at, records_processed, created_at)
+            VALUES (%s, 'running', 'manual', %s, now(), 0, now())
+            RETURNING id
+        """, (client_id, file_name))
+        sync_log_id = cur.fetchone()[0]
+    conn.commit()
+    return sync_log_id
+
+
+def update_sync_log(conn, sync_log_id, status, records_processed, error_message=None):
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE sync_logs SET status = %s, records_processed = %s, error_message = %s, completed_at = now()
+            WHERE id = %s
+        """, (status, records_processed, error_message, sync_log_id))
+    conn.commit()
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Bulk-ingest CRUVA CSV exports (backfills)')
+    parser.add_argument('paths', nargs='+', help='CRUVA CSV files, ingested in the order given')
+    parser.add_argument('--client-id', required=True)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--no-sync-log', action='store_true', help='do not record runs in sync_logs')
+    parser.add_argument('--resolve-renames', action='store_true',
+                        help='match handles case-insensitively and through handle_changes (identity_index.py)')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    with connect(args.dsn) as conn:
+        handle_index = None
+        if args.resolve_renames:
+            from identity_index import load_identity_index
+
+            handle_index = load_identity_index(conn, args.client_id)
+        ingester = CruvaIngester(conn, args.client_id, handle_index, batch_size=args.batch_size)
+        for path in args.paths:
+            start = time.perf_counter()
+            before = ingester.result['recordsProcessed']
+            errors_before = len(ingester.result['errors'])
+            sync_log_id = None if args.no_sync_log else create_sync_log(conn, args.client_id, os.path.basename(path))
+            try:
+                ingester.ingest_file(path)
+            except Exception as e:
+                if sync_log_id:
+                    update_sync_log(conn, sync_log_id, 'failed', ingester.result['recordsProcessed'] - before, str(e))
+                raise
+            rows = ingester.result['recordsProcessed'] - before
+            file_errors = ingester.result['errors'][errors_before:]
+            if sync_log_id:
+                update_sync_log(conn, sync_log_id, 'failed' if file_errors else 'success', rows,
+                                '; '.join(file_errors[:100]) or None)
+            elapsed = time.perf_counter() - start
+            print(f"{path}: {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s), "
+                  f"{len(file_errors)} skipped")
+
+    result = ingester.result
+    print(f"Done: {result['recordsProcessed']:,} videos, {result['usersUpdated']:,} users, "
+          f"{result['newUsersCreated']:,} new users, {len(result['errors'])} errors")
+    print("Run update_precomputed_fields / update_mission_progress (next daily sync) to refresh derived fields.")
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Dashboard Snapshots
+Builds every user's get_dashboard_data payload in bulk after the sync, so a
+dashboard load is a keyed read (get_dashboard_snapshot, migration
+20261019130000_dashboard_snapshots.sql) instead of seven queries per request.
+
+The RPC's inputs only change when the sync runs: tiers, missions, progress,
+redemptions and the tier's VIP rewards. The builder reads them for the whole
+tenant in one REPEATABLE READ transaction, with one query per part of the
+payload:
+- users + client, ordered by user id
+- per tier: currentTier, nextTier, the top 4 vip_tier rewards and their count
+- featured-mission candidates, in get_dashboard_data's priority order
+- mission_progress of those missions, with whether the linked redemption
+  still allows featuring them (none or 'claimable')
+- raffle participations, and the recentFulfillment query
+Per-user streams are merged by user id, so memory does not grow with the
+tenant. Every value is rendered by Postgres' to_json, as json_build_object
+renders it, and fragments are joined without whitespace. Tier and mission
+fragments are built once and shared by every user in the tier.
+
+Featured mission: the first candidate for the user's tier whose progress
+row (or absence of one) passes the redemption filter, skipping raffles the
+user has entered. Missions of equal priority go by display_order; the
+RPC's LIMIT 1 picks any of them, so --verify reports those as ties.
+
+Snapshots are written with COPY under a sync_id (default: the client's
+latest successful sync_logs row). dashboard_snapshot_sets then points at the
+new set in the same transaction, and older sets are deleted.
+built_at is the start of the oldest transaction open in the database when
+the build started. A write that was in flight then, but is not in the
+snapshot, still has updated_at > built_at, so get_dashboard_snapshot falls
+back to the RPC for that user. The set also records the client's
+dashboard_content_versions counter, read in the build transaction; triggers
+bump it on any change to the client's missions, rewards, tiers or client
+row, which stops the whole set being served until the next build
+(migration 20261019140000_dashboard_snapshot_content_version.sql).
+
+The app reads snapshots only for clients listed in
+DASHBOARD_SNAPSHOT_CLIENT_IDS; get_dashboard_data stays the default.
+sync_orchestrator.py --snapshots verifies a sample after every build and
+unpublishes the set (invalidate) when it differs from the RPC.
+
+Usage:
+    python dashboard_snapshots.py --client-id <uuid>
+    python dashboard_snapshots.py --client-id <uuid> --sync-id <uuid> --verify 500
+    python dashboard_snapshots.py --client-id <uuid> --bench --calls 2000 --concurrency 8
+    python dashboard_snapshots.py --client-id <uuid> --invalidate
+"""
+
+import itertools
+import re
+import time
+from operator import itemgetter
+
+from local_db import add_dsn_argument, connect
+
+FEATURED_TYPES = ['raffle', 'sales_dollars', 'sales_units', 'videos', 'likes', 'views']
+COPY_BATCH = 5000
+ITERSIZE = 10_000
+
+# Key order and expressions as in get_dashboard_data's json_build_object calls
+USER_FIELDS = [('id', 'u.id'), ('handle', 'u.tiktok_handle'), ('email', 'u.email'), ('clientName', 'c.name')]
+CLIENT_FIELDS = [('id', 'c.id'), ('vipMetric', 'c.vip_metric'), ('checkpointMonths', 'c.checkpoint_months')]
+CURRENT_TIER_FIELDS = [('id', 't.tier_id'), ('name', 't.tier_name'), ('color', 't.tier_color'),
+                       ('order', 't.tier_order'), ('checkpointExempt', 'COALESCE(t.checkpoint_exempt, false)')]
+NEXT_TIER_FIELDS = [('id', 'n.tier_id'), ('name', 'n.tier_name'), ('color', 'n.tier_color'),
+                    ('salesThreshold', 'n.sales_threshold'), ('unitsThreshold', 'n.units_threshold')]
+CHECKPOINT_FIELDS = [('salesCurrent', 'u.checkpoint_sales_current'), ('unitsCurrent', 'u.checkpoint_units_current'),
+                     ('manualAdjustmentsTotal', 'u.manual_adjustments_total'),
+                     ('manualAdjustmentsUnits', 'u.manual_adjustments_units'),
+                     ('nextCheckpointAt', 'u.next_checkpoint_at'), ('lastLoginAt', 'u.last_login_at')]
+# featuredMission is MISSION_FIELDS + PROGRESS_FIELDS + REWARD_FIELDS
+MISSION_FIELDS = [('missionId', 'm.id'), ('missionType', 'm.mission_type'), ('displayName', 'm.display_name'),
+                  ('targetValue', 'm.target_value'), ('targetUnit', 'm.target_unit'),
+                  ('raffleEndDate', 'm.raffle_end_date'), ('activated', 'm.activated')]
+PROGRESS_FIELDS = [('progressId', 'mp.id'), ('currentValue', 'COALESCE(mp.current_value, 0)'),
+                   ('progressStatus', 'mp.status'), ('completedAt', 'mp.completed_at')]
+NO_PROGRESS = '"progressId":null,"currentValue":0,"progressStatus":null,"completedAt":null'
+REWARD_FIELDS = [('rewardId', 'r.id'), ('rewardType', 'r.type'), ('rewardName', 'r.name'),
+                 ('rewardValueData', 'r.value_data'), ('tierName', 't.tier_name'), ('tierColor', 't.tier_color')]
+FULFILLMENT_FIELDS = [('fulfilledAt', 'mp.completed_at'), ('rewardType', 'r.type'), ('rewardName', 'r.name'),
+                      ('rewardAmount', "COALESCE((r.value_data->>'amount')::INTEGER, 0)")]
+# currentTierRewards rows (json_agg of the reward columns)
+TIER_REWARD_FIELDS = [(column, f"r.{column}") for column in
+                      ['id', 'type', 'name', 'description', 'value_data', 'reward_source', 'redemption_quantity',
+                       'display_order']]
+
+
+def json_object_sql(fields):
+    """SQL expression for a compact JSON object (text). Values go through to_json, as in json_build_object."""
+    return ' || '.join(f"""'{"," if i else "{"}"{key}":' || COALESCE(to_json({expr})::text, 'null')"""
+                       for i, (key, expr) in enumerate(fields)) + " || '}'"
+
+
+_JSON_SPACE = re.compile(r'("(?:[^"\\]|\\.)*")|\s+')
+
+
+def minify_json(text):
+    """Drop the whitespace jsonb and json_agg put between tokens; strings and numbers are kept as rendered."""
+    return _JSON_SPACE.sub(lambda m: m.group(1) or '', text)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+PRIORITY_SQL = """
+    CASE m.mission_type
+      WHEN 'raffle' THEN 0
+      WHEN 'sales_dollars' THEN CASE WHEN c.vip_metric = 'sales' THEN 1 ELSE 2 END
+      WHEN 'sales_units' THEN CASE WHEN c.vip_metric = 'units' THEN 1 ELSE 2 END
+      WHEN 'videos' THEN 3
+      WHEN 'likes' THEN 4
+      WHEN 'views' THEN 5
+      ELSE 999
+    END"""
+
+CANDIDATES_SQL = """
+    SELECT m.id FROM missions m
+    WHERE m.client_id = %(client_id)s AND m.enabled = true AND m.mission_type = ANY(%(types)s)
+      AND (m.mission_type <> 'raffle' OR m.activated = true)"""
+
+CLIENT_SQL = f"SELECT {json_object_sql(CLIENT_FIELDS)} FROM clients c WHERE c.id = %(client_id)s"
+
+TIERS_SQL = f"""
+    SELECT t.tier_id, {json_object_sql(CURRENT_TIER_FIELDS)},
+           (SELECT {json_object_sql(NEXT_TIER_FIELDS)} FROM tiers n
+            WHERE n.client_id = t.client_id AND n.tier_order = t.tier_order + 1 LIMIT 1),
+           (SELECT '[' || string_agg({json_object_sql(TIER_REWARD_FIELDS)}, ',' ORDER BY r.display_order) || ']'
+            FROM (SELECT * FROM rewards r
+                  WHERE r.client_id = t.client_id AND r.tier_eligibility = t.tier_id AND r.enabled = true
+                    AND r.reward_source = 'vip_tier'
+                  ORDER BY r.display_order LIMIT 4) r),
+           (SELECT COUNT(*) FROM rewards r
+            WHERE r.client_id = t.client_id AND r.tier_eligibility = t.tier_id AND r.enabled = true
+              AND r.reward_source = 'vip_tier')
+    FROM tiers t
+    WHERE t.client_id = %(client_id)s
+"""
+
+MISSIONS_SQL = f"""
+    SELECT m.id, m.mission_type, m.tier_eligibility, {PRIORITY_SQL} AS priority,
+           {json_object_sql(MISSION_FIELDS)}, {json_object_sql(REWARD_FIELDS)}
+    FROM missions m
+    INNER JOIN clients c ON c.id = m.client_id
+    INNER JOIN rewards r ON m.reward_id = r.id
+    LEFT JOIN tiers t ON m.tier_eligibility = t.tier_id AND m.client_id = t.client_id
+    WHERE m.id IN ({CANDIDATES_SQL})
+    ORDER BY priority, m.display_order, m.id
+"""
+
+USERS_SQL = f"""
+    SELECT u.id, u.current_tier, u.last_login_at,
+           dashboard_snapshot_user_digest(u.tiktok_handle, u.email, u.current_tier, u.checkpoint_sales_current,
+                                          u.checkpoint_units_current, u.manual_adjustments_total,
+                                          u.manual_adjustments_units, u.next_checkpoint_at),
+           {json_object_sql(USER_FIELDS)}, {json_object_sql(CHECKPOINT_FIELDS)}
+    FROM users u
+    INNER JOIN clients c ON u.client_id = c.id
+    WHERE u.client_id = %(client_id)s
+    ORDER BY u.id
+"""
+
+# One row per (progress, redemption) pair, as get_dashboard_data's LEFT JOINs produce them
+PROGRESS_SQL = f"""
+    SELECT mp.user_id, mp.mission_id, (red.id IS NULL OR red.status = 'claimable'),
+           {json_object_sql(PROGRESS_FIELDS)}
+    FROM mission_progress mp
+    LEFT JOIN redemptions red ON mp.id = red.mission_progress_id
+      AND red.user_id = mp.user_id
+      AND red.client_id = mp.client_id
+      AND red.deleted_at IS NULL
+    WHERE mp.client_id = %(client_id)s
+      AND mp.mission_id IN ({CANDIDATES_SQL})
+    ORDER BY mp.user_id, mp.checkpoint_start DESC, mp.id
+"""
+
+RAFFLE_SQL = """
+    SELECT DISTINCT rp.user_id, rp.mission_id
+    FROM raffle_participations rp
+    INNER JOIN missions m ON m.id = rp.mission_id AND m.mission_type = 'raffle'
+    WHERE rp.client_id = %(client_id)s
+    ORDER BY rp.user_id
+"""
+
+# Same filter as get_dashboard_data step 5 (BUG-004: mission_progress.status is never 'fulfilled')
+FULFILLMENT_SQL = f"""
+    SELECT DISTINCT ON (mp.user_id) mp.user_id, {json_object_sql(FULFILLMENT_FIELDS)}
+    FROM mission_progress mp
+    INNER JOIN users u ON u.id = mp.user_id
+    INNER JOIN missions m ON mp.mission_id = m.id
+    INNER JOIN rewards r ON m.reward_id = r.id
+    WHERE mp.client_id = %(client_id)s
+      AND mp.status = 'fulfilled'
+      AND (u.last_login_at IS NULL OR mp.completed_at > u.last_login_at)
+    ORDER BY mp.user_id, mp.completed_at DESC
+"""
+
+# Oldest transaction still open: anything it writes has updated_at (its now()) after built_at
+BUILT_AT_SQL = """
+    SELECT LEAST(now(), (SELECT min(xact_start) FROM pg_stat_activity
+                         WHERE datname = current_database() AND xact_start IS NOT NULL))
+           - interval '1 millisecond'
+"""
+
+# Bumped by triggers on clients, tiers, missions and rewards (20261019140000 migration)
+CONTENT_VERSION_SQL = """
+    SELECT COALESCE((SELECT version FROM dashboard_content_versions WHERE client_id = %(client_id)s), 0)
+"""
+
+PUBLISH_SQL = """
+    INSERT INTO dashboard_snapshot_sets (client_id, sync_id, built_at, users, content_version)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (client_id) DO UPDATE
+    SET sync_id = EXCLUDED.sync_id, built_at = EXCLUDED.built_at, users = EXCLUDED.users,
+        content_version = EXCLUDED.content_version
+"""
+
+
+def latest_sync_id(conn, client_id):
+    """id of the client's latest successful sync_logs row, or None."""
+    row = conn.execute("""
+        SELECT id FROM sync_logs WHERE client_id = %s AND status = 'success'
+        ORDER BY started_at DESC LIMIT 1
+    """, (client_id,)).fetchone()
+    return row and row[0]
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+class _UserStream:
+    """Rows of a query ordered by user id (first column), taken one user at a time."""
+
+    def __init__(self, cursor):
+        self._groups = itertools.groupby(cursor, key=itemgetter(0))
+        self._next = next(self._groups, None)
+
+    def take(self, user_id):
+        while self._next is not None and self._next[0] < user_id:
+            self._next = next(self._groups, None)
+        if self._next is None or self._next[0] != user_id:
+            return ()
+        rows = list(self._next[1])
+        self._next = next(self._groups, None)
+        return rows
+
+
+def _stream(conn, name, sql, params):
+    cur = conn.cursor(name=name)
+    cur.itersize = ITERSIZE
+    cur.execute(sql, params)
+    return _UserStream(cur)
+
+
+class Featured:
+    """Featured-mission candidates per tier, in priority order, as shared JSON fragments."""
+
+    def __init__(self, missions):
+        # mission row: id, type, tier_eligibility, priority, mission object, reward object
+        self.missions = [(m[0], m[1], m[2], m[3], m[4][:-1] + ',', ',' + m[5][1:]) for m in missions]
+        self._by_tier = {}
+
+    def for_tier(self, tier_id):
+        if tier_id not in self._by_tier:
+            self._by_tier[tier_id] = [m for m in self.missions if m[2] in (tier_id, 'all')]
+        return self._by_tier[tier_id]
+
+    def pick(self, tier_id, progress, entered):
+        """(mission type, featuredMission JSON) or (None, 'null')."""
+        for mission_id, mission_type, _, _, head, tail in self.for_tier(tier_id):
+            if mission_type == 'raffle' and mission_id in entered:
+                continue
+            rows = progress.get(mission_id)
+            if rows is None:
+                return mission_type, head + NO_PROGRESS + tail
+            for is_open, fields in rows:
+                if is_open:
+                    return mission_type, head + fields[1:-1] + tail
+        return None, 'null'
+
+
+def build_snapshots(conn, client_id, sync_id, copy_batch=COPY_BATCH):
+    """
+    Build and publish every user's dashboard payload for one client under
+    sync_id, in one transaction (conn must be idle). Returns build stats.
+    """
+    params = {'client_id': client_id, 'types': FEATURED_TYPES}
+    stats = {'users': 0, 'written': 0, 'no_tier': 0, 'bytes': 0, 'featured': {}, 'recent_fulfillment': 0}
+    start = time.perf_counter()
+    with conn.transaction():
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        built_at = conn.execute(BUILT_AT_SQL).fetchone()[0]
+        content_version = conn.execute(CONTENT_VERSION_SQL, params).fetchone()[0]
+        row = conn.execute(CLIENT_SQL, params).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown client {client_id}")
+        client = row[0]
+        tiers = {}
+        for tier_id, current, next_tier, rewards, count in conn.execute(TIERS_SQL, params):
+            tiers.setdefault(tier_id, (f',"currentTier":{current},"nextTier":{next_tier or "null"}',
+                                       f',"currentTierRewards":{minify_json(rewards or "[]")},'
+                                       f'"totalRewardsCount":{count}}}'))
+        featured = Featured([m[:4] + (minify_json(m[4]), minify_json(m[5]))
+                             for m in conn.execute(MISSIONS_SQL, params)])
+        stats['read_s'] = time.perf_counter() - start
+
+        users = conn.cursor(name='dashboard_users')
+        users.itersize = ITERSIZE
+        users.execute(USERS_SQL, params)
+        progress = _stream(conn, 'dashboard_progress', PROGRESS_SQL, params)
+        raffles = _stream(conn, 'dashboard_raffles', RAFFLE_SQL, params)
+        fulfillments = _stream(conn, 'dashboard_fulfillments', FULFILLMENT_SQL, params)
+        conn.execute("DELETE FROM dashboard_snapshots WHERE client_id = %s AND sync_id = %s", (client_id, sync_id))
+
+        batch = []
+        for user_id, tier_id, last_login_at, digest, user, checkpoint in users:
+            stats['users'] += 1
+            by_mission = {}
+            for _, mission_id, is_open, fields in progress.take(user_id):
+                by_mission.setdefault(mission_id, []).append((is_open, fields))
+            entered = {row[1] for row in raffles.take(user_id)}
+            recent = fulfillments.take(user_id)
+            if tier_id not in tiers:
+                # get_dashboard_data returns NULL; no row, so get_dashboard_snapshot calls it
+                stats['no_tier'] += 1
+                continue
+            tier, rewards = tiers[tier_id]
+            mission_type, mission = featured.pick(tier_id, by_mission, entered)
+            stats['featured'][mission_type] = stats['featured'].get(mission_type, 0) + 1
+            stats['recent_fulfillment'] += bool(recent)
+            payload = (f'{{"user":{user},"client":{client}{tier},"checkpointData":{checkpoint},'
+                       f'"featuredMission":{mission},"recentFulfillment":{recent[0][1] if recent else "null"}'
+                       f'{rewards}')
+            stats['bytes'] += len(payload)
+            batch.append((client_id, sync_id, user_id, payload, digest, last_login_at))
+            if len(batch) >= copy_batch:
+                stats['written'] += _copy(conn, batch)
+                batch = []
+        stats['written'] += _copy(conn, batch)
+        conn.execute(PUBLISH_SQL, (client_id, sync_id, built_at, stats['written'], content_version))
+    stats['build_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with conn.transaction():
+        cur = conn.execute("DELETE FROM dashboard_snapshots WHERE client_id = %s AND sync_id <> %s",
+                           (client_id, sync_id))
+        stats['deleted'] = cur.rowcount
+    stats['cleanup_s'] = time.perf_counter() - start
+    stats['built_at'] = built_at
+    return stats
+
+
+def _copy(conn, rows):
+    if rows:
+        with conn.cursor() as cur, cur.copy("COPY dashboard_snapshots "
+                                            "(client_id, sync_id, user_id, payload, user_digest, last_login_at) "
+                                            "FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+    return len(rows)
+
+
+def invalidate(conn, client_id):
+    """Stop serving the client's snapshots (get_dashboard_snapshot falls back) until the next build."""
+    with conn.transaction():
+        return conn.execute("DELETE FROM dashboard_snapshot_sets WHERE client_id = %s", (client_id,)).rowcount
+
+
+def print_build(stats):
+    written = max(stats['written'], 1)
+    print(f"Built {stats['written']:,} snapshots for {stats['users']:,} users in {stats['build_s']:.1f}s "
+          f"({stats['users'] / max(stats['build_s'], 1e-9):,.0f} users/s; tiers and missions read in "
+          f"{stats['read_s']:.2f}s), built_at {stats['built_at']:%Y-%m-%d %H:%M:%S%z}")
+    print(f"  {stats['bytes'] / 1e6:.1f} MB of JSON, {stats['bytes'] / written:,.0f} bytes per payload; "
+          f"{stats['no_tier']:,} users without a tier (served by the RPC)")
+    print('  featured: ' + ', '.join(f"{k or 'none'} {v:,}" for k, v in
+                                     sorted(stats['featured'].items(), key=lambda kv: -kv[1]))
+          + f"; recentFulfillment {stats['recent_fulfillment']:,}")
+    print(f"  {stats['deleted']:,} rows of older sets deleted in {stats['cleanup_s']:.1f}s")
+
+
+# ============================================================================
+# VERIFY AND BENCHMARK
+# ============================================================================
+
+def _priority(mission, vip_metric):
+    if mission is None:
+        return None
+    kind = mission['missionType']
+    if kind in ('sales_dollars', 'sales_units'):
+        return 1 if (kind == 'sales_dollars') == (vip_metric == 'sales') else 2
+    return FEATURED_TYPES.index(kind)
+
+
+def verify(conn, client_id, n, seed=0):
+    """
+    Compare stored snapshots with get_dashboard_data for n sampled users.
+    Returns (matches, ties, mismatches as (user_id, keys)). A tie is a
+    different featured mission of the same priority.
+    """
+    import json
+    import random
+
+    user_ids = [row[0] for row in conn.execute("""
+        SELECT s.user_id FROM dashboard_snapshot_sets ss
+        JOIN dashboard_snapshots s USING (client_id, sync_id) WHERE ss.client_id = %s ORDER BY s.user_id
+    """, (client_id,))]
+    matches, ties, mismatches = 0, 0, []
+    for user_id in random.Random(seed).sample(user_ids, min(n, len(user_ids))):
+        payload, rpc = conn.execute(f"""
+            SELECT ({SNAPSHOT_READ_SQL})::text, get_dashboard_data(%(user_id)s, %(client_id)s)::text
+        """, {'user_id': user_id, 'client_id': client_id}).fetchone()
+        expected, actual = json.loads(rpc), json.loads(payload)
+        different = sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+        if different == ['featuredMission']:
+            metric = expected['client']['vipMetric']
+            if _priority(expected['featuredMission'], metric) == _priority(actual['featuredMission'], metric):
+                ties += 1
+                continue
+        if different:
+            mismatches.append((user_id, different))
+        else:
+            matches += 1
+    conn.rollback()
+    return matches, ties, mismatches
+
+
+SNAPSHOT_READ_SQL = """
+    SELECT s.payload FROM dashboard_snapshot_sets ss
+    JOIN dashboard_snapshots s ON s.client_id = ss.client_id AND s.sync_id = ss.sync_id AND s.user_id = %(user_id)s
+    WHERE ss.client_id = %(client_id)s
+"""
+BENCH_READS = {
+    'get_dashboard_data': "SELECT get_dashboard_data(%(user_id)s, %(client_id)s)",
+    'get_dashboard_snapshot': "SELECT get_dashboard_snapshot(%(user_id)s, %(client_id)s)",
+    'snapshot row': SNAPSHOT_READ_SQL,
+}
+
+
+def run_benchmark(dsn, client_id, calls, concurrency, seed=0):
+    """Per-request latency and throughput of the RPC against the snapshot reads, on sampled users."""
+    import numpy as np
+    from psycopg_pool import ConnectionPool
+
+    from bench_rpc import PERCENTILES, run_concurrent, sample_users
+
+    with connect(dsn) as conn:
+        users = sample_users(conn, client_id, calls, np.random.default_rng(seed))
+    print(f"\n{len(users):,} sampled users, concurrency {concurrency}")
+    print(f"{'read':24s} " + ' '.join(f"{f'p{q} ms':>8s}" for q in PERCENTILES) + f" {'calls/s':>9s}")
+    with ConnectionPool(dsn, min_size=concurrency, max_size=concurrency, open=True) as pool:
+        pool.wait()
+        for name, sql in BENCH_READS.items():
+            run_concurrent(pool, sql, users[:concurrency * 4], concurrency)   # warm-up
+            latencies, seconds = run_concurrent(pool, sql, users, concurrency)
+            p = np.percentile(latencies, PERCENTILES)
+            print(f"{name:24s} " + ' '.join(f"{v:>8.2f}" for v in p) + f" {len(users) / seconds:>9,.0f}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Build dashboard payload snapshots for one client')
+    parser.add_argument('--client-id', required=True)
+    parser.add_argument('--sync-id', help="sync_logs id to build under (default: latest successful sync)")
+    parser.add_argument('--no-build', action='store_true', help='use the published set (--verify, --bench)')
+    parser.add_argument('--verify', type=int, metavar='N', help='compare N snapshots with get_dashboard_data')
+    parser.add_argument('--bench', action='store_true', help='time get_dashboard_data against snapshot reads')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--invalidate', action='store_true', help='serve get_dashboard_data until the next build')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    with connect(args.dsn) as conn:
+        if args.invalidate:
+            print(f"{invalidate(conn, args.client_id)} snapshot set unpublished for {args.client_id}")
+            sys.exit(0)
+        if not args.no_build:
+            sync_id = args.sync_id or latest_sync_id(conn, args.client_id)
+            conn.commit()
+            if sync_id is None:
+                parser.error('client has no successful sync_logs row; pass --sync-id')
+            print(f"Client {args.client_id}, sync {sync_id}")
+            print_build(build_snapshots(conn, args.client_id, sync_id))
+        if args.verify:
+            matches, ties, mismatches = verify(conn, args.client_id, args.verify)
+            print(f"\nVerify: {matches:,} identical to get_dashboard_data, {ties:,} featured-mission ties, "
+                  f"{len(mismatches):,} different")
+            for user_id, keys in mismatches[:20]:
+                print(f"  {user_id}: {', '.join(keys)}")
+    if args.bench:
+        run_benchmark(args.dsn, args.client_id, args.calls, args.concurrency)
+    sys.exit(1 if args.verify and mismatches else 0)
@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+Fulfillment Simulator
+Discrete-event simulation of the redemption state machines in
+STATE_TRANSITIONS.md, to size admin staff and cron cadence before a big
+client goes live.
+
+Every mission completion or raffle entry becomes a redemption and is driven
+through:
+- mission_progress.status: active -> completed. Each user holds
+  --missions-per-user active rows; the cron completes each with a constant
+  hazard (so completions per user per month match --completion-rate) and
+  the next recurring row starts active. Raffle rows complete when the user
+  participates. dormant -> active is one admin action per mission at
+  launch, not per user, so rows start active.
+- redemptions.status: claimable -> claimed -> (fulfilled ->) concluded,
+  raffle losers claimable -> rejected
+- commission_boost_redemptions.boost_status: scheduled -> active ->
+  expired -> pending_info -> pending_payout -> paid
+- physical gifts: to_ship -> shipped -> concluded (Mark Shipped / Mark
+  Received on the admin Redemptions screen)
+
+Timing follows the app: the daily automation cron (vercel.json, 19:00 UTC)
+runs the sync that completes missions and creates claimable redemptions,
+activates boosts scheduled for 2 PM EST, and moves expired boosts to
+pending_info in the same run. The admin dashboard queues (instant rewards
+to fulfill, physical gifts to ship, commission payouts, discounts to
+activate, raffles to draw) are worked FIFO by --admins staff during
+business hours, 9-5 ET on weekdays. User steps (claiming, picking a boost
+date or discount slot, submitting payment info) take exponential delays.
+
+The event queue is a heap of (time, seq, kind, item, arg) tuples over
+per-redemption state lists, so a run handles a few million events per
+minute. mission_progress rows are a numpy array of activation times, updated
+once per cron run. Times are hours from a Monday 00:00 UTC. Admin queue
+waits are cut off at the end of the run; tasks still queued then are
+reported as not started rather than given waits past the horizon.
+
+Usage:
+    python fulfillment_sim.py --users 1000000 --days 180 --admins 4
+    python fulfillment_sim.py --users 500000 --replay replay.json --cron-hours 6 --daily daily.csv
+"""
+
+import heapq
+import json
+import random
+
+import numpy as np
+
+HOURS_PER_MONTH = 365.25 / 12 * 24
+CRON_HOUR_UTC = 19                  # vercel.json "0 19 * * *"
+ADMIN_OPEN_UTC, ADMIN_CLOSE_UTC = 14, 22  # 9 AM - 5 PM EST, Monday to Friday
+DISCOUNT_SLOTS_UTC = (14, 21)       # users pick a 9 AM - 4 PM EST weekday slot
+
+# Share of mission completions per reward type (replaced by --replay)
+DEFAULT_MIX = {
+    'gift_card': 0.35, 'spark_ads': 0.15, 'experience': 0.02,
+    'physical_gift': 0.08, 'commission_boost': 0.20, 'discount': 0.20,
+}
+# Admin minutes per dashboard task
+TASK_MINUTES = {'instant': 10, 'ship': 15, 'receive': 2, 'payout': 5, 'discount': 3, 'draw': 20}
+# User behaviour: exponential mean delays (days) and shares that act at all
+DEFAULT_BEHAVIOUR = {
+    'claim_share': 0.9, 'claim_days': 2.0,
+    'payment_share': 0.95, 'payment_days': 3.0,
+    'lead_days_max': 7,            # boost date / discount slot picked 1..N days ahead
+    'boost_duration_days': 30, 'discount_duration_days': 7,
+    'transit_days': 5.0,
+    'raffles_per_month': 1, 'raffle_participation': 0.2,
+    'missions_per_user': 5,        # active mission_progress rows per user
+}
+SLA_HOURS = 24  # instant rewards: red flag after 24 hours
+
+REWARD_TYPES = ['gift_card', 'spark_ads', 'experience', 'physical_gift', 'commission_boost', 'discount', 'raffle']
+GIFT_CARD, SPARK_ADS, EXPERIENCE, PHYSICAL, BOOST, DISCOUNT, RAFFLE = range(len(REWARD_TYPES))
+INSTANT = (GIFT_CARD, SPARK_ADS, EXPERIENCE)
+
+STATES = ['claimable', 'claimed', 'fulfilled', 'concluded', 'rejected',
+          'scheduled', 'active', 'expired', 'pending_info', 'pending_payout', 'paid',
+          'to_ship', 'shipped']
+(CLAIMABLE, CLAIMED, FULFILLED, CONCLUDED, REJECTED,
+ SCHEDULED, ACTIVE, EXPIRED, PENDING_INFO, PENDING_PAYOUT, PAID,
+ TO_SHIP, SHIPPED) = range(len(STATES))
+NO_STATE = -1
+
+TASKS = list(TASK_MINUTES)
+T_INSTANT, T_SHIP, T_RECEIVE, T_PAYOUT, T_DISCOUNT, T_DRAW = range(len(TASKS))
+
+(E_TICK, E_DAY, E_CLAIM, E_BOOST_ACTIVATE, E_BOOST_EXPIRE, E_PAYMENT_INFO, E_DISCOUNT_SLOT,
+ E_DISCOUNT_EXPIRE, E_DELIVERED, E_TASK_DONE, E_RAFFLE_ENTRY, E_RAFFLE_END) = range(12)
+
+
+def admin_open_at(t):
+    """Earliest time >= t inside admin business hours."""
+    while True:
+        day = int(t // 24)
+        hour = t - day * 24
+        if day % 7 < 5 and hour < ADMIN_CLOSE_UTC:
+            return max(t, day * 24 + ADMIN_OPEN_UTC)
+        t = (day + 1) * 24
+
+
+def admin_work_end(t, hours):
+    """Time a task of `hours` working hours started at t finishes, across closed hours."""
+    while True:
+        t = admin_open_at(t)
+        close = int(t // 24) * 24 + ADMIN_CLOSE_UTC
+        if t + hours <= close:
+            return t + hours
+        hours -= close - t
+        t = close
+
+
+def mix_from_replay(path):
+    """(completions per user per month, reward mix) from a mission_replay.py --json report."""
+    with open(path) as f:
+        report = json.load(f)
+    by_type = {}
+    for row in report['missions']:
+        if row['reward_type'] in DEFAULT_MIX:
+            by_type[row['reward_type']] = by_type.get(row['reward_type'], 0) + row['completions']
+    total = sum(by_type.values())
+    if not total:
+        raise ValueError(f"{path}: no completions with a known reward type")
+    # Last three complete months of created redemptions per user
+    recent = [m['created'] for m in report['months'][-4:-1]] or [m['created'] for m in report['months']]
+    rate = sum(recent) / len(recent) / report['users']
+    return rate, {t: n / total for t, n in by_type.items()}
+
+
+class FulfillmentSim:
+    """
+    One tenant's redemptions. run() drives the event heap to the horizon;
+    afterwards `daily` holds one row per simulated day and `dwell` the hours
+    each redemption spent in each state it left.
+    """
+
+    def __init__(self, users, completion_rate, mix=None, admins=2, cron_hours=24, behaviour=None,
+                 task_minutes=None, seed=1):
+        self.users = users
+        self.completion_rate = completion_rate  # completions per user per month
+        mix = mix or DEFAULT_MIX
+        self.mix_types = [REWARD_TYPES.index(t) for t in mix]
+        self.mix_weights = np.array(list(mix.values()), dtype=float) / sum(mix.values())
+        self.cron_hours = cron_hours
+        self.b = dict(DEFAULT_BEHAVIOUR, **(behaviour or {}))
+        minutes = dict(TASK_MINUTES, **(task_minutes or {}))
+        self.task_hours = [minutes[t] / 60 for t in TASKS]
+        self.random = random.Random(seed)
+        self.np_random = np.random.default_rng(seed)
+
+        # Per redemption
+        self.rtype, self.rstate, self.rsince, self.sstate, self.ssince, self.claimed_at = [], [], [], [], [], []
+        self.count = [0] * len(STATES)
+        self.dwell = [[] for _ in STATES]
+
+        # mission_progress: activation time of each active row, and active -> completed times
+        self.mission_since = np.zeros(int(users * self.b['missions_per_user']))
+        self.mission_completed = 0
+        self.mission_dwell = []         # arrays of hours, standard missions
+        self.raffle_dwell = []          # hours from raffle start to participation
+
+        self.heap = []
+        self.seq = 0
+        self.free = [0.0] * admins      # when each admin is next free
+        self.task_wait = [[] for _ in TASKS]
+        self.task_unstarted = [0] * len(TASKS)
+        self.horizon = float('inf')
+        self.sla_breaches = 0
+        self.raffles = []
+        self.events = 0
+        self.daily = []
+        self._today = self._new_day(0)
+
+    # ---- plumbing ----
+    def push(self, t, kind, item=-1, arg=0):
+        self.seq += 1
+        heapq.heappush(self.heap, (t, self.seq, kind, item, arg))
+
+    def next_tick(self, t):
+        first = CRON_HOUR_UTC % self.cron_hours
+        k = -(-(t - first) // self.cron_hours)
+        return first + k * self.cron_hours
+
+    def _new_day(self, day):
+        return {'day': day, 'completions': 0, 'raffle_entries': 0, 'claims': 0,
+                'tasks_in': [0] * len(TASKS), 'tasks_done': [0] * len(TASKS), 'admin_hours': 0.0,
+                'demand_hours': 0.0}
+
+    def new_redemption(self, t, rtype):
+        self.rtype.append(rtype)
+        self.rstate.append(CLAIMABLE)
+        self.rsince.append(t)
+        self.sstate.append(NO_STATE)
+        self.ssince.append(t)
+        self.claimed_at.append(None)
+        self.count[CLAIMABLE] += 1
+        return len(self.rtype) - 1
+
+    def set_status(self, i, state, t):
+        old = self.rstate[i]
+        self.count[old] -= 1
+        self.dwell[old].append(t - self.rsince[i])
+        self.count[state] += 1
+        self.rstate[i] = state
+        self.rsince[i] = t
+
+    def set_sub(self, i, state, t):
+        old = self.sstate[i]
+        if old != NO_STATE:
+            self.count[old] -= 1
+            self.dwell[old].append(t - self.ssince[i])
+        if state != NO_STATE:
+            self.count[state] += 1
+        self.sstate[i] = state
+        self.ssince[i] = t
+
+    def task(self, t, task, item=-1):
+        """Queue an admin task: FIFO on the earliest free admin, in business hours."""
+        self._today['tasks_in'][task] += 1
+        self._today['demand_hours'] += self.task_hours[task]
+        free = heapq.heappop(self.free)
+        start = admin_open_at(max(t, free))
+        done = admin_work_end(start, self.task_hours[task])
+        heapq.heappush(self.free, done)
+        if start > self.horizon:
+            # Still queued when the run ends: its wait is only known to exceed this
+            self.task_unstarted[task] += 1
+        self.task_wait[task].append(min(start, self.horizon) - t)
+        self.push(done, E_TASK_DONE, item, task)
+
+    def user_claims(self, t, i):
+        if self.random.random() < self.b['claim_share']:
+            self.push(t + self.random.expovariate(1 / (self.b['claim_days'] * 24)), E_CLAIM, i)
+
+    def complete_missions(self, t):
+        """
+        Cron run: active mission_progress rows reaching their target become
+        completed. Returns how many. Rows are alike and the hazard is
+        constant, so the completed ones are a uniform sample of the active
+        rows; each is replaced by the next recurring row, active from t.
+        """
+        rows = len(self.mission_since)
+        if not rows:
+            return 0
+        hazard = self.completion_rate / self.b['missions_per_user'] / HOURS_PER_MONTH
+        n = int(self.np_random.binomial(rows, -np.expm1(-hazard * self.cron_hours)))
+        # n is a small share of the rows: sampling with replacement and dropping repeats is close enough
+        done = np.unique(self.np_random.integers(0, rows, n))
+        self.mission_dwell.append(t - self.mission_since[done])
+        self.mission_since[done] = t
+        self.mission_completed += len(done)
+        return len(done)
+
+    # ---- run ----
+    def run(self, days):
+        horizon = days * 24
+        self.horizon = horizon
+        self.push(self.next_tick(0), E_TICK)
+        self.push(24, E_DAY)
+        b = self.b
+        raffle_hours = HOURS_PER_MONTH / b['raffles_per_month'] if b['raffles_per_month'] else None
+        entry_rate = self.users * b['raffle_participation'] / raffle_hours if raffle_hours else 0
+        if raffle_hours:
+            self.push(0, E_RAFFLE_END, -1, -1)  # opens the first raffle
+        rnd = self.random
+        heap = self.heap
+
+        while heap:
+            t, _, kind, i, arg = heapq.heappop(heap)
+            if t > horizon:
+                break
+            self.events += 1
+
+            if kind == E_TICK:
+                # Sync: missions completed since the last run get claimable redemptions
+                n = self.complete_missions(t)
+                self._today['completions'] += n
+                types = self.np_random.choice(self.mix_types, n, p=self.mix_weights).tolist()
+                for rtype in types:
+                    self.user_claims(t, self.new_redemption(t, rtype))
+                self.push(t + self.cron_hours, E_TICK)
+
+            elif kind == E_CLAIM:
+                self.set_status(i, CLAIMED, t)
+                self.claimed_at[i] = t
+                self._today['claims'] += 1
+                rtype = self.rtype[i]
+                if rtype in INSTANT:
+                    self.task(t, T_INSTANT, i)
+                elif rtype == PHYSICAL:
+                    self.set_sub(i, TO_SHIP, t)  # shipping address is collected with the claim
+                    self.task(t, T_SHIP, i)
+                elif rtype == BOOST:
+                    self.set_sub(i, SCHEDULED, t)
+                    day = int(t // 24) + rnd.randint(1, b['lead_days_max'])
+                    self.push(self.next_tick(day * 24 + CRON_HOUR_UTC), E_BOOST_ACTIVATE, i)
+                elif rtype == DISCOUNT:
+                    day = int(t // 24) + rnd.randint(1, b['lead_days_max'])
+                    while day % 7 >= 5:
+                        day += 1
+                    self.push(day * 24 + rnd.uniform(*DISCOUNT_SLOTS_UTC), E_DISCOUNT_SLOT, i)
+
+            elif kind == E_TASK_DONE:
+                today = self._today
+                today['tasks_done'][arg] += 1
+                today['admin_hours'] += self.task_hours[arg]
+                if arg == T_INSTANT:
+                    self.set_status(i, CONCLUDED, t)
+                    if t - self.claimed_at[i] > SLA_HOURS:
+                        self.sla_breaches += 1
+                elif arg == T_SHIP:
+                    self.set_sub(i, SHIPPED, t)
+                    self.push(t + rnd.expovariate(1 / (b['transit_days'] * 24)), E_DELIVERED, i)
+                elif arg == T_RECEIVE:
+                    self.set_sub(i, NO_STATE, t)
+                    self.set_status(i, CONCLUDED, t)
+                elif arg == T_PAYOUT:
+                    self.set_sub(i, PAID, t)
+                    self.set_status(i, CONCLUDED, t)
+                elif arg == T_DISCOUNT:
+                    self.set_status(i, FULFILLED, t)
+                    expires = t + b['discount_duration_days'] * 24
+                    self.push(self.next_tick(expires), E_DISCOUNT_EXPIRE, i)
+                elif arg == T_DRAW:
+                    self._draw(t, self.raffles[i])
+
+            elif kind == E_BOOST_ACTIVATE:
+                self.set_sub(i, ACTIVE, t)
+                self.push(self.next_tick(t + b['boost_duration_days'] * 24), E_BOOST_EXPIRE, i)
+
+            elif kind == E_BOOST_EXPIRE:
+                # Same cron run: active -> expired -> pending_info
+                self.set_sub(i, EXPIRED, t)
+                self.set_sub(i, PENDING_INFO, t)
+                if rnd.random() < b['payment_share']:
+                    self.push(t + rnd.expovariate(1 / (b['payment_days'] * 24)), E_PAYMENT_INFO, i)
+
+            elif kind == E_PAYMENT_INFO:
+                self.set_sub(i, PENDING_PAYOUT, t)
+                self.set_status(i, FULFILLED, t)
+                self.task(t, T_PAYOUT, i)
+
+            elif kind == E_DISCOUNT_SLOT:
+                self.task(t, T_DISCOUNT, i)
+
+            elif kind == E_DISCOUNT_EXPIRE:
+                self.set_status(i, CONCLUDED, t)
+
+            elif kind == E_DELIVERED:
+                self.task(t, T_RECEIVE, i)
+
+            elif kind == E_RAFFLE_ENTRY:
+                # Entries arrive as a Poisson process over the raffle window; each schedules the next.
+                # Participating completes the user's raffle mission_progress row.
+                self._today['raffle_entries'] += 1
+                self.raffle_dwell.append(t - arg * raffle_hours)
+                self.raffles[arg].append(self.new_redemption(t, RAFFLE))
+                after = t + rnd.expovariate(entry_rate)
+                if after < (arg + 1) * raffle_hours:
+                    self.push(after, E_RAFFLE_ENTRY, -1, arg)
+
+            elif kind == E_RAFFLE_END:
+                if arg >= 0:
+                    self.task(t, T_DRAW, arg)
+                # Open the next raffle
+                self.raffles.append([])
+                number = len(self.raffles) - 1
+                if entry_rate:
+                    self.push(t + rnd.expovariate(entry_rate), E_RAFFLE_ENTRY, -1, number)
+                self.push(t + raffle_hours, E_RAFFLE_END, number, number)
+
+            elif kind == E_DAY:
+                self._close_day()
+                self.push(t + 24, E_DAY)
+        return self
+
+    def _draw(self, t, entries):
+        """Admin picks one winner; the other entries are rejected."""
+        waiting = [i for i in entries if self.rstate[i] == CLAIMABLE]
+        if not waiting:
+            return
+        winner = waiting[self.random.randrange(len(waiting))]
+        for i in waiting:
+            if i != winner:
+                self.set_status(i, REJECTED, t)
+        self.rtype[winner] = GIFT_CARD
+        self.user_claims(t, winner)
+
+    def _close_day(self):
+        today = self._today
+        today['backlog'] = list(self.count)
+        today['admin_queue'] = sum(today['tasks_in']) - sum(today['tasks_done']) + \
+            (self.daily[-1]['admin_queue'] if self.daily else 0)
+        self.daily.append(today)
+        self._today = self._new_day(today['day'] + 1)
+
+    # ---- results ----
+    def summary(self, warmup_days=0):
+        days = [d for d in self.daily if d['day'] >= warmup_days] or self.daily
+        load = {}
+        for k, task in enumerate(TASKS):
+            arrived = np.array([d['tasks_in'][k] for d in days])
+            waits = np.array(self.task_wait[k]) if self.task_wait[k] else np.zeros(1)
+            load[task] = {'per_day_mean': float(arrived.mean()), 'per_day_p95': float(np.percentile(arrived, 95)),
+                          'per_day_max': int(arrived.max()), 'wait_p50_h': float(np.percentile(waits, 50)),
+                          'wait_p90_h': float(np.percentile(waits, 90)), 'unstarted_at_end': self.task_unstarted[k]}
+        hours = np.array([d['admin_hours'] for d in days])
+        demand = sum(d['demand_hours'] for d in days)
+        # Staff whose weekday shifts cover the work arriving over the whole window (weekend work waits)
+        shift_hours = sum(ADMIN_CLOSE_UTC - ADMIN_OPEN_UTC for d in days if d['day'] % 7 < 5)
+        admins_needed = demand / shift_hours if shift_hours else 0.0
+        backlog = np.array([d['backlog'] for d in days])
+        dwell = {}
+        for k, state in enumerate(STATES):
+            if self.dwell[k]:
+                values = np.array(self.dwell[k]) / 24
+                dwell[state] = {'n': len(values), 'p50_d': float(np.percentile(values, 50)),
+                                'p90_d': float(np.percentile(values, 90)), 'p99_d': float(np.percentile(values, 99))}
+        mission = {'active': len(self.mission_since), 'completed': self.mission_completed}
+        for name, parts in (('active', self.mission_dwell), ('raffle_active', [np.array(self.raffle_dwell)])):
+            values = np.concatenate(parts) / 24 if parts else np.zeros(0)
+            if len(values):
+                mission[f"{name}_dwell"] = {'n': len(values), 'p50_d': float(np.percentile(values, 50)),
+                                            'p90_d': float(np.percentile(values, 90)),
+                                            'p99_d': float(np.percentile(values, 99))}
+        return {
+            'days': len(days),
+            'events': self.events,
+            'redemptions': len(self.rtype),
+            'completions_per_day': float(np.mean([d['completions'] for d in days])),
+            'tasks': load,
+            'admin_hours_per_day': {'mean': float(hours.mean()), 'p95': float(np.percentile(hours, 95)),
+                                    'max': float(hours.max())},
+            'demand_hours_per_day': demand / len(days),
+            'admins': len(self.free),
+            'admins_needed': admins_needed,
+            'admin_queue_end': days[-1]['admin_queue'] if days else 0,
+            'sla_breaches': self.sla_breaches,
+            'backlog': {state: {'end': int(backlog[-1, k]), 'mean': float(backlog[:, k].mean()),
+                                'max': int(backlog[:, k].max())} for k, state in enumerate(STATES)},
+            'dwell': dwell,
+            'mission_progress': mission,
+        }
+
+
+def write_daily(path, daily):
+    import csv
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['day', 'completions', 'raffle_entries', 'claims', 'admin_hours', 'admin_queue'] +
+                        [f"in_{t}" for t in TASKS] + [f"done_{t}" for t in TASKS] + STATES)
+        for d in daily:
+            writer.writerow([d['day'], d['completions'], d['raffle_entries'], d['claims'],
+                             round(d['admin_hours'], 2), d['admin_queue']] + d['tasks_in'] + d['tasks_done'] +
+                            d['backlog'])
+
+
+def print_report(result, elapsed):
+    print(f"{result['events']:,} events, {result['redemptions']:,} redemptions in {elapsed:.1f}s "
+          f"({result['events'] / elapsed * 60 / 1e6:.1f}M events/min)\n")
+    print(f"Daily admin load over {result['days']} days ({result['completions_per_day']:,.0f} completions/day):")
+    print(f"  {'task':10s} {'mean/day':>9s} {'p95/day':>8s} {'max/day':>8s} {'wait p50':>9s} {'wait p90':>9s} "
+          f"{'not started':>12s}")
+    for task, row in result['tasks'].items():
+        print(f"  {task:10s} {row['per_day_mean']:>9,.1f} {row['per_day_p95']:>8,.0f} {row['per_day_max']:>8,d} "
+              f"{row['wait_p50_h']:>8.1f}h {row['wait_p90_h']:>8.1f}h {row['unstarted_at_end']:>12,d}")
+    if any(row['unstarted_at_end'] for row in result['tasks'].values()):
+        print("  (tasks not started by the end of the run count their wait up to the end, so waits are lower bounds)")
+    h = result['admin_hours_per_day']
+    print(f"  admin work arriving: {result['demand_hours_per_day']:.1f}h/day -> {result['admins_needed']:.1f} "
+          f"admins on {ADMIN_CLOSE_UTC - ADMIN_OPEN_UTC}h weekday shifts "
+          f"({result['admins_needed'] / result['admins']:.0%} of {result['admins']})")
+    print(f"  admin hours worked/day: mean {h['mean']:.1f}, p95 {h['p95']:.1f}, max {h['max']:.1f}; "
+          f"queue at end {result['admin_queue_end']:,}; instant rewards concluded after {SLA_HOURS}h: "
+          f"{result['sla_breaches']:,}\n")
+
+    mp = result['mission_progress']
+    print(f"  mission_progress: {mp['active']:,} active rows, {mp['completed']:,} completed in the run")
+    for name, label in (('active_dwell', 'active -> completed'), ('raffle_active_dwell', 'raffle participation')):
+        if name in mp:
+            dw = mp[name]
+            print(f"    {label:22s} n={dw['n']:,}  p50 {dw['p50_d']:.1f}d  p90 {dw['p90_d']:.1f}d  "
+                  f"p99 {dw['p99_d']:.1f}d")
+    print()
+
+    print(f"  {'state':15s} {'backlog end':>12s} {'mean':>10s} {'max':>10s} {'left':>10s} "
+          f"{'p50 days':>9s} {'p90':>7s} {'p99':>7s}")
+    for state in STATES:
+        bl = result['backlog'][state]
+        dw = result['dwell'].get(state)
+        times = f"{dw['n']:>10,d} {dw['p50_d']:>9.2f} {dw['p90_d']:>7.2f} {dw['p99_d']:>7.2f}" if dw else ''
+        print(f"  {state:15s} {bl['end']:>12,d} {bl['mean']:>10,.0f} {bl['max']:>10,d} {times}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Discrete-event simulation of redemption fulfillment')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--warmup-days', type=int, default=60, help='left out of the load and backlog stats')
+    parser.add_argument('--completion-rate', type=float, default=0.5, help='mission completions per user per month')
+    parser.add_argument('--replay', help='take completion rate and reward mix from a mission_replay.py --json report')
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--cron-hours', type=int, default=24, help='daily-automation cadence')
+    parser.add_argument('--claim-share', type=float, default=DEFAULT_BEHAVIOUR['claim_share'])
+    parser.add_argument('--claim-days', type=float, default=DEFAULT_BEHAVIOUR['claim_days'])
+    parser.add_argument('--raffle-participation', type=float, default=DEFAULT_BEHAVIOUR['raffle_participation'])
+    parser.add_argument('--missions-per-user', type=float, default=DEFAULT_BEHAVIOUR['missions_per_user'],
+                        help='active mission_progress rows per user')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--daily', help='write per-day counts and backlog to this CSV')
+    parser.add_argument('--json', help='write the summary as JSON')
+    args = parser.parse_args()
+
+    rate, mix = args.completion_rate, None
+    if args.replay:
+        rate, mix = mix_from_replay(args.replay)
+        print(f"From {args.replay}: {rate:.3f} completions per user per month, mix " +
+              ', '.join(f"{t} {share:.0%}" for t, share in mix.items()))
+    behaviour = {'claim_share': args.claim_share, 'claim_days': args.claim_days,
+                 'raffle_participation': args.raffle_participation, 'missions_per_user': args.missions_per_user}
+    sim = FulfillmentSim(args.users, rate, mix, args.admins, args.cron_hours, behaviour, seed=args.seed)
+    start = time.perf_counter()
+    sim.run(args.days)
+    elapsed = time.perf_counter() - start
+    result = sim.summary(args.warmup_days)
+    print_report(result, elapsed)
+    if args.daily:
+        write_daily(args.daily, sim.daily)
+        print(f"\nDaily rows written to {args.daily}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+        print(f"Summary written to {args.json}")
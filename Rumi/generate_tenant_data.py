@@ -0,0 +1,637 @@
+#!/usr/bin/env python3
+"""
+Synthetic Tenant Dataset Generator
+Writes realistic multi-tenant data (clients, tiers, rewards, users, videos,
+missions, mission_progress, redemptions, commission_boost_redemptions) as
+Postgres COPY files, for load and scale testing the RPCs and API at
+production sizes. supabase/seed.sql stays the small fixture for app tests.
+
+Output layout:
+    <out>/manifest.json                  columns, files and row counts per table
+    <out>/<table>/<tenant>-<chunk>.csv   COPY ... FROM STDIN WITH (FORMAT csv)
+
+Runs are reproducible: every chunk of users draws from its own generator
+seeded with (seed, tenant, chunk), and ids are derived from (table, tenant,
+row), so the same arguments give byte-identical files whatever --jobs is.
+Different seeds give disjoint ids, handles and subdomains, so several
+datasets can be loaded into one database.
+
+Rows follow the app's rules where the RPCs depend on them: current_tier
+comes from lifetime totals (checkForPromotions), checkpoint_* totals from
+videos posted since tier_achieved_at, mission_progress from the videos in
+its checkpoint window (update_mission_progress), boost_status from the
+boost's dates as of --as-of, redemption status from boost_status
+(sync_boost_to_redemption).
+leaderboard_rank and projected_tier_at_checkpoint are left for
+update_leaderboard_ranks / update_precomputed_fields.
+
+Usage:
+    python generate_tenant_data.py --users 1000 100000 1000000 --out /tmp/tenants
+    python generate_tenant_data.py --users 50000 --out /tmp/t --load --dsn postgresql://...
+"""
+
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+# Table -> code used in generated ids. Also the load order (foreign keys).
+TABLE_CODES = {
+    'clients': 1,
+    'tiers': 2,
+    'rewards': 3,
+    'missions': 4,
+    'users': 5,
+    'videos': 6,
+    'mission_progress': 7,
+    'redemptions': 8,
+    'commission_boost_redemptions': 9,
+}
+
+# Same tier ladder as supabase/seed.sql, with sales thresholds added
+TIERS = [
+    # tier_id, name, color, sales_threshold, units_threshold, commission_rate
+    ('tier_1', 'Bronze', '#CD7F32', 0, 0, 10.00),
+    ('tier_2', 'Silver', '#94a3b8', 1000, 100, 12.00),
+    ('tier_3', 'Gold', '#F59E0B', 3000, 300, 15.00),
+    ('tier_4', 'Platinum', '#818CF8', 5000, 500, 20.00),
+]
+
+# One mission per type per tier, each paying the reward in the same slot
+# (seed.sql layout). Targets are tier_1 values, scaled by tier_order.
+MISSION_SLOTS = [
+    # mission_type, target_unit, tier_1 target, reward type, reward_type (redemption)
+    ('sales_dollars', 'dollars', 100, 'gift_card', 'instant'),
+    ('sales_units', 'units', 10, 'spark_ads', 'instant'),
+    ('videos', 'count', 3, 'commission_boost', 'scheduled'),
+    ('views', 'count', 1000, 'discount', 'instant'),
+    ('likes', 'count', 100, 'physical_gift', 'instant'),
+]
+# rewards.description is varchar(12)
+REWARD_LABELS = {'gift_card': 'Gift Card', 'spark_ads': 'Ads Boost', 'commission_boost': 'Pay Boost',
+                 'discount': 'Deal Boost', 'physical_gift': 'Merch'}
+BOOST_PERCENT = [5, 8, 10, 15]
+BOOST_DAYS = 30
+
+BOOST_STATUSES = ['scheduled', 'active', 'expired', 'pending_info', 'pending_payout', 'paid']
+# Weights of the states after expiry (expired, pending_info, pending_payout, paid);
+# scheduled and active follow from the boost's dates
+ENDED_BOOST_WEIGHTS = [0.10, 0.15, 0.15, 0.60]
+# Redemption status for each boost_status, as kept by sync_boost_to_redemption
+BOOST_TO_REDEMPTION = {
+    'scheduled': 'claimed', 'active': 'claimed', 'expired': 'claimed', 'pending_info': 'claimed',
+    'pending_payout': 'fulfilled', 'paid': 'concluded',
+}
+REDEMPTION_STATUSES = ['claimable', 'claimed', 'fulfilled', 'concluded']
+REDEMPTION_STATUS_WEIGHTS = [0.30, 0.25, 0.20, 0.25]
+
+# bcrypt('Password123!'), same hash as supabase/seed.sql
+PASSWORD_HASH = '$2b$10$ty/IhrZxY3l76u3lp.T1xuQAw8PkQgXRr3CSQeGpLBjNa6FYSPYd2'
+
+COLUMNS = {
+    'clients': ['id', 'name', 'subdomain', 'primary_color', 'tier_calculation_mode', 'checkpoint_months',
+                'vip_metric', 'created_at'],
+    'tiers': ['id', 'client_id', 'tier_order', 'tier_id', 'tier_name', 'tier_color', 'sales_threshold',
+              'units_threshold', 'commission_rate', 'checkpoint_exempt'],
+    'rewards': ['id', 'client_id', 'type', 'name', 'description', 'value_data', 'reward_source',
+                'tier_eligibility', 'enabled', 'redemption_frequency', 'redemption_quantity', 'redemption_type',
+                'display_order'],
+    'missions': ['id', 'client_id', 'title', 'display_name', 'description', 'mission_type', 'target_value',
+                 'target_unit', 'reward_id', 'tier_eligibility', 'display_order', 'raffle_end_date', 'enabled',
+                 'activated'],
+    'users': ['id', 'client_id', 'tiktok_handle', 'email', 'email_verified', 'password_hash', 'is_admin',
+              'current_tier', 'tier_achieved_at', 'next_checkpoint_at', 'total_sales', 'total_units',
+              'manual_adjustments_total', 'manual_adjustments_units', 'checkpoint_sales_current',
+              'checkpoint_units_current', 'checkpoint_videos_posted', 'checkpoint_total_views',
+              'checkpoint_total_likes', 'checkpoint_total_comments', 'first_video_date', 'created_at'],
+    'videos': ['id', 'user_id', 'client_id', 'video_url', 'video_title', 'post_date', 'views', 'likes',
+               'comments', 'gmv', 'ctr', 'units_sold', 'sync_date'],
+    'mission_progress': ['id', 'user_id', 'mission_id', 'client_id', 'current_value', 'status', 'completed_at',
+                         'checkpoint_start', 'checkpoint_end'],
+    'redemptions': ['id', 'user_id', 'reward_id', 'mission_progress_id', 'client_id', 'status', 'tier_at_claim',
+                    'redemption_type', 'claimed_at', 'scheduled_activation_date', 'fulfilled_at', 'concluded_at'],
+    'commission_boost_redemptions': ['id', 'redemption_id', 'client_id', 'boost_status', 'scheduled_activation_date',
+                                     'activated_at', 'expires_at', 'duration_days', 'boost_rate',
+                                     'tier_commission_rate', 'sales_at_activation', 'sales_at_expiration',
+                                     'calculated_commission', 'final_payout_amount', 'payment_method',
+                                     'payment_account', 'payment_info_collected_at', 'payment_info_confirmed',
+                                     'payout_sent_at'],
+}
+
+DAY = 86400
+INT32_MAX = 2**31 - 1
+MAX_VIDEOS_PER_USER = 4095  # videos ids use 12 bits per user
+
+
+# ============================================================================
+# IDS
+# ============================================================================
+def _mix64(x):
+    """splitmix64 finalizer: a bijection on uint64, so distinct keys stay distinct."""
+    with np.errstate(over='ignore'):
+        x = x ^ (x >> np.uint64(30))
+        x = x * np.uint64(0xbf58476d1ce4e5b9)
+        x = x ^ (x >> np.uint64(27))
+        x = x * np.uint64(0x94d049bb133111eb)
+        return x ^ (x >> np.uint64(31))
+
+
+_HEX = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+_HEX_POS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+
+
+def make_uuids(seed, table, tenant, rows):
+    """
+    Deterministic version-4-shaped uuids for (table, tenant, row), as a
+    pyarrow string array. The low half holds the key itself, so ids are
+    unique; the high half is a seeded mix of it, so ids are spread like
+    gen_random_uuid() in the B-tree.
+    """
+    rows = np.asarray(rows, dtype=np.uint64)
+    key = (np.uint64(TABLE_CODES[table]) << np.uint64(56)) | (np.uint64(tenant) << np.uint64(40)) | rows
+    hi = _mix64(key ^ _mix64(np.uint64(seed) + np.uint64(0x9e3779b97f4a7c15)))
+    hi = (hi & ~np.uint64(0xF000)) | np.uint64(0x4000)     # version 4
+    lo = key | np.uint64(1 << 63)                           # variant 10 (key < 2^62)
+    raw = np.empty((len(rows), 2), dtype='>u8')
+    raw[:, 0], raw[:, 1] = hi, lo
+    raw = raw.view(np.uint8)
+    nibbles = np.empty((len(rows), 32), dtype=np.uint8)
+    nibbles[:, 0::2] = raw >> 4
+    nibbles[:, 1::2] = raw & 15
+    text = np.full((len(rows), 36), ord('-'), dtype=np.uint8)
+    text[:, _HEX_POS] = _HEX[nibbles]
+    offsets = np.arange(0, 36 * len(rows) + 1, 36, dtype=np.int32)
+    return pa.StringArray.from_buffers(len(rows), pa.py_buffer(offsets), pa.py_buffer(text.tobytes()))
+
+
+def _strings(*parts):
+    """Element-wise concatenation of string scalars and arrays."""
+    parts = [pc.cast(pa.array(p), pa.string()) if isinstance(p, np.ndarray) else p for p in parts]
+    return pc.binary_join_element_wise(*parts, '')
+
+
+def _ts(seconds, valid=None):
+    arr = pa.array(np.asarray(seconds, dtype=np.int64), mask=None if valid is None else ~valid)
+    return arr.cast(pa.timestamp('s', tz='UTC'))
+
+
+def _date(seconds, valid=None):
+    days = (np.asarray(seconds, dtype=np.int64) // DAY).astype(np.int32)
+    return pa.array(days, mask=None if valid is None else ~valid).cast(pa.date32())
+
+
+def _money(values, valid=None):
+    return pa.array(np.round(values, 2), mask=None if valid is None else ~valid)
+
+
+def _add_months(seconds, months):
+    """Date.setMonth(getMonth() + months), keeping the time of day."""
+    days = (seconds // DAY).astype('datetime64[D]')
+    month = days.astype('datetime64[M]')
+    shifted = (month + months).astype('datetime64[D]') + (days - month.astype('datetime64[D]'))
+    return shifted.astype(np.int64) * DAY + seconds % DAY
+
+
+# ============================================================================
+# TENANT-LEVEL TABLES
+# ============================================================================
+def tenant_tables(seed, tenant, vip_metric, checkpoint_months, as_of):
+    """clients, tiers, rewards, missions for one tenant (small, built in the parent)."""
+    client_id = make_uuids(seed, 'clients', tenant, [0])
+    n_tiers = len(TIERS)
+    tables = {
+        'clients': pa.table({
+            'id': client_id,
+            'name': [f"Load Tenant {tenant}"],
+            'subdomain': [f"load-{seed}-{tenant}"],
+            'primary_color': ['#6366f1'],
+            'tier_calculation_mode': ['fixed_checkpoint'],
+            'checkpoint_months': pa.array([checkpoint_months], pa.int32()),
+            'vip_metric': [vip_metric],
+            'created_at': _ts([as_of - 400 * DAY]),
+        }),
+        'tiers': pa.table({
+            'id': make_uuids(seed, 'tiers', tenant, range(n_tiers)),
+            'client_id': pa.repeat(client_id[0], n_tiers),
+            'tier_order': pa.array(range(1, n_tiers + 1), pa.int32()),
+            'tier_id': [t[0] for t in TIERS],
+            'tier_name': [t[1] for t in TIERS],
+            'tier_color': [t[2] for t in TIERS],
+            'sales_threshold': [float(t[3]) for t in TIERS],
+            'units_threshold': [t[4] for t in TIERS],
+            'commission_rate': [t[5] for t in TIERS],
+            'checkpoint_exempt': [i == 0 for i in range(n_tiers)],
+        }),
+    }
+
+    rewards = []
+    missions = []
+    for t, tier in enumerate(TIERS):
+        scale = t + 1
+        for slot, (mission_type, unit, target, reward_type, redemption_type) in enumerate(MISSION_SLOTS):
+            value = {
+                'gift_card': {'amount': 25 * scale},
+                'spark_ads': {'amount': 30 * scale},
+                'commission_boost': {'percent': BOOST_PERCENT[t], 'duration_days': BOOST_DAYS},
+                'discount': {'percent': 5 * scale, 'duration_minutes': 10080,
+                             'coupon_code': f"LOAD{5 * scale}", 'max_uses': 100},
+                'physical_gift': {'name': 'Branded Merch', 'requires_size': False},
+            }[reward_type]
+            rewards.append({
+                'type': reward_type, 'name': f"{tier[1]} {reward_type.replace('_', ' ')}",
+                'description': REWARD_LABELS[reward_type], 'value_data': json.dumps(value), 'reward_source': 'mission',
+                'tier_eligibility': tier[0], 'enabled': True, 'redemption_frequency': 'monthly',
+                'redemption_quantity': 1, 'redemption_type': redemption_type, 'display_order': slot + 1,
+            })
+            missions.append({
+                'title': f"{mission_type} {target * scale}", 'display_name': f"{tier[1]} {mission_type}",
+                'description': f"Reach {target * scale} {unit}", 'mission_type': mission_type,
+                'target_value': target * scale, 'target_unit': unit, 'reward': len(rewards) - 1,
+                'tier_eligibility': tier[0], 'display_order': slot + 1, 'raffle_end_date': None,
+                'enabled': True, 'activated': True,
+            })
+    # One open raffle for everyone
+    rewards.append({
+        'type': 'gift_card', 'name': '$500 Gift Card', 'description': 'Raffle prize',
+        'value_data': json.dumps({'amount': 500}), 'reward_source': 'mission', 'tier_eligibility': 'tier_1',
+        'enabled': True, 'redemption_frequency': 'one-time', 'redemption_quantity': 1,
+        'redemption_type': 'instant', 'display_order': 100,
+    })
+    missions.append({
+        'title': 'Gift Card Raffle', 'display_name': 'Win a $500 Gift Card!', 'description': 'Enter to win',
+        'mission_type': 'raffle', 'target_value': 0, 'target_unit': 'count', 'reward': len(rewards) - 1,
+        'tier_eligibility': 'all', 'display_order': 100, 'raffle_end_date': as_of + 14 * DAY,
+        'enabled': True, 'activated': True,
+    })
+
+    reward_ids = make_uuids(seed, 'rewards', tenant, range(len(rewards)))
+    tables['rewards'] = pa.Table.from_pylist(
+        [dict(id=reward_ids[i].as_py(), client_id=client_id[0].as_py(), **r) for i, r in enumerate(rewards)]
+    ).select(COLUMNS['rewards'])
+    mission_ids = make_uuids(seed, 'missions', tenant, range(len(missions)))
+    raffle_end = [m['raffle_end_date'] for m in missions]
+    tables['missions'] = pa.table({
+        'id': mission_ids,
+        'client_id': pa.repeat(client_id[0], len(missions)),
+        **{k: [m[k] for m in missions] for k in ('title', 'display_name', 'description', 'mission_type',
+                                                 'target_value', 'target_unit')},
+        'reward_id': reward_ids.take(pa.array([m['reward'] for m in missions])),
+        **{k: [m[k] for m in missions] for k in ('tier_eligibility', 'display_order')},
+        'raffle_end_date': _ts([e or 0 for e in raffle_end], np.array([e is not None for e in raffle_end])),
+        'enabled': [m['enabled'] for m in missions],
+        'activated': [m['activated'] for m in missions],
+    })
+    return tables
+
+
+# ============================================================================
+# USER CHUNKS (run in worker processes)
+# ============================================================================
+def generate_chunk(spec):
+    """
+    Users [user_start, user_start + user_count) of one tenant, with their
+    videos, mission_progress, redemptions and boosts. Writes one file per
+    table and returns {table: rows}.
+    """
+    seed, tenant, chunk = spec['seed'], spec['tenant'], spec['chunk']
+    rng = np.random.default_rng([seed, tenant, chunk])
+    as_of, days = spec['as_of'], spec['days']
+    n = spec['user_count']
+    index = spec['user_start'] + np.arange(n)
+    client_id = make_uuids(seed, 'clients', tenant, [0])[0]
+    vip_metric = spec['vip_metric']
+
+    # ---- Users: signup time and activity level ----
+    user_ids = make_uuids(seed, 'users', tenant, index)
+    created = as_of - rng.integers(1, days, n) * DAY - rng.integers(0, DAY, n)
+    active_days = (as_of - created) / DAY
+    # Heavy-tailed posting and sales rates: most creators post rarely, a few a lot
+    video_rate = rng.lognormal(np.log(spec['videos_per_user'] / days), 1.0, n)
+    units_rate = rng.lognormal(np.log(0.6), 0.9, n)
+    price = rng.uniform(15, 60, n)
+    n_videos = np.minimum(rng.poisson(video_rate * active_days), MAX_VIDEOS_PER_USER)
+
+    # ---- Videos ----
+    owner = np.repeat(np.arange(n), n_videos)
+    nth = np.arange(len(owner)) - np.repeat(np.cumsum(n_videos) - n_videos, n_videos)
+    video_key = (index[owner].astype(np.uint64) << np.uint64(12)) | nth.astype(np.uint64)
+    post_time = created[owner] + (rng.random(len(owner)) * (as_of - created[owner])).astype(np.int64)
+    post_day = post_time // DAY * DAY
+    units = rng.poisson(units_rate[owner])
+    gmv = np.round(units * price[owner] * rng.uniform(0.9, 1.1, len(owner)), 2)
+    views = np.minimum(rng.lognormal(7, 1.5, len(owner)), INT32_MAX).astype(np.int64)
+    likes = (views * rng.beta(1, 20, len(owner))).astype(np.int64)
+    comments = (likes * rng.beta(1, 15, len(owner))).astype(np.int64)
+    handles = _strings(f"creator_{seed}_{tenant}_", index)
+
+    videos = pa.table({
+        'id': make_uuids(seed, 'videos', tenant, video_key),
+        'user_id': user_ids.take(pa.array(owner)),
+        'client_id': pa.repeat(client_id, len(owner)),
+        'video_url': _strings('https://www.tiktok.com/@', handles.take(pa.array(owner)), '/video/',
+                              video_key.astype(np.int64)),
+        'video_title': _strings('Video ', nth + 1),
+        'post_date': _date(post_day),
+        'views': views, 'likes': likes, 'comments': comments,
+        'gmv': gmv,
+        'ctr': np.round(rng.uniform(0.5, 8.0, len(owner)), 2),
+        'units_sold': units,
+        'sync_date': _ts(post_day + DAY + 3 * 3600),
+    })
+
+    # ---- User totals, tier and checkpoint fields ----
+    total_sales = np.bincount(owner, weights=gmv, minlength=n)
+    total_units = np.bincount(owner, weights=units, minlength=n)
+    lifetime = total_units if vip_metric == 'units' else total_sales
+    thresholds = np.array([t[4] if vip_metric == 'units' else t[3] for t in TIERS], dtype=np.float64)
+    tier = np.maximum(np.searchsorted(thresholds, lifetime, side='right') - 1, 0)
+
+    achieved = np.where(tier > 0, created + ((as_of - created) * rng.random(n)).astype(np.int64), created)
+    next_checkpoint = _add_months(achieved, spec['checkpoint_months'])
+    # checkpoint_* count videos whose post_date >= tier_achieved_at, as update_precomputed_fields does
+    in_period = post_day >= achieved[owner]
+    period_owner = owner[in_period]
+
+    def period_sum(values):
+        return np.bincount(period_owner, weights=values[in_period], minlength=n)
+
+    cp_sales = period_sum(gmv)
+    cp_units = period_sum(units)
+    cp_videos = np.bincount(period_owner, minlength=n)
+    cp_views = period_sum(views)
+    cp_likes = period_sum(likes)
+    cp_comments = period_sum(comments)
+    first_video = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first_video, owner, post_day)
+    has_videos = n_videos > 0
+
+    tier_ids = np.array([t[0] for t in TIERS])
+    emails = _strings(handles, '@example.com')
+    users = pa.table({
+        'id': user_ids,
+        'client_id': pa.repeat(client_id, n),
+        'tiktok_handle': handles,
+        'email': emails,
+        'email_verified': np.ones(n, dtype=bool),
+        'password_hash': pa.repeat(pa.scalar(PASSWORD_HASH), n),
+        'is_admin': index == 0,
+        'current_tier': tier_ids[tier],
+        'tier_achieved_at': _ts(achieved),
+        'next_checkpoint_at': _ts(next_checkpoint),
+        'total_sales': _money(total_sales),
+        'total_units': total_units.astype(np.int64),
+        'manual_adjustments_total': np.zeros(n),
+        'manual_adjustments_units': np.zeros(n, dtype=np.int64),
+        'checkpoint_sales_current': _money(cp_sales),
+        'checkpoint_units_current': cp_units.astype(np.int64),
+        'checkpoint_videos_posted': cp_videos.astype(np.int64),
+        'checkpoint_total_views': cp_views.astype(np.int64),
+        'checkpoint_total_likes': cp_likes.astype(np.int64),
+        'checkpoint_total_comments': cp_comments.astype(np.int64),
+        'first_video_date': _ts(np.where(has_videos, first_video, 0), has_videos),
+        'created_at': _ts(created),
+    })
+
+    # ---- Mission progress: one row per mission of the user's tier ----
+    slots = len(MISSION_SLOTS)
+    pu = np.repeat(np.arange(n), slots)
+    slot = np.tile(np.arange(slots), n)
+    mission_index = tier[pu] * slots + slot
+    targets = spec['mission_targets'][mission_index]
+    # current_value as update_mission_progress computes it: post_date in
+    # [checkpoint_start, checkpoint_end), SUM(gmv)::INTEGER rounding half away from zero
+    in_window = in_period & (post_day < next_checkpoint[owner])
+    window_owner = owner[in_window]
+
+    def window_sum(values):
+        return np.bincount(window_owner, weights=values[in_window], minlength=n)
+
+    gmv_cents = np.bincount(window_owner, weights=np.rint(gmv * 100)[in_window], minlength=n).astype(np.int64)
+    progress_values = np.stack([(gmv_cents + 50) // 100, window_sum(units), np.bincount(window_owner, minlength=n),
+                                window_sum(views), window_sum(likes)], axis=1)
+    current = np.minimum(progress_values[pu, slot], INT32_MAX).astype(np.int64)
+    completed = current >= targets
+    # Completed inside the checkpoint window, by as_of
+    window_end = np.minimum(next_checkpoint[pu], as_of)
+    completed_at = achieved[pu] + ((window_end - achieved[pu]) * rng.random(len(pu))).astype(np.int64)
+    progress_key = (index[pu].astype(np.uint64) << np.uint64(4)) | slot.astype(np.uint64)
+    progress_ids = make_uuids(seed, 'mission_progress', tenant, progress_key)
+    mission_ids = pa.array(spec['mission_ids'])
+    progress = pa.table({
+        'id': progress_ids,
+        'user_id': user_ids.take(pa.array(pu)),
+        'mission_id': mission_ids.take(pa.array(mission_index)),
+        'client_id': pa.repeat(client_id, len(pu)),
+        'current_value': current,
+        'status': np.where(completed, 'completed', 'active'),
+        'completed_at': _ts(completed_at, completed),
+        'checkpoint_start': _ts(achieved[pu]),
+        'checkpoint_end': _ts(next_checkpoint[pu]),
+    })
+
+    # ---- Redemptions for completed missions ----
+    done = np.flatnonzero(completed)
+    ru, rslot = pu[done], slot[done]
+    is_boost = np.array([s[3] == 'commission_boost' for s in MISSION_SLOTS])[rslot]
+    status = np.array(REDEMPTION_STATUSES)[rng.choice(len(REDEMPTION_STATUSES), len(done),
+                                                      p=REDEMPTION_STATUS_WEIGHTS)]
+    claimed_at = completed_at[done] + rng.integers(0, 3 * DAY, len(done))
+    claimed_at = np.minimum(claimed_at, as_of - 1)
+    activation = claimed_at + rng.integers(1, 8, len(done)) * DAY
+
+    # Boost timeline: activate_scheduled_boosts runs on the scheduled date (6am cron),
+    # expire_active_boosts once expires_at has passed. boost_status follows the
+    # dates as of as_of; only the state after expiry is drawn, and only among the
+    # states whose dates have passed.
+    activated_at = np.minimum(activation // DAY * DAY + 6 * 3600, as_of)
+    expires_at = activated_at + BOOST_DAYS * DAY
+    info_at = expires_at + DAY
+    payout_at = expires_at + 5 * DAY
+    ended_status = np.array(BOOST_STATUSES[2:])[rng.choice(len(BOOST_STATUSES) - 2, len(done),
+                                                          p=ENDED_BOOST_WEIGHTS)]
+    ended_status = np.where((ended_status == 'paid') & (payout_at > as_of), 'pending_payout', ended_status)
+    ended_status = np.where((ended_status == 'pending_payout') & (info_at > as_of), 'pending_info', ended_status)
+    boost_status = np.where(activation // DAY > as_of // DAY, 'scheduled',
+                            np.where(expires_at > as_of, 'active', ended_status))
+    boost_claimed = is_boost & (rng.random(len(done)) > REDEMPTION_STATUS_WEIGHTS[0])
+    status = np.where(is_boost, np.where(boost_claimed, np.vectorize(BOOST_TO_REDEMPTION.get)(boost_status),
+                                         'claimable'), status)
+    claimed = status != 'claimable'
+    fulfilled_at = np.where(is_boost, info_at, claimed_at + rng.integers(DAY, 10 * DAY, len(done)))
+    concluded_at = np.where(is_boost, payout_at, fulfilled_at + 2 * DAY)
+    # A redemption has only reached the stages whose dates have passed
+    status = np.where((status == 'concluded') & (concluded_at > as_of), 'fulfilled', status)
+    status = np.where((status == 'fulfilled') & (fulfilled_at > as_of), 'claimed', status)
+    fulfilled = np.isin(status, ['fulfilled', 'concluded'])
+    redemption_ids = make_uuids(seed, 'redemptions', tenant, progress_key[done])
+    redemptions = pa.table({
+        'id': redemption_ids,
+        'user_id': user_ids.take(pa.array(ru)),
+        'reward_id': pa.array(spec['reward_ids']).take(pa.array(tier[ru] * slots + rslot)),
+        'mission_progress_id': progress_ids.take(pa.array(done)),
+        'client_id': pa.repeat(client_id, len(done)),
+        'status': status,
+        'tier_at_claim': tier_ids[tier[ru]],
+        'redemption_type': np.where(is_boost, 'scheduled', 'instant'),
+        'claimed_at': _ts(claimed_at, claimed),
+        'scheduled_activation_date': _date(activation, claimed & is_boost),
+        'fulfilled_at': _ts(fulfilled_at, fulfilled),
+        'concluded_at': _ts(concluded_at, status == 'concluded'),
+    })
+
+    # ---- Commission boosts for claimed boost redemptions ----
+    b = np.flatnonzero(is_boost & claimed)
+    bstatus = boost_status[b]
+    started = bstatus != 'scheduled'
+    ended = np.isin(bstatus, ['expired', 'pending_info', 'pending_payout', 'paid'])
+    has_payment = np.isin(bstatus, ['pending_payout', 'paid'])
+    rate = np.array(BOOST_PERCENT, dtype=np.float64)[tier[ru[b]]]
+    sales_start = np.round(total_sales[ru[b]] * rng.uniform(0.3, 0.9, len(b)), 2)
+    sales_end = np.round(sales_start + rng.gamma(2.0, 150.0, len(b)), 2)
+    commission = np.round((sales_end - sales_start) * rate / 100, 2)
+    boosts = pa.table({
+        'id': make_uuids(seed, 'commission_boost_redemptions', tenant, progress_key[done][b]),
+        'redemption_id': redemption_ids.take(pa.array(b)),
+        'client_id': pa.repeat(client_id, len(b)),
+        'boost_status': bstatus,
+        'scheduled_activation_date': _date(activation[b]),
+        'activated_at': _ts(activated_at[b], started),
+        'expires_at': _ts(expires_at[b], started),
+        'duration_days': np.full(len(b), BOOST_DAYS),
+        'boost_rate': rate,
+        'tier_commission_rate': np.array([t[5] for t in TIERS])[tier[ru[b]]],
+        'sales_at_activation': _money(sales_start, started),
+        'sales_at_expiration': _money(sales_end, ended),
+        'calculated_commission': _money(commission, ended),
+        'final_payout_amount': _money(commission, has_payment),
+        'payment_method': pa.array(np.where(rng.random(len(b)) < 0.5, 'paypal', 'venmo'), mask=~has_payment),
+        'payment_account': pc.if_else(has_payment, emails.take(pa.array(ru[b])), None),
+        'payment_info_collected_at': _ts(info_at[b], has_payment),
+        'payment_info_confirmed': has_payment,
+        'payout_sent_at': _ts(payout_at[b], bstatus == 'paid'),
+    })
+
+    tables = {'users': users, 'videos': videos, 'mission_progress': progress, 'redemptions': redemptions,
+              'commission_boost_redemptions': boosts}
+    return {table: write_part(spec['out'], table, f"{tenant:03d}-{chunk:05d}", tbl) for table, tbl in tables.items()}
+
+
+def write_part(out, table, name, tbl):
+    """Write one COPY file (CSV, no header, empty unquoted field = NULL)."""
+    tbl = tbl.select(COLUMNS[table])
+    directory = os.path.join(out, table)
+    os.makedirs(directory, exist_ok=True)
+    pv.write_csv(tbl, os.path.join(directory, f"{name}.csv"),
+                 write_options=pv.WriteOptions(include_header=False, quoting_style='needed'))
+    return tbl.num_rows
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+def generate(out, user_counts, seed=1, vip_metric='units', checkpoint_months=4, as_of='2025-12-31',
+             days=365, videos_per_user=20, chunk_users=20_000, jobs=None):
+    """
+    Generate one tenant per entry of user_counts. Returns the manifest
+    (also written to out/manifest.json).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    as_of_s = int(np.datetime64(as_of, 's').astype(np.int64))
+    counts = {table: 0 for table in TABLE_CODES}
+    specs = []
+    for tenant, n_users in enumerate(user_counts):
+        metric = vip_metric if vip_metric != 'mixed' else ('units', 'sales')[tenant % 2]
+        tables = tenant_tables(seed, tenant, metric, checkpoint_months, as_of_s)
+        for table, tbl in tables.items():
+            counts[table] += write_part(out, table, f"{tenant:03d}", tbl)
+        missions = tables['missions'].slice(0, len(TIERS) * len(MISSION_SLOTS))
+        for chunk, start in enumerate(range(0, n_users, chunk_users)):
+            specs.append({
+                'out': out, 'seed': seed, 'tenant': tenant, 'chunk': chunk, 'vip_metric': metric,
+                'checkpoint_months': checkpoint_months, 'as_of': as_of_s, 'days': days,
+                'videos_per_user': videos_per_user, 'user_start': start,
+                'user_count': min(chunk_users, n_users - start),
+                'mission_ids': missions['id'].to_pylist(),
+                'mission_targets': missions['target_value'].to_numpy(),
+                'reward_ids': tables['rewards']['id'].to_pylist(),
+            })
+
+    if jobs == 1:
+        results = list(map(generate_chunk, specs))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(generate_chunk, specs))
+    for result in results:
+        for table, rows in result.items():
+            counts[table] += rows
+
+    manifest = {
+        'seed': seed, 'as_of': as_of, 'days': days, 'videos_per_user': videos_per_user,
+        'tenants': [{'tenant': i, 'users': n, 'client_id': make_uuids(seed, 'clients', i, [0])[0].as_py()}
+                    for i, n in enumerate(user_counts)],
+        'tables': [{'table': table, 'columns': COLUMNS[table], 'rows': counts[table],
+                    'files': sorted(os.listdir(os.path.join(out, table)))} for table in TABLE_CODES],
+    }
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest
+
+
+def load_dataset(conn, out, manifest=None):
+    """COPY a generated dataset into the database, parents first. Returns {table: seconds}."""
+    import time
+
+    if manifest is None:
+        with open(os.path.join(out, 'manifest.json')) as f:
+            manifest = json.load(f)
+    timings = {}
+    for entry in manifest['tables']:
+        start = time.perf_counter()
+        query = f"COPY {entry['table']} ({', '.join(entry['columns'])}) FROM STDIN WITH (FORMAT csv)"
+        with conn.cursor() as cur:
+            for name in entry['files']:
+                with cur.copy(query) as copy, open(os.path.join(out, entry['table'], name), 'rb') as f:
+                    while data := f.read(1 << 20):
+                        copy.write(data)
+        conn.commit()
+        timings[entry['table']] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Generate synthetic tenants as Postgres COPY files')
+    parser.add_argument('--users', type=int, nargs='+', required=True, help='users per tenant, one tenant each')
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--vip-metric', choices=['units', 'sales', 'mixed'], default='units')
+    parser.add_argument('--checkpoint-months', type=int, default=4)
+    parser.add_argument('--as-of', default='2025-12-31', help='"today" for the generated history')
+    parser.add_argument('--days', type=int, default=365, help='days of history')
+    parser.add_argument('--videos-per-user', type=float, default=20, help='mean videos per user over --days')
+    parser.add_argument('--chunk-users', type=int, default=20_000)
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--load', action='store_true', help='COPY the dataset into --dsn afterwards')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = generate(args.out, args.users, args.seed, args.vip_metric, args.checkpoint_months, args.as_of,
+                        args.days, args.videos_per_user, args.chunk_users, args.jobs)
+    print(f"Generated in {time.perf_counter() - start:.1f}s:")
+    for entry in manifest['tables']:
+        print(f"  {entry['table']:30s} {entry['rows']:>12,d} rows  {len(entry['files']):4d} files")
+
+    if args.load:
+        with connect(args.dsn) as conn:
+            for table, seconds in load_dataset(conn, args.out, manifest).items():
+                print(f"  loaded {table:30s} {seconds:7.1f}s")
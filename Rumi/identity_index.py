@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Creator Identity Index
+Resolves CRUVA handles to user ids in memory, following renames recorded
+in handle_changes, for cruva_ingest.py and other bulk loaders.
+
+syncRepository.findUserByTiktokHandle matches the current tiktok_handle
+exactly. When it misses, createUserFromCruva creates a new user. A creator
+who renamed therefore gets a second account even when handle_changes
+already links the old and new handles. A handle that differs only in case
+does too: TikTok handles are case-insensitive, and auth_create_user stores
+them lowercased, but CRUVA-created users keep the export's spelling.
+
+The index is built once per client from users + handle_changes, so
+ingestion makes no per-row queries:
+- Keys are normalized: surrounding spaces and a leading '@' are dropped,
+  then the key is lowercased.
+- Current handles always win. If several users share a key, the earliest
+  created account wins; the others are reported as case_duplicates.
+- Each old_handle becomes an alias. It resolves to the change's user_id
+  when that user belongs to the client. Otherwise the chain
+  old -> new -> newer ... is followed until it reaches a current handle.
+  Chains are resolved once with path compression, so lookups are a
+  single dict probe. If the same old handle was renamed more than once,
+  the latest change (detected_at) wins. Cycles are cut and reported.
+
+get(handle) and __setitem__(handle, user_id) are what CruvaIngester
+needs; key(handle) lets it treat spellings of one handle as one new user.
+
+Usage:
+    python identity_index.py --client-id <uuid>
+    python identity_index.py --client-id <uuid> --resolve @OldHandle new_handle
+    python identity_index.py --bench --users 1000000 --renames 200000
+"""
+
+from local_db import add_dsn_argument, connect
+
+
+def normalize_key(handle):
+    """Case- and '@'-insensitive lookup key for a TikTok handle."""
+    handle = handle.strip()
+    return (handle[1:] if handle.startswith('@') else handle).lower()
+
+
+class IdentityIndex:
+    """
+    handle -> user_id for one client, with renames.
+
+    users: iterable of (tiktok_handle, user_id), oldest account first.
+    changes: iterable of (user_id, old_handle, new_handle), oldest change
+    first. user_id may be None or a user of another client.
+    """
+
+    def __init__(self, users=(), changes=()):
+        self._current = {}
+        self._alias = {}
+        self.stats = {'users': 0, 'case_duplicates': 0, 'renames': 0, 'aliases': 0, 'chained': 0,
+                      'reused': 0, 'unresolved': 0, 'cycles': 0}
+        self.case_duplicates = []
+        for handle, user_id in users:
+            self.stats['users'] += 1
+            key = normalize_key(handle)
+            if key in self._current:
+                self.case_duplicates.append((handle, str(user_id), self._current[key]))
+            else:
+                self._current[key] = str(user_id)
+        self.stats['case_duplicates'] = len(self.case_duplicates)
+        self._resolve_changes(changes)
+
+    def _resolve_changes(self, changes):
+        # Latest change per old handle: old key -> (new key, user_id if it is one of ours)
+        users = set(self._current.values())
+        edges = {}
+        for user_id, old_handle, new_handle in changes:
+            self.stats['renames'] += 1
+            user_id = str(user_id) if user_id is not None else None
+            edges[normalize_key(old_handle)] = (normalize_key(new_handle), user_id if user_id in users else None)
+
+        resolved = {}
+        hops = {}
+        for start in edges:
+            if start in self._current:
+                # The old handle now belongs to a current account
+                self.stats['reused'] += 1
+                continue
+            path = []
+            key = start
+            target = None
+            depth = 0
+            while True:
+                if key in resolved:
+                    target = resolved[key]
+                    depth = hops[key]
+                    break
+                if key in self._current:
+                    target = self._current[key]
+                    break
+                if key not in edges or key in path:
+                    if key in path:
+                        self.stats['cycles'] += 1
+                    break
+                path.append(key)
+                new_key, user_id = edges[key]
+                if user_id is not None:
+                    target = user_id
+                    break
+                key = new_key
+            for key in reversed(path):
+                depth += 1
+                resolved[key] = target
+                hops[key] = depth
+
+        for key, target in resolved.items():
+            if target is None:
+                self.stats['unresolved'] += 1
+            else:
+                self._alias[key] = target
+                self.stats['chained'] += hops[key] > 1
+        self.stats['aliases'] = len(self._alias)
+
+    key = staticmethod(normalize_key)
+
+    def get(self, handle, default=None):
+        key = normalize_key(handle)
+        user_id = self._current.get(key)
+        if user_id is None:
+            user_id = self._alias.get(key, default)
+        return user_id
+
+    def __getitem__(self, handle):
+        user_id = self.get(handle)
+        if user_id is None:
+            raise KeyError(handle)
+        return user_id
+
+    def __setitem__(self, handle, user_id):
+        self._current[normalize_key(handle)] = str(user_id)
+
+    def __contains__(self, handle):
+        return self.get(handle) is not None
+
+    def __len__(self):
+        return len(self._current) + len(self._alias)
+
+    def via_alias(self, handle):
+        """True when handle only matches through handle_changes."""
+        key = normalize_key(handle)
+        return key not in self._current and key in self._alias
+
+
+def load_identity_index(conn, client_id):
+    """IdentityIndex for one client: its users and every handle change touching them, in two queries."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT tiktok_handle, id FROM users WHERE client_id = %s ORDER BY created_at, id",
+                    (client_id,))
+        users = cur.fetchall()
+        # handle_changes has no client_id: take the client's users' changes plus unattributed ones,
+        # which only resolve if their chain reaches one of this client's handles
+        cur.execute("""
+            SELECT hc.user_id, hc.old_handle, hc.new_handle
+            FROM handle_changes hc
+            LEFT JOIN users u ON u.id = hc.user_id
+            WHERE u.client_id = %s OR hc.user_id IS NULL
+            ORDER BY hc.detected_at NULLS FIRST, hc.id
+        """, (client_id,))
+        changes = cur.fetchall()
+    return IdentityIndex(users, changes)
+
+
+def run_benchmark(n_users, n_renames, n_lookups=1_000_000):
+    """Build an index over synthetic users and rename chains, then time lookups in mixed spellings."""
+    import random
+    import time
+
+    rng = random.Random(0)
+    users = [(f"creator_{i}", f"user-{i}") for i in range(n_users)]
+    # Renames form chains: each renamed creator's previous handles are h_1 -> h_2 -> ... -> current
+    changes = []
+    for i in rng.sample(range(n_users), min(n_renames, n_users)):
+        hops = rng.randint(1, 4)
+        handles = [f"old_{i}_{h}" for h in range(hops)] + [f"creator_{i}"]
+        for old, new in zip(handles, handles[1:]):
+            changes.append((None if rng.random() < 0.5 else f"user-{i}", old, new))
+
+    start = time.perf_counter()
+    index = IdentityIndex(users, changes)
+    built = time.perf_counter() - start
+    print(f"Built index of {len(index):,} keys ({n_users:,} users, {len(changes):,} renames) in {built:.2f}s")
+    print('  ' + ', '.join(f"{k} {v:,}" for k, v in index.stats.items()))
+
+    olds = [old for _, old, _ in changes] or ['creator_0']
+    probes = []
+    for j in range(n_lookups):
+        handle = rng.choice(olds) if j % 2 else f"creator_{rng.randrange(n_users)}"
+        probes.append('@' + handle.upper() if j % 3 == 0 else handle)
+    get = index.get
+    start = time.perf_counter()
+    hits = sum(1 for handle in probes if get(handle) is not None)
+    elapsed = time.perf_counter() - start
+    print(f"{n_lookups:,} lookups in {elapsed:.2f}s ({n_lookups / elapsed:,.0f}/s), {hits:,} resolved")
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Build the handle -> user identity index for one client')
+    parser.add_argument('--client-id')
+    parser.add_argument('--resolve', nargs='+', default=[], metavar='HANDLE', help='handles to look up')
+    parser.add_argument('--duplicates', help='write users sharing a handle up to case (CSV)')
+    parser.add_argument('--bench', action='store_true', help='build and query a synthetic index')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--renames', type=int, default=200_000)
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.users, args.renames)
+        sys.exit(0)
+    if not args.client_id:
+        parser.error('pass --client-id or --bench')
+
+    start = time.perf_counter()
+    with connect(args.dsn) as conn:
+        index = load_identity_index(conn, args.client_id)
+    print(f"Index of {len(index):,} handles built in {time.perf_counter() - start:.2f}s")
+    for name, count in index.stats.items():
+        print(f"  {name:16s} {count:>10,d}")
+    for handle in args.resolve:
+        user_id = index.get(handle)
+        how = ' (via handle_changes)' if index.via_alias(handle) else ''
+        print(f"{handle}: {user_id or 'no match, would create a user'}{how}")
+    if args.duplicates:
+        import csv
+
+        with open(args.duplicates, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['tiktok_handle', 'user_id', 'kept_user_id'])
+            writer.writerows(index.case_duplicates)
+        print(f"{len(index.case_duplicates):,} case duplicates written to {args.duplicates}")
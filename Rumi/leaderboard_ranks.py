@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Incremental Leaderboard Ranks
+Reference implementation and validator for updating users.leaderboard_rank
+incrementally. update_leaderboard_ranks (migrations_backup_20251216/
+20251211163010_add_phase8_rpc_functions.sql) recomputes
+ROW_NUMBER() OVER (ORDER BY total_units|total_sales DESC) for every user of
+the client and rewrites every row after each sync, although only the
+processedUserIds moved.
+
+RankEngine keeps the client's users in an order-statistics structure
+(sorted blocks with a Fenwick tree over block sizes: O(log n) rank of a key,
+O(sqrt n) insert/remove), applies only the changed users' new totals, and
+returns only the users whose rank changed, i.e. the rows an incremental RPC
+would UPDATE.
+
+Ordering is (metric DESC, id ASC). The RPC's ROW_NUMBER has no tie-break,
+so Postgres may number tied users in any order; validate() accepts any
+order within a tie, and the RPC should add ", id" to its ORDER BY before an
+incremental version can match it row for row.
+
+Usage:
+    python leaderboard_ranks.py --bench --users 1000000 --changed 10000
+    python leaderboard_ranks.py --validate --client-id <uuid>
+"""
+
+import uuid
+from bisect import bisect_left, insort
+
+import numpy as np
+
+BLOCK_SIZE = 1000
+_ID_BITS = 128
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def metric_value(value, vip_metric):
+    """Integer ranking value: units as-is, sales in cents (numeric(12,2))."""
+    return int(value or 0) if vip_metric == 'units' else int(round(float(value or 0) * 100))
+
+
+def _key(value, id_int):
+    # Sorts by value descending, then id ascending (uuid order == Postgres uuid order)
+    return -value * (1 << _ID_BITS) + id_int
+
+
+def format_uuid(id_int):
+    h = f"{id_int:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class _Fenwick:
+    def __init__(self, sizes):
+        self.n = len(sizes)
+        self.tree = [0] * (self.n + 1)
+        for i, size in enumerate(sizes, 1):
+            self.tree[i] += size
+            j = i + (i & -i)
+            if j <= self.n:
+                self.tree[j] += self.tree[i]
+
+    def add(self, i, delta):
+        i += 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of sizes of blocks [0, i)."""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class RankIndex:
+    """Sorted multiset of distinct int keys with positional rank."""
+
+    def __init__(self, sorted_keys=()):
+        keys = list(sorted_keys)
+        self._blocks = [keys[i:i + BLOCK_SIZE] for i in range(0, len(keys), BLOCK_SIZE)]
+        self._rebuild()
+
+    def _rebuild(self):
+        self._blocks = [b for b in self._blocks if b]
+        self._maxes = [b[-1] for b in self._blocks]
+        self._fenwick = _Fenwick([len(b) for b in self._blocks])
+
+    def __len__(self):
+        return self._fenwick.prefix(len(self._blocks))
+
+    def _locate(self, key):
+        b = bisect_left(self._maxes, key)
+        return min(b, len(self._blocks) - 1)
+
+    def position(self, key):
+        """0-based position of key (or where it would be inserted)."""
+        if not self._blocks:
+            return 0
+        b = bisect_left(self._maxes, key)
+        if b == len(self._blocks):
+            return len(self)
+        return self._fenwick.prefix(b) + bisect_left(self._blocks[b], key)
+
+    def insert(self, key):
+        if not self._blocks:
+            self._blocks = [[key]]
+            self._rebuild()
+            return
+        b = self._locate(key)
+        block = self._blocks[b]
+        insort(block, key)
+        self._maxes[b] = block[-1]
+        self._fenwick.add(b, 1)
+        if len(block) > 2 * BLOCK_SIZE:
+            self._blocks[b:b + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self._rebuild()
+
+    def remove(self, key):
+        b = self._locate(key)
+        block = self._blocks[b]
+        i = bisect_left(block, key)
+        if i == len(block) or block[i] != key:
+            raise KeyError(key)
+        del block[i]
+        if block:
+            self._maxes[b] = block[-1]
+            self._fenwick.add(b, -1)
+        else:
+            self._rebuild()
+
+    def range(self, lo=None, hi=None):
+        """(first position, keys) runs for lo < key < hi, block by block."""
+        b = 0 if lo is None else bisect_left(self._maxes, lo)
+        if b == len(self._blocks):
+            return
+        block = self._blocks[b]
+        i = 0 if lo is None else bisect_left(block, lo)
+        if i < len(block) and block[i] == lo:
+            i += 1
+        position = self._fenwick.prefix(b) + i
+        while b < len(self._blocks):
+            block = self._blocks[b]
+            j = len(block) if hi is None or block[-1] < hi else bisect_left(block, hi)
+            if j > i:
+                yield position, block[i:j]
+                position += j - i
+            if j < len(block):
+                return
+            b += 1
+            i = 0
+
+    def keys(self):
+        for block in self._blocks:
+            yield from block
+
+
+class RankEngine:
+    """
+    One client's leaderboard. apply() takes {user_id: new metric value}
+    (None removes the user) and returns [(user_id, new_rank)] for every user
+    whose rank changed, new rank None for removed users.
+    """
+
+    def __init__(self, user_ids, values):
+        ids = [uuid.UUID(str(u)).int for u in user_ids]
+        self._keys = {i: _key(int(v), i) for i, v in zip(ids, values)}
+        self.index = RankIndex(sorted(self._keys.values()))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def ranks(self):
+        """{user_id: rank} for everyone (1-based)."""
+        return {format_uuid(key & _ID_MASK): r for r, key in enumerate(self.index.keys(), 1)}
+
+    def apply(self, changes):
+        removed, inserted, movers = [], [], []
+        for user_id, value in changes.items():
+            id_int = uuid.UUID(str(user_id)).int
+            old = self._keys.get(id_int)
+            new = None if value is None else _key(int(value), id_int)
+            if old == new:
+                continue
+            old_rank = None if old is None else self.index.position(old) + 1
+            movers.append((id_int, old_rank, new))
+            if old is not None:
+                removed.append(old)
+            if new is not None:
+                inserted.append(new)
+
+        # Ranks computed against the index before any removal; apply the batch, then read new ranks
+        for key in removed:
+            self.index.remove(key)
+        for key in inserted:
+            self.index.insert(key)
+        result = []
+        for id_int, old_rank, new in movers:
+            if new is None:
+                del self._keys[id_int]
+                result.append((format_uuid(id_int), None))
+                continue
+            self._keys[id_int] = new
+            new_rank = self.index.position(new) + 1
+            if new_rank != old_rank:
+                result.append((format_uuid(id_int), new_rank))
+
+        # A user that did not move shifts by (#inserted keys before it - #removed keys before it).
+        # That count only changes at the batch's keys, so only the intervals between them with a
+        # non-zero running balance hold users whose rank changed.
+        events = sorted([(k, 1) for k in inserted] + [(k, -1) for k in removed])
+        inserted_set = set(inserted)
+        balance = 0
+        for n, (key, delta) in enumerate(events):
+            balance += delta
+            if balance == 0:
+                continue
+            hi = events[n + 1][0] if n + 1 < len(events) else None
+            for position, keys in self.index.range(key, hi):
+                result.extend((format_uuid(k & _ID_MASK), position + j + 1)
+                              for j, k in enumerate(keys) if k not in inserted_set)
+        return result
+
+
+# ============================================================================
+# REFERENCE AND VALIDATION
+# ============================================================================
+def full_ranks(id_ints, values):
+    """ROW_NUMBER() OVER (ORDER BY value DESC, id) with numpy. id_ints: uint64 (n, 2) hi/lo halves."""
+    order = np.lexsort((id_ints[:, 1], id_ints[:, 0], -np.asarray(values)))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def validate(values, ranks):
+    """
+    Check leaderboard_rank against the metric, allowing any order within a
+    tie (as ROW_NUMBER without a tie-break does). Returns the number of
+    users whose rank is outside their tie group's range.
+    """
+    values = np.asarray(values)
+    ranks = np.asarray([r if r is not None else -1 for r in ranks])
+    order = np.argsort(-values, kind='stable')
+    sorted_values = -values[order]
+    first = np.searchsorted(sorted_values, -values, side='left') + 1
+    last = np.searchsorted(sorted_values, -values, side='right')
+    return int(((ranks < first) | (ranks > last)).sum())
+
+
+def _id_halves(user_ids):
+    ints = [uuid.UUID(str(u)).int for u in user_ids]
+    return np.array([[i >> 64, i & ((1 << 64) - 1)] for i in ints], dtype=np.uint64)
+
+
+def run_benchmark(n_users, changed, syncs, seed=1):
+    import time
+
+    rng = np.random.default_rng(seed)
+    user_ids = [str(uuid.UUID(int=int(x))) for x in rng.integers(0, 2**62, n_users) << 64 | np.arange(n_users)]
+    # Many creators at zero, long tail above (units)
+    values = np.where(rng.random(n_users) < 0.5, 0, rng.lognormal(3, 1.5, n_users)).astype(np.int64)
+    halves = _id_halves(user_ids)
+
+    start = time.perf_counter()
+    engine = RankEngine(user_ids, values)
+    print(f"Built index over {n_users:,} users in {time.perf_counter() - start:.2f}s")
+    ranks = full_ranks(halves, values)
+
+    print(f"{'sync':>4s} {'full re-rank':>13s} {'rows written':>13s} {'incremental':>12s} {'rank changes':>13s}  check")
+    share = []
+    for sync in range(1, syncs + 1):
+        # A day's sync: some creators post videos and gain units
+        who = rng.choice(n_users, changed, replace=False)
+        values[who] += rng.poisson(3, changed) + 1
+
+        start = time.perf_counter()
+        new_ranks = full_ranks(halves, values)
+        full_s = time.perf_counter() - start
+        start = time.perf_counter()
+        result = engine.apply({user_ids[i]: int(values[i]) for i in who})
+        incremental_s = time.perf_counter() - start
+
+        expected = np.flatnonzero(new_ranks != ranks)
+        got = {u: r for u, r in result}
+        ok = len(got) == len(expected) and all(got.get(user_ids[i]) == new_ranks[i] for i in expected)
+        ranks = new_ranks
+        share.append(len(result) / n_users)
+        print(f"{sync:>4d} {full_s * 1000:>11.0f}ms {n_users:>13,d} {incremental_s * 1000:>10.0f}ms "
+              f"{len(result):>13,d}  {'ok' if ok else 'MISMATCH'}")
+    print(f"\n{changed:,} changed users moved the rank of {np.mean(share):.0%} of all users per sync: "
+          f"an incremental RPC only saves the UPDATEs of the other {1 - np.mean(share):.0%}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Incremental leaderboard ranks: benchmark and validator')
+    parser.add_argument('--bench', action='store_true', help='incremental vs full re-rank on synthetic users')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--changed', type=int, default=10_000, help='users changed per sync')
+    parser.add_argument('--syncs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--validate', action='store_true', help='check users.leaderboard_rank in the database')
+    parser.add_argument('--client-id')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.users, args.changed, args.syncs, args.seed)
+    if args.validate:
+        if not args.client_id:
+            parser.error('--validate needs --client-id')
+        with connect(args.dsn) as conn:
+            vip_metric = conn.execute("SELECT vip_metric FROM clients WHERE id = %s", (args.client_id,)).fetchone()[0]
+            rows = conn.execute(f"""
+                SELECT id, {'total_units' if vip_metric == 'units' else 'total_sales'}, leaderboard_rank
+                FROM users WHERE client_id = %s
+            """, (args.client_id,)).fetchall()
+        values = np.array([metric_value(r[1], vip_metric) for r in rows], dtype=np.int64)
+        bad = validate(values, [r[2] for r in rows])
+        unranked = sum(r[2] is None for r in rows)
+        print(f"{len(rows):,} users ({vip_metric}): {bad:,} ranks inconsistent with the metric "
+              f"({unranked:,} unranked)")
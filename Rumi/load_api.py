@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+API Load Generator
+Replays creator sessions against a running app (npm run dev / next start) to
+see how the dashboard, missions, rewards and tiers routes hold up under
+concurrent traffic, e.g. right after the daily sync.
+
+1. Logs in a pool of test users through POST /api/auth/login and keeps each
+   user's auth-token / auth-refresh-token cookies
+2. Starts sessions at a constant (Poisson) arrival rate for --duration:
+   open model, so a slow server does not slow the arrivals down
+3. Each session walks one SESSION_MIXES route sequence with think time between
+   pages, as one creator clicking through the app
+4. Latency is measured from when each request was due, not when it went out,
+   so time spent queued behind a saturated client or connection pool counts
+   (no coordinated omission)
+
+Test users need Supabase auth accounts (e.g. supabase/seed.sql, password
+Password123!); handles come from --handles or the users table (--client-id).
+
+Usage:
+    python load_api.py --base-url http://localhost:3000 --client-id <uuid> --logins 200 --rate 50
+    python load_api.py --handles handles.txt --rate 20 --duration 300 --json load.json
+"""
+
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+
+# (weight, pages). Every session starts on the dashboard, like the app after login.
+SESSION_MIXES = [
+    (0.40, ['/api/dashboard', '/api/dashboard/featured-mission']),
+    (0.25, ['/api/dashboard', '/api/missions', '/api/missions/history']),
+    (0.20, ['/api/dashboard', '/api/rewards', '/api/rewards/history']),
+    (0.15, ['/api/dashboard', '/api/tiers']),
+]
+DEFAULT_PASSWORD = 'Password123!'
+AUTH_COOKIES = ('auth-token', 'auth-refresh-token')
+
+
+# ============================================================================
+# HISTOGRAM
+# ============================================================================
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (1% relative precision from 10us to
+    ~10min), cheap to record into and to merge.
+    """
+
+    MIN_MS = 0.01
+    GROWTH = 1.01
+    BUCKETS = int(math.log(600_000 / MIN_MS) / math.log(GROWTH)) + 2
+
+    def __init__(self):
+        self.counts = np.zeros(self.BUCKETS, dtype=np.int64)
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+
+    def record(self, ms):
+        i = 0 if ms <= self.MIN_MS else int(math.log(ms / self.MIN_MS) / math.log(self.GROWTH)) + 1
+        self.counts[min(i, self.BUCKETS - 1)] += 1
+        self.max_ms = max(self.max_ms, ms)
+        self.total_ms += ms
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (ms)."""
+        n = self.count
+        if not n:
+            return float('nan')
+        i = int(np.searchsorted(np.cumsum(self.counts), math.ceil(n * q / 100)))
+        return min(self.MIN_MS * self.GROWTH ** i, self.max_ms)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.total_ms += other.total_ms
+
+    def to_dict(self):
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            'count': self.count, 'max_ms': self.max_ms,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'buckets': {f"{self.MIN_MS * self.GROWTH ** i:.4g}": int(self.counts[i]) for i in nonzero},
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, ms, status):
+        self.latency.record(ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+
+
+# ============================================================================
+# LOAD RUN
+# ============================================================================
+class LoadRun:
+    def __init__(self, base_url, rate, duration, warmup=10.0, think_time=2.0, max_connections=256,
+                 timeout=30.0, seed=1):
+        self.base_url = base_url.rstrip('/')
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.think_time = think_time
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.rng = np.random.default_rng(seed)
+        self.weights = np.array([w for w, _ in SESSION_MIXES]) / sum(w for w, _ in SESSION_MIXES)
+        self.routes = {}
+        self.login_stats = RouteStats()
+        self.sessions_started = 0
+        self.max_lag_ms = 0.0
+
+    def _stats(self, route):
+        if route not in self.routes:
+            self.routes[route] = RouteStats()
+        return self.routes[route]
+
+    async def _sleep_until(self, t):
+        delay = t - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def login(self, http, handle, password):
+        """Returns the user's Cookie header, or None if login failed."""
+        start = time.perf_counter()
+        try:
+            async with http.post(f"{self.base_url}/api/auth/login",
+                                 json={'handle': handle, 'password': password}) as resp:
+                await resp.read()
+                status = resp.status
+                cookies = {name: resp.cookies[name].value for name in AUTH_COOKIES if name in resp.cookies}
+        except Exception as e:
+            status, cookies = type(e).__name__, {}
+        self.login_stats.record((time.perf_counter() - start) * 1000, status)
+        if status != 200 or 'auth-token' not in cookies:
+            return None
+        return '; '.join(f"{name}={value}" for name, value in cookies.items())
+
+    async def login_all(self, http, handles, password, concurrency=20):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(handle):
+            async with semaphore:
+                return await self.login(http, handle, password)
+
+        cookies = await asyncio.gather(*(one(h) for h in handles))
+        return [c for c in cookies if c]
+
+    async def request(self, http, route, cookie, due, record):
+        try:
+            async with http.get(f"{self.base_url}{route}", headers={'Cookie': cookie}) as resp:
+                await resp.read()
+                status = resp.status
+        except Exception as e:
+            status = type(e).__name__
+        if record:
+            # From when the request was due, so client-side queueing is included
+            self._stats(route).record((time.perf_counter() - due) * 1000, status)
+
+    async def session(self, http, cookie, pages, due, measure_from):
+        for i, route in enumerate(pages):
+            if i:
+                due = time.perf_counter() + self.rng.exponential(self.think_time)
+            await self._sleep_until(due)
+            self.max_lag_ms = max(self.max_lag_ms, (time.perf_counter() - due) * 1000)
+            await self.request(http, route, cookie, due, due >= measure_from)
+
+    async def run(self, handles, password=DEFAULT_PASSWORD, login_concurrency=20):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # One shared connector; cookies are sent per user, never stored
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         cookie_jar=aiohttp.DummyCookieJar()) as http:
+            cookies = await self.login_all(http, handles, password, login_concurrency)
+            if not cookies:
+                raise SystemExit(f"No logins succeeded ({self.login_stats.statuses}); check handles/password")
+            print(f"Logged in {len(cookies)}/{len(handles)} users; "
+                  f"running {self.rate:g} sessions/s for {self.warmup:g}s warm-up + {self.duration:g}s")
+
+            start = time.perf_counter()
+            measure_from = start + self.warmup
+            end = measure_from + self.duration
+            tasks = set()
+            due = start
+            while True:
+                due += self.rng.exponential(1 / self.rate)
+                if due >= end:
+                    break
+                await self._sleep_until(due)
+                pages = SESSION_MIXES[self.rng.choice(len(SESSION_MIXES), p=self.weights)][1]
+                cookie = cookies[self.rng.integers(len(cookies))]
+                task = asyncio.create_task(self.session(http, cookie, pages, due, measure_from))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.sessions_started += 1
+            if tasks:
+                await asyncio.gather(*tasks)
+        return self.report()
+
+    def report(self):
+        total = LatencyHistogram()
+        rows = []
+        for route, stats in sorted(self.routes.items()):
+            total.merge(stats.latency)
+            rows.append(self._row(route, stats.latency, stats.errors, stats.statuses))
+        rows.append(self._row('all', total, sum(s.errors for s in self.routes.values()), {}))
+        return {
+            'rate': self.rate, 'duration': self.duration, 'sessions': self.sessions_started,
+            'max_scheduler_lag_ms': self.max_lag_ms,
+            'login': self._row('/api/auth/login', self.login_stats.latency, self.login_stats.errors,
+                               self.login_stats.statuses),
+            'routes': rows,
+            'histograms': {route: s.latency.to_dict() for route, s in self.routes.items()},
+        }
+
+    def _row(self, route, hist, errors, statuses):
+        return {
+            'route': route, 'requests': hist.count, 'errors': errors,
+            'rps': hist.count / self.duration if route != '/api/auth/login' else None,
+            **{f"p{q:g}_ms": hist.percentile(q) for q in (50, 90, 99, 99.9)},
+            'max_ms': hist.max_ms, 'statuses': {str(k): v for k, v in statuses.items()},
+        }
+
+
+def print_report(report):
+    print(f"\n{report['sessions']:,} sessions started; max scheduler lag {report['max_scheduler_lag_ms']:.1f} ms")
+    print(f"{'route':32s} {'requests':>9s} {'errors':>7s} {'req/s':>7s} {'p50 ms':>8s} {'p90 ms':>8s} "
+          f"{'p99 ms':>8s} {'p99.9 ms':>9s} {'max ms':>8s}")
+    for r in [report['login']] + report['routes']:
+        rps = f"{r['rps']:7.1f}" if r['rps'] is not None else f"{'':7s}"
+        print(f"{r['route']:32s} {r['requests']:>9,d} {r['errors']:>7,d} {rps} {r['p50_ms']:8.1f} "
+              f"{r['p90_ms']:8.1f} {r['p99_ms']:8.1f} {r['p99.9_ms']:9.1f} {r['max_ms']:8.1f}")
+        failed = {k: v for k, v in r['statuses'].items() if not k.isdigit() or int(k) >= 400}
+        if failed:
+            print(f"{'':32s} failures: {failed}")
+
+
+def load_handles(path=None, client_id=None, dsn=None, limit=None):
+    """Test user handles from a file (one per line) or the users table."""
+    if path:
+        with open(path) as f:
+            handles = [line.strip() for line in f if line.strip()]
+    else:
+        from local_db import connect
+        with connect(dsn) as conn:
+            rows = conn.execute("""
+                SELECT tiktok_handle FROM users WHERE client_id = %s AND NOT is_admin ORDER BY tiktok_handle
+            """, (client_id,)).fetchall()
+        handles = [r[0] for r in rows]
+    return handles[:limit] if limit else handles
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from local_db import add_dsn_argument
+
+    parser = argparse.ArgumentParser(description='Open-model load generator for the creator API routes')
+    parser.add_argument('--base-url', default='http://localhost:3000')
+    parser.add_argument('--handles', help='file of test user handles, one per line')
+    parser.add_argument('--client-id', help='take handles from the users table instead')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--logins', type=int, default=100, help='users to log in')
+    parser.add_argument('--login-concurrency', type=int, default=20)
+    parser.add_argument('--rate', type=float, required=True, help='session arrivals per second')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=10, help='unmeasured seconds first')
+    parser.add_argument('--think-time', type=float, default=2.0, help='mean seconds between pages')
+    parser.add_argument('--max-connections', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help='write the report and histograms as JSON')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    if not args.handles and not args.client_id:
+        parser.error('pass --handles or --client-id')
+    handles = load_handles(args.handles, args.client_id, args.dsn, args.logins)
+    pages_per_session = sum(w * len(p) for w, p in SESSION_MIXES) / sum(w for w, _ in SESSION_MIXES)
+    print(f"Target: {args.rate:g} sessions/s = ~{args.rate * pages_per_session:.0f} requests/s")
+
+    run = LoadRun(args.base_url, args.rate, args.duration, args.warmup, args.think_time,
+                  args.max_connections, args.timeout, args.seed)
+    report = asyncio.run(run.run(handles, args.password, args.login_concurrency))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Loyalty Program Financial Model - Result Cache
+Content-addressed, disk-backed cache of evaluated monthly outputs.
+
+- Key: SHA-256 of the canonical Inputs / VIP Levels / Missions config plus
+  loyalty_model.ENGINE_VERSION (so a formula change never serves stale data)
+- Value: one small binary file per scenario (header + float64 per month per
+  OUTPUT_METRICS row, ~5 KB)
+- Eviction: least-recently-used entries are deleted once the directory
+  exceeds max_bytes. File mtime is the recency stamp, so the order survives
+  restarts and is shared between processes using the same directory.
+- Hits for keys already seen by this process are served from memory without
+  touching disk, as a copy: callers may mutate what they get back.
+
+Usage:
+    cache = ResultCache('.loyalty_cache')
+    results = cache.get_or_evaluate(config)
+"""
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from array import array
+from collections import OrderedDict
+
+import loyalty_model
+
+CONFIG_SECTIONS = ['inputs', 'level_distribution', 'levels', 'welcome_rewards', 'missions']
+
+# File layout: magic, format version, metric count, month count, layout hash, values
+_MAGIC = b'LPMC'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHHH16s')
+_LAYOUT_HASH = hashlib.md5(json.dumps(loyalty_model.OUTPUT_METRICS).encode()).digest()
+_SUFFIX = '.bin'
+
+
+def config_key(config, engine_version=loyalty_model.ENGINE_VERSION):
+    """Hex digest identifying (config, engine version)."""
+    # Plain sorted-key JSON keeps hashing in the tens of microseconds. Configs
+    # that differ only in spelling (5 vs 5.0) get separate entries, which is
+    # a wasted miss, never a wrong hit.
+    payload = {section: config[section] for section in CONFIG_SECTIONS}
+    payload['engine_version'] = engine_version
+    blob = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def encode_results(results):
+    values = array('d')
+    for sheet, metric in loyalty_model.OUTPUT_METRICS:
+        values.extend(results[sheet][metric])
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(loyalty_model.OUTPUT_METRICS),
+                          loyalty_model.MONTHS, _LAYOUT_HASH)
+    return header + values.tobytes()
+
+
+def decode_results(blob):
+    """Inverse of encode_results. Returns None if the blob is from another layout."""
+    if len(blob) < _HEADER.size:
+        return None
+    magic, version, n_metrics, months, layout = _HEADER.unpack_from(blob)
+    if (magic != _MAGIC or version != _FORMAT_VERSION or layout != _LAYOUT_HASH
+            or months != loyalty_model.MONTHS or n_metrics != len(loyalty_model.OUTPUT_METRICS)):
+        return None
+    values = array('d')
+    values.frombytes(blob[_HEADER.size:])
+    if len(values) != n_metrics * months:
+        return None
+    results = {}
+    for i, (sheet, metric) in enumerate(loyalty_model.OUTPUT_METRICS):
+        results.setdefault(sheet, {})[metric] = values[i * months:(i + 1) * months].tolist()
+    return results
+
+
+def copy_results(results):
+    """Copy of a {sheet: {metric: [monthly values]}} dict, safe for the caller to mutate."""
+    return {sheet: {metric: list(values) for metric, values in metrics.items()}
+            for sheet, metrics in results.items()}
+
+
+class ResultCache:
+    """LRU-by-size disk cache of loyalty_model.evaluate() results."""
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, memory_entries=1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()   # key -> decoded results
+        self._index = OrderedDict()    # key -> size on disk, oldest first
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _load_index(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name[:-len(_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _remember(self, key, results):
+        # Own copy, so the caller mutating what it passed in or got back cannot change later hits
+        self._memory[key] = copy_results(results)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key):
+        self._index.move_to_end(key)
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            self._forget(key)
+
+    def _forget(self, key):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        self._memory.pop(key, None)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, config, key=None):
+        """Cached results for config, or None."""
+        key = key or config_key(config)
+        results = self._memory.get(key)
+        if results is not None:
+            self._memory.move_to_end(key)
+            if key in self._index:
+                self._index.move_to_end(key)
+            self.hits += 1
+            return copy_results(results)
+        try:
+            with open(self._path(key), 'rb') as f:
+                results = decode_results(f.read())
+        except FileNotFoundError:
+            results = None
+        if results is None:
+            self._forget(key)
+            self.misses += 1
+            return None
+        if key not in self._index:
+            # Written by another process since we scanned the directory
+            size = os.path.getsize(self._path(key))
+            self._index[key] = size
+            self._total_bytes += size
+        self._touch(key)
+        self._remember(key, results)
+        self.hits += 1
+        return results
+
+    def put(self, config, results, key=None):
+        key = key or config_key(config)
+        blob = encode_results(results)
+        # Write-then-rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, self._path(key))
+        self._forget(key)
+        self._index[key] = len(blob)
+        self._total_bytes += len(blob)
+        self._remember(key, results)
+        self._evict()
+        return key
+
+    def get_or_evaluate(self, config):
+        key = config_key(config)
+        results = self.get(config, key)
+        if results is None:
+            results = loyalty_model.evaluate(config)
+            self.put(config, results, key)
+        return results
+
+    def clear(self):
+        for key in list(self._index):
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self._memory.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._index),
+            'total_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Inspect or warm the model result cache')
+    parser.add_argument('--dir', default='.loyalty_cache')
+    parser.add_argument('--max-mb', type=float, default=64)
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir, max_bytes=int(args.max_mb * 1024 * 1024))
+    if args.clear:
+        cache.clear()
+
+    config = loyalty_model.default_config()
+    start = time.perf_counter()
+    cache.get_or_evaluate(config)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    cache.get_or_evaluate(config)
+    second = time.perf_counter() - start
+    print(f"Default scenario key: {config_key(config)}")
+    print(f"First lookup:  {first * 1e6:,.1f} us")
+    print(f"Second lookup: {second * 1e6:,.1f} us")
+    print(f"Cache stats:   {cache.stats()}")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Loyalty Program Financial Model - Config Files
+Load and validate YAML/JSON model configs (same shape as
+loyalty_model.DEFAULT_CONFIG), so scenario variants are data files instead
+of copies of the builder script.
+
+Usage:
+    python loyalty_config.py --dump-default model_configs/loyalty_v3.yaml
+    python loyalty_config.py model_configs/*.yaml          # validate a batch
+    python build_loyalty_excel_v3.py --config my_scenario.yaml
+"""
+
+import json
+import math
+import os
+
+import yaml
+
+from loyalty_model import (DEFAULT_CONFIG, LEVEL_NAMES, MAX_MISSIONS, OPTIONAL_INPUTS, REWARD_TYPES,
+                           WELCOME_REWARD_FIELDS)
+
+try:
+    _YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    _YamlLoader = yaml.SafeLoader
+
+MISSION_TYPES = ['Videos', 'Likes', 'Sales', 'Views']
+REPEATABILITY = ['One-time', 'Weekly', 'Monthly']
+MISSION_FIELDS = ['level', 'mission_type', 'target', 'repeatability', 'completion_rate',
+                  'reward_type', 'reward_value', 'reward_duration', 'active']
+# Optional top-level metadata, ignored by the engine
+METADATA_KEYS = ['scenario', 'description']
+
+# Inputs whose sheet unit is '%'
+RATE_INPUTS = [
+    'Sample-to-Affiliate Conversion Rate',
+    'Affiliate Attrition Rate',
+    'Discount Redemption Rate',
+    'Default Mission Completion Rate',
+]
+PCT_REWARD_FIELDS = ['comm_boost_pct', 'discount_pct']
+DISTRIBUTION_TOLERANCE = 1e-6
+
+
+class ConfigError(ValueError):
+    """Raised by load_config when a file fails validation."""
+
+    def __init__(self, path, errors):
+        self.path = path
+        self.errors = errors
+        super().__init__(f"{path}: " + '; '.join(errors))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _check_number(errors, where, value, low=0, high=None):
+    if not _is_number(value):
+        errors.append(f"{where}: expected a number, got {value!r}")
+    elif value < low or (high is not None and value > high):
+        bound = f"between {low} and {high}" if high is not None else f">= {low}"
+        errors.append(f"{where}: must be {bound}, got {value!r}")
+
+
+def _check_keys(errors, where, mapping, expected, optional=()):
+    if not isinstance(mapping, dict):
+        errors.append(f"{where}: expected a mapping")
+        return False
+    missing = [k for k in expected if k not in mapping and k not in optional]
+    unknown = [k for k in mapping if k not in expected]
+    if missing:
+        errors.append(f"{where}: missing {', '.join(missing)}")
+    if unknown:
+        errors.append(f"{where}: unknown {', '.join(map(str, unknown))}")
+    return not missing
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+def validate_config(config):
+    """Return a list of human-readable problems (empty list = valid)."""
+    errors = []
+    if not isinstance(config, dict):
+        return ["config: expected a mapping at the top level"]
+    sections = list(DEFAULT_CONFIG)
+    unknown = [k for k in config if k not in sections and k not in METADATA_KEYS]
+    if unknown:
+        errors.append(f"config: unknown section(s) {', '.join(map(str, unknown))}")
+    missing = [k for k in sections if k not in config]
+    if missing:
+        errors.append(f"config: missing section(s) {', '.join(missing)}")
+        return errors
+
+    # Inputs sheet
+    inputs = config['inputs']
+    if _check_keys(errors, 'inputs', inputs, DEFAULT_CONFIG['inputs'], OPTIONAL_INPUTS):
+        for name, value in inputs.items():
+            if name in DEFAULT_CONFIG['inputs']:
+                _check_number(errors, f"inputs.{name}", value, 0, 1 if name in RATE_INPUTS else None)
+
+    # Level distribution must cover every level and sum to 100%
+    dist = config['level_distribution']
+    if _check_keys(errors, 'level_distribution', dist, LEVEL_NAMES):
+        for name in LEVEL_NAMES:
+            _check_number(errors, f"level_distribution.{name}", dist[name], 0, 1)
+        if all(_is_number(dist[name]) for name in LEVEL_NAMES):
+            total = sum(dist[name] for name in LEVEL_NAMES)
+            if abs(total - 1) > DISTRIBUTION_TOLERANCE:
+                errors.append(f"level_distribution: must sum to 100%, got {total:.2%}")
+
+    # VIP levels: the workbook has exactly one row per level, in order
+    levels = config['levels']
+    if not isinstance(levels, list) or len(levels) != len(LEVEL_NAMES):
+        errors.append(f"levels: expected {len(LEVEL_NAMES)} levels ({', '.join(LEVEL_NAMES)})")
+    else:
+        previous = None
+        for i, level in enumerate(levels):
+            where = f"levels[{i}]"
+            if not _check_keys(errors, where, level, ['name', 'sales_threshold', 'commission_rate']):
+                continue
+            if level['name'] != LEVEL_NAMES[i]:
+                errors.append(f"{where}.name: expected {LEVEL_NAMES[i]!r}, got {level['name']!r}")
+            _check_number(errors, f"{where}.sales_threshold", level['sales_threshold'])
+            _check_number(errors, f"{where}.commission_rate", level['commission_rate'], 0, 1)
+            threshold = level['sales_threshold']
+            if _is_number(threshold) and previous is not None and threshold <= previous:
+                errors.append(f"{where}.sales_threshold: must be above the previous level ({previous})")
+            previous = threshold if _is_number(threshold) else previous
+
+    # Welcome rewards: one 13-value row per level (VIP Levels B-N)
+    welcome = config['welcome_rewards']
+    if _check_keys(errors, 'welcome_rewards', welcome, LEVEL_NAMES):
+        for name in LEVEL_NAMES:
+            row = welcome[name]
+            where = f"welcome_rewards.{name}"
+            if not isinstance(row, list) or len(row) != len(WELCOME_REWARD_FIELDS):
+                errors.append(f"{where}: expected {len(WELCOME_REWARD_FIELDS)} values "
+                              f"({', '.join(WELCOME_REWARD_FIELDS)})")
+                continue
+            for field, value in zip(WELCOME_REWARD_FIELDS, row):
+                _check_number(errors, f"{where}.{field}", value, 0, 1 if field in PCT_REWARD_FIELDS else None)
+
+    # Missions sheet rows 5-24
+    missions = config['missions']
+    if not isinstance(missions, list):
+        errors.append("missions: expected a list")
+    else:
+        if len(missions) > MAX_MISSIONS:
+            errors.append(f"missions: at most {MAX_MISSIONS} missions fit the Missions sheet, got {len(missions)}")
+        for i, mission in enumerate(missions):
+            where = f"missions[{i}]"
+            if not _check_keys(errors, where, mission, MISSION_FIELDS):
+                continue
+            for field, allowed in (('level', LEVEL_NAMES), ('mission_type', MISSION_TYPES),
+                                   ('repeatability', REPEATABILITY), ('reward_type', REWARD_TYPES)):
+                if mission[field] not in allowed:
+                    errors.append(f"{where}.{field}: must be one of {', '.join(allowed)}, got {mission[field]!r}")
+            _check_number(errors, f"{where}.target", mission['target'])
+            _check_number(errors, f"{where}.completion_rate", mission['completion_rate'], 0, 1)
+            _check_number(errors, f"{where}.reward_duration", mission['reward_duration'])
+            if mission['reward_type'] == 'Commission Boost':
+                _check_number(errors, f"{where}.reward_value", mission['reward_value'], 0, 1)
+            else:
+                _check_number(errors, f"{where}.reward_value", mission['reward_value'])
+            if not isinstance(mission['active'], bool):
+                errors.append(f"{where}.active: expected true/false, got {mission['active']!r}")
+
+    return errors
+
+
+# ============================================================================
+# LOADING / SAVING
+# ============================================================================
+def parse_config(text, fmt):
+    if fmt == 'json':
+        return json.loads(text)
+    return yaml.load(text, Loader=_YamlLoader)
+
+
+def _format_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        return 'json'
+    if ext in ('.yaml', '.yml'):
+        return 'yaml'
+    raise ValueError(f"{path}: config files must be .yaml, .yml or .json")
+
+
+def load_config(path):
+    """Parse and validate a config file. Raises ConfigError on problems."""
+    with open(path, encoding='utf-8') as f:
+        config = parse_config(f.read(), _format_for(path))
+    errors = validate_config(config)
+    if errors:
+        raise ConfigError(path, errors)
+    return config
+
+
+def save_config(config, path):
+    fmt = _format_for(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'json':
+            json.dump(config, f, indent=2)
+            f.write('\n')
+        else:
+            yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True, width=120)
+
+
+def check_file(path):
+    """(path, errors) for batch validation; parse failures are reported, not raised."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = parse_config(f.read(), _format_for(path))
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        return path, [f"could not parse: {e}"]
+    return path, validate_config(config)
+
+
+def check_files(paths, jobs=None):
+    """Validate many files, in parallel when jobs > 1. Yields (path, errors)."""
+    if jobs == 1 or len(paths) < 2:
+        yield from map(check_file, paths)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(check_file, paths, chunksize=max(1, len(paths) // ((jobs or os.cpu_count() or 1) * 4)))
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Validate loyalty model config files')
+    parser.add_argument('paths', nargs='*', help='.yaml/.yml/.json config files')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--dump-default', metavar='PATH', help='write the built-in v3 config and exit')
+    args = parser.parse_args()
+
+    if args.dump_default:
+        save_config(DEFAULT_CONFIG, args.dump_default)
+        print(f"Default config written: {args.dump_default}")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    failed = 0
+    for path, errors in check_files(args.paths, args.jobs):
+        if errors:
+            failed += 1
+            print(f"INVALID {path}")
+            for error in errors:
+                print(f"  - {error}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.paths) - failed}/{len(args.paths)} valid in {elapsed:.2f}s")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Loyalty Program Financial Model - Columnar Export
+Streams evaluated monthly metrics (Affiliate Projection, Reward Triggers,
+Revenue, Costs) to a long-format table:
+
+    scenario: string, month: int16, sheet: dictionary<string>,
+    metric: dictionary<string>, value: float64
+
+as Arrow IPC (uncompressed, memory-mappable) or Parquet. Rows are buffered
+per batch of scenarios and flushed as record batches, so a sweep of any
+size is written in constant memory.
+
+Usage:
+    python loyalty_export.py model_configs/*.yaml --out sweep.arrow
+    python loyalty_export.py model_configs/*.yaml --out sweep.parquet --cache-dir .loyalty_cache
+
+Reading back in a notebook:
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map('sweep.arrow')).read_all()
+"""
+
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import loyalty_model
+
+SCHEMA = pa.schema([
+    ('scenario', pa.string()),
+    ('month', pa.int16()),
+    ('sheet', pa.dictionary(pa.int16(), pa.string())),
+    ('metric', pa.dictionary(pa.int16(), pa.string())),
+    ('value', pa.float64()),
+], metadata={'engine_version': loyalty_model.ENGINE_VERSION})
+
+# The sheet/metric/month columns are identical for every scenario, so they are
+# built once. Keeping one dictionary for every batch is also what the Arrow
+# IPC file format requires.
+_SHEETS = sorted({sheet for sheet, _ in loyalty_model.OUTPUT_METRICS})
+_SHEET_DICT = pa.array(_SHEETS, pa.string())
+_METRIC_DICT = pa.array([metric for _, metric in loyalty_model.OUTPUT_METRICS], pa.string())
+_ROWS_PER_SCENARIO = len(loyalty_model.OUTPUT_METRICS) * loyalty_model.MONTHS
+_MONTH_PATTERN = list(range(1, loyalty_model.MONTHS + 1)) * len(loyalty_model.OUTPUT_METRICS)
+_SHEET_PATTERN = [_SHEETS.index(sheet) for sheet, _ in loyalty_model.OUTPUT_METRICS for _ in range(loyalty_model.MONTHS)]
+_METRIC_PATTERN = [i for i in range(len(loyalty_model.OUTPUT_METRICS)) for _ in range(loyalty_model.MONTHS)]
+
+
+def _format_for(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        return 'parquet'
+    if ext in ('.arrow', '.feather', '.ipc'):
+        return 'arrow'
+    raise ValueError(f"{path}: use .arrow/.feather/.ipc or .parquet, or pass fmt")
+
+
+class ResultWriter:
+    """Streaming writer for evaluated scenarios. Use as a context manager."""
+
+    def __init__(self, path, fmt=None, batch_scenarios=256):
+        self.path = path
+        self.fmt = _format_for(path, fmt)
+        self.batch_scenarios = batch_scenarios
+        self.rows_written = 0
+        self._scenarios = []
+        self._values = []
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(path, SCHEMA, compression='zstd')
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, SCHEMA)
+
+    def write(self, scenario, results):
+        for sheet, metric in loyalty_model.OUTPUT_METRICS:
+            self._values.extend(results[sheet][metric])
+        self._scenarios.append(scenario)
+        if len(self._scenarios) >= self.batch_scenarios:
+            self.flush()
+
+    def flush(self):
+        n = len(self._scenarios)
+        if not n:
+            return
+        scenario = pa.array(self._scenarios, pa.string()).take(
+            pa.array([i for i in range(n) for _ in range(_ROWS_PER_SCENARIO)], pa.int32()))
+        batch = pa.RecordBatch.from_arrays([
+            scenario,
+            pa.array(_MONTH_PATTERN * n, pa.int16()),
+            pa.DictionaryArray.from_arrays(pa.array(_SHEET_PATTERN * n, pa.int16()), _SHEET_DICT),
+            pa.DictionaryArray.from_arrays(pa.array(_METRIC_PATTERN * n, pa.int16()), _METRIC_DICT),
+            pa.array(self._values, pa.float64()),
+        ], schema=SCHEMA)
+        self._writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+        self._scenarios = []
+        self._values = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if self.fmt == 'arrow':
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_scenarios(scenarios, path, fmt=None, cache=None, batch_scenarios=256):
+    """
+    Evaluate and write (name, config) pairs. Pass a loyalty_cache.ResultCache
+    to reuse already-evaluated scenarios. Returns rows written.
+    """
+    evaluate = cache.get_or_evaluate if cache is not None else loyalty_model.evaluate
+    with ResultWriter(path, fmt, batch_scenarios) as writer:
+        for name, config in scenarios:
+            writer.write(name, evaluate(config))
+    return writer.rows_written
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from loyalty_config import load_config
+
+    parser = argparse.ArgumentParser(description='Export model results as a long-format columnar table')
+    parser.add_argument('configs', nargs='*', help='config files (default: built-in v3 config)')
+    parser.add_argument('--out', required=True, help='.arrow/.feather/.ipc or .parquet')
+    parser.add_argument('--format', choices=['arrow', 'parquet'])
+    parser.add_argument('--cache-dir', help='reuse results from a loyalty_cache directory')
+    args = parser.parse_args()
+
+    def scenarios():
+        if not args.configs:
+            yield 'default', loyalty_model.default_config()
+        for path in args.configs:
+            config = load_config(path)
+            yield config.get('scenario') or os.path.splitext(os.path.basename(path))[0], config
+
+    cache = None
+    if args.cache_dir:
+        from loyalty_cache import ResultCache
+        cache = ResultCache(args.cache_dir)
+
+    start = time.perf_counter()
+    rows = export_scenarios(scenarios(), args.out, args.format, cache)
+    print(f"Wrote {rows:,} rows to {args.out} in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Loyalty Program Financial Model - Python Evaluation Engine
+Evaluates the same formulas that build_loyalty_excel_v3.py writes into the
+workbook, so scenario sweeps can get the monthly numbers without Excel.
+
+Config sections mirror the builder's input blocks:
+- inputs: Inputs sheet parameters keyed by their sheet label
+- level_distribution: % of affiliates per level (Inputs rows 34-38)
+- levels: VIP Levels thresholds & commission (rows 5-9)
+- welcome_rewards: VIP Levels welcome rewards (rows 14-18)
+- missions: Missions sheet rows 5-24
+
+Raffle Prize Cost is Raffles per Month x Avg Raffle Prize Cost (measured
+by raffle_engine.py, Inputs rows 29-30). Both inputs are optional and zero
+when a config leaves them out.
+"""
+
+import copy
+import math
+
+# Bump whenever a formula below (or in the builder) changes meaning.
+# Cached results are keyed on this, see loyalty_cache.py
+ENGINE_VERSION = '3.1.0'
+
+MONTHS = 12
+LEVEL_NAMES = ['Bronze', 'Silver', 'Gold', 'Platinum', 'Diamond']
+REWARD_TYPES = ['Gift Card', 'Commission Boost', 'Spark Ads']
+MAX_MISSIONS = 20  # Missions!A5:A24
+
+# Inputs added after the first v3 configs were written; missing ones count as these values
+OPTIONAL_INPUTS = {'Raffles per Month': 0, 'Avg Raffle Prize Cost': 0}
+
+# ============================================================================
+# DEFAULT CONFIGURATION (same values as build_loyalty_excel_v3.py)
+# ============================================================================
+DEFAULT_CONFIG = {
+    'inputs': {
+        'Samples Sent - Month 1': 150,
+        'Samples Sent - Month 2+': 100,
+        'Sample-to-Affiliate Conversion Rate': 0.20,
+        'Flywheel Affiliates per Month': 10,
+        'Time to First Sale': 14,
+        'Affiliate Attrition Rate': 0.05,
+        'Average Sales per Affiliate per Month': 5,
+        'Gross AOV': 100,
+        'Rolling Window Duration': 30,
+        'Discount Redemption Rate': 0.30,
+        'Default Mission Completion Rate': 0.25,
+        'Avg Sales During Commission Boost': 3,
+        'Cost per Sample': 15,
+        'Raffles per Month': 0,
+        'Avg Raffle Prize Cost': 0,
+    },
+    'level_distribution': {
+        'Bronze': 0.40,
+        'Silver': 0.30,
+        'Gold': 0.18,
+        'Platinum': 0.09,
+        'Diamond': 0.03,
+    },
+    'levels': [
+        {'name': 'Bronze', 'sales_threshold': 0, 'commission_rate': 0.10},
+        {'name': 'Silver', 'sales_threshold': 5, 'commission_rate': 0.12},
+        {'name': 'Gold', 'sales_threshold': 20, 'commission_rate': 0.18},
+        {'name': 'Platinum', 'sales_threshold': 50, 'commission_rate': 0.22},
+        {'name': 'Diamond', 'sales_threshold': 100, 'commission_rate': 0.25},
+    ],
+    # (comm boost qty, %, days, gift card qty, $, discount qty, %,
+    #  spark ads qty, $, phys gift qty, $, experience qty, $)
+    'welcome_rewards': {
+        'Bronze': [1, 0.10, 30, 0, 0, 2, 0.15, 0, 0, 0, 0, 0, 0],
+        'Silver': [2, 0.15, 30, 1, 50, 2, 0.15, 1, 25, 0, 0, 0, 0],
+        'Gold': [1, 0.20, 30, 1, 100, 2, 0.20, 1, 50, 1, 50, 0, 0],
+        'Platinum': [2, 0.25, 45, 2, 150, 3, 0.25, 2, 75, 1, 75, 1, 100],
+        'Diamond': [3, 0.30, 60, 2, 200, 3, 0.30, 2, 100, 1, 100, 1, 200],
+    },
+    'missions': [
+        {'level': 'Bronze', 'mission_type': 'Videos', 'target': 5, 'repeatability': 'Monthly',
+         'completion_rate': 0.25, 'reward_type': 'Gift Card', 'reward_value': 50, 'reward_duration': 0, 'active': True},
+        {'level': 'Bronze', 'mission_type': 'Likes', 'target': 100, 'repeatability': 'Monthly',
+         'completion_rate': 0.20, 'reward_type': 'Gift Card', 'reward_value': 50, 'reward_duration': 0, 'active': True},
+        {'level': 'Silver', 'mission_type': 'Videos', 'target': 10, 'repeatability': 'Monthly',
+         'completion_rate': 0.20, 'reward_type': 'Commission Boost', 'reward_value': 0.20, 'reward_duration': 30, 'active': True},
+        {'level': 'Silver', 'mission_type': 'Likes', 'target': 100, 'repeatability': 'Monthly',
+         'completion_rate': 0.15, 'reward_type': 'Gift Card', 'reward_value': 50, 'reward_duration': 0, 'active': True},
+        {'level': 'Gold', 'mission_type': 'Sales', 'target': 100, 'repeatability': 'One-time',
+         'completion_rate': 0.10, 'reward_type': 'Commission Boost', 'reward_value': 0.30, 'reward_duration': 45, 'active': True},
+        {'level': 'Gold', 'mission_type': 'Views', 'target': 1000, 'repeatability': 'Monthly',
+         'completion_rate': 0.15, 'reward_type': 'Spark Ads', 'reward_value': 50, 'reward_duration': 0, 'active': True},
+        {'level': 'Platinum', 'mission_type': 'Sales', 'target': 200, 'repeatability': 'One-time',
+         'completion_rate': 0.08, 'reward_type': 'Gift Card', 'reward_value': 200, 'reward_duration': 0, 'active': True},
+        {'level': 'Platinum', 'mission_type': 'Videos', 'target': 20, 'repeatability': 'Monthly',
+         'completion_rate': 0.12, 'reward_type': 'Commission Boost', 'reward_value': 0.25, 'reward_duration': 30, 'active': True},
+        {'level': 'Diamond', 'mission_type': 'Sales', 'target': 500, 'repeatability': 'One-time',
+         'completion_rate': 0.05, 'reward_type': 'Gift Card', 'reward_value': 300, 'reward_duration': 0, 'active': True},
+        {'level': 'Diamond', 'mission_type': 'Views', 'target': 5000, 'repeatability': 'Monthly',
+         'completion_rate': 0.10, 'reward_type': 'Spark Ads', 'reward_value': 100, 'reward_duration': 0, 'active': True},
+    ],
+}
+
+# Column order of a welcome_rewards row (VIP Levels columns B-N)
+WELCOME_REWARD_FIELDS = [
+    'comm_boost_qty', 'comm_boost_pct', 'comm_boost_days',
+    'gift_card_qty', 'gift_card_value', 'discount_qty', 'discount_pct',
+    'spark_ads_qty', 'spark_ads_value', 'phys_gift_qty', 'phys_gift_value',
+    'experience_qty', 'experience_value',
+]
+
+# Every monthly output row, in sheet order. Labels match the builder's rows.
+OUTPUT_METRICS = [
+    ('Affiliate Projection', 'Samples Sent'),
+    ('Affiliate Projection', 'New Affiliates (from Samples)'),
+    ('Affiliate Projection', 'Flywheel Affiliates'),
+    ('Affiliate Projection', 'Total New Affiliates'),
+    ('Affiliate Projection', 'Churned Affiliates'),
+    ('Affiliate Projection', 'Active Affiliates (End of Month)'),
+    ('Affiliate Projection', 'Total Sales'),
+    ('Affiliate Projection', 'Affiliates at Bronze'),
+    ('Affiliate Projection', 'Affiliates at Silver'),
+    ('Affiliate Projection', 'Affiliates at Gold'),
+    ('Affiliate Projection', 'Affiliates at Platinum'),
+    ('Affiliate Projection', 'Affiliates at Diamond'),
+    ('Affiliate Projection', 'New Affiliate Level-Ups (to Bronze)'),
+    ('Affiliate Projection', 'Promotion Events (Bronze to higher)'),
+    ('Affiliate Projection', 'Total Level-Up Events'),
+    ('Affiliate Projection', 'Demotion Events'),
+    ('Reward Triggers', 'Commission Boosts Triggered'),
+    ('Reward Triggers', 'Gift Cards Triggered'),
+    ('Reward Triggers', 'Discount Coupons Triggered'),
+    ('Reward Triggers', 'Spark Ads Triggered'),
+    ('Reward Triggers', 'Physical Gifts Triggered'),
+    ('Reward Triggers', 'Experiences Triggered'),
+    ('Reward Triggers', 'Mission Completions (Bronze)'),
+    ('Reward Triggers', 'Mission Completions (Silver)'),
+    ('Reward Triggers', 'Mission Completions (Gold)'),
+    ('Reward Triggers', 'Mission Completions (Platinum)'),
+    ('Reward Triggers', 'Mission Completions (Diamond)'),
+    ('Reward Triggers', 'Total Mission Completions'),
+    ('Revenue', 'Total Sales Volume'),
+    ('Revenue', 'Gross AOV'),
+    ('Revenue', 'Gross Revenue'),
+    ('Revenue', 'Avg Discount % (when redeemed)'),
+    ('Revenue', 'Discount Redemption Rate'),
+    ('Revenue', 'Discounted Sales Count'),
+    ('Revenue', 'Net AOV (weighted avg)'),
+    ('Revenue', 'Net Revenue'),
+    ('Revenue', 'Discount Margin Erosion'),
+    ('Costs', 'Base Commission Cost'),
+    ('Costs', 'Commission Boost Cost (Welcome)'),
+    ('Costs', 'Commission Boost Cost (Missions)'),
+    ('Costs', 'Discount Cost (Margin Erosion)'),
+    ('Costs', 'Total CM1 Costs'),
+    ('Costs', 'Gift Card Cost (Welcome)'),
+    ('Costs', 'Gift Card Cost (Missions)'),
+    ('Costs', 'Total Gift Card Cost'),
+    ('Costs', 'Total Loyalty Program Costs'),
+    ('Costs', 'Spark Ads Cost (Welcome)'),
+    ('Costs', 'Spark Ads Cost (Missions)'),
+    ('Costs', 'Physical Gift Cost'),
+    ('Costs', 'Experience Cost'),
+    ('Costs', 'Raffle Prize Cost'),
+    ('Costs', 'Sample Cost'),
+    ('Costs', 'Total Marketing OpEx'),
+    ('Costs', 'Total Program Cost'),
+]
+
+
+def default_config():
+    """Fresh copy of DEFAULT_CONFIG (safe to mutate for scenario variants)."""
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def excel_round(value):
+    """Excel ROUND(x, 0): halves round away from zero (Python rounds to even)."""
+    return math.copysign(math.floor(abs(value) + 0.5), value)
+
+
+def _sumproduct(values, weights):
+    return sum(v * w for v, w in zip(values, weights))
+
+
+def _weighted_avg(values, weights):
+    # Excel shows #DIV/0! when the weights are all zero; the sweep keeps going with 0
+    total = sum(weights)
+    return _sumproduct(values, weights) / total if total else 0.0
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+def evaluate(config):
+    """
+    Evaluate the 12-month model for a config.
+
+    Returns {sheet: {metric: [month 1 .. month 12]}} for every row in
+    OUTPUT_METRICS.
+    """
+    inp = dict(OPTIONAL_INPUTS, **config['inputs'])
+    dist = [config['level_distribution'][name] for name in LEVEL_NAMES]
+    commission = [level['commission_rate'] for level in config['levels']]
+    welcome = [dict(zip(WELCOME_REWARD_FIELDS, config['welcome_rewards'][name])) for name in LEVEL_NAMES]
+
+    def col(field, start=0):
+        return [row[field] for row in welcome[start:]]
+
+    def col_value(qty, value, start=0):
+        return [row[qty] * row[value] for row in welcome[start:]]
+
+    # VIP Levels rows 22-26 (weighted welcome reward summary)
+    weighted_boost_pct = _sumproduct(col('comm_boost_pct'), dist)
+    weighted_gift_card = _sumproduct(col_value('gift_card_qty', 'gift_card_value'), dist)
+    weighted_spark_ads = _sumproduct(col_value('spark_ads_qty', 'spark_ads_value'), dist)
+    weighted_phys_gift = _sumproduct(col_value('phys_gift_qty', 'phys_gift_value'), dist)
+    weighted_experience = _sumproduct(col_value('experience_qty', 'experience_value'), dist)
+    weighted_commission = _sumproduct(commission, dist)
+    avg_discount_pct = _sumproduct(col('discount_pct'), dist)
+
+    # Revenue rows 5, 8, 10 are constant across months
+    gross_aov = inp['Gross AOV']
+    redemption_rate = inp['Discount Redemption Rate']
+    net_aov = gross_aov * (1 - avg_discount_pct * redemption_rate)
+    boost_sales = inp['Avg Sales During Commission Boost']
+
+    # Missions col J and summaries (rows 29-33, 38-40)
+    active = [m for m in config['missions'] if m['active']]
+
+    def mission_cost(mission):
+        if mission['reward_type'] in ('Gift Card', 'Spark Ads'):
+            return mission['reward_value']
+        if mission['reward_type'] == 'Commission Boost':
+            return mission['reward_value'] * boost_sales * net_aov
+        return 0
+
+    level_count = []
+    level_completion = []
+    for name in LEVEL_NAMES:
+        rates = [m['completion_rate'] for m in active if m['level'] == name]
+        level_count.append(len(rates))
+        level_completion.append(sum(rates) / len(rates) if rates else 0)
+
+    type_count = {}
+    type_avg_cost = {}
+    for rtype in REWARD_TYPES:
+        costs = [mission_cost(m) for m in active if m['reward_type'] == rtype]
+        type_count[rtype] = len(costs)
+        type_avg_cost[rtype] = sum(costs) / len(costs) if costs else 0
+    typed_total = sum(type_count.values())
+    type_share = {rtype: (type_count[rtype] / typed_total if typed_total else 0) for rtype in REWARD_TYPES}
+
+    # Reward Triggers per-promotion weights (welcome rewards of the level reached)
+    boosts_per_promotion = _weighted_avg(col('comm_boost_qty', 1), dist[1:])
+    gifts_per_promotion = _weighted_avg(col('gift_card_qty', 1), dist[1:])
+    discounts_per_level_up = _sumproduct(col('discount_qty'), dist)
+    spark_per_promotion = _weighted_avg(col('spark_ads_qty', 1), dist[1:])
+    phys_per_promotion = _weighted_avg(col('phys_gift_qty', 2), dist[2:])
+    experience_per_promotion = _weighted_avg(col('experience_qty', 3), dist[3:])
+
+    out = {sheet: {} for sheet, _ in OUTPUT_METRICS}
+    for sheet, metric in OUTPUT_METRICS:
+        out[sheet][metric] = []
+    proj = out['Affiliate Projection']
+    trig = out['Reward Triggers']
+    rev = out['Revenue']
+    cost = out['Costs']
+
+    prev_active = 0
+    prev_higher = 0
+    for month in range(1, MONTHS + 1):
+        # ---- Affiliate Projection ----
+        samples = inp['Samples Sent - Month 1'] if month == 1 else inp['Samples Sent - Month 2+']
+        new_from_samples = excel_round(samples * inp['Sample-to-Affiliate Conversion Rate'])
+        flywheel = inp['Flywheel Affiliates per Month']
+        total_new = new_from_samples + flywheel
+        churned = 0 if month == 1 else excel_round(prev_active * inp['Affiliate Attrition Rate'])
+        active_affiliates = prev_active + total_new - churned
+        total_sales = excel_round(active_affiliates * inp['Average Sales per Affiliate per Month'])
+        if month == 1:
+            at_level = [active_affiliates, 0, 0, 0, 0]
+        else:
+            at_level = [excel_round(active_affiliates * pct) for pct in dist]
+        higher = sum(at_level[1:])
+        promotions = 0 if month == 1 else max(0, higher - prev_higher)
+        demotions = 0 if month == 1 else max(0, prev_higher - higher)
+
+        proj['Samples Sent'].append(samples)
+        proj['New Affiliates (from Samples)'].append(new_from_samples)
+        proj['Flywheel Affiliates'].append(flywheel)
+        proj['Total New Affiliates'].append(total_new)
+        proj['Churned Affiliates'].append(churned)
+        proj['Active Affiliates (End of Month)'].append(active_affiliates)
+        proj['Total Sales'].append(total_sales)
+        for name, count in zip(LEVEL_NAMES, at_level):
+            proj['Affiliates at %s' % name].append(count)
+        proj['New Affiliate Level-Ups (to Bronze)'].append(total_new)
+        proj['Promotion Events (Bronze to higher)'].append(promotions)
+        proj['Total Level-Up Events'].append(total_new + promotions)
+        proj['Demotion Events'].append(demotions)
+
+        # ---- Reward Triggers ----
+        boosts = excel_round(total_new * welcome[0]['comm_boost_qty'] + promotions * boosts_per_promotion)
+        gift_cards = excel_round(promotions * gifts_per_promotion)
+        discounts = excel_round((total_new + promotions) * discounts_per_level_up)
+        spark_ads = excel_round(promotions * spark_per_promotion)
+        phys_gifts = excel_round(promotions * phys_per_promotion)
+        experiences = excel_round(promotions * experience_per_promotion)
+        completions = [
+            excel_round(count * level_count[i] * level_completion[i])
+            for i, count in enumerate(at_level)
+        ]
+        total_completions = sum(completions)
+
+        trig['Commission Boosts Triggered'].append(boosts)
+        trig['Gift Cards Triggered'].append(gift_cards)
+        trig['Discount Coupons Triggered'].append(discounts)
+        trig['Spark Ads Triggered'].append(spark_ads)
+        trig['Physical Gifts Triggered'].append(phys_gifts)
+        trig['Experiences Triggered'].append(experiences)
+        for name, count in zip(LEVEL_NAMES, completions):
+            trig['Mission Completions (%s)' % name].append(count)
+        trig['Total Mission Completions'].append(total_completions)
+
+        # ---- Revenue ----
+        gross_revenue = total_sales * gross_aov
+        net_revenue = total_sales * net_aov
+        rev['Total Sales Volume'].append(total_sales)
+        rev['Gross AOV'].append(gross_aov)
+        rev['Gross Revenue'].append(gross_revenue)
+        rev['Avg Discount % (when redeemed)'].append(avg_discount_pct)
+        rev['Discount Redemption Rate'].append(redemption_rate)
+        rev['Discounted Sales Count'].append(excel_round(total_sales * redemption_rate))
+        rev['Net AOV (weighted avg)'].append(net_aov)
+        rev['Net Revenue'].append(net_revenue)
+        rev['Discount Margin Erosion'].append(gross_revenue - net_revenue)
+
+        # ---- Costs ----
+        base_commission = total_sales * weighted_commission * net_aov
+        boost_welcome = boosts * boost_sales * weighted_boost_pct * net_aov
+        boost_missions = total_completions * type_share['Commission Boost'] * type_avg_cost['Commission Boost']
+        discount_cost = gross_revenue - net_revenue
+        total_cm1 = base_commission + boost_welcome + boost_missions + discount_cost
+        gift_welcome = gift_cards * weighted_gift_card
+        gift_missions = total_completions * type_share['Gift Card'] * type_avg_cost['Gift Card']
+        total_gift = gift_welcome + gift_missions
+        spark_welcome = spark_ads * weighted_spark_ads
+        spark_missions = total_completions * type_share['Spark Ads'] * type_avg_cost['Spark Ads']
+        phys_cost = phys_gifts * weighted_phys_gift
+        experience_cost = experiences * weighted_experience
+        raffle_cost = inp['Raffles per Month'] * inp['Avg Raffle Prize Cost']
+        sample_cost = samples * inp['Cost per Sample']
+        total_opex = spark_welcome + spark_missions + phys_cost + experience_cost + raffle_cost + sample_cost
+
+        cost['Base Commission Cost'].append(base_commission)
+        cost['Commission Boost Cost (Welcome)'].append(boost_welcome)
+        cost['Commission Boost Cost (Missions)'].append(boost_missions)
+        cost['Discount Cost (Margin Erosion)'].append(discount_cost)
+        cost['Total CM1 Costs'].append(total_cm1)
+        cost['Gift Card Cost (Welcome)'].append(gift_welcome)
+        cost['Gift Card Cost (Missions)'].append(gift_missions)
+        cost['Total Gift Card Cost'].append(total_gift)
+        cost['Total Loyalty Program Costs'].append(total_gift)
+        cost['Spark Ads Cost (Welcome)'].append(spark_welcome)
+        cost['Spark Ads Cost (Missions)'].append(spark_missions)
+        cost['Physical Gift Cost'].append(phys_cost)
+        cost['Experience Cost'].append(experience_cost)
+        cost['Raffle Prize Cost'].append(raffle_cost)
+        cost['Sample Cost'].append(sample_cost)
+        cost['Total Marketing OpEx'].append(total_opex)
+        cost['Total Program Cost'].append(total_cm1 + total_gift + total_opex)
+
+        prev_active = active_affiliates
+        prev_higher = higher
+
+    return out
+
+
+if __name__ == '__main__':
+    results = evaluate(DEFAULT_CONFIG)
+    for sheet, metric in [('Affiliate Projection', 'Active Affiliates (End of Month)'),
+                          ('Revenue', 'Net Revenue'),
+                          ('Costs', 'Total Program Cost')]:
+        values = results[sheet][metric]
+        print(f"{metric:35s} M12={values[-1]:>12,.0f}  Total={sum(values):>14,.0f}")
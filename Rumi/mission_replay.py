@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Mission Progress Replay
+Replays mission progress for every user x mission x cycle from a table
+snapshot, the way create_mission_progress_for_eligible_users,
+update_mission_progress and the recurring claim RPCs
+(20251226100000_recurring_missions.sql,
+20251226223419_fix_recurring_checkpoint_start.sql) move it:
+
+- cycle 0 is the row created for every eligible user (mission tier_order
+  <= the user's, or 'all'): the existing mission_progress row's window
+  when the snapshot has one, else [tier_achieved_at, next_checkpoint_at)
+- a cycle completes on the first day its value (SUM(gmv)::INTEGER,
+  SUM(units_sold), COUNT(*), SUM(views), SUM(likes) over post_date in the
+  window) reaches target_value; the next daily sync creates the claimable
+  redemption
+- the reward is claimed claim_delay days later, and not before the
+  instance's cooldown_until; only users whose current tier is the
+  mission's tier (or 'all') can claim (claimMissionReward)
+- claiming a weekly / monthly / unlimited reward starts the next cycle at
+  the claim, with a 7 / 30 / 0 day cooldown
+
+Recurring instances are created with checkpoint_end NULL, so the SQL
+window (post_date < NULL) never matches and update_mission_progress keeps
+them at 0: cycles after the first are replayed with the window open until
+completion, as intended, and reported separately.
+
+Videos are streamed into per-(user, day) buckets with running sums, so the
+value of any window is two binary searches and the completion day of
+every open cycle is one vectorized search per cycle step.
+
+With a mission_progress table in the snapshot, --check compares each
+active row's current_value with the value its window should hold (the
+correctness oracle for update_mission_progress).
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/today
+    python mission_replay.py snapshots/today --client-id <uuid> --claim-delay 2 --cycles cycles.csv
+    python mission_replay.py snapshots/today --check
+    python mission_replay.py snapshots/today --out model_configs/missions.yaml --base model_configs/base.yaml
+"""
+
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from loyalty_model import LEVEL_NAMES
+from table_snapshot import iter_table_batches, read_table, table_path
+
+# mission_type -> bucket metric, and the Missions sheet's mission type
+METRIC_OF = {'sales_dollars': 'gmv', 'sales_units': 'units', 'videos': 'videos', 'views': 'views', 'likes': 'likes'}
+MODEL_TYPE_OF = {'sales_dollars': 'Sales', 'sales_units': 'Sales', 'videos': 'Videos', 'views': 'Views',
+                 'likes': 'Likes'}
+METRICS = ['gmv', 'units', 'videos', 'views', 'likes']
+# claim_* RPCs: cooldown_until = claim + N days
+COOLDOWN_DAYS = {'weekly': 7, 'monthly': 30, 'unlimited': 0}
+# Reward types whose value_data amount is a cash cost
+CASH_REWARDS = ('gift_card', 'spark_ads')
+
+US_PER_DAY = 86_400_000_000
+DAYS_PER_MONTH = 365.25 / 12
+# (user code, day) packed into one int64 key; days since 1970 fit in 16 bits until 2149
+_DAY_BITS = 16
+DAY_LIMIT = (1 << _DAY_BITS) - 1
+NEVER = np.iinfo(np.int64).max
+
+
+def _numpy(column, fill, dtype=np.int64):
+    return pc.fill_null(column, fill).to_numpy(zero_copy_only=False).astype(dtype)
+
+
+def _ceil_day(column):
+    """Timestamp column -> first day whose midnight is >= it (post_date >= ts); NULL -> NEVER."""
+    us = _numpy(pc.cast(column, pa.int64()), NEVER)
+    return np.where(us == NEVER, NEVER, -(-us // US_PER_DAY))
+
+
+def _month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+# ============================================================================
+# DAILY BUCKETS
+# ============================================================================
+def _merge(parts):
+    """Sum (keys, sums[metric, key]) parts into one part with unique, sorted keys."""
+    keys = np.concatenate([p[0] for p in parts])
+    values = np.concatenate([p[1] for p in parts], axis=1)
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    sums = np.stack([np.bincount(inverse, weights=row, minlength=len(uniq)) for row in values])
+    return uniq, np.round(sums).astype(np.int64)
+
+
+class DailyBuckets:
+    """
+    Per-(user, day) video sums with running totals. Window bounds are day
+    numbers, [start, end); metrics are non-negative, so running totals are
+    sorted and completion days come from a binary search.
+    """
+
+    def __init__(self, keys, sums, last_day):
+        self.keys = keys
+        self.last_day = last_day
+        self.cum = {m: np.concatenate([[0], np.cumsum(sums[i])]) for i, m in enumerate(METRICS)}
+
+    def _pos(self, user, day):
+        return np.searchsorted(self.keys, (user << _DAY_BITS) + np.clip(day, 0, DAY_LIMIT))
+
+    def window_sum(self, metric, user, start, end):
+        cum = self.cum[metric]
+        return cum[self._pos(user, end)] - cum[self._pos(user, start)]
+
+    def first_reaching(self, metric, user, start, end, need):
+        """Day on which the window's running sum first reaches need (> 0), or NEVER."""
+        cum = self.cum[metric]
+        lo, hi = self._pos(user, start), self._pos(user, end)
+        i = np.searchsorted(cum, cum[lo] + need, side='left')
+        reached = i <= hi
+        day = self.keys[np.clip(i - 1, 0, max(len(self.keys) - 1, 0))] & DAY_LIMIT
+        return np.where(reached, day, NEVER)
+
+
+def bucket_videos(directory, user_ids, client_id=None, block_size=4 << 20):
+    """Stream videos.csv into DailyBuckets over the given users (gmv in cents)."""
+    code_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    parts = []
+    pending_rows = merged_rows = 0
+    last_day = None
+    columns = ['user_id', 'client_id', 'post_date', 'gmv', 'units_sold', 'views', 'likes']
+    for batch in iter_table_batches(directory, 'videos', columns, client_id, block_size):
+        # Look up each distinct id of the block once
+        encoded = pc.dictionary_encode(batch['user_id'])
+        codes = np.array([code_of.get(user_id, -1) for user_id in encoded.dictionary.to_pylist()] + [-1])
+        user = codes[pc.fill_null(encoded.indices, len(codes) - 1).to_numpy()]
+        keep = user >= 0
+        if not keep.any():
+            continue
+        days = _numpy(pc.cast(batch['post_date'], pa.int32()), 0)[keep]
+        last_day = max(last_day or days.max(), days.max())
+        values = np.stack([
+            np.round(_numpy(batch['gmv'], 0.0, np.float64)[keep] * 100),
+            _numpy(batch['units_sold'], 0)[keep],
+            np.ones(int(keep.sum())),
+            _numpy(batch['views'], 0)[keep],
+            _numpy(batch['likes'], 0)[keep],
+        ])
+        parts.append(_merge([((user[keep] << _DAY_BITS) | days, values)]))
+        pending_rows += len(parts[-1][0])
+        if pending_rows > max(merged_rows, 1 << 20):
+            parts = [_merge(parts)]
+            merged_rows = pending_rows = len(parts[0][0])
+
+    if not parts:
+        return DailyBuckets(np.empty(0, dtype=np.int64), np.zeros((len(METRICS), 0), dtype=np.int64), None)
+    keys, sums = _merge(parts)
+    return DailyBuckets(keys, sums, int(last_day))
+
+
+def sql_value(buckets, mission_type, user, start, end):
+    """current_value update_mission_progress writes for windows [start, end) (NEVER bounds match nothing)."""
+    value = buckets.window_sum(METRIC_OF[mission_type], user, start, end)
+    if mission_type == 'sales_dollars':
+        value = (value + 50) // 100  # SUM(gmv)::INTEGER rounds half away from zero
+    return np.where((start == NEVER) | (end == NEVER), 0, value)
+
+
+def _need(mission_type, target):
+    # SUM(gmv)::INTEGER >= target  <=>  cents >= 100 * target - 50
+    return 100 * target - 50 if mission_type == 'sales_dollars' else target
+
+
+# ============================================================================
+# SNAPSHOT
+# ============================================================================
+def load_program(directory, client_id=None):
+    """Users, tiers, missions and rewards of one client, as plain arrays."""
+    clients = read_table(directory, 'clients', ['id'], client_id)
+    if clients.num_rows != 1:
+        raise SystemExit(f"Snapshot has {clients.num_rows} clients; pass --client-id")
+    client_id = clients['id'][0].as_py()
+
+    tiers = read_table(directory, 'tiers', ['tier_id', 'client_id', 'tier_order'], client_id).sort_by('tier_order')
+    tier_ids = tiers['tier_id'].to_pylist()
+    tier_order = dict(zip(tier_ids, tiers['tier_order'].to_pylist()))
+    users = read_table(directory, 'users', ['id', 'client_id', 'current_tier', 'tier_achieved_at',
+                                            'next_checkpoint_at'], client_id)
+    rewards = read_table(directory, 'rewards', None, client_id)
+    reward_of = {r['id']: r for r in rewards.to_pylist()}
+    missions = []
+    for m in read_table(directory, 'missions', None, client_id).to_pylist():
+        if m['mission_type'] not in METRIC_OF or not m['enabled']:
+            continue
+        reward = reward_of.get(m['reward_id']) or {}
+        value_data = json.loads(reward.get('value_data') or '{}')
+        missions.append(dict(
+            m, reward_type=reward.get('type'), frequency=reward.get('redemption_frequency') or 'one-time',
+            cash=float(value_data.get('amount') or 0) if reward.get('type') in CASH_REWARDS else 0.0,
+            tier_order=tier_order.get(m['tier_eligibility']),
+            level=LEVEL_NAMES[min(tier_ids.index(m['tier_eligibility']), len(LEVEL_NAMES) - 1)]
+            if m['tier_eligibility'] in tier_order else None,
+        ))
+    return {
+        'client_id': client_id,
+        'tier_order': tier_order,
+        'user_ids': users['id'].to_pylist(),
+        'user_tier': np.array(users['current_tier'].to_pylist(), dtype=object),
+        'user_tier_order': np.array([tier_order.get(t, -1) for t in users['current_tier'].to_pylist()]),
+        'start': _ceil_day(users['tier_achieved_at']),
+        'end': _ceil_day(users['next_checkpoint_at']),
+        'missions': missions,
+    }
+
+
+def _load_progress(directory, client_id, user_ids, missions):
+    """mission_progress rows as arrays (user and mission codes), or None without the table."""
+    if not os.path.exists(table_path(directory, 'mission_progress')):
+        return None
+    rows = read_table(directory, 'mission_progress', None, client_id)
+    user_code = pc.index_in(rows['user_id'], value_set=pa.array(user_ids, pa.string()))
+    mission_code = pc.index_in(rows['mission_id'], value_set=pa.array([m['id'] for m in missions], pa.string()))
+    keep = pc.and_(pc.is_valid(user_code), pc.is_valid(mission_code))
+    rows = rows.filter(keep)
+    return {
+        'id': rows['id'].to_pylist(),
+        'user': _numpy(pc.filter(user_code, keep), -1),
+        'mission': _numpy(pc.filter(mission_code, keep), -1),
+        'current_value': _numpy(rows['current_value'], 0),
+        'status': np.array(rows['status'].to_pylist(), dtype=object),
+        'start': _ceil_day(rows['checkpoint_start']),
+        'end': _ceil_day(rows['checkpoint_end']),
+    }
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+def replay(program, buckets, progress=None, as_of=None, claim_delay=0):
+    """
+    Returns a dict of arrays with one entry per user x mission x cycle:
+    user, mission, cycle, start (first counted day), completed (day or
+    NEVER), claimed (day or NEVER), at_level (the user can claim it). Days
+    are days since 1970-01-01; only completions before as_of (default: the
+    day after the last post) count.
+    """
+    if as_of is None:
+        as_of = (buckets.last_day or 0) + 1
+    missions = program['missions']
+    n_users = len(program['user_ids'])
+
+    # Cycle 0: every eligible (user, mission) pair of an activated mission
+    pair_user, pair_mission = [], []
+    for j, m in enumerate(missions):
+        if not m['activated'] or not m['target_value'] or m['target_value'] <= 0:
+            continue
+        if m['tier_eligibility'] == 'all':
+            users = np.arange(n_users)
+        elif m['tier_order'] is None:
+            continue
+        else:
+            users = np.flatnonzero(program['user_tier_order'] >= m['tier_order'])
+        pair_user.append(users)
+        pair_mission.append(np.full(len(users), j))
+    user = np.concatenate(pair_user) if pair_user else np.empty(0, dtype=np.int64)
+    mission = np.concatenate(pair_mission) if pair_mission else np.empty(0, dtype=np.int64)
+    start, end = program['start'][user], program['end'][user]
+
+    # The existing first instance's window wins over the user's current one
+    if progress is not None and len(progress['user']):
+        stride = len(missions)
+        order = np.lexsort((progress['start'], progress['user'] * stride + progress['mission']))
+        key = (progress['user'] * stride + progress['mission'])[order]
+        first = order[np.r_[True, key[1:] != key[:-1]]]
+        first_key = (progress['user'] * stride + progress['mission'])[first]
+        pos = np.searchsorted(first_key, user * stride + mission)
+        found = pos < len(first_key)
+        found[found] = first_key[pos[found]] == (user * stride + mission)[found]
+        start = np.where(found, progress['start'][first[np.minimum(pos, len(first) - 1)]], start)
+        end = np.where(found, progress['end'][first[np.minimum(pos, len(first) - 1)]], end)
+
+    mission_type = np.array([m['mission_type'] for m in missions], dtype=object)
+    target = np.array([m['target_value'] or 0 for m in missions], dtype=np.int64)
+    need = np.array([_need(m['mission_type'], m['target_value'] or 0) for m in missions], dtype=np.int64)
+    cooldown = np.array([COOLDOWN_DAYS.get(m['frequency'], -1) for m in missions])
+    claim_tier = np.array([m['tier_eligibility'] for m in missions], dtype=object)
+    can_claim_pair = (claim_tier[mission] == 'all') | (claim_tier[mission] == program['user_tier'][user])
+
+    cycles = {name: [] for name in ('user', 'mission', 'cycle', 'start', 'completed', 'claimed', 'at_level')}
+    cooldown_day = np.zeros(len(user), dtype=np.int64)
+    cycle = 0
+    pair = np.arange(len(user))
+    while len(pair):
+        u, j = user[pair], mission[pair]
+        window_end = np.minimum(end[pair], as_of)
+        completed = np.full(len(pair), NEVER)
+        for t in np.unique(mission_type[j]):
+            sel = (mission_type[j] == t) & (start[pair] < window_end)
+            if sel.any():
+                completed[sel] = buckets.first_reaching(METRIC_OF[t], u[sel], start[pair][sel], window_end[sel],
+                                                        need[j][sel])
+        # Redemption appears at the next sync; claimed after the delay, not before the cooldown ends
+        claim = np.maximum(completed + 1, cooldown_day[pair]) + claim_delay
+        claimed = np.where((completed != NEVER) & can_claim_pair[pair] & (claim < as_of), claim, NEVER)
+
+        for name, values in (('user', u), ('mission', j), ('cycle', np.full(len(pair), cycle)),
+                             ('start', start[pair]), ('completed', completed), ('claimed', claimed),
+                             ('at_level', can_claim_pair[pair])):
+            cycles[name].append(values)
+
+        # Claimed recurring rewards open the next cycle at the claim (post_date >= claim time: the next day)
+        again = (claimed != NEVER) & (cooldown[j] >= 0)
+        pair = pair[again]
+        start[pair] = claimed[again] + 1
+        end[pair] = NEVER
+        cooldown_day[pair] = claimed[again] + cooldown[mission[pair]]
+        cycle += 1
+    result = {name: np.concatenate(values) if values else np.empty(0, dtype=np.int64)
+              for name, values in cycles.items()}
+    result['as_of'] = as_of
+    result['target'] = target
+    return result
+
+
+def mission_rates(program, result):
+    """
+    Per mission: pairs, completions per cycle, claims, and completions per
+    affiliate-month at the mission's level (users whose current tier is the
+    mission's tier, from their first window to as_of), the Missions sheet's
+    completion_rate.
+    """
+    as_of = result['as_of']
+    first = result['cycle'] == 0
+    done = result['completed'] != NEVER
+    at_level = result['at_level']
+    exposure = np.where(first & at_level, np.clip(as_of - np.minimum(result['start'], as_of), 0, None), 0)
+    rows = []
+    for j, m in enumerate(program['missions']):
+        mine = result['mission'] == j
+        if not mine.any():
+            continue
+        months = exposure[mine].sum() / DAYS_PER_MONTH
+        level_done = (done & mine & at_level).sum()
+        rows.append({
+            'mission_id': m['id'], 'title': m['title'], 'tier': m['tier_eligibility'], 'level': m['level'],
+            'mission_type': m['mission_type'], 'model_type': MODEL_TYPE_OF[m['mission_type']],
+            'target': m['target_value'], 'frequency': m['frequency'], 'reward_type': m['reward_type'],
+            'pairs': int((mine & first).sum()),
+            'completions': int((done & mine).sum()),
+            'first_cycle': int((done & mine & first).sum()),
+            'later_cycles': int((done & mine & ~first).sum()),
+            'unclaimable': int((done & mine & ~at_level).sum()),
+            'claims': int(((result['claimed'] != NEVER) & mine).sum()),
+            'affiliate_months': float(months),
+            'completion_rate': float(level_done / months) if months else 0.0,
+        })
+    return rows
+
+
+def redemption_volume(program, result):
+    """Redemptions created and claimed per month, with the cash value (gift cards, spark ads) of the claims."""
+    cash = np.array([m['cash'] for m in program['missions']] + [0.0])
+    months = {}
+    for column, kind in (('completed', 'created'), ('claimed', 'claimed')):
+        hit = result[column] != NEVER
+        month = result[column][hit].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        uniq, inverse = np.unique(month, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(uniq))
+        value = np.bincount(inverse, weights=cash[result['mission'][hit]], minlength=len(uniq))
+        for m, count, total in zip(uniq, counts, value):
+            row = months.setdefault(int(m), {'month': _month_label(m), 'created': 0, 'claimed': 0,
+                                             'claimed_cash': 0.0})
+            row[kind] = int(count)
+            if kind == 'claimed':
+                row['claimed_cash'] = float(total)
+    return [months[m] for m in sorted(months)]
+
+
+def calibrated_missions(config, rates):
+    """
+    Set completion_rate of the config's missions from the replayed rates
+    (mean over database missions of the same level and model type).
+    Returns the (level, mission_type) pairs updated.
+    """
+    measured = {}
+    for row in rates:
+        if row['level'] and row['affiliate_months']:
+            measured.setdefault((row['level'], row['model_type']), []).append(row['completion_rate'])
+    updated = []
+    for mission in config['missions']:
+        key = (mission['level'], mission['mission_type'])
+        if key in measured:
+            mission['completion_rate'] = round(min(1.0, sum(measured[key]) / len(measured[key])), 4)
+            updated.append(key)
+    return updated
+
+
+# ============================================================================
+# ORACLE
+# ============================================================================
+def check_progress(program, buckets, progress):
+    """
+    Compare active mission_progress rows of activated missions with the
+    value their window should hold. Returns (checked, stale mask, expected
+    values, should-be-completed mask, never-advancing mask) over the
+    progress rows; unchecked rows are False in every mask.
+    """
+    missions = program['missions']
+    activated = np.array([m['activated'] for m in missions] + [False])
+    checked = (progress['status'] == 'active') & activated[progress['mission']]
+    expected = np.zeros(len(checked), dtype=np.int64)
+    types = np.array([m['mission_type'] for m in missions], dtype=object)
+    target = np.array([m['target_value'] or 0 for m in missions], dtype=np.int64)
+    for t in np.unique(types):
+        sel = checked & (types[progress['mission']] == t)
+        if sel.any():
+            expected[sel] = sql_value(buckets, t, progress['user'][sel], progress['start'][sel],
+                                      progress['end'][sel])
+    stale = checked & (progress['current_value'] != expected)
+    should_complete = checked & (target[progress['mission']] > 0) & (expected >= target[progress['mission']])
+    never = checked & (progress['end'] == NEVER)
+    return checked, stale, expected, should_complete, never
+
+
+def write_cycles(path, program, result):
+    import csv
+
+    def day(value):
+        return '' if value == NEVER else str(np.datetime64(int(value), 'D'))
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'mission_id', 'cycle', 'window_start', 'completed', 'claimed'])
+        for u, j, c, s, done, claimed in zip(result['user'], result['mission'], result['cycle'], result['start'],
+                                             result['completed'], result['claimed']):
+            writer.writerow([program['user_ids'][u], program['missions'][j]['id'], int(c), day(s), day(done),
+                             day(claimed)])
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Replay mission progress per user x mission x cycle')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--as-of', help='replay up to this date (default: the day after the last post)')
+    parser.add_argument('--claim-delay', type=int, default=0, help='days from claimable to claimed')
+    parser.add_argument('--block-mb', type=int, default=4, help='videos.csv read block size')
+    parser.add_argument('--cycles', help='write every user x mission x cycle to this CSV')
+    parser.add_argument('--json', help='write per-mission rates and monthly redemption volume (JSON)')
+    parser.add_argument('--check', action='store_true', help='diff mission_progress.current_value (exit 1 if off)')
+    parser.add_argument('--out', help='write a model config with the replayed completion rates')
+    parser.add_argument('--base', help='config to start from for --out (default: built-in v3 config)')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    program = load_program(args.snapshot, args.client_id)
+    buckets = bucket_videos(args.snapshot, program['user_ids'], program['client_id'], args.block_mb << 20)
+    progress = _load_progress(args.snapshot, program['client_id'], program['user_ids'], program['missions'])
+    as_of = int(np.datetime64(args.as_of, 'D').astype(np.int64)) if args.as_of else None
+    result = replay(program, buckets, progress, as_of, args.claim_delay)
+    rates = mission_rates(program, result)
+    volume = redemption_volume(program, result)
+    print(f"{len(program['user_ids']):,} users, {len(program['missions'])} missions, {len(result['user']):,} "
+          f"user x mission x cycle rows up to {np.datetime64(result['as_of'], 'D')} "
+          f"in {time.perf_counter() - start_time:.1f}s\n")
+
+    print(f"{'mission':28s} {'tier':7s} {'freq':9s} {'pairs':>7s} {'cycle 0':>8s} {'later':>7s} "
+          f"{'no claim':>9s} {'claims':>7s} {'rate/mo':>8s}")
+    for row in rates:
+        print(f"{row['title'][:28]:28s} {row['tier']:7s} {row['frequency']:9s} {row['pairs']:>7,d} "
+              f"{row['first_cycle']:>8,d} {row['later_cycles']:>7,d} {row['unclaimable']:>9,d} "
+              f"{row['claims']:>7,d} {row['completion_rate']:>8.3f}")
+    later = sum(row['later_cycles'] for row in rates)
+    if later:
+        print(f"\n{later:,} completions are in cycles after the first: update_mission_progress leaves those "
+              f"instances at 0 (checkpoint_end is NULL)")
+
+    print(f"\n{'month':8s} {'created':>9s} {'claimed':>9s} {'claimed cash':>13s}")
+    for row in volume:
+        print(f"{row['month']:8s} {row['created']:>9,d} {row['claimed']:>9,d} {row['claimed_cash']:>13,.2f}")
+
+    if args.cycles:
+        write_cycles(args.cycles, program, result)
+        print(f"\nCycles written to {args.cycles}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'as_of': str(np.datetime64(result['as_of'], 'D')), 'claim_delay': args.claim_delay,
+                       'users': len(program['user_ids']), 'missions': rates, 'months': volume}, f, indent=2)
+            f.write('\n')
+        print(f"Report written to {args.json}")
+    if args.out:
+        from loyalty_config import load_config, save_config, validate_config
+        from loyalty_model import default_config
+
+        config = load_config(args.base) if args.base else default_config()
+        updated = calibrated_missions(config, rates)
+        errors = validate_config(config)
+        if errors:
+            print("Config is invalid:\n  - " + '\n  - '.join(errors))
+            sys.exit(1)
+        save_config(config, args.out)
+        print(f"Config written: {args.out} (completion_rate of {len(updated)} missions: "
+              f"{', '.join(f'{level} {kind}' for level, kind in updated) or 'none matched'})")
+
+    if args.check:
+        if progress is None:
+            parser.error('--check needs mission_progress.csv in the snapshot')
+        checked, stale, expected, should_complete, never = check_progress(program, buckets, progress)
+        print(f"\nmission_progress: {int(checked.sum()):,} active rows checked, {int(stale.sum()):,} with a "
+              f"current_value other than their window's, {int(should_complete.sum()):,} at target but not "
+              f"completed, {int(never.sum()):,} with no checkpoint_end (never advance)")
+        for i in np.flatnonzero(stale)[:5]:
+            print(f"  {progress['id'][i]}: {progress['current_value'][i]} -> {expected[i]}")
+        sys.exit(1 if stale.any() or should_complete.any() else 0)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Precomputed Fields Check
+Recomputes every user's precomputed fields from a snapshot's videos and
+sales_adjustments, the way update_precomputed_fields does
+(migrations_backup_20251216/20251215101202_fix_precomputed_fields_adjustments.sql),
+and diffs them against the users table in the same snapshot.
+
+Expected values:
+- total_sales / total_units = SUM(videos) + manual_adjustments_total / _units
+- checkpoint_* = SUM / COUNT over videos with post_date >= tier_achieved_at
+- projected_tier_at_checkpoint = highest tier whose threshold the checkpoint
+  value (by vip_metric) reaches
+- next_tier_* = the tier with tier_order + 1, NULL at the top tier
+- manual_adjustments_total / _units = SUM of applied sales_adjustments
+  (what apply_pending_sales_adjustments has added so far)
+
+Videos are streamed and summed per user in integer cents, so a
+multi-million-video tenant runs in seconds and money compares exactly.
+Mismatches where the database holds 0 are reported as "zeroed": the tier
+jobs (updateUserTierAfterCheckpoint / promoteUserToTier) reset the
+checkpoint totals to 0 without moving tier_achieved_at for maintained
+users, and only the next sync that touches the user recomputes them.
+
+Exits 1 when anything mismatches, for use as a nightly check.
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/today
+    python precomputed_fields.py snapshots/today --client-id <uuid> --mismatches mismatches.csv
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_snapshot import iter_table_batches, read_table
+
+# Fields set by update_precomputed_fields, plus the adjustment totals it builds on
+COUNT_FIELDS = ['total_units', 'checkpoint_units_current', 'checkpoint_videos_posted', 'checkpoint_total_views',
+                'checkpoint_total_likes', 'checkpoint_total_comments', 'next_tier_threshold_units',
+                'manual_adjustments_units']
+MONEY_FIELDS = ['total_sales', 'checkpoint_sales_current', 'next_tier_threshold', 'manual_adjustments_total']
+TEXT_FIELDS = ['projected_tier_at_checkpoint', 'next_tier_name']
+FIELDS = MONEY_FIELDS + COUNT_FIELDS + TEXT_FIELDS
+CHECKPOINT_FIELDS = ['checkpoint_sales_current', 'checkpoint_units_current', 'checkpoint_videos_posted',
+                     'checkpoint_total_views', 'checkpoint_total_likes', 'checkpoint_total_comments']
+
+US_PER_DAY = 86_400_000_000
+NEVER = np.iinfo(np.int64).max
+NULL_CENTS = np.iinfo(np.int64).min
+
+
+def _cents(values):
+    """Money column -> int64 cents, NULL -> NULL_CENTS."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), NULL_CENTS, np.round(values * 100)).astype(np.int64)
+
+
+def _numpy(column, fill=None, dtype=None):
+    if fill is not None:
+        column = pc.fill_null(column, fill)
+    values = column.to_numpy(zero_copy_only=False)
+    return values.astype(dtype) if dtype else values
+
+
+def sum_videos(directory, user_ids, period_start_day, client_id=None, block_size=4 << 20):
+    """
+    Per-user video sums: lifetime gmv cents and units, and the checkpoint
+    sums (gmv cents, units, count, views, likes, comments) over videos with
+    post_date >= period_start_day[user].
+    """
+    n = len(user_ids)
+    code_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    sums = {name: np.zeros(n, dtype=np.int64) for name in
+            ('gmv', 'units', 'cp_gmv', 'cp_units', 'cp_videos', 'cp_views', 'cp_likes', 'cp_comments')}
+    columns = ['user_id', 'client_id', 'post_date', 'gmv', 'units_sold', 'views', 'likes', 'comments']
+    for batch in iter_table_batches(directory, 'videos', columns, client_id, block_size):
+        # Look up each distinct id of the block once
+        encoded = pc.dictionary_encode(batch['user_id'])
+        codes = np.array([code_of.get(user_id, -1) for user_id in encoded.dictionary.to_pylist()] + [-1])
+        user = codes[pc.fill_null(encoded.indices, len(codes) - 1).to_numpy()]
+        keep = user >= 0
+        user = user[keep]
+        days = _numpy(pc.cast(batch['post_date'], pa.int32()), 0, np.int64)[keep]
+        gmv = np.round(_numpy(batch['gmv'], 0.0, np.float64)[keep] * 100).astype(np.int64)
+        units = _numpy(batch['units_sold'], 0, np.int64)[keep]
+        in_period = days >= period_start_day[user]
+        period_user = user[in_period]
+
+        sums['gmv'] += np.bincount(user, weights=gmv, minlength=n).astype(np.int64)
+        sums['units'] += np.bincount(user, weights=units, minlength=n).astype(np.int64)
+        sums['cp_gmv'] += np.bincount(period_user, weights=gmv[in_period], minlength=n).astype(np.int64)
+        sums['cp_units'] += np.bincount(period_user, weights=units[in_period], minlength=n).astype(np.int64)
+        sums['cp_videos'] += np.bincount(period_user, minlength=n)
+        for name, column in (('cp_views', 'views'), ('cp_likes', 'likes'), ('cp_comments', 'comments')):
+            values = _numpy(batch[column], 0, np.int64)[keep][in_period]
+            sums[name] += np.bincount(period_user, weights=values, minlength=n).astype(np.int64)
+    return sums
+
+
+def expected_fields(directory, client_id=None, block_size=4 << 20):
+    """
+    Returns (user_ids, expected, actual): dicts of field -> numpy array
+    aligned with user_ids. Money fields are int64 cents (NULL_CENTS for NULL),
+    text fields object arrays with None.
+    """
+    clients = read_table(directory, 'clients', ['id', 'vip_metric'], client_id)
+    if clients.num_rows != 1:
+        raise SystemExit(f"Snapshot has {clients.num_rows} clients; pass --client-id")
+    client_id = clients['id'][0].as_py()
+    vip_metric = clients['vip_metric'][0].as_py()
+
+    tiers = read_table(directory, 'tiers', None, client_id).sort_by('tier_order')
+    tier_ids = tiers['tier_id'].to_pylist()
+    tier_order = dict(zip(tier_ids, tiers['tier_order'].to_pylist()))
+    by_order = {order: i for i, order in enumerate(tiers['tier_order'].to_pylist())}
+
+    users = read_table(directory, 'users', None, client_id)
+    user_ids = users['id'].to_pylist()
+    n = len(user_ids)
+    actual = {}
+    for field in MONEY_FIELDS:
+        actual[field] = _cents(_numpy(users[field], np.nan, np.float64))
+    for field in COUNT_FIELDS:
+        values = users[field]
+        actual[field] = np.where(_numpy(pc.is_null(values)), NULL_CENTS, _numpy(values, 0, np.int64))
+    for field in TEXT_FIELDS:
+        actual[field] = np.array(users[field].to_pylist(), dtype=object)
+    # The baseline schema types projected_tier_at_checkpoint as uuid while the RPC writes tier_id:
+    # accept either form of the same tier
+    tier_of_uuid = dict(zip(tiers['id'].to_pylist(), tier_ids))
+    actual['projected_tier_at_checkpoint'] = np.array([tier_of_uuid.get(t, t)
+                                                       for t in actual['projected_tier_at_checkpoint']], dtype=object)
+
+    # post_date (a date, i.e. midnight UTC) >= tier_achieved_at  <=>  day >= ceil(tier_achieved_at in days)
+    achieved = pc.cast(users['tier_achieved_at'], pa.int64())
+    achieved_us = _numpy(achieved, NEVER, np.int64)
+    period_start_day = np.where(achieved_us == NEVER, NEVER, -(-achieved_us // US_PER_DAY))
+    sums = sum_videos(directory, user_ids, period_start_day, client_id, block_size)
+
+    # Applied adjustments per user
+    adjustments = read_table(directory, 'sales_adjustments', ['user_id', 'client_id', 'amount', 'amount_units',
+                                                              'applied_at'], client_id)
+    adjustments = adjustments.filter(pc.is_valid(adjustments['applied_at']))
+    code_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    adj_user = np.array([code_of.get(u, -1) for u in adjustments['user_id'].to_pylist()], dtype=np.int64)
+    ok = adj_user >= 0
+    adj_cents = np.bincount(adj_user[ok], weights=_cents(_numpy(adjustments['amount'], 0.0))[ok], minlength=n)
+    adj_units = np.bincount(adj_user[ok], weights=_numpy(adjustments['amount_units'], 0, np.int64)[ok],
+                            minlength=n)
+
+    manual_cents = np.where(actual['manual_adjustments_total'] == NULL_CENTS, 0, actual['manual_adjustments_total'])
+    manual_units = np.where(actual['manual_adjustments_units'] == NULL_CENTS, 0, actual['manual_adjustments_units'])
+    expected = {
+        'total_sales': sums['gmv'] + manual_cents,
+        'total_units': sums['units'] + manual_units,
+        'checkpoint_sales_current': sums['cp_gmv'],
+        'checkpoint_units_current': sums['cp_units'],
+        'checkpoint_videos_posted': sums['cp_videos'],
+        'checkpoint_total_views': sums['cp_views'],
+        'checkpoint_total_likes': sums['cp_likes'],
+        'checkpoint_total_comments': sums['cp_comments'],
+        'manual_adjustments_total': adj_cents.astype(np.int64),
+        'manual_adjustments_units': adj_units.astype(np.int64),
+    }
+
+    # Projected tier: highest tier_order whose threshold (NULL -> 0) the checkpoint value reaches
+    if vip_metric == 'sales':
+        thresholds = _cents(_numpy(tiers['sales_threshold'], 0.0, np.float64))
+        value = expected['checkpoint_sales_current']
+    else:
+        thresholds = _numpy(tiers['units_threshold'], 0, np.int64)
+        value = expected['checkpoint_units_current']
+    # tiers are sorted by tier_order, but thresholds need not be monotone: take the last reached
+    reached = value[:, None] >= thresholds[None, :]
+    last = np.where(reached.any(axis=1), reached.shape[1] - 1 - np.argmax(reached[:, ::-1], axis=1), -1)
+    tier_array = np.array(tier_ids + [None], dtype=object)
+    expected['projected_tier_at_checkpoint'] = tier_array[last]
+
+    # Next tier: tier_order + 1 of current_tier
+    next_index = np.array([by_order.get(tier_order.get(t, -10) + 1, -1) for t in users['current_tier'].to_pylist()])
+    names = np.array(tiers['tier_name'].to_pylist() + [None], dtype=object)
+    sales = np.append(_cents(_numpy(tiers['sales_threshold'], np.nan, np.float64)), NULL_CENTS)
+    units_nulls = _numpy(pc.is_null(tiers['units_threshold']))
+    units = np.append(np.where(units_nulls, NULL_CENTS, _numpy(tiers['units_threshold'], 0, np.int64)), NULL_CENTS)
+    expected['next_tier_name'] = names[next_index]
+    expected['next_tier_threshold'] = sales[next_index]
+    expected['next_tier_threshold_units'] = units[next_index]
+    return user_ids, expected, actual
+
+
+def diff_fields(expected, actual):
+    """{field: (mismatch mask, zeroed mask)}."""
+    result = {}
+    for field in FIELDS:
+        if field in TEXT_FIELDS:
+            mismatch = np.array([a != b for a, b in zip(actual[field], expected[field])], dtype=bool)
+        else:
+            mismatch = actual[field] != expected[field]
+        zeroed = mismatch & (actual[field] == 0) if field in CHECKPOINT_FIELDS else np.zeros_like(mismatch)
+        result[field] = (mismatch, zeroed)
+    return result
+
+
+def _show(field, value):
+    if field in TEXT_FIELDS:
+        return value
+    if value == NULL_CENTS:
+        return None
+    return value / 100 if field in MONEY_FIELDS else int(value)
+
+
+def write_mismatches(path, user_ids, expected, actual, diffs):
+    import csv
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'field', 'database', 'expected', 'zeroed'])
+        for field, (mismatch, zeroed) in diffs.items():
+            for i in np.flatnonzero(mismatch):
+                writer.writerow([user_ids[i], field, _show(field, actual[field][i]),
+                                 _show(field, expected[field][i]), bool(zeroed[i])])
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Recompute precomputed user fields from a snapshot and diff')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--block-mb', type=int, default=4, help='videos.csv read block size')
+    parser.add_argument('--mismatches', help='write every mismatch to this CSV')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    user_ids, expected, actual = expected_fields(args.snapshot, args.client_id, args.block_mb << 20)
+    diffs = diff_fields(expected, actual)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(user_ids):,} users checked in {elapsed:.1f}s\n")
+    print(f"{'field':30s} {'mismatched':>11s} {'zeroed':>8s}  example (database -> expected)")
+    total = 0
+    for field, (mismatch, zeroed) in diffs.items():
+        count = int(mismatch.sum())
+        total += count
+        example = ''
+        if count:
+            i = int(np.flatnonzero(mismatch & ~zeroed)[0]) if (mismatch & ~zeroed).any() else int(np.argmax(mismatch))
+            example = f"{user_ids[i]}: {_show(field, actual[field][i])} -> {_show(field, expected[field][i])}"
+        print(f"{field:30s} {count:>11,d} {int(zeroed.sum()):>8,d}  {example}")
+    if args.mismatches:
+        write_mismatches(args.mismatches, user_ids, expected, actual, diffs)
+        print(f"\nMismatches written to {args.mismatches}")
+    sys.exit(1 if total else 0)
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Raffle Draw Engine
+Draws raffle missions in bulk from a table snapshot and measures raffle
+participation and cost. Entries come from raffleRepository.participate.
+The daily cron only creates a "Draw Raffle Winner" calendar reminder for
+raffles ending today (syncRepository.findRafflesEndingToday). The admin
+then picks the winner: is_winner TRUE for one participant, FALSE for the
+rest (ADMIN_API_CONTRACTS.md select-winner).
+
+Every raffle has its own counter-based random stream: SplitMix64 keyed by
+(seed, raffle id), evaluated at each entrant's user id. The winner is the
+entry with the smallest key, which is a uniform draw that does not depend
+on export order or on the other raffles. Publishing the seed after
+entries close lets anyone recompute the draw. The whole bulk draw is a
+few vectorized passes plus one np.minimum.at over the entries, so it is
+linear in participants with no sort or per-raffle loop.
+
+Analytics per raffle (expected prize cost: the prize if anyone entered)
+and per tier (entries, participation of eligible users, expected and
+drawn wins, entries per win) use the entrant's tier_at_claim. --out feeds
+the model's Raffles per Month and Avg Raffle Prize Cost inputs (the
+Raffle Prize Cost line).
+
+The select-winner contract first sets is_winner = false with
+winner_selected_at = NULL, which check_winner_consistency rejects. Draws
+written by --draws carry winner_selected_at for every row.
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/today
+    python raffle_engine.py snapshots/today --seed 20260119 --draws draws.csv
+    python raffle_engine.py snapshots/today --prize-value physical_gift=40 --out model_configs/raffles.yaml
+    python raffle_engine.py --bench --raffles 100000 --entries 10
+"""
+
+import csv
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_snapshot import read_table
+
+# Reward types whose value_data amount is the prize's cash cost
+CASH_PRIZES = ('gift_card', 'spark_ads')
+
+US_PER_DAY = 86_400_000_000
+DAYS_PER_MONTH = 365.25 / 12
+NEVER = np.iinfo(np.int64).max
+_KEY_MAX = np.iinfo(np.uint64).max
+# Hex digit positions of a canonical 8-4-4-4-12 uuid string
+_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+
+def _uuid_chars(ids):
+    """[n, 36] character codes of canonical uuid strings (pyarrow string array or numpy 'U36')."""
+    if isinstance(ids, (pa.Array, pa.ChunkedArray)):
+        ids = ids.combine_chunks() if isinstance(ids, pa.ChunkedArray) else ids
+        if ids.null_count or pc.any(pc.not_equal(pc.utf8_length(ids), 36)).as_py():
+            raise ValueError("uuid column has NULLs or non-canonical values")
+        offsets = np.frombuffer(ids.buffers()[1], dtype=np.int32)[ids.offset:ids.offset + len(ids) + 1]
+        data = np.frombuffer(ids.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+        return data.reshape(-1, 36)
+    return np.ascontiguousarray(ids, dtype='U36').view(np.uint32).reshape(-1, 36)
+
+
+def uuid_halves(ids):
+    """uuid strings -> (hi, lo) uint64 arrays, vectorized."""
+    digits = _uuid_chars(ids)[:, _HEX_POSITIONS].astype(np.uint8) | 0x20  # lower-case letters
+    nibbles = np.where(digits >= ord('a'), digits - (ord('a') - 10), digits - ord('0')).astype(np.uint8)
+    packed = np.ascontiguousarray((nibbles[:, 0::2] << 4) | nibbles[:, 1::2])
+    halves = packed.view('>u8').astype(np.uint64)
+    return halves[:, 0], halves[:, 1]
+
+
+def _mix(x):
+    """SplitMix64 over a uint64 array (wrapping arithmetic)."""
+    with np.errstate(over='ignore'):
+        z = x + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def stream_keys(seed, raffle_ids):
+    """One stream key per raffle, from the seed and the raffle's uuid."""
+    hi, lo = uuid_halves(raffle_ids)
+    return _mix(_mix(hi ^ _mix(lo)) ^ np.uint64(seed & 0xFFFFFFFFFFFFFFFF))
+
+
+def entry_keys(streams, raffle, user_ids):
+    """
+    Draw key of each entry: the raffle's stream evaluated at the entrant's
+    user id. Users enter many raffles, so each distinct id is hashed once.
+    """
+    encoded = pc.dictionary_encode(pa.array(user_ids) if isinstance(user_ids, np.ndarray) else user_ids)
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    hi, lo = uuid_halves(encoded.dictionary)
+    user = _mix(hi ^ _mix(lo))
+    return _mix(streams[raffle] ^ user[encoded.indices.to_numpy(zero_copy_only=False)])
+
+
+def draw(raffle, keys, n_raffles):
+    """Winning entry index per raffle (-1 without entries): the smallest key."""
+    best = np.full(n_raffles, _KEY_MAX, dtype=np.uint64)
+    np.minimum.at(best, raffle, keys)
+    rows = np.flatnonzero(keys == best[raffle])
+    winner = np.full(n_raffles, -1, dtype=np.int64)
+    # Reversed so the first entry wins a (2^-64) tie
+    winner[raffle[rows][::-1]] = rows[::-1]
+    return winner
+
+
+def _numpy(column, fill):
+    return pc.fill_null(column, fill).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def _us(column):
+    return pc.fill_null(pc.cast(column, pa.int64()), NEVER).to_numpy(zero_copy_only=False)
+
+
+def _iso(us):
+    return '' if us == NEVER else str(np.datetime64(int(us), 'us')) + 'Z'
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+def load_raffles(directory, client_id=None, prize_values=None):
+    """Raffle missions, their entries and the client's tiers as arrays."""
+    prize_values = prize_values or {}
+    missions = read_table(directory, 'missions', None, client_id)
+    missions = missions.filter(pc.equal(missions['mission_type'], 'raffle'))
+    rewards = {r['id']: r for r in read_table(directory, 'rewards', None, client_id).to_pylist()}
+    tiers = read_table(directory, 'tiers', ['tier_id', 'client_id', 'tier_order'], client_id).sort_by('tier_order')
+    tier_ids = tiers['tier_id'].to_pylist()
+
+    ends = _us(missions['raffle_end_date'])
+    raffles = []
+    for m, end in zip(missions.to_pylist(), ends.tolist()):
+        reward = rewards.get(m['reward_id']) or {}
+        kind = reward.get('type')
+        value = prize_values.get(kind)
+        if value is None and kind in CASH_PRIZES:
+            value = float(json.loads(reward.get('value_data') or '{}').get('amount') or 0)
+        eligibility = m['tier_eligibility']
+        raffles.append({
+            'id': m['id'], 'title': m['title'], 'activated': bool(m['activated']), 'enabled': bool(m['enabled']),
+            'end': end,
+            'prize_type': kind, 'prize_value': value,
+            # Lowest tier index that may enter ('all': every tier)
+            'min_tier': 0 if eligibility == 'all' else tier_ids.index(eligibility) if eligibility in tier_ids else None,
+        })
+
+    entries = read_table(directory, 'raffle_participations', None, client_id)
+    raffle = pc.index_in(entries['mission_id'], value_set=missions['id'])
+    known = pc.is_valid(raffle)
+    entries = entries.filter(known)
+    redemptions = read_table(directory, 'redemptions', ['id', 'client_id', 'tier_at_claim'], client_id)
+    tier_at_claim = pc.take(redemptions['tier_at_claim'],
+                            pc.index_in(entries['redemption_id'], value_set=redemptions['id']))
+    tier = pc.index_in(tier_at_claim, value_set=pa.array(tier_ids, pa.string()))
+    users = read_table(directory, 'users', ['id', 'client_id', 'current_tier'], client_id)
+    user_tier = pc.index_in(users['current_tier'], value_set=pa.array(tier_ids, pa.string()))
+    return {
+        'tier_ids': tier_ids,
+        'users_per_tier': np.bincount(_numpy(user_tier, -1) + 1, minlength=len(tier_ids) + 1)[1:],
+        'raffles': raffles,
+        'dropped': int(pc.sum(pc.invert(known)).as_py() or 0),
+        'id': np.array(entries['id'].to_pylist(), dtype=object),
+        'raffle': _numpy(raffle.filter(known), -1),
+        'user_id': entries['user_id'].combine_chunks(),
+        'tier': _numpy(tier, -1),
+        'participated': _us(entries['participated_at']),
+        # 1 won, 0 lost, -1 not drawn
+        'is_winner': _numpy(pc.cast(entries['is_winner'], pa.int8()), -1),
+        'selected': _us(entries['winner_selected_at']),
+    }
+
+
+# ============================================================================
+# ANALYTICS
+# ============================================================================
+def raffle_rows(data, winner, as_of):
+    """Per raffle: entries, recorded and seeded winner, win probability, expected prize cost."""
+    n = len(data['raffles'])
+    entries = np.bincount(data['raffle'], minlength=n)
+    won = data['is_winner'] == 1
+    recorded = np.full(n, -1, dtype=np.int64)
+    recorded[data['raffle'][won]] = np.flatnonzero(won)
+    rows = []
+    for r, raffle in enumerate(data['raffles']):
+        pick = recorded[r] if recorded[r] >= 0 else winner[r]
+        value = raffle['prize_value']
+        rows.append({
+            'mission_id': raffle['id'], 'title': raffle['title'], 'end': _iso(raffle['end']),
+            'entries': int(entries[r]), 'p_win': round(1 / entries[r], 6) if entries[r] else None,
+            'prize_type': raffle['prize_type'], 'prize_value': value,
+            'expected_cost': (value if entries[r] else 0.0) if value is not None else None,
+            'drawn': bool(recorded[r] >= 0),
+            'due': bool(recorded[r] < 0 and entries[r] and raffle['end'] <= as_of and raffle['activated']
+                        and raffle['enabled']),
+            'winner_user_id': data['user_id'][int(pick)].as_py() if pick >= 0 else None,
+            'winner_participation_id': data['id'][pick] if pick >= 0 else None,
+        })
+    return rows
+
+
+def tier_rows(data, winner):
+    """
+    Per tier of the entrant: users now at the tier, eligible user x raffle
+    slots, entries, participation rate, expected wins (sum of 1/entries),
+    wins (recorded, else the seeded draw), entries per expected win and
+    expected prize cost.
+    """
+    tiers = data['tier_ids']
+    n = len(data['raffles'])
+    raffle, tier = data['raffle'], data['tier']
+    entries_of = np.bincount(raffle, minlength=n)
+    p_win = 1 / np.maximum(entries_of[raffle], 1)
+    value = np.array([r['prize_value'] or 0.0 for r in data['raffles']] + [0.0])[raffle]
+    won = data['is_winner'] == 1
+    drawn = np.zeros(n, dtype=bool)
+    drawn[raffle[won]] = True
+    winners = won.copy()
+    seeded = winner[(winner >= 0) & ~drawn]
+    winners[seeded] = True
+
+    slot = tier + 1  # 0: tier unknown
+    width = len(tiers) + 1
+    count = np.bincount(slot, minlength=width)
+    expected = np.bincount(slot, weights=p_win, minlength=width)
+    wins = np.bincount(slot[winners], minlength=width)
+    cost = np.bincount(slot, weights=p_win * value, minlength=width)
+    open_to = [r['min_tier'] for r in data['raffles'] if r['activated'] and r['min_tier'] is not None]
+    rows = []
+    for i, name in enumerate(['(unknown)'] + tiers):
+        if i == 0 and not count[0]:
+            continue
+        users = int(data['users_per_tier'][i - 1]) if i else 0
+        eligible = users * sum(1 for m in open_to if m <= i - 1) if i else 0
+        rows.append({
+            'tier': name, 'users': users, 'eligible_slots': eligible, 'entries': int(count[i]),
+            'participation_rate': round(count[i] / eligible, 4) if eligible else None,
+            'expected_wins': round(float(expected[i]), 3), 'wins': int(wins[i]),
+            'entries_per_win': round(count[i] / expected[i], 1) if expected[i] else None,
+            'expected_prize_cost': round(float(cost[i]), 2),
+        })
+    return rows
+
+
+def model_inputs(data, raffles, as_of):
+    """
+    Raffles per Month (activated, enabled raffles ended by as_of, per
+    month between the first and last end date) and Avg Raffle Prize Cost
+    (expected cost of those raffles that are priced), or None without
+    ended, priced raffles.
+    """
+    ended = [row for raffle, row in zip(data['raffles'], raffles)
+             if raffle['activated'] and raffle['enabled'] and raffle['end'] <= as_of]
+    ends = [np.datetime64(r['end'][:10], 'D') for r in ended]
+    priced = [r['expected_cost'] for r in ended if r['expected_cost'] is not None]
+    if not ends or not priced:
+        return None
+    span = max(1.0, float((max(ends) - min(ends)).astype(np.int64) + 1) / DAYS_PER_MONTH)
+    return {'Raffles per Month': round(len(ends) / span, 2),
+            'Avg Raffle Prize Cost': round(sum(priced) / len(priced), 2)}
+
+
+def check_draws(data, as_of):
+    """Raffles whose recorded is_winner values break the select-winner rules."""
+    n = len(data['raffles'])
+    raffle, state = data['raffle'], data['is_winner']
+    winners = np.bincount(raffle[state == 1], minlength=n)
+    undecided = np.bincount(raffle[state < 0], minlength=n)
+    entries = np.bincount(raffle, minlength=n)
+    end = np.array([r['end'] for r in data['raffles']], dtype=np.int64)
+    early = np.zeros(n, dtype=bool)
+    picked = (state == 1) & (data['selected'] < end[raffle])
+    early[raffle[picked]] = True
+    return {
+        'multiple_winners': np.flatnonzero(winners > 1),
+        'losers_without_winner': np.flatnonzero((winners == 0) & (undecided < entries)),
+        'partially_drawn': np.flatnonzero((winners > 0) & (undecided > 0)),
+        'drawn_before_end': np.flatnonzero(early),
+        'overdue': np.flatnonzero((undecided == entries) & (entries > 0) & (end <= as_of - US_PER_DAY)),
+    }
+
+
+def write_draws(path, data, rows, seed, as_of):
+    """One row per participant of every due raffle: the is_winner update to apply."""
+    due = {r: row for r, row in enumerate(rows) if row['due']}
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['participation_id', 'mission_id', 'user_id', 'is_winner', 'winner_selected_at', 'seed'])
+        for i in np.flatnonzero(np.isin(data['raffle'], list(due))):
+            row = due[data['raffle'][i]]
+            writer.writerow([data['id'][i], row['mission_id'], data['user_id'][int(i)].as_py(),
+                             'true' if data['id'][i] == row['winner_participation_id'] else 'false',
+                             _iso(as_of), seed])
+    return len(due)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+def run_benchmark(n_raffles, per_raffle, seed):
+    """
+    Bulk draw over n_raffles raffles with the same per_raffle entrants.
+    Every raffle is an independent stream, so the winner's position among
+    the entrants must be uniform across raffles (chi-square, df =
+    per_raffle - 1).
+    """
+    import time
+    import uuid
+
+    rng = np.random.default_rng(seed)
+    raffle_ids = np.array([str(uuid.UUID(int=int(x))) for x in rng.integers(0, 2**63, n_raffles)], dtype='U36')
+    users = np.array([str(uuid.UUID(int=int(x))) for x in rng.integers(0, 2**63, per_raffle)], dtype='U36')
+    raffle = np.repeat(np.arange(n_raffles), per_raffle)
+    user_ids = pa.array(np.tile(users, n_raffles))
+
+    start = time.perf_counter()
+    streams = stream_keys(seed, raffle_ids)
+    keys = entry_keys(streams, raffle, user_ids)
+    winner = draw(raffle, keys, n_raffles)
+    elapsed = time.perf_counter() - start
+    position = winner - np.arange(n_raffles) * per_raffle
+    observed = np.bincount(position, minlength=per_raffle)
+    expected = n_raffles / per_raffle
+    chi2 = float(((observed - expected) ** 2 / expected).sum())
+    print(f"{n_raffles:,} raffles x {per_raffle} entrants = {len(raffle):,} entries drawn in {elapsed:.2f}s "
+          f"({len(raffle) / elapsed / 1e6:.1f}M entries/s)")
+    print(f"Winner position chi-square {chi2:.1f} on {per_raffle - 1} df "
+          f"(95% bound ~{per_raffle - 1 + 2.33 * np.sqrt(2 * (per_raffle - 1)):.1f})")
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Bulk raffle draws and raffle participation analytics')
+    parser.add_argument('snapshot', nargs='?', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--seed', type=int, default=0, help='draw seed (publish it after entries close)')
+    parser.add_argument('--as-of', help='draw raffles ended by this instant (default: now)')
+    parser.add_argument('--prize-value', action='append', default=[], metavar='TYPE=DOLLARS',
+                        help='prize cost for a reward type without an amount, e.g. physical_gift=40')
+    parser.add_argument('--draws', help='write the is_winner updates for due raffles (CSV)')
+    parser.add_argument('--json', help='write per-raffle and per-tier results (JSON)')
+    parser.add_argument('--check', action='store_true', help='check recorded draws (exit 1 if off)')
+    parser.add_argument('--out', help='write a model config with the measured raffle inputs')
+    parser.add_argument('--base', help='config to start from for --out (default: built-in v3 config)')
+    parser.add_argument('--bench', action='store_true', help='bulk draw over synthetic raffles')
+    parser.add_argument('--raffles', type=int, default=100_000)
+    parser.add_argument('--entries', type=int, default=10, help='entrants per synthetic raffle')
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.raffles, args.entries, args.seed)
+    if not args.snapshot:
+        if not args.bench:
+            parser.error('pass a snapshot directory or --bench')
+        sys.exit(0)
+
+    prize_values = {}
+    for item in args.prize_value:
+        kind, _, value = item.partition('=')
+        try:
+            prize_values[kind] = float(value)
+        except ValueError:
+            parser.error(f"--prize-value expects TYPE=DOLLARS, got {item!r}")
+    as_of = int(np.datetime64(args.as_of or 'now', 'us').astype(np.int64))
+
+    start_time = time.perf_counter()
+    data = load_raffles(args.snapshot, args.client_id, prize_values)
+    streams = stream_keys(args.seed, [r['id'] for r in data['raffles']]) if data['raffles'] else np.zeros(0, np.uint64)
+    winner = draw(data['raffle'], entry_keys(streams, data['raffle'], data['user_id']), len(data['raffles']))
+    raffles = raffle_rows(data, winner, as_of)
+    tiers = tier_rows(data, winner)
+    print(f"{len(raffles):,} raffles, {len(data['raffle']):,} entries, seed {args.seed}, as of {_iso(as_of)} "
+          f"in {time.perf_counter() - start_time:.2f}s"
+          + (f" ({data['dropped']:,} entries of unknown raffles skipped)" if data['dropped'] else ''))
+
+    print(f"\n{'raffle':30s} {'ends':10s} {'entries':>8s} {'prize':>9s} {'exp. cost':>10s}  status")
+    for row in raffles[:50]:
+        status = 'drawn' if row['drawn'] else 'due' if row['due'] else 'open'
+        prize = '?' if row['prize_value'] is None else f"{row['prize_value']:,.0f}"
+        cost = '?' if row['expected_cost'] is None else f"{row['expected_cost']:,.2f}"
+        print(f"{row['title'][:30]:30s} {row['end'][:10]:10s} {row['entries']:>8,d} {prize:>9s} {cost:>10s}  {status}")
+    if len(raffles) > 50:
+        print(f"... {len(raffles) - 50:,} more")
+    unpriced = sorted({r['prize_type'] for r in raffles if r['prize_value'] is None})
+    if unpriced:
+        print(f"No prize value for {', '.join(map(str, unpriced))}: pass --prize-value")
+
+    print(f"\n{'tier':10s} {'users':>8s} {'eligible':>9s} {'entries':>8s} {'part.':>6s} {'exp. wins':>10s} "
+          f"{'wins':>5s} {'entries/win':>12s} {'exp. cost':>10s}")
+    for row in tiers:
+        rate = '-' if row['participation_rate'] is None else f"{row['participation_rate']:.1%}"
+        per_win = '-' if row['entries_per_win'] is None else f"{row['entries_per_win']:,.1f}"
+        print(f"{row['tier']:10s} {row['users']:>8,d} {row['eligible_slots']:>9,d} {row['entries']:>8,d} {rate:>6s} "
+              f"{row['expected_wins']:>10,.2f} {row['wins']:>5,d} {per_win:>12s} {row['expected_prize_cost']:>10,.2f}")
+
+    if args.draws:
+        due = write_draws(args.draws, data, raffles, args.seed, as_of)
+        print(f"\nDraws for {due:,} due raffles written to {args.draws}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'as_of': _iso(as_of), 'seed': args.seed, 'raffles': raffles, 'tiers': tiers}, f, indent=2)
+            f.write('\n')
+        print(f"Report written to {args.json}")
+    if args.out:
+        from loyalty_config import load_config, save_config, validate_config
+        from loyalty_model import default_config
+
+        config = load_config(args.base) if args.base else default_config()
+        inputs = model_inputs(data, raffles, as_of)
+        if inputs:
+            config['inputs'].update(inputs)
+        errors = validate_config(config)
+        if errors:
+            print("Config is invalid:\n  - " + '\n  - '.join(errors))
+            sys.exit(1)
+        save_config(config, args.out)
+        print(f"Config written: {args.out} ("
+              + (', '.join(f"{k}: {v}" for k, v in inputs.items()) if inputs else 'no priced raffles, inputs unchanged')
+              + ")")
+    if args.check:
+        problems = check_draws(data, as_of)
+        print()
+        for name, raffle_idx in problems.items():
+            if len(raffle_idx):
+                print(f"  {name:24s} {len(raffle_idx):>6,d}  e.g. {data['raffles'][raffle_idx[0]]['title']}")
+        if not any(len(v) for v in problems.values()):
+            print("Recorded draws are consistent")
+        sys.exit(1 if any(len(v) for v in problems.values()) else 0)
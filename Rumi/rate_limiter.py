@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+"""
+Login Rate Limiter
+The failed-login policy of lib/utils/rateLimiter.ts (5 failed attempts in
+15 minutes lock the handle for 15 minutes) behind a pluggable store, so
+every app server can share one lockout state.
+
+rateLimiter.ts keeps its entries in a process-local Map. With more than
+one server, or after a restart, an attacker gets 5 attempts per instance.
+This module runs the same policy against any store with a get/update/delete
+interface:
+- MemoryStore: a dict with lazy expiry, the equivalent of the Map.
+- RespStore: any Redis-protocol server (Redis, Upstash over TCP, Valkey).
+  A failure is a WATCH/GET, then MULTI/SET PX/EXEC round trip, retried if
+  another server changed the key in between. Checks are one GET and a
+  successful login one DEL. No Lua, so the stand-in below can serve it.
+- RespStandIn: a minimal single-process Redis-protocol server (GET, SET PX,
+  DEL, WATCH, MULTI, EXEC, ...) for --verify and --bench when no Redis is
+  available.
+
+Three algorithms, all storing one small packed value per key whose first
+field is locked_until:
+- FixedWindowLimiter: rateLimiter.ts as written. The window starts at the
+  first failure, so 4 failures at minute 14 and 4 at minute 16 never lock.
+- SlidingWindowLogLimiter: the timestamps of the failures in the last 15
+  minutes (at most 4). Any 5 failures within 15 minutes lock.
+- GCRALimiter: one theoretical arrival time. Each failure adds 3 minutes
+  (15 / 5), so the value is 16 bytes regardless of the attempt count. It
+  locks a burst of 5, but failures spread 3 minutes or more apart never
+  lock, so it is more lenient than the log for slow guessing.
+A failure recorded while locked does not extend the lockout (the login
+route checks before verifying the password, so it never records one).
+Keys match rateLimiter.ts: clientId:handle, lowercased, first '@' removed.
+
+Usage:
+    python rate_limiter.py --verify
+    python rate_limiter.py --bench --keys 1000000
+    python rate_limiter.py --bench --redis 127.0.0.1:6379
+    python rate_limiter.py --serve 6390
+"""
+
+import itertools
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# Policy per API_CONTRACTS.md (same constants as rateLimiter.ts)
+MAX_ATTEMPTS = 5
+WINDOW_MS = 15 * 60 * 1000
+LOCKOUT_MS = 15 * 60 * 1000
+
+RESP_PREFIX = 'ratelimit:login-handle:'
+MAX_WATCH_RETRIES = 10
+
+RateLimitCheck = namedtuple('RateLimitCheck', 'is_limited retry_after_seconds')
+FailedLogin = namedtuple('FailedLogin', 'is_locked attempts_remaining')
+
+_NOT_LIMITED = RateLimitCheck(False, None)
+_LOCKED = FailedLogin(True, 0)
+_INT64 = struct.Struct('<q')
+
+
+def rate_limit_key(client_id, handle):
+    """Same key as rateLimiter.ts: `${clientId}:${handle.toLowerCase().replace('@', '')}`."""
+    return f"{client_id}:{handle.lower().replace('@', '', 1)}"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+# ============================================================================
+# STORES
+# ============================================================================
+
+class MemoryStore:
+    """key -> (expires_at_ms, value). Expired keys are dropped when read, or by sweep()."""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def update(self, key, fn, now):
+        """fn(value) -> (new value or None to delete, ttl_ms, result); returns result."""
+        value = self.get(key, now)
+        new_value, ttl, result = fn(value)
+        if new_value is not value:
+            if new_value is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (now + ttl, new_value)
+        return result
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def sweep(self, now):
+        """Drop expired keys (cleanupExpiredEntries). Returns how many were dropped."""
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+def _encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def _read_reply(reader):
+    """One RESP2 reply. Error replies are returned as RespError, not raised, so pipelines stay in sync."""
+    line = reader.readline()
+    if not line:
+        raise ConnectionError('connection closed by server')
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body
+    if kind == b'-':
+        return RespError(body.decode())
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        return None if length < 0 else reader.read(length + 2)[:-2]
+    if kind == b'*':
+        length = int(body)
+        return None if length < 0 else [_read_reply(reader) for _ in range(length)]
+    raise RespError(f"unexpected reply {line[:40]!r}")
+
+
+def _raise_errors(replies):
+    for reply in replies:
+        if isinstance(reply, RespError):
+            raise reply
+    return replies
+
+
+class RespConnection:
+    """Blocking Redis-protocol client on one socket. Not thread-safe: one per thread or process."""
+
+    def __init__(self, host='127.0.0.1', port=6379, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self.sock.makefile('rb')
+
+    def pipeline(self, *commands):
+        """Send several commands in one write and return their replies in order."""
+        self.sock.sendall(b''.join(_encode_command(args) for args in commands))
+        return [_read_reply(self._reader) for _ in commands]
+
+    def execute(self, *args):
+        return _raise_errors(self.pipeline(args))[0]
+
+    def close(self):
+        self._reader.close()
+        self.sock.close()
+
+
+class RespStore:
+    """Lockout state in a Redis-protocol server, shared by every app server using the same prefix."""
+
+    def __init__(self, conn, prefix=RESP_PREFIX):
+        self.conn = conn
+        self.prefix = prefix
+        self.retries = 0
+
+    def get(self, key, now=None):
+        return self.conn.execute('GET', self.prefix + key)
+
+    def update(self, key, fn, now=None):
+        """Optimistic read-modify-write: WATCH/GET, then MULTI/SET/EXEC, retried if the key changed."""
+        key = self.prefix + key
+        for _ in range(MAX_WATCH_RETRIES):
+            value = _raise_errors(self.conn.pipeline(('WATCH', key), ('GET', key)))[1]
+            new_value, ttl, result = fn(value)
+            if new_value is value:
+                self.conn.execute('UNWATCH')
+                return result
+            write = ('DEL', key) if new_value is None else ('SET', key, new_value, 'PX', max(int(ttl), 1))
+            replies = _raise_errors(self.conn.pipeline(('MULTI',), write, ('EXEC',)))
+            if replies[-1] is not None:
+                return result
+            self.retries += 1
+        raise RespError(f"{key} changed on every one of {MAX_WATCH_RETRIES} attempts")
+
+    def delete(self, key):
+        self.conn.execute('DEL', self.prefix + key)
+
+    def memory_usage(self, key):
+        """Server-reported bytes for key (MEMORY USAGE), or None if the server does not support it."""
+        reply = self.conn.pipeline(('MEMORY', 'USAGE', self.prefix + key))[0]
+        return None if isinstance(reply, RespError) else reply
+
+
+# ============================================================================
+# LOCAL STAND-IN SERVER
+# ============================================================================
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    """One client connection: RESP2 commands in, replies out, with WATCH / MULTI state."""
+
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.dirty = False
+        self.watching = set()
+        self.queued = None
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                break
+            if not args:
+                continue
+            with self.server.lock:
+                reply = self._dispatch(args[0].upper(), args[1:])
+            self.wfile.write(_encode_reply(reply))
+            self.wfile.flush()
+
+    def finish(self):
+        with self.server.lock:
+            self._unwatch()
+        super().finish()
+
+    def _unwatch(self):
+        for key in self.watching:
+            watchers = self.server.watchers.get(key)
+            if watchers is not None:
+                watchers.discard(self)
+                if not watchers:
+                    del self.server.watchers[key]
+        self.watching = set()
+        self.dirty = False
+
+    def _dispatch(self, command, args):
+        if self.queued is not None and command not in (b'EXEC', b'DISCARD', b'MULTI', b'WATCH'):
+            self.queued.append((command, args))
+            return b'QUEUED'
+        if command == b'MULTI':
+            if self.queued is not None:
+                return RespError('ERR MULTI calls can not be nested')
+            self.queued = []
+            return b'OK'
+        if command == b'EXEC':
+            if self.queued is None:
+                return RespError('ERR EXEC without MULTI')
+            queued, self.queued = self.queued, None
+            aborted = self.dirty
+            self._unwatch()
+            if aborted:
+                return None
+            return [self.server.run(cmd, cmd_args) for cmd, cmd_args in queued]
+        if command == b'DISCARD':
+            if self.queued is None:
+                return RespError('ERR DISCARD without MULTI')
+            self.queued = None
+            self._unwatch()
+            return b'OK'
+        if command == b'WATCH':
+            if self.queued is not None:
+                return RespError('ERR WATCH inside MULTI is not allowed')
+            for key in args:
+                self.server.expire_if_due(key)
+                self.server.watchers.setdefault(key, set()).add(self)
+                self.watching.add(key)
+            return b'OK'
+        if command == b'UNWATCH':
+            self._unwatch()
+            return b'OK'
+        return self.server.run(command, args)
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, RespError):
+        return b'-%s\r\n' % str(reply).encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(map(_encode_reply, reply))
+    if reply in (b'OK', b'QUEUED', b'PONG'):
+        return b'+%s\r\n' % reply
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """
+    Minimal Redis-protocol server: PING, GET, SET [PX|EX], DEL, EXISTS,
+    PTTL, WATCH, UNWATCH, MULTI, EXEC, DISCARD, DBSIZE, FLUSHALL. One lock
+    serializes commands, as Redis' single thread does. Enough for RespStore;
+    not a cache.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, _StandInHandler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+        self.watchers = {}
+
+    def touch(self, key):
+        """A write to key: transactions watching it will abort."""
+        for handler in self.watchers.pop(key, ()):
+            handler.dirty = True
+
+    def expire_if_due(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= _now_ms():
+            del self.data[key]
+            del self.expires[key]
+            self.touch(key)
+
+    def run(self, command, args):
+        for key in args[:1]:
+            self.expire_if_due(key)
+        if command == b'PING':
+            return b'PONG'
+        if command == b'GET':
+            return self.data.get(args[0])
+        if command == b'SET':
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if b'PX' in options:
+                self.expires[key] = _now_ms() + int(args[2 + options.index(b'PX') + 1])
+            elif b'EX' in options:
+                self.expires[key] = _now_ms() + 1000 * int(args[2 + options.index(b'EX') + 1])
+            self.touch(key)
+            return b'OK'
+        if command == b'DEL':
+            deleted = 0
+            for key in args:
+                self.expire_if_due(key)
+                if self.data.pop(key, None) is not None:
+                    self.expires.pop(key, None)
+                    self.touch(key)
+                    deleted += 1
+            return deleted
+        if command == b'EXISTS':
+            for key in args:
+                self.expire_if_due(key)
+            return sum(1 for key in args if key in self.data)
+        if command == b'PTTL':
+            if args[0] not in self.data:
+                return -2
+            expires_at = self.expires.get(args[0])
+            return -1 if expires_at is None else expires_at - _now_ms()
+        if command == b'DBSIZE':
+            return len(self.data)
+        if command == b'FLUSHALL':
+            for key in list(self.data):
+                self.touch(key)
+            self.data.clear()
+            self.expires.clear()
+            return b'OK'
+        return RespError(f"ERR unknown command '{command.decode(errors='replace')}'")
+
+
+def start_stand_in(port=0):
+    """RespStandIn on 127.0.0.1:port (0 = any free port), served from a daemon thread. Returns (server, port)."""
+    server = RespStandIn(('127.0.0.1', port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+# ============================================================================
+# ALGORITHMS
+# ============================================================================
+
+class LoginRateLimiter:
+    """
+    checkLoginRateLimit / recordFailedLogin / clearLoginRateLimit over a
+    store. Subclasses pack their state after an int64 locked_until and
+    provide two hooks:
+    - _fail(value, now) -> (new value, ttl_ms, FailedLogin): one failure
+      applied to the stored value (None when there is none)
+    - _locked_state(locked_until) -> value: the state of a locked key,
+      used by _lock
+    """
+
+    name = None
+
+    def __init__(self, store):
+        self.store = store
+
+    def check(self, client_id, handle, now=None):
+        now = _now_ms() if now is None else now
+        value = self.store.get(rate_limit_key(client_id, handle), now)
+        if value is not None:
+            locked_until = _INT64.unpack_from(value)[0]
+            if locked_until > now:
+                return RateLimitCheck(True, -(-(locked_until - now) // 1000))
+        return _NOT_LIMITED
+
+    def record_failure(self, client_id, handle, now=None):
+        now = _now_ms() if now is None else now
+        return self.store.update(rate_limit_key(client_id, handle), lambda value: self._fail(value, now), now)
+
+    def clear(self, client_id, handle):
+        self.store.delete(rate_limit_key(client_id, handle))
+
+    def _lock(self, now):
+        return self._locked_state(now + LOCKOUT_MS), LOCKOUT_MS, _LOCKED
+
+
+class FixedWindowLimiter(LoginRateLimiter):
+    """rateLimiter.ts: attempts counted from the first failure for WINDOW_MS. 24 bytes."""
+
+    name = 'fixed-window'
+    _state = struct.Struct('<qqq')  # locked_until, first_attempt_at, attempts
+
+    def _locked_state(self, locked_until):
+        return self._state.pack(locked_until, 0, 0)
+
+    def _fail(self, value, now):
+        if value is not None:
+            locked_until, first_at, attempts = self._state.unpack(value)
+            if locked_until > now:
+                return value, locked_until - now, _LOCKED
+            if now - first_at <= WINDOW_MS:
+                attempts += 1
+                if attempts >= MAX_ATTEMPTS:
+                    return self._lock(now)
+                return (self._state.pack(0, first_at, attempts), first_at + WINDOW_MS + 1 - now,
+                        FailedLogin(False, MAX_ATTEMPTS - attempts))
+        return self._state.pack(0, now, 1), WINDOW_MS + 1, FailedLogin(False, MAX_ATTEMPTS - 1)
+
+
+class SlidingWindowLogLimiter(LoginRateLimiter):
+    """Timestamps of the failures in the last WINDOW_MS. 8 bytes plus 8 per failure, at most 40."""
+
+    name = 'sliding-log'
+
+    def _locked_state(self, locked_until):
+        return _INT64.pack(locked_until)
+
+    def _fail(self, value, now):
+        log = ()
+        if value is not None:
+            locked_until, *log = struct.unpack(f'<{len(value) // 8}q', value)
+            if locked_until > now:
+                return value, locked_until - now, _LOCKED
+            log = [t for t in log if now - t <= WINDOW_MS]
+        if len(log) + 1 >= MAX_ATTEMPTS:
+            return self._lock(now)
+        log = [*log, now]
+        # Kept until the newest failure leaves the window
+        return struct.pack(f'<{len(log) + 1}q', 0, *log), WINDOW_MS + 1, FailedLogin(False, MAX_ATTEMPTS - len(log))
+
+
+class GCRALimiter(LoginRateLimiter):
+    """
+    Generic cell rate algorithm: each failure pushes the theoretical
+    arrival time (tat) EMISSION_MS further, and time drains it. A failure
+    that leaves tat more than WINDOW_MS - EMISSION_MS ahead fills the
+    bucket and locks. 16 bytes.
+    """
+
+    name = 'gcra'
+    EMISSION_MS = WINDOW_MS // MAX_ATTEMPTS
+    _state = struct.Struct('<qq')  # locked_until, tat
+
+    def _locked_state(self, locked_until):
+        return self._state.pack(locked_until, 0)
+
+    def _fail(self, value, now):
+        tat = now
+        if value is not None:
+            locked_until, tat = self._state.unpack(value)
+            if locked_until > now:
+                return value, locked_until - now, _LOCKED
+            tat = max(tat, now)
+        tat += self.EMISSION_MS
+        if tat - now > WINDOW_MS - self.EMISSION_MS:
+            return self._lock(now)
+        used = -(-(tat - now) // self.EMISSION_MS)
+        return self._state.pack(0, tat), tat - now, FailedLogin(False, MAX_ATTEMPTS - used)
+
+
+LIMITERS = {cls.name: cls for cls in (FixedWindowLimiter, SlidingWindowLogLimiter, GCRALimiter)}
+
+
+# ============================================================================
+# VERIFY / BENCHMARK
+# ============================================================================
+
+def login_trace(n_keys, n_attempts, seed=0, span_ms=2 * 3600 * 1000):
+    """
+    Synthetic login attempts as (handle index, now_ms, password_ok) arrays.
+    A hot 1% of handles (guessing, credential stuffing) gets 30% of the
+    attempts and fails 80% of the time; the rest fail 20%.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    hot = rng.random(n_attempts) < 0.3
+    keys = np.where(hot, rng.integers(0, max(n_keys // 100, 1), n_attempts), rng.integers(0, n_keys, n_attempts))
+    now = np.sort(rng.integers(0, span_ms, n_attempts)) + 1_700_000_000_000
+    ok = rng.random(n_attempts) >= np.where(hot, 0.8, 0.2)
+    return keys.tolist(), now.tolist(), ok.tolist()
+
+
+def replay(limiter, client_id, handles, trace):
+    """
+    Run each attempt like the login route: check, then clear on success or
+    record the failure. One decision per attempt, however many calls it takes.
+    """
+    counts = {'decisions': 0, 'limited': 0, 'locks': 0}
+    decisions = []
+    for index, now, ok in zip(*trace):
+        handle = handles[index]
+        checked = limiter.check(client_id, handle, now)
+        counts['decisions'] += 1
+        if checked.is_limited:
+            counts['limited'] += 1
+            decisions.append(('limited', checked.retry_after_seconds))
+            continue
+        if ok:
+            limiter.clear(client_id, handle)
+            decisions.append(('ok', None))
+        else:
+            failed = limiter.record_failure(client_id, handle, now)
+            counts['locks'] += failed.is_locked
+            decisions.append(('failed', failed.attempts_remaining))
+    return counts, decisions
+
+
+def policy_cases(limiter_cls, store_factory):
+    """Hand-checked scenarios: returns a list of failed descriptions (empty when all pass)."""
+    problems = []
+    minute = 60_000
+    start = 1_700_000_000_000
+
+    def expect(label, actual, expected):
+        if actual != expected:
+            problems.append(f"{limiter_cls.name}: {label}: got {actual}, expected {expected}")
+
+    limiter = limiter_cls(store_factory())
+    for i in range(MAX_ATTEMPTS - 1):
+        expect(f"failure {i + 1}", limiter.record_failure('c', '@Handle', start + i),
+               FailedLogin(False, MAX_ATTEMPTS - 1 - i))
+    expect('check before lock', limiter.check('c', 'handle', start + 10), _NOT_LIMITED)
+    expect('5th failure locks', limiter.record_failure('c', 'HANDLE', start + 10), _LOCKED)
+    expect('locked', limiter.check('c', '@handle', start + 10 + 1500), RateLimitCheck(True, 900 - 1))
+    expect('other tenant', limiter.check('d', 'handle', start + 20), _NOT_LIMITED)
+    expect('unlocked after lockout', limiter.check('c', 'handle', start + 10 + LOCKOUT_MS), _NOT_LIMITED)
+    limiter.record_failure('c', 'handle', start + 10 + LOCKOUT_MS)
+    limiter.clear('c', '@HANDLE')
+    expect('clear resets', limiter.record_failure('c', 'handle', start + 10 + LOCKOUT_MS + 1),
+           FailedLogin(False, MAX_ATTEMPTS - 1))
+
+    # 4 failures at minute 14, then 4 at minute 16
+    limiter = limiter_cls(store_factory())
+    locked = False
+    for t in [0] + [14 * minute] * 3 + [16 * minute] * 4:
+        locked = limiter.record_failure('c', 'straddle', start + t).is_locked or locked
+    expect('failures straddling the window lock', locked, limiter_cls is not FixedWindowLimiter)
+
+    # One failure every 3.5 minutes for an hour: 5 fit in 15 minutes, but GCRA drains faster than they arrive
+    limiter = limiter_cls(store_factory())
+    locked = any(limiter.record_failure('c', 'slow', start + t * 210_000).is_locked for t in range(18))
+    expect('failures every 3.5 minutes lock', locked, limiter_cls is not GCRALimiter)
+    return problems
+
+
+def run_verify(address=None, n_keys=2_000, n_attempts=20_000):
+    """Policy cases on both stores, then the same trace on MemoryStore and RespStore: decisions must match."""
+    server = None
+    if address is None:
+        server, port = start_stand_in()
+        address = ('127.0.0.1', port)
+    conn = RespConnection(*address)
+    prefix = f"{RESP_PREFIX}verify-{_now_ms()}:"
+    cases = itertools.count()
+    handles = [f"Creator_{i}" for i in range(n_keys)]
+    trace = login_trace(n_keys, n_attempts, seed=1)
+    problems = []
+    for name, cls in LIMITERS.items():
+        problems += policy_cases(cls, MemoryStore)
+        problems += policy_cases(cls, lambda: RespStore(conn, f"{prefix}{name}:case-{next(cases)}:"))
+        memory_counts, memory_decisions = replay(cls(MemoryStore()), 'client', handles, trace)
+        _, resp_decisions = replay(cls(RespStore(conn, f"{prefix}{name}:")), 'client', handles, trace)
+        mismatches = sum(1 for a, b in zip(memory_decisions, resp_decisions) if a != b)
+        if mismatches:
+            problems.append(f"{name}: {mismatches:,} of {len(memory_decisions):,} decisions differ between stores")
+        print(f"  {name:13s} {memory_counts['decisions']:>7,} decisions, {memory_counts['locks']:>5,} locks, "
+              f"{memory_counts['limited']:>6,} limited; RESP store "
+              f"{'identical' if not mismatches else f'{mismatches:,} different'}")
+
+    # Another app server records a failure between our WATCH/GET and EXEC: the EXEC must abort and retry
+    other = RespConnection(*address)
+    store = RespStore(conn, f"{prefix}race:")
+    limiter = SlidingWindowLogLimiter(store)
+    now = _now_ms()
+
+    def interleaved(value):
+        if not store.retries:
+            SlidingWindowLogLimiter(RespStore(other, store.prefix)).record_failure('c', 'raced', now)
+        return limiter._fail(value, now)
+
+    result = store.update(rate_limit_key('c', 'raced'), interleaved)
+    if store.retries != 1 or result != FailedLogin(False, MAX_ATTEMPTS - 2):
+        problems.append(f"concurrent failure: {store.retries} retries, {result}; expected 1 retry and "
+                        f"{MAX_ATTEMPTS - 2} attempts remaining")
+    print(f"  concurrent failure: {store.retries} WATCH retry, {result.attempts_remaining} attempts remaining")
+    other.close()
+    conn.close()
+    if server is not None:
+        server.shutdown()
+    return problems
+
+
+def run_benchmark(n_keys, n_attempts, resp_address=None, resp_attempts=20_000):
+    """
+    Decisions per second and memory per tracked key for each algorithm:
+    in process with n_keys tracked handles, then over RESP (stand-in server
+    unless resp_address points at a real one).
+    """
+    import gc
+    import tracemalloc
+
+    client_id = 'a001b447-8387-4b75-8100-010000000000'
+    handles = [f"creator_{i:07d}" for i in range(n_keys)]
+    trace = login_trace(n_keys, n_attempts)
+    start_ms = trace[1][0] - WINDOW_MS
+    step = max(WINDOW_MS // n_keys, 1)
+    print(f"{n_keys:,} tracked handles, {n_attempts:,} login attempts over "
+          f"{(trace[1][-1] - trace[1][0]) / 3_600_000:.1f}h (1% of handles get 30%)")
+    print(f"{'algorithm':13s} {'store':7s} {'populate/s':>11s} {'decisions/s':>12s} {'bytes/key':>10s} "
+          f"{'value B':>8s} {'locks':>7s} {'limited':>8s}")
+    for name, cls in LIMITERS.items():
+        store = MemoryStore()
+        limiter = cls(store)
+        # Every handle gets one failure in the 15 minutes before the trace
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i, handle in enumerate(handles):
+            limiter.record_failure(client_id, handle, start_ms + i * step)
+        per_key = (tracemalloc.get_traced_memory()[0] - before) / max(len(store), 1)
+        tracemalloc.stop()
+
+        store = MemoryStore()
+        limiter = cls(store)
+        started = time.perf_counter()
+        for i, handle in enumerate(handles):
+            limiter.record_failure(client_id, handle, start_ms + i * step)
+        populate = n_keys / (time.perf_counter() - started)
+        started = time.perf_counter()
+        counts, _ = replay(limiter, client_id, handles, trace)
+        rate = counts['decisions'] / (time.perf_counter() - started)
+        value_bytes = sum(len(value) for _, value in store._data.values()) / max(len(store), 1)
+        print(f"{name:13s} {'memory':7s} {populate:>11,.0f} {rate:>12,.0f} {per_key:>10,.0f} {value_bytes:>8.1f} "
+              f"{counts['locks']:>7,} {counts['limited']:>8,}")
+        del store, limiter
+        gc.collect()
+
+    server = None
+    if resp_address is None:
+        server, port = start_stand_in()
+        resp_address = ('127.0.0.1', port)
+    conn = RespConnection(*resp_address)
+    prefix = f"{RESP_PREFIX}bench-{_now_ms()}:"
+    resp_trace = login_trace(n_keys, resp_attempts, seed=2)
+    for name, cls in LIMITERS.items():
+        store = RespStore(conn, f"{prefix}{name}:")
+        started = time.perf_counter()
+        counts, _ = replay(cls(store), client_id, handles, resp_trace)
+        rate = counts['decisions'] / (time.perf_counter() - started)
+        sample = rate_limit_key(client_id, handles[0])
+        cls(store).record_failure(client_id, handles[0])
+        usage = store.memory_usage(sample)
+        payload = len(RESP_PREFIX + sample) + len(store.get(sample))
+        print(f"{name:13s} {'RESP':7s} {'':>11s} {rate:>12,.0f} {usage or payload:>10,}"
+              f"{'' if usage else '*':1s} {len(store.get(sample)):>7} {counts['locks']:>7,} {counts['limited']:>8,}"
+              f"  ({store.retries} WATCH retries)")
+        conn.execute('DEL', store.prefix + sample)
+    conn.close()
+    if server is not None:
+        server.shutdown()
+        print('RESP rows ran against the local stand-in; * = key + value payload only, '
+              'the stand-in has no MEMORY USAGE')
+    print('RESP round trips per decision: check 1, failure 2 (WATCH/GET, MULTI/SET/EXEC), success 1 (DEL)')
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Login rate limiter: verify, benchmark, or serve the RESP stand-in')
+    parser.add_argument('--verify', action='store_true', help='policy cases and memory/RESP agreement')
+    parser.add_argument('--bench', action='store_true', help='decisions/s and memory per key')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='run the RESP stand-in server on PORT')
+    parser.add_argument('--redis', metavar='HOST:PORT', help='use this Redis-protocol server instead of the stand-in')
+    parser.add_argument('--keys', type=int, default=1_000_000, help='tracked handles (--bench)')
+    parser.add_argument('--attempts', type=int, default=1_000_000, help='login attempts replayed in memory (--bench)')
+    parser.add_argument('--resp-attempts', type=int, default=20_000, help='login attempts replayed over RESP')
+    args = parser.parse_args()
+    if sum(map(bool, (args.verify, args.bench, args.serve))) != 1:
+        parser.error('pass one of --verify, --bench, --serve')
+
+    address = None
+    if args.redis:
+        host, _, port = args.redis.rpartition(':')
+        address = (host or '127.0.0.1', int(port))
+    if args.serve:
+        server = RespStandIn(('127.0.0.1', args.serve))
+        print(f"RESP stand-in listening on 127.0.0.1:{args.serve}")
+        server.serve_forever()
+    elif args.verify:
+        problems = run_verify(address)
+        for problem in problems:
+            print(f"FAIL {problem}")
+        print('OK' if not problems else f"{len(problems)} problems")
+        sys.exit(1 if problems else 0)
+    else:
+        run_benchmark(args.keys, args.attempts, address, args.resp_attempts)
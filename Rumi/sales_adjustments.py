@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Sales Adjustment Audit
+Applies a snapshot's pending sales_adjustments to the exported user totals
+the way apply_pending_sales_adjustments does
+(migrations_backup_20251216/20251215103614_fix_apply_adjustments_null_handling.sql),
+so finance can see what the next daily cron will commit before it runs.
+That cron is runCheckpointEvaluation step 1
+(syncRepository.applyPendingSalesAdjustments).
+
+The RPC adds SUM(amount) / SUM(amount_units) of each user's pending rows to
+total_sales / total_units and manual_adjustments_total / _units. It then
+marks every pending row of the client applied, whether or not a user was
+credited. The audit reproduces this in one grouped pass: user ids are
+matched with one index_in, and the amounts (in integer cents) are summed
+per user with bincount. Hundreds of thousands of adjustments take well
+under a second once the CSV is read.
+
+Orphaned adjustments are pending rows that would be marked applied without
+crediting anyone:
+- no_user: user_id is NULL
+- unknown_user: the user is not one of the client's users. The foreign key
+  only points at users(id), and the RPC's update requires
+  u.client_id = p_client_id.
+- empty: both amount and amount_units are NULL
+
+Users whose manual_adjustments_* do not equal the sum of their applied
+adjustments are reported as:
+- double_applied: the excess equals one day's applied batch. Two
+  overlapping runs both add the same pending rows: the second UPDATE waits
+  on the row locks and then adds its own sum.
+- pending_already_counted: the excess equals the pending sum, so applying
+  it would count it twice
+- erased: manual_adjustments_* is 0 although adjustments were applied, as
+  with BUG-UPDATE-PRECOMPUTED-FIELDS-OVERWRITES-ADJUSTMENTS
+- drift: any other difference
+
+Each affected user also gets the tier the adjustments lead to:
+- checkpoint_tier: what runCheckpointEvaluation gives for the checkpoint
+  value (checkpoint_*_current + manual adjustments, calculateCheckpointValue)
+- promotion_tier: what checkForPromotions gives for the lifetime totals.
+  It runs before the adjustments are applied, so this takes effect the
+  day after.
+
+Exits 1 when anything is orphaned or inconsistent, for use as a gate
+before the cron.
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/today
+    python sales_adjustments.py snapshots/today --users affected.csv --adjustments flagged.csv
+"""
+
+import csv
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from table_snapshot import read_table
+
+ORPHAN_REASONS = ['no_user', 'unknown_user', 'empty']
+USER_FINDINGS = ['double_applied', 'pending_already_counted', 'erased', 'drift']
+
+US_PER_DAY = 86_400_000_000
+NEVER = np.iinfo(np.int64).max
+
+
+def _numpy(column, fill=None, dtype=None):
+    if fill is not None:
+        column = pc.fill_null(column, fill)
+    values = column.to_numpy(zero_copy_only=False)
+    return values.astype(dtype) if dtype else values
+
+
+def _cents(column):
+    """Money column -> int64 cents, NULL -> 0."""
+    return np.round(_numpy(column, 0.0, np.float64) * 100).astype(np.int64)
+
+
+def _sum(index, weights, n):
+    return np.bincount(index, weights=weights, minlength=n).astype(np.int64)
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def load_snapshot(directory, client_id=None):
+    """The client's vip_metric, tiers, users and sales_adjustments from a snapshot."""
+    clients = read_table(directory, 'clients', ['id', 'vip_metric'], client_id)
+    if clients.num_rows != 1:
+        raise SystemExit(f"Snapshot has {clients.num_rows} clients; pass --client-id")
+    client_id = clients['id'][0].as_py()
+
+    tiers = read_table(directory, 'tiers', None, client_id).sort_by('tier_order')
+    users = read_table(directory, 'users', ['id', 'current_tier', 'next_checkpoint_at', 'total_sales', 'total_units',
+                                            'manual_adjustments_total', 'manual_adjustments_units',
+                                            'checkpoint_sales_current', 'checkpoint_units_current'], client_id)
+    adjustments = read_table(directory, 'sales_adjustments', None, client_id)
+    return {
+        'client_id': client_id,
+        'vip_metric': 'units' if clients['vip_metric'][0].as_py() == 'units' else 'sales',
+        'tiers': tiers,
+        'users': users,
+        'adjustments': adjustments,
+    }
+
+
+# ============================================================================
+# AUDIT
+# ============================================================================
+
+def _applied_batches(user, day, cents, units):
+    """Sum applied adjustments per (user, applied day): (batch user, batch day, batch cents, batch units)."""
+    if not len(user):
+        return (np.zeros(0, np.int64),) * 4
+    first = int(day.min())
+    span = int(day.max()) - first + 1
+    keys, batch = np.unique(user * span + (day - first), return_inverse=True)
+    n = len(keys)
+    return keys // span, keys % span + first, _sum(batch, cents, n), _sum(batch, units, n)
+
+
+def _tier_index(value, thresholds):
+    """Highest tier (index into tiers sorted by tier_order) whose threshold value reaches, else the lowest."""
+    reached = value[:, None] >= thresholds[None, :]
+    return np.where(reached.any(axis=1), reached.shape[1] - 1 - np.argmax(reached[:, ::-1], axis=1), 0)
+
+
+def audit(data, as_of_day):
+    """
+    Apply the pending adjustments in one grouped pass and audit them.
+    Returns (adjustment, user) dicts of numpy arrays: per adjustment its
+    user index (-1 if none), pending flag and orphan reason; per user the
+    totals before and after, the pending and applied sums, the finding
+    and the tiers.
+    """
+    users, adjustments, tiers = data['users'], data['adjustments'], data['tiers']
+    n = users.num_rows
+
+    # Per adjustment
+    user = _numpy(pc.index_in(adjustments['user_id'], value_set=users['id']), -1, np.int64)
+    has_amount = _numpy(pc.is_valid(adjustments['amount']))
+    has_units = _numpy(pc.is_valid(adjustments['amount_units']))
+    cents = np.where(has_amount, _cents(adjustments['amount']), 0)
+    units = np.where(has_units, _numpy(adjustments['amount_units'], 0, np.int64), 0)
+    pending = _numpy(pc.is_null(adjustments['applied_at']))
+    reason = np.full(len(user), None, dtype=object)
+    reason[~has_amount & ~has_units] = 'empty'
+    reason[(user < 0) & _numpy(pc.is_valid(adjustments['user_id']))] = 'unknown_user'
+    reason[_numpy(pc.is_null(adjustments['user_id']))] = 'no_user'
+
+    # Per user: what is pending and what was already applied
+    credit = pending & (user >= 0)
+    applied = ~pending & (user >= 0)
+    pending_count = np.bincount(user[credit], minlength=n)
+    pending_cents = _sum(user[credit], cents[credit], n)
+    pending_units = _sum(user[credit], units[credit], n)
+    applied_cents = _sum(user[applied], cents[applied], n)
+    applied_units = _sum(user[applied], units[applied], n)
+
+    manual_cents = _cents(users['manual_adjustments_total'])
+    manual_units = _numpy(users['manual_adjustments_units'], 0, np.int64)
+    excess_cents = manual_cents - applied_cents
+    excess_units = manual_units - applied_units
+    inconsistent = (excess_cents != 0) | (excess_units != 0)
+
+    applied_day = _numpy(pc.cast(pc.fill_null(adjustments['applied_at'], pa.scalar(0, pa.date32())), pa.int32()),
+                         dtype=np.int64)
+    batch_user, batch_day, batch_cents, batch_units = _applied_batches(user[applied], applied_day[applied],
+                                                                       cents[applied], units[applied])
+    repeated = ((excess_cents[batch_user] == batch_cents) & (excess_units[batch_user] == batch_units)
+                & inconsistent[batch_user])
+    double_day = np.full(n, -1, dtype=np.int64)
+    double_day[batch_user[repeated]] = batch_day[repeated]
+
+    finding = np.full(n, None, dtype=object)
+    finding[inconsistent] = 'drift'
+    finding[inconsistent & (manual_cents == 0) & (manual_units == 0)] = 'erased'
+    counted = (excess_cents == pending_cents) & (excess_units == pending_units)
+    finding[inconsistent & counted] = 'pending_already_counted'
+    finding[double_day >= 0] = 'double_applied'
+
+    # Totals after the RPC (NULL totals count as 0, as its COALESCE does)
+    total_cents = _cents(users['total_sales'])
+    total_units = _numpy(users['total_units'], 0, np.int64)
+    after = {
+        'total_sales': total_cents + pending_cents,
+        'total_units': total_units + pending_units,
+        'manual_adjustments_total': manual_cents + pending_cents,
+        'manual_adjustments_units': manual_units + pending_units,
+    }
+
+    # Tiers before and after, by vip_metric (NULL thresholds count as 0)
+    if data['vip_metric'] == 'units':
+        thresholds = _numpy(tiers['units_threshold'], 0, np.int64)
+        checkpoint = _numpy(users['checkpoint_units_current'], 0, np.int64)
+        lifetime, manual, delta = total_units, manual_units, pending_units
+    else:
+        thresholds = _cents(tiers['sales_threshold'])
+        checkpoint = _cents(users['checkpoint_sales_current'])
+        lifetime, manual, delta = total_cents, manual_cents, pending_cents
+    tier_ids = tiers['tier_id'].to_pylist()
+    current = _numpy(pc.index_in(users['current_tier'], value_set=tiers['tier_id']), 0, np.int64)
+    next_checkpoint = _numpy(pc.cast(users['next_checkpoint_at'], pa.int64()), NEVER, np.int64)
+    due = (next_checkpoint // US_PER_DAY <= as_of_day) & (current > 0)
+
+    def promotion(value):
+        best = _tier_index(value, thresholds)
+        return np.where(best > current, best, current)
+
+    result = {
+        'pending_count': pending_count, 'pending_cents': pending_cents, 'pending_units': pending_units,
+        'applied_cents': applied_cents, 'applied_units': applied_units,
+        'manual_cents': manual_cents, 'manual_units': manual_units,
+        'total_cents': total_cents, 'total_units': total_units, 'after': after,
+        'finding': finding, 'double_day': double_day, 'due': due, 'current_tier': current,
+        'checkpoint_value': (checkpoint + manual, checkpoint + manual + delta),
+        'checkpoint_tier': (_tier_index(checkpoint + manual, thresholds),
+                            _tier_index(checkpoint + manual + delta, thresholds)),
+        'promotion_tier': (promotion(lifetime), promotion(lifetime + delta)),
+        'tier_ids': tier_ids,
+    }
+    return {'user': user, 'pending': pending, 'reason': reason, 'cents': cents, 'units': units}, result
+
+
+def summary(data, adjustment, result):
+    """Counts for the report and --json."""
+    pending = adjustment['pending']
+    reason = adjustment['reason']
+    affected = (result['pending_count'] > 0)
+    cp_before, cp_after = result['checkpoint_tier']
+    pr_before, pr_after = result['promotion_tier']
+    return {
+        'client_id': data['client_id'],
+        'vip_metric': data['vip_metric'],
+        'adjustments': int(len(pending)),
+        'pending': int(pending.sum()),
+        'pending_amount': int(result['pending_cents'].sum()) / 100,
+        'pending_units': int(result['pending_units'].sum()),
+        'users_credited': int(affected.sum()),
+        'orphaned': {r: int((pending & (reason == r)).sum()) for r in ORPHAN_REASONS},
+        'orphaned_applied': {r: int((~pending & (reason == r)).sum()) for r in ORPHAN_REASONS},
+        'findings': {f: int((result['finding'] == f).sum()) for f in USER_FINDINGS},
+        'checkpoint_tier_changes': int((affected & result['due'] & (cp_before != cp_after)).sum()),
+        'promotions_added': int((affected & (pr_after > pr_before)).sum()),
+        'promotions_removed': int((affected & (pr_after < pr_before)).sum()),
+    }
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def write_users(path, data, result):
+    """One row per user with pending adjustments or a finding: totals and tiers before -> after."""
+    ids = data['users']['id']
+    tier_ids = result['tier_ids']
+    rows = np.flatnonzero((result['pending_count'] > 0) | (result['finding'] != None))  # noqa: E711
+    cp_value, cp_tier, pr_tier = result['checkpoint_value'], result['checkpoint_tier'], result['promotion_tier']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'pending_adjustments', 'pending_amount', 'pending_units',
+                         'total_sales', 'total_sales_after', 'total_units', 'total_units_after',
+                         'manual_adjustments_total', 'applied_total', 'manual_adjustments_units', 'applied_units',
+                         'checkpoint_value', 'checkpoint_value_after', 'current_tier', 'due_for_checkpoint',
+                         'checkpoint_tier', 'checkpoint_tier_after', 'promotion_tier', 'promotion_tier_after',
+                         'finding', 'double_applied_on'])
+        scale = 100 if data['vip_metric'] == 'sales' else 1
+        for i in rows:
+            day = result['double_day'][i]
+            writer.writerow([
+                ids[i].as_py(), int(result['pending_count'][i]), result['pending_cents'][i] / 100,
+                int(result['pending_units'][i]),
+                result['total_cents'][i] / 100, result['after']['total_sales'][i] / 100,
+                int(result['total_units'][i]), int(result['after']['total_units'][i]),
+                result['manual_cents'][i] / 100, result['applied_cents'][i] / 100,
+                int(result['manual_units'][i]), int(result['applied_units'][i]),
+                cp_value[0][i] / scale, cp_value[1][i] / scale, tier_ids[result['current_tier'][i]],
+                bool(result['due'][i]), tier_ids[cp_tier[0][i]], tier_ids[cp_tier[1][i]],
+                tier_ids[pr_tier[0][i]], tier_ids[pr_tier[1][i]], result['finding'][i],
+                str(np.datetime64(int(day), 'D')) if day >= 0 else None,
+            ])
+    return len(rows)
+
+
+def write_adjustments(path, data, adjustment):
+    """Every orphaned adjustment, pending or already applied."""
+    adjustments = data['adjustments']
+    rows = np.flatnonzero(adjustment['reason'] != None)  # noqa: E711
+    columns = {name: adjustments[name].to_pylist() for name in
+               ('id', 'user_id', 'amount', 'amount_units', 'adjustment_type', 'created_at', 'applied_at')}
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(columns) + ['reason'])
+        for i in rows:
+            writer.writerow([columns[name][i] for name in columns] + [adjustment['reason'][i]])
+    return len(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Apply pending sales adjustments to a snapshot and audit them')
+    parser.add_argument('snapshot', help='snapshot directory (table_snapshot.py)')
+    parser.add_argument('--client-id')
+    parser.add_argument('--as-of', help='day the cron runs, for users due for checkpoint (default: today)')
+    parser.add_argument('--users', help='write affected and inconsistent users (CSV)')
+    parser.add_argument('--adjustments', help='write orphaned adjustments (CSV)')
+    parser.add_argument('--json', help='write the summary (JSON)')
+    args = parser.parse_args()
+
+    as_of_day = int(np.datetime64(args.as_of or 'today', 'D').astype(np.int64))
+    start = time.perf_counter()
+    data = load_snapshot(args.snapshot, args.client_id)
+    loaded = time.perf_counter()
+    adjustment, result = audit(data, as_of_day)
+    report = summary(data, adjustment, result)
+    elapsed = time.perf_counter() - loaded
+
+    print(f"{report['adjustments']:,} adjustments, {data['users'].num_rows:,} users "
+          f"(read in {loaded - start:.1f}s, audited in {elapsed:.2f}s)\n")
+    print(f"Pending: {report['pending']:,} adjustments, ${report['pending_amount']:,.2f} and "
+          f"{report['pending_units']:,} units for {report['users_credited']:,} users")
+    print(f"  checkpoint tier changes for users due on {np.datetime64(as_of_day, 'D')}: "
+          f"{report['checkpoint_tier_changes']:,}")
+    print(f"  promotions on the next run: +{report['promotions_added']:,} / -{report['promotions_removed']:,}")
+    print(f"\n{'orphaned':24s} {'pending':>8s} {'applied':>8s}")
+    for name in ORPHAN_REASONS:
+        print(f"{name:24s} {report['orphaned'][name]:>8,d} {report['orphaned_applied'][name]:>8,d}")
+    print(f"\n{'inconsistent users':24s} {'count':>8s}")
+    for name in USER_FINDINGS:
+        print(f"{name:24s} {report['findings'][name]:>8,d}")
+
+    if args.users:
+        count = write_users(args.users, data, result)
+        print(f"\n{count:,} users written to {args.users}")
+    if args.adjustments:
+        count = write_adjustments(args.adjustments, data, adjustment)
+        print(f"{count:,} orphaned adjustments written to {args.adjustments}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Summary written to {args.json}")
+    sys.exit(1 if sum(report['orphaned'].values()) or sum(report['findings'].values()) else 0)
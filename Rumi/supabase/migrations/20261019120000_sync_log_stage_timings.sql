@@ -0,0 +1,10 @@
+-- Migration: Per-stage timings on sync_logs
+-- Context: sync_orchestrator.py runs the daily sync for several clients in parallel and
+-- records how long each stage (download, parse, ingest, each refresh RPC) took, plus
+-- the time spent waiting for a database connection, so slow tenants and connection
+-- contention show up per run.
+-- Shape: {"download": 12.3, "parse": 4.1, "connection_wait": 0.0, "ingest": 20.5, ...} (seconds)
+-- NULL for runs that do not record stages (processDailySales).
+
+ALTER TABLE "public"."sync_logs"
+  ADD COLUMN IF NOT EXISTS "stage_timings" "jsonb";
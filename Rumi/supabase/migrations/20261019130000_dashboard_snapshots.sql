@@ -0,0 +1,122 @@
+-- Migration: Dashboard payload snapshots
+-- Context: get_dashboard_data recomputes the tier, featured mission and reward list on every
+-- dashboard load, but its inputs only change when the daily sync runs. dashboard_snapshots.py
+-- builds every user's payload in bulk after the sync and stores it here as compact JSON,
+-- keyed by (client, sync, user). get_dashboard_snapshot serves it with keyed reads.
+--
+-- A build writes a new sync_id, then points dashboard_snapshot_sets at it in one transaction,
+-- so readers never see a half-written set. Older sets are deleted afterwards.
+--
+-- Freshness: get_dashboard_snapshot falls back to get_dashboard_data when there is no snapshot
+-- row, when the user has mission_progress or redemptions (claims, raffle entries) changed after
+-- the build, or when the user's tier, checkpoint or profile fields differ from the build
+-- (dashboard_snapshot_user_digest: checkpoint evaluation, manual adjustments). A newer
+-- last_login_at (every login) only patches checkpointData.lastLoginAt, unless the snapshot
+-- shows a recentFulfillment, which depends on it. Admin edits to missions, rewards, tiers or
+-- the client are not detected: rebuild after them, or run dashboard_snapshots.py --invalidate
+-- to serve the RPC until the next build.
+
+CREATE TABLE IF NOT EXISTS "public"."dashboard_snapshots" (
+    "client_id" "uuid" NOT NULL,
+    "sync_id" "uuid" NOT NULL,
+    "user_id" "uuid" NOT NULL,
+    "payload" "json" NOT NULL,
+    "user_digest" "text" NOT NULL,
+    "last_login_at" timestamp with time zone,
+    CONSTRAINT "dashboard_snapshots_pkey" PRIMARY KEY ("client_id", "sync_id", "user_id")
+);
+
+CREATE TABLE IF NOT EXISTS "public"."dashboard_snapshot_sets" (
+    "client_id" "uuid" NOT NULL REFERENCES "public"."clients"("id") ON DELETE CASCADE,
+    "sync_id" "uuid" NOT NULL,
+    "built_at" timestamp with time zone NOT NULL,
+    "users" integer NOT NULL,
+    CONSTRAINT "dashboard_snapshot_sets_pkey" PRIMARY KEY ("client_id")
+);
+
+COMMENT ON COLUMN "public"."dashboard_snapshot_sets"."built_at" IS
+  'Start of the build transaction. Rows changed after it make get_dashboard_snapshot use get_dashboard_data.';
+
+-- Only the SECURITY DEFINER function and the service role read these
+ALTER TABLE "public"."dashboard_snapshots" ENABLE ROW LEVEL SECURITY;
+ALTER TABLE "public"."dashboard_snapshot_sets" ENABLE ROW LEVEL SECURITY;
+
+-- Digest of the users columns get_dashboard_data reads, except last_login_at. Called with the
+-- columns rather than the whole row, which would build a composite of every users column on
+-- each read. The checkpoint date goes in as epoch seconds, so the digest does not depend on
+-- the session TimeZone or DateStyle.
+CREATE OR REPLACE FUNCTION dashboard_snapshot_user_digest(
+  p_tiktok_handle VARCHAR,
+  p_email VARCHAR,
+  p_current_tier VARCHAR,
+  p_checkpoint_sales_current NUMERIC,
+  p_checkpoint_units_current INTEGER,
+  p_manual_adjustments_total NUMERIC,
+  p_manual_adjustments_units INTEGER,
+  p_next_checkpoint_at TIMESTAMPTZ
+)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT md5(ROW(p_tiktok_handle, p_email, p_current_tier, p_checkpoint_sales_current,
+                 p_checkpoint_units_current, p_manual_adjustments_total, p_manual_adjustments_units,
+                 extract(epoch FROM p_next_checkpoint_at))::text)
+$$;
+
+CREATE OR REPLACE FUNCTION get_dashboard_snapshot(
+  p_user_id UUID,
+  p_client_id UUID
+)
+RETURNS JSON
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public  -- SECURITY: Prevent search_path injection
+AS $$
+DECLARE
+  v_snapshot RECORD;
+BEGIN
+  SELECT
+    s.payload,
+    u.last_login_at,
+    u.last_login_at IS NOT DISTINCT FROM s.last_login_at AS same_login,
+    dashboard_snapshot_user_digest(u.tiktok_handle, u.email, u.current_tier, u.checkpoint_sales_current,
+                                   u.checkpoint_units_current, u.manual_adjustments_total,
+                                   u.manual_adjustments_units, u.next_checkpoint_at) = s.user_digest
+      AND NOT EXISTS (SELECT 1 FROM mission_progress mp
+                      WHERE mp.user_id = p_user_id AND mp.updated_at > ss.built_at)
+      AND NOT EXISTS (SELECT 1 FROM redemptions red
+                      WHERE red.user_id = p_user_id AND red.updated_at > ss.built_at) AS fresh
+  INTO v_snapshot
+  FROM dashboard_snapshot_sets ss
+  INNER JOIN dashboard_snapshots s ON s.client_id = ss.client_id
+    AND s.sync_id = ss.sync_id
+    AND s.user_id = p_user_id
+  INNER JOIN users u ON u.id = s.user_id
+    AND u.client_id = ss.client_id
+  WHERE ss.client_id = p_client_id;  -- CRITICAL: Multitenancy enforcement
+
+  IF NOT FOUND OR NOT v_snapshot.fresh THEN
+    RETURN get_dashboard_data(p_user_id, p_client_id);
+  END IF;
+  IF v_snapshot.same_login THEN
+    RETURN v_snapshot.payload;
+  END IF;
+  -- Logged in since the build: recentFulfillment compares against last_login_at
+  IF (v_snapshot.payload->'recentFulfillment')::text <> 'null' THEN
+    RETURN get_dashboard_data(p_user_id, p_client_id);
+  END IF;
+  RETURN jsonb_set(v_snapshot.payload::jsonb, '{checkpointData,lastLoginAt}',
+                   to_jsonb(v_snapshot.last_login_at))::json;
+END;
+$$;
+
+-- SECURITY: Revoke default PUBLIC access, then grant only to specific roles
+REVOKE EXECUTE ON FUNCTION dashboard_snapshot_user_digest(VARCHAR, VARCHAR, VARCHAR, NUMERIC, INTEGER, NUMERIC, INTEGER,
+                                                        TIMESTAMPTZ) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dashboard_snapshot_user_digest(VARCHAR, VARCHAR, VARCHAR, NUMERIC, INTEGER, NUMERIC, INTEGER,
+                                                      TIMESTAMPTZ) TO service_role;
+REVOKE EXECUTE ON FUNCTION get_dashboard_snapshot(UUID, UUID) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION get_dashboard_snapshot(UUID, UUID) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_dashboard_snapshot(UUID, UUID) TO service_role;
@@ -0,0 +1,123 @@
+-- Migration: Dashboard snapshot freshness for admin edits and raffle entries
+-- Context: get_dashboard_snapshot (20261019130000_dashboard_snapshots.sql) only compared the
+-- user's digest, mission_progress and redemptions with the build. An edit to the client's
+-- missions, rewards, tiers or client row kept serving the old payload until the next build,
+-- and so did a change to the user's raffle_participations, which decide the featured raffle.
+--
+-- dashboard_content_versions holds a per-client counter that row triggers on clients, tiers,
+-- missions and rewards bump on every insert, update or delete (missions has no updated_at,
+-- and a deleted row leaves no timestamp to compare). dashboard_snapshots.py reads the counter
+-- in its build transaction and stores it on the set; get_dashboard_snapshot serves the set only
+-- while the counter is unchanged. A raffle_participations row of the user updated after
+-- built_at also falls back to get_dashboard_data.
+--
+-- The app still calls get_dashboard_data by default; dashboardRepository only calls
+-- get_dashboard_snapshot for clients listed in DASHBOARD_SNAPSHOT_CLIENT_IDS.
+
+CREATE TABLE IF NOT EXISTS "public"."dashboard_content_versions" (
+    "client_id" "uuid" NOT NULL,
+    "version" bigint NOT NULL DEFAULT 0,
+    CONSTRAINT "dashboard_content_versions_pkey" PRIMARY KEY ("client_id")
+);
+
+-- Only the triggers, the SECURITY DEFINER function and the service role use it
+ALTER TABLE "public"."dashboard_content_versions" ENABLE ROW LEVEL SECURITY;
+
+ALTER TABLE "public"."dashboard_snapshot_sets"
+  ADD COLUMN IF NOT EXISTS "content_version" bigint NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN "public"."dashboard_snapshot_sets"."content_version" IS
+  'dashboard_content_versions.version read by the build. get_dashboard_snapshot serves the set only while it matches.';
+
+-- Sets built before this migration have no recorded version: stop serving them until the next build
+DELETE FROM "public"."dashboard_snapshot_sets";
+
+-- TG_ARGV[0]: the column holding the client id ('id' on clients, 'client_id' elsewhere)
+CREATE OR REPLACE FUNCTION "public"."bump_dashboard_content_version"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SECURITY DEFINER
+    SET search_path = public
+    AS $$
+DECLARE
+  v_old_client UUID;
+  v_new_client UUID;
+BEGIN
+  IF TG_OP <> 'INSERT' THEN
+    v_old_client := (to_jsonb(OLD) ->> TG_ARGV[0])::UUID;
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    v_new_client := (to_jsonb(NEW) ->> TG_ARGV[0])::UUID;
+  END IF;
+
+  INSERT INTO dashboard_content_versions (client_id, version)
+  SELECT DISTINCT c, 1 FROM unnest(ARRAY[v_old_client, v_new_client]) AS c WHERE c IS NOT NULL
+  ON CONFLICT (client_id) DO UPDATE SET version = dashboard_content_versions.version + 1;
+  RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION "public"."bump_dashboard_content_version"() OWNER TO "postgres";
+
+CREATE OR REPLACE TRIGGER "bump_dashboard_content_version" AFTER INSERT OR UPDATE OR DELETE ON "public"."clients"
+  FOR EACH ROW EXECUTE FUNCTION "public"."bump_dashboard_content_version"('id');
+CREATE OR REPLACE TRIGGER "bump_dashboard_content_version" AFTER INSERT OR UPDATE OR DELETE ON "public"."tiers"
+  FOR EACH ROW EXECUTE FUNCTION "public"."bump_dashboard_content_version"('client_id');
+CREATE OR REPLACE TRIGGER "bump_dashboard_content_version" AFTER INSERT OR UPDATE OR DELETE ON "public"."missions"
+  FOR EACH ROW EXECUTE FUNCTION "public"."bump_dashboard_content_version"('client_id');
+CREATE OR REPLACE TRIGGER "bump_dashboard_content_version" AFTER INSERT OR UPDATE OR DELETE ON "public"."rewards"
+  FOR EACH ROW EXECUTE FUNCTION "public"."bump_dashboard_content_version"('client_id');
+
+CREATE OR REPLACE FUNCTION get_dashboard_snapshot(
+  p_user_id UUID,
+  p_client_id UUID
+)
+RETURNS JSON
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public  -- SECURITY: Prevent search_path injection
+AS $$
+DECLARE
+  v_snapshot RECORD;
+BEGIN
+  SELECT
+    s.payload,
+    u.last_login_at,
+    u.last_login_at IS NOT DISTINCT FROM s.last_login_at AS same_login,
+    ss.content_version = COALESCE((SELECT v.version FROM dashboard_content_versions v
+                                   WHERE v.client_id = ss.client_id), 0)
+      AND dashboard_snapshot_user_digest(u.tiktok_handle, u.email, u.current_tier, u.checkpoint_sales_current,
+                                         u.checkpoint_units_current, u.manual_adjustments_total,
+                                         u.manual_adjustments_units, u.next_checkpoint_at) = s.user_digest
+      AND NOT EXISTS (SELECT 1 FROM mission_progress mp
+                      WHERE mp.user_id = p_user_id AND mp.updated_at > ss.built_at)
+      AND NOT EXISTS (SELECT 1 FROM redemptions red
+                      WHERE red.user_id = p_user_id AND red.updated_at > ss.built_at)
+      AND NOT EXISTS (SELECT 1 FROM raffle_participations rp
+                      WHERE rp.user_id = p_user_id AND rp.updated_at > ss.built_at) AS fresh
+  INTO v_snapshot
+  FROM dashboard_snapshot_sets ss
+  INNER JOIN dashboard_snapshots s ON s.client_id = ss.client_id
+    AND s.sync_id = ss.sync_id
+    AND s.user_id = p_user_id
+  INNER JOIN users u ON u.id = s.user_id
+    AND u.client_id = ss.client_id
+  WHERE ss.client_id = p_client_id;  -- CRITICAL: Multitenancy enforcement
+
+  IF NOT FOUND OR NOT v_snapshot.fresh THEN
+    RETURN get_dashboard_data(p_user_id, p_client_id);
+  END IF;
+  IF v_snapshot.same_login THEN
+    RETURN v_snapshot.payload;
+  END IF;
+  -- Logged in since the build: recentFulfillment compares against last_login_at
+  IF (v_snapshot.payload->'recentFulfillment')::text <> 'null' THEN
+    RETURN get_dashboard_data(p_user_id, p_client_id);
+  END IF;
+  RETURN jsonb_set(v_snapshot.payload::jsonb, '{checkpointData,lastLoginAt}',
+                   to_jsonb(v_snapshot.last_login_at))::json;
+END;
+$$;
+
+-- SECURITY: Triggers only; not callable through the API
+REVOKE EXECUTE ON FUNCTION "public"."bump_dashboard_content_version"() FROM PUBLIC;
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+CRUVA Sync Delta
+Reduces a daily CRUVA export to the rows that changed since the previous
+run. Every download is the cumulative video list, and processDailySales
+upserts every row every day. For a mature tenant almost all of those rows
+are unchanged.
+
+A fingerprint store keeps two uint64 arrays from the last run, sorted by
+the first: a hash of each video_url, and a hash of every value the upsert
+writes for it (handle, title, post date, views, likes, comments, gmv, ctr,
+units). That is 16 bytes per video, about 16 MB for a million. Rows are
+parsed with the same rules as cruva_ingest.py / csvParser.ts, hashed with
+blake2b, and looked up with one searchsorted per batch. A row is emitted
+only if its video is new or any written value differs. Title, post date,
+ctr and handle are fingerprinted along with the metrics: they are
+upserted too, and a change to them would otherwise never be written.
+--init records a file that is already in the database without emitting
+anything.
+
+The delta is written as a CRUVA CSV (--delta) for the usual pipeline, or
+ingested directly (--ingest) with CruvaIngester. In that case
+update_precomputed_fields and update_mission_progress then run with
+p_user_ids = only the users whose videos changed. Each is committed on its
+own and, as in processDailySales, is non-fatal: a failing RPC is rolled
+back and reported, the next one still runs, and the store is still
+advanced, since the videos are already written. Videos missing from
+today's file keep their fingerprint, as videos are never deleted. The
+store is replaced only after the delta has been written or ingested. The
+previous store is kept as <store>.prev, so a failed downstream run can be
+retried against it.
+
+Usage:
+    python sync_delta.py --store fingerprints/<client>.npz --init exports/2025-12-30.csv
+    python sync_delta.py --store fingerprints/<client>.npz exports/2025-12-31.csv --delta delta.csv
+    python sync_delta.py --store fingerprints/<client>.npz exports/2025-12-31.csv --ingest --client-id <uuid>
+"""
+
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+from cruva_ingest import CRUVA_COLUMN_MAP, iter_cruva_rows, normalize_handle
+
+# Values the videos upsert writes; a change to any of them must reach the database
+FINGERPRINT_COLUMNS = ['tiktok_handle', 'video_title', 'post_date', 'views', 'likes', 'comments', 'gmv', 'ctr',
+                       'units_sold']
+BATCH_SIZE = 50_000
+
+
+def row_fingerprint(row, _blake2b=hashlib.blake2b):
+    """16 bytes: blake2b-64 of video_url, then of the written values (FINGERPRINT_COLUMNS)."""
+    values = (f"{normalize_handle(row['tiktok_handle'])}\x1f{row['video_title']}\x1f{row['post_date']}\x1f"
+              f"{row['views']}\x1f{row['likes']}\x1f{row['comments']}\x1f{row['gmv']!r}\x1f{row['ctr']!r}\x1f"
+              f"{row['units_sold']}")
+    return (_blake2b(row['video_url'].encode(), digest_size=8).digest()
+            + _blake2b(values.encode(), digest_size=8).digest())
+
+
+def fingerprints(rows):
+    """(video_url hashes, row hashes) as uint64 arrays."""
+    packed = np.frombuffer(b''.join(map(row_fingerprint, rows)), dtype='<u8').reshape(-1, 2)
+    return packed[:, 0].astype(np.uint64), packed[:, 1].astype(np.uint64)
+
+
+# ============================================================================
+# FINGERPRINT STORE
+# ============================================================================
+
+class FingerprintStore:
+    """video_url hash -> row hash, as two sorted uint64 arrays."""
+
+    def __init__(self, urls=None, rows=None):
+        self.urls = np.zeros(0, np.uint64) if urls is None else urls
+        self.rows = np.zeros(0, np.uint64) if rows is None else rows
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            return cls(data['urls'], data['rows'])
+
+    def save(self, path):
+        """Write atomically, keeping the previous store as <path>.prev."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, urls=self.urls, rows=self.rows)
+        if os.path.exists(path):
+            os.replace(path, path + '.prev')
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def compare(self, urls, rows):
+        """(new, changed) boolean masks: url not stored / stored with a different row hash."""
+        if not len(self.urls):
+            return np.ones(len(urls), dtype=bool), np.zeros(len(urls), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.urls, urls), len(self.urls) - 1)
+        new = self.urls[pos] != urls
+        return new, ~new & (self.rows[pos] != rows)
+
+    def merged(self, urls, rows):
+        """
+        New store with today's fingerprints, the last occurrence of a url
+        winning (as the upserts do), plus every stored url not seen today.
+        """
+        urls = np.concatenate([self.urls, urls])
+        rows = np.concatenate([self.rows, rows])
+        # Reverse so np.unique's first occurrence is the latest one
+        keep_urls, first = np.unique(urls[::-1], return_index=True)
+        return FingerprintStore(keep_urls, rows[::-1][first])
+
+
+class DeltaRun:
+    """
+    One delta pass over CRUVA files against a store. Iterate to get the
+    changed rows; afterwards counts and new_store() describe the run.
+    """
+
+    def __init__(self, paths, store, batch_size=BATCH_SIZE):
+        self.paths = paths
+        self.store = store
+        self.batch_size = batch_size
+        self.errors = []
+        self.counts = {'rows': 0, 'new': 0, 'changed': 0, 'unchanged': 0}
+        self.handles = set()
+        self._urls = []
+        self._rows = []
+
+    def _flush(self, batch):
+        urls, rows = fingerprints(batch)
+        self._urls.append(urls)
+        self._rows.append(rows)
+        new, changed = self.store.compare(urls, rows)
+        self.counts['rows'] += len(batch)
+        self.counts['new'] += int(new.sum())
+        self.counts['changed'] += int(changed.sum())
+        self.counts['unchanged'] += int((~new & ~changed).sum())
+        for i in np.flatnonzero(new | changed):
+            self.handles.add(normalize_handle(batch[i]['tiktok_handle']))
+            yield batch[i]
+
+    def __iter__(self):
+        for path in self.paths:
+            batch = []
+            for row in iter_cruva_rows(path, self.errors):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    yield from self._flush(batch)
+                    batch = []
+            if batch:
+                yield from self._flush(batch)
+
+    def new_store(self):
+        """The store after this run, and how many stored videos were absent from today's files."""
+        if not self._urls:
+            return self.store, len(self.store)
+        urls = np.concatenate(self._urls)
+        store = self.store.merged(urls, np.concatenate(self._rows))
+        return store, len(store) - len(np.unique(urls))
+
+
+def write_delta(path, rows):
+    """Write rows as a CRUVA CSV (same header as the export). Returns the row count."""
+    columns = list(CRUVA_COLUMN_MAP.items())
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([cruva for cruva, _ in columns])
+        for row in rows:
+            writer.writerow([row[db] for _, db in columns])
+            count += 1
+    return count
+
+
+# RPCs refreshed for the changed users, in processDailySales order
+REFRESH_RPCS = ['update_precomputed_fields', 'update_mission_progress']
+
+
+def refresh_users(conn, client_id, user_ids):
+    """
+    REFRESH_RPCS for the given users only. Each is committed on its own and,
+    as in processDailySales, a failure is rolled back without stopping the
+    next. Returns ({rpc: result}, [failure messages]).
+    """
+    user_ids = [u for u in user_ids if u is not None]
+    results, failures = {}, []
+    if not user_ids:
+        return results, failures
+    with conn.cursor() as cur:
+        for rpc in REFRESH_RPCS:
+            try:
+                cur.execute(f"SELECT {rpc}(%s, %s::uuid[])", (client_id, user_ids))
+                results[rpc] = cur.fetchone()[0]
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                failures.append(f"{rpc} failed: {type(e).__name__}: {e}")
+    return results, failures
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Reduce a CRUVA export to the rows changed since the last run')
+    parser.add_argument('paths', nargs='+', help='CRUVA CSV files, in the order they would be ingested')
+    parser.add_argument('--store', required=True, help='fingerprint store (.npz), created if missing')
+    parser.add_argument('--init', action='store_true', help='only record the files in the store')
+    parser.add_argument('--delta', help='write the new and changed rows as a CRUVA CSV')
+    parser.add_argument('--ingest', action='store_true', help='ingest the delta and refresh the affected users')
+    parser.add_argument('--client-id', help='client to ingest into (--ingest)')
+    parser.add_argument('--resolve-renames', action='store_true', help='resolve handles with identity_index.py')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='report the delta without updating the store')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+    if sum(map(bool, (args.init, args.delta, args.ingest, args.dry_run))) != 1:
+        parser.error('pass one of --init, --delta, --ingest, --dry-run')
+    if args.ingest and not args.client_id:
+        parser.error('--ingest needs --client-id')
+
+    start = time.perf_counter()
+    existed = os.path.exists(args.store)
+    store = FingerprintStore.load(args.store)
+    run = DeltaRun(args.paths, store, args.batch_size)
+    written = refreshed = None
+    if args.ingest:
+        from cruva_ingest import CruvaIngester
+
+        with connect(args.dsn) as conn:
+            handle_index = None
+            if args.resolve_renames:
+                from identity_index import load_identity_index
+
+                handle_index = load_identity_index(conn, args.client_id)
+            ingester = CruvaIngester(conn, args.client_id, handle_index, batch_size=args.batch_size)
+            ingester.ingest_rows(run)
+            written = ingester.result['recordsProcessed']
+            refreshed = ingester.processed_user_ids
+            refresh_results, refresh_failures = refresh_users(conn, args.client_id, refreshed)
+    elif args.delta:
+        written = write_delta(args.delta, run)
+    else:
+        for _ in run:
+            pass
+    new_store, missing = run.new_store()
+    elapsed = time.perf_counter() - start
+
+    counts = run.counts
+    emitted = counts['new'] + counts['changed']
+    print(f"{counts['rows']:,} rows in {elapsed:.1f}s ({counts['rows'] / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{len(run.errors)} skipped")
+    if args.init:
+        # Baseline: the rows are already in the database, so nothing is emitted
+        print(f"Fingerprint store {'updated' if existed else 'initialized'} as a baseline: "
+              f"{len(new_store):,} videos recorded, nothing to upsert")
+    else:
+        print(f"  new {counts['new']:,}, changed {counts['changed']:,}, unchanged {counts['unchanged']:,}, "
+              f"not in today's file {missing:,}")
+        if counts['rows']:
+            print(f"  {emitted:,} rows to upsert ({emitted / counts['rows']:.1%}) for {len(run.handles):,} handles")
+    if args.delta:
+        print(f"Delta written to {args.delta}")
+    if args.ingest:
+        print(f"Ingested {written:,} videos; refreshed {len(refreshed):,} users"
+              + (f" ({', '.join(f'{rpc} {value}' for rpc, value in refresh_results.items())})"
+                 if refresh_results else ''))
+        for failure in refresh_failures:
+            print(f"  {failure} (non-fatal, as in processDailySales)")
+    if args.dry_run:
+        print(f"Dry run: {args.store} not updated")
+    else:
+        new_store.save(args.store)
+        print(f"Store {args.store}: {len(new_store):,} videos, {os.path.getsize(args.store) / 1e6:.1f} MB")
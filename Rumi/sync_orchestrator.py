@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Multi-Tenant Sync Orchestrator
+Runs the daily CRUVA sync for many clients at once. processDailySales (and
+the daily-automation route) handle one CLIENT_ID per run, so run back to
+back the daily window is the sum over tenants. Here it is roughly the
+slowest tenant.
+
+Each tenant is one job on a process pool (--workers), so CSV parsing runs
+in parallel rather than behind the GIL:
+1. download: fetch the tenant's CSV (--source, a path or http(s) URL with
+   {client_id})
+2. parse: cruva_ingest.iter_cruva_rows. With --store-dir, sync_delta.py
+   keeps only new or changed rows.
+3. ingest: CruvaIngester (find/create users, COPY + upsert videos)
+4. refresh: update_precomputed_fields -> update_leaderboard_ranks, and
+   create_mission_progress_for_eligible_users -> update_mission_progress.
+   The mission RPCs read videos, missions and users.current_tier, not the
+   precomputed fields, so the two chains run on separate connections
+   when the tenant may hold two. As in processDailySales, a failing RPC
+   is rolled back and recorded, and the other RPCs and later stages
+   still run.
+5. snapshots (--snapshots): dashboard_snapshots.py rebuilds every user's
+   dashboard payload under the run's sync_logs id, then compares a sample
+   (--snapshot-verify users) with get_dashboard_data. Any difference
+   unpublishes the set, so get_dashboard_snapshot serves the RPC until a
+   build verifies.
+
+Steps 1-2 need no database. Every connection is taken through a
+ConnectionLimiter. It enforces --tenant-connections per client and
+--max-connections overall (e.g. the pooler's limit minus headroom for the
+app), so a large tenant cannot starve the others. The time spent waiting
+for a slot is recorded as its own stage.
+
+Each tenant gets a sync_logs row (source 'auto', as processDailySales
+writes). Its stage_timings column holds the seconds per stage (migration
+20261019120000_sync_log_stage_timings.sql), including the connection wait
+of a run that failed, plus processed_users: how many users were passed to
+the user-scoped refresh RPCs. A tenant whose file had rows skipped during
+parse, a refresh RPC that failed, or snapshots that were unpublished, but
+was otherwise synced is reported as 'partial'; its sync_logs row is
+'success' (the status check allows running/success/failed) with those
+problems in error_message. Promotions, checkpoints and mission redemptions stay
+in the daily-automation route.
+
+Usage:
+    python sync_orchestrator.py --source 'exports/{client_id}.csv' --workers 8 --max-connections 10
+    python sync_orchestrator.py --client-ids <uuid> <uuid> --source 'https://files.example.com/{client_id}.csv'
+    python sync_orchestrator.py --source 'exports/{client_id}.csv' --store-dir fingerprints/
+    python sync_orchestrator.py --source 'exports/{client_id}.csv' --snapshots
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from local_db import connect
+
+# Refresh RPCs after the ingest, as independent chains (each chain runs in order on one connection)
+REFRESH_CHAINS = [
+    [('update_precomputed_fields', "SELECT update_precomputed_fields(%s, %s::uuid[])"),
+     ('update_leaderboard_ranks', "SELECT update_leaderboard_ranks(%s)")],
+    [('create_mission_progress', "SELECT create_mission_progress_for_eligible_users(%s)"),
+     ('update_mission_progress', "SELECT update_mission_progress(%s, %s::uuid[])")],
+]
+STAGES = (['download', 'parse', 'connection_wait', 'ingest'] + [name for chain in REFRESH_CHAINS for name, _ in chain]
+          + ['snapshots', 'snapshot_verify'])
+
+
+class ConnectionLimiter:
+    """
+    Per-tenant and global caps on open database connections. Semaphores
+    come from a multiprocessing Manager so the caps hold across worker
+    processes.
+    """
+
+    def __init__(self, dsn, global_slots, tenant_slots, waited):
+        self.dsn = dsn
+        self.global_slots = global_slots
+        self.tenant_slots = tenant_slots
+        self.waited = waited
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        # Tenant slot first, so a tenant never holds a global slot while queueing behind itself
+        self.tenant_slots.acquire()
+        try:
+            self.global_slots.acquire()
+            try:
+                with self._lock:
+                    self.waited[0] += time.perf_counter() - start
+                with connect(self.dsn) as conn:
+                    yield conn
+            finally:
+                self.global_slots.release()
+        finally:
+            self.tenant_slots.release()
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def download(source, client_id, directory):
+    """Fetch the tenant's CSV into directory; local paths are used in place."""
+    location = source.format(client_id=client_id)
+    if not location.startswith(('http://', 'https://')):
+        if not os.path.exists(location):
+            raise FileNotFoundError(f"No CSV for client {client_id}: {location}")
+        return location
+    from urllib.request import urlopen
+
+    path = os.path.join(directory, f"{client_id}.csv")
+    with urlopen(location, timeout=300) as response, open(path, 'wb') as f:
+        shutil.copyfileobj(response, f)
+    return path
+
+
+def parse(path, client_id, store_dir):
+    """(rows, errors, store to save or None). With store_dir only new or changed rows are kept."""
+    if not store_dir:
+        from cruva_ingest import iter_cruva_rows
+
+        errors = []
+        return list(iter_cruva_rows(path, errors)), errors, None
+    from sync_delta import DeltaRun, FingerprintStore
+
+    run = DeltaRun([path], FingerprintStore.load(os.path.join(store_dir, f"{client_id}.npz")))
+    rows = list(run)
+    return rows, run.errors, run.new_store()[0]
+
+
+def _run_chain(limiter, chain, client_id, user_ids, timings, failures):
+    # Each RPC is non-fatal, as in processDailySales: a failure is rolled back
+    # and recorded, and the rest of the chain still runs
+    with limiter.connection() as conn, conn.cursor() as cur:
+        for name, query in chain:
+            start = time.perf_counter()
+            try:
+                cur.execute(query, (client_id, user_ids) if query.count('%s') == 2 else (client_id,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                failures.append(f"{name} failed: {type(e).__name__}: {e}")
+            timings[name] = time.perf_counter() - start
+
+
+def refresh(limiter, client_id, user_ids, tenant_connections, timings):
+    """
+    Run REFRESH_CHAINS, in parallel when the tenant may hold more than one
+    connection. Returns the failed RPCs' messages; only a failure to get a
+    connection raises.
+    """
+    failures = []
+    if tenant_connections < 2:
+        for chain in REFRESH_CHAINS:
+            _run_chain(limiter, chain, client_id, user_ids, timings, failures)
+        return failures
+    errors = []
+
+    def run(chain):
+        try:
+            _run_chain(limiter, chain, client_id, user_ids, timings, failures)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(chain,)) for chain in REFRESH_CHAINS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return failures
+
+
+def _update_log(limiter, sync_log_id, status, records, error, timings):
+    with limiter.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE sync_logs SET status = %s, records_processed = %s, error_message = %s,
+                                 stage_timings = %s, completed_at = now()
+            WHERE id = %s
+        """, (status, records, error, json.dumps({k: round(v, 3) for k, v in timings.items()}), sync_log_id))
+        conn.commit()
+
+
+def sync_tenant(client_id, options, global_slots, tenant_slots):
+    """
+    Worker: run one tenant through every stage. Returns a result dict
+    (never raises), so one failing tenant does not stop the others.
+    """
+    from cruva_ingest import CruvaIngester
+
+    waited = [0.0]
+    limiter = ConnectionLimiter(options['dsn'], global_slots, tenant_slots, waited)
+    timings = {}
+    result = {'client_id': client_id, 'status': 'failed', 'rows': 0, 'videos': 0, 'new_users': 0, 'users': 0,
+              'skipped': 0, 'error': None, 'timings': timings}
+    start = time.perf_counter()
+    sync_log_id = None
+    try:
+        with limiter.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO sync_logs (client_id, status, source, file_name, started_at, records_processed, created_at)
+                VALUES (%s, 'running', 'auto', %s, now(), 0, now())
+                RETURNING id
+            """, (client_id, os.path.basename(options['source'].format(client_id=client_id))))
+            sync_log_id = cur.fetchone()[0]
+            conn.commit()
+
+        with tempfile.TemporaryDirectory() as directory:
+            stage = time.perf_counter()
+            path = download(options['source'], client_id, directory)
+            timings['download'] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            rows, errors, store = parse(path, client_id, options['store_dir'])
+            timings['parse'] = time.perf_counter() - stage
+        result['rows'] = len(rows)
+        result['skipped'] = len(errors)
+
+        with limiter.connection() as conn:
+            stage = time.perf_counter()
+            handle_index = None
+            if options['resolve_renames']:
+                from identity_index import load_identity_index
+
+                handle_index = load_identity_index(conn, client_id)
+            ingester = CruvaIngester(conn, client_id, handle_index, batch_size=options['batch_size'])
+            ingester.ingest_rows(rows)
+            timings['ingest'] = time.perf_counter() - stage
+        result['videos'] = ingester.result['recordsProcessed']
+        result['new_users'] = ingester.result['newUsersCreated']
+        user_ids = [u for u in ingester.processed_user_ids if u is not None]
+        result['users'] = len(user_ids)
+        timings['processed_users'] = len(user_ids)
+
+        problems = []
+        if user_ids:
+            failures = refresh(limiter, client_id, user_ids, options['tenant_connections'], timings)
+            if failures:
+                problems.append('; '.join(sorted(failures)))
+        if options.get('snapshots'):
+            from dashboard_snapshots import build_snapshots, invalidate, verify
+
+            with limiter.connection() as conn:
+                stage = time.perf_counter()
+                build_snapshots(conn, client_id, sync_log_id)
+                timings['snapshots'] = time.perf_counter() - stage
+                stage = time.perf_counter()
+                matches, ties, mismatches = verify(conn, client_id, options['snapshot_verify'])
+                if mismatches:
+                    invalidate(conn, client_id)
+                    keys = sorted({key for _, different in mismatches for key in different})
+                    problems.append(f"snapshots unpublished: {len(mismatches):,} of "
+                                    f"{matches + ties + len(mismatches):,} sampled payloads differ from "
+                                    f"get_dashboard_data ({', '.join(keys)})")
+                timings['snapshot_verify'] = time.perf_counter() - stage
+        if store is not None:
+            store.save(os.path.join(options['store_dir'], f"{client_id}.npz"))
+        if errors:
+            problems.append(f"{len(errors):,} rows skipped: " + '; '.join(errors[:100]))
+        result['status'] = 'partial' if problems else 'success'
+        if problems:
+            result['error'] = ' | '.join(problems)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    timings['connection_wait'] = waited[0]
+    result['elapsed'] = time.perf_counter() - start
+    timings['total'] = result['elapsed']
+    if sync_log_id is not None:
+        try:
+            status = 'success' if result['status'] == 'partial' else result['status']
+            _update_log(limiter, sync_log_id, status, result['videos'], result['error'], timings)
+        except Exception as e:
+            result['error'] = (result['error'] or '') + f" (sync log update failed: {e})"
+    return result
+
+
+def run_all(client_ids, options, workers, max_connections, tenant_connections, on_result=None):
+    """Sync every client on a pool of workers under the connection caps. Returns results in completion order."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from multiprocessing import Manager
+
+    options = dict(options, tenant_connections=tenant_connections)
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        global_slots = manager.BoundedSemaphore(max_connections)
+        futures = [pool.submit(sync_tenant, client_id, options, global_slots,
+                               manager.BoundedSemaphore(tenant_connections))
+                   for client_id in client_ids]
+        results = []
+        for future in as_completed(futures):
+            results.append(future.result())
+            if on_result:
+                on_result(results[-1])
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from local_db import add_dsn_argument
+
+    parser = argparse.ArgumentParser(description='Run the daily CRUVA sync for many clients in parallel')
+    parser.add_argument('--source', required=True, help="CSV path or URL per client, with {client_id}")
+    parser.add_argument('--client-ids', nargs='+', help='clients to sync (default: every client)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='tenants processed at once')
+    parser.add_argument('--max-connections', type=int, default=10, help='database connections across all tenants')
+    parser.add_argument('--tenant-connections', type=int, default=2, help='database connections per tenant')
+    parser.add_argument('--store-dir', help='ingest only changed rows, with sync_delta.py stores kept here')
+    parser.add_argument('--resolve-renames', action='store_true', help='resolve handles with identity_index.py')
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--snapshots', action='store_true', help='rebuild dashboard snapshots after the refresh')
+    parser.add_argument('--snapshot-verify', type=int, default=50, metavar='N',
+                        help='users compared with get_dashboard_data after each snapshot build')
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+    if args.max_connections < 1 or args.tenant_connections < 1:
+        parser.error('connection limits must be at least 1')
+    if args.snapshot_verify < 1:
+        parser.error('--snapshot-verify must be at least 1')
+
+    client_ids = args.client_ids
+    if not client_ids:
+        with connect(args.dsn) as conn, conn.cursor() as cur:
+            cur.execute("SELECT id FROM clients ORDER BY name")
+            client_ids = [str(row[0]) for row in cur]
+    options = {'dsn': args.dsn, 'source': args.source, 'store_dir': args.store_dir,
+               'resolve_renames': args.resolve_renames, 'batch_size': args.batch_size, 'snapshots': args.snapshots,
+               'snapshot_verify': args.snapshot_verify}
+
+    print(f"{len(client_ids)} clients, {args.workers} workers, {args.max_connections} connections "
+          f"({args.tenant_connections} per client)\n")
+    print(f"{'client':36s} {'status':8s} {'rows':>9s} {'users':>7s} {'new':>5s} {'total s':>8s}  stages (s)")
+
+    def show(result):
+        stages = ' '.join(f"{name}={result['timings'][name]:.1f}" for name in STAGES if name in result['timings'])
+        print(f"{result['client_id']:36s} {result['status']:8s} {result['rows']:>9,d} {result['users']:>7,d} "
+              f"{result['new_users']:>5,d} {result['elapsed']:>8.1f}  {stages}")
+        if result['error']:
+            print(f"{'':36s} {result['error'][:200]}")
+
+    start = time.perf_counter()
+    results = run_all(client_ids, options, args.workers, args.max_connections, args.tenant_connections, show)
+    wall = time.perf_counter() - start
+    slowest = max((r['elapsed'] for r in results), default=0)
+    serial = sum(r['elapsed'] for r in results)
+    failed = sum(r['status'] == 'failed' for r in results)
+    partial = sum(r['status'] == 'partial' for r in results)
+    print(f"\nWall time {wall:.1f}s: slowest tenant {slowest:.1f}s, tenants back to back {serial:.1f}s; "
+          f"{failed} failed, {partial} partial (skipped rows or unpublished snapshots)")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Table snapshots for the offline analysis tools.
+
+A snapshot is a directory of CSV files, one per table (videos.csv,
+users.csv, ...), as written by `COPY ... TO STDOUT WITH CSV HEADER` or the
+Supabase table export. Only the columns listed in SNAPSHOT_COLUMNS are
+read, with fixed types, so exports with extra columns load the same way.
+
+Timestamps are read as day precision (the first 10 characters), which is
+what the checkpoint and calibration tools work in and avoids parsing
+Postgres '+00' offsets. Columns compared against exact instants (e.g.
+tier_achieved_at) are read as full UTC timestamps instead; timestamps
+without a time zone (mission_progress.cooldown_until) are taken as UTC.
+
+Usage:
+    python table_snapshot.py --client-id <uuid> snapshots/2025-12-31
+"""
+
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+# Column -> arrow type. 'date' columns are timestamptz/date in Postgres,
+# truncated to the day on read; 'timestamp' columns keep the full instant.
+SNAPSHOT_COLUMNS = {
+    'clients': {
+        'id': pa.string(), 'name': pa.string(), 'vip_metric': pa.string(),
+        'checkpoint_months': pa.int32(),
+    },
+    'tiers': {
+        'id': pa.string(), 'client_id': pa.string(), 'tier_order': pa.int32(),
+        'tier_id': pa.string(), 'tier_name': pa.string(),
+        'sales_threshold': pa.float64(), 'units_threshold': pa.int64(),
+        'commission_rate': pa.float64(),
+    },
+    'users': {
+        'id': pa.string(), 'client_id': pa.string(), 'tiktok_handle': pa.string(),
+        'current_tier': pa.string(), 'tier_achieved_at': 'timestamp', 'next_checkpoint_at': 'timestamp',
+        'first_video_date': 'date', 'created_at': 'date',
+        'total_sales': pa.float64(), 'total_units': pa.int64(),
+        'manual_adjustments_total': pa.float64(), 'manual_adjustments_units': pa.int64(),
+        'checkpoint_sales_current': pa.float64(), 'checkpoint_units_current': pa.int64(),
+        'checkpoint_videos_posted': pa.int64(), 'checkpoint_total_views': pa.int64(),
+        'checkpoint_total_likes': pa.int64(), 'checkpoint_total_comments': pa.int64(),
+        'projected_tier_at_checkpoint': pa.string(), 'next_tier_name': pa.string(),
+        'next_tier_threshold': pa.float64(), 'next_tier_threshold_units': pa.int64(),
+    },
+    'videos': {
+        'user_id': pa.string(), 'client_id': pa.string(), 'video_url': pa.string(),
+        'post_date': 'date', 'views': pa.int64(), 'likes': pa.int64(), 'comments': pa.int64(),
+        'gmv': pa.float64(), 'ctr': pa.float64(), 'units_sold': pa.int64(),
+    },
+    'sales_adjustments': {
+        'id': pa.string(), 'user_id': pa.string(), 'client_id': pa.string(),
+        'amount': pa.float64(), 'amount_units': pa.int64(), 'adjustment_type': pa.string(),
+        'created_at': 'date', 'applied_at': 'date',
+    },
+    'rewards': {
+        'id': pa.string(), 'client_id': pa.string(), 'type': pa.string(), 'value_data': pa.string(),
+        'tier_eligibility': pa.string(), 'redemption_frequency': pa.string(), 'enabled': pa.bool_(),
+    },
+    'missions': {
+        'id': pa.string(), 'client_id': pa.string(), 'title': pa.string(), 'mission_type': pa.string(),
+        'target_value': pa.int64(), 'reward_id': pa.string(), 'tier_eligibility': pa.string(),
+        'enabled': pa.bool_(), 'activated': pa.bool_(), 'raffle_end_date': 'timestamp',
+    },
+    'mission_progress': {
+        'id': pa.string(), 'user_id': pa.string(), 'mission_id': pa.string(), 'client_id': pa.string(),
+        'current_value': pa.int64(), 'status': pa.string(), 'completed_at': 'timestamp',
+        'checkpoint_start': 'timestamp', 'checkpoint_end': 'timestamp', 'cooldown_until': 'timestamp',
+    },
+    'redemptions': {
+        'id': pa.string(), 'user_id': pa.string(), 'reward_id': pa.string(), 'client_id': pa.string(),
+        'status': pa.string(), 'tier_at_claim': pa.string(), 'claimed_at': 'timestamp',
+        'scheduled_activation_date': 'date',
+    },
+    'raffle_participations': {
+        'id': pa.string(), 'mission_id': pa.string(), 'user_id': pa.string(), 'redemption_id': pa.string(),
+        'client_id': pa.string(), 'participated_at': 'timestamp', 'is_winner': pa.bool_(),
+        'winner_selected_at': 'timestamp',
+    },
+    'commission_boost_redemptions': {
+        'id': pa.string(), 'redemption_id': pa.string(), 'client_id': pa.string(), 'boost_status': pa.string(),
+        'scheduled_activation_date': 'date', 'activated_at': 'timestamp', 'expires_at': 'timestamp',
+        'duration_days': pa.int32(), 'boost_rate': pa.float64(), 'sales_at_activation': pa.float64(),
+        'sales_at_expiration': pa.float64(), 'admin_adjusted_commission': pa.float64(),
+        'final_payout_amount': pa.float64(), 'payment_info_collected_at': 'timestamp',
+        'payout_sent_at': 'timestamp',
+    },
+    'commission_boost_state_history': {
+        'boost_redemption_id': pa.string(), 'client_id': pa.string(), 'from_status': pa.string(),
+        'to_status': pa.string(), 'transitioned_at': 'timestamp', 'transition_type': pa.string(),
+    },
+    'sync_logs': {
+        'id': pa.string(), 'client_id': pa.string(), 'status': pa.string(), 'source': pa.string(),
+        'started_at': 'timestamp', 'completed_at': 'timestamp', 'records_processed': pa.int64(),
+    },
+    'tier_checkpoints': {
+        'user_id': pa.string(), 'client_id': pa.string(), 'checkpoint_date': 'date',
+        'period_start_date': 'date', 'sales_in_period': pa.float64(), 'units_in_period': pa.int64(),
+        'tier_before': pa.string(), 'tier_after': pa.string(), 'status': pa.string(),
+    },
+}
+
+
+def table_path(directory, table):
+    return os.path.join(directory, f"{table}.csv")
+
+
+def _convert_options(table, columns):
+    spec = SNAPSHOT_COLUMNS[table]
+    columns = list(columns or spec)
+    types = {c: pa.string() if spec[c] in ('date', 'timestamp') else spec[c] for c in columns}
+    return columns, pv.ConvertOptions(include_columns=columns, column_types=types,
+                                      include_missing_columns=True, strings_can_be_null=True,
+                                      true_values=['t', 'true'], false_values=['f', 'false'])
+
+
+def _convert_times(table_or_batch, table, columns):
+    """Replace 'date' string columns with date32 (first 10 characters), 'timestamp' ones with UTC timestamps."""
+    spec = SNAPSHOT_COLUMNS[table]
+    arrays = []
+    for name in columns:
+        col = table_or_batch.column(name)
+        if spec[name] == 'date':
+            col = pc.cast(pc.utf8_slice_codeunits(col, 0, 10), pa.date32())
+        elif spec[name] == 'timestamp':
+            # Postgres writes '+00'; the ISO parser wants '+00:00'. No offset at all: timestamp without time zone
+            col = pc.replace_substring_regex(col, r'([+-]\d\d)$', r'\1:00')
+            col = pc.if_else(pc.match_substring_regex(col, r'[+-]\d\d:\d\d$'), col,
+                             pc.binary_join_element_wise(col, '+00:00', ''))
+            col = pc.cast(col, pa.timestamp('us', tz='UTC'))
+        arrays.append(col)
+    return arrays
+
+
+def _filter_client(tbl, table, client_id):
+    if client_id is None:
+        return tbl
+    key = 'id' if table == 'clients' else 'client_id'
+    if key not in tbl.column_names:
+        return tbl
+    return tbl.filter(pc.equal(tbl[key], client_id))
+
+
+def read_table(directory, table, columns=None, client_id=None):
+    """Read one snapshot table as a pyarrow Table."""
+    columns, convert = _convert_options(table, columns)
+    tbl = pv.read_csv(table_path(directory, table), convert_options=convert)
+    tbl = pa.Table.from_arrays(_convert_times(tbl, table, columns), names=columns)
+    return _filter_client(tbl, table, client_id)
+
+
+def iter_table_batches(directory, table, columns=None, client_id=None, block_size=16 << 20):
+    """
+    Stream a snapshot table as pyarrow RecordBatches of roughly block_size
+    bytes of CSV each, for tables too large to load at once.
+    """
+    columns, convert = _convert_options(table, columns)
+    reader = pv.open_csv(table_path(directory, table), convert_options=convert,
+                         read_options=pv.ReadOptions(block_size=block_size))
+    for batch in reader:
+        batch = pa.RecordBatch.from_arrays(_convert_times(batch, table, columns), names=columns)
+        yield _filter_client(batch, table, client_id)
+
+
+def export_snapshot(conn, client_id, directory, tables=None):
+    """
+    Write one client's tables to directory/<table>.csv with server-side COPY.
+    Returns {table: bytes written}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    with conn.cursor() as cur:
+        for table in tables or SNAPSHOT_COLUMNS:
+            key = 'id' if table == 'clients' else 'client_id'
+            columns = ', '.join(SNAPSHOT_COLUMNS[table])
+            query = f"COPY (SELECT {columns} FROM {table} WHERE {key} = %s) TO STDOUT WITH (FORMAT csv, HEADER)"
+            size = 0
+            with open(table_path(directory, table), 'wb') as f, cur.copy(query, (client_id,)) as copy:
+                for chunk in copy:
+                    f.write(chunk)
+                    size += len(chunk)
+            written[table] = size
+    return written
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from local_db import add_dsn_argument, connect
+
+    parser = argparse.ArgumentParser(description='Export one client\'s tables as a CSV snapshot')
+    parser.add_argument('directory')
+    parser.add_argument('--client-id', required=True)
+    parser.add_argument('--tables', nargs='+', choices=list(SNAPSHOT_COLUMNS))
+    add_dsn_argument(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with connect(args.dsn) as conn:
+        written = export_snapshot(conn, args.client_id, args.directory, args.tables)
+    for table, size in written.items():
+        print(f"{table:20s} {size / 1e6:10.1f} MB")
+    print(f"Snapshot written to {args.directory} in {time.perf_counter() - start:.1f}s")
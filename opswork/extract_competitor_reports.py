@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Competitor Report Extractor
+Batch version of the DataExtraction.md workflow: pulls the fields out of
+every competitor's {handle}_analysis_data.xlsx and writes AffiliateCC.md
+style sections, plus a JSON sidecar with the same data.
+
+For each handle the workbook is found under
+    {root}/{handle}/top_contrastive/reports/competitor/{handle}_analysis_data.xlsx
+falling back to top_top. It is streamed with openpyxl in read-only mode, and
+only columns A (field) and B (value) of rows 8-186 are read:
+- Content Strategy: rows 8-19
+- Performance Buckets: rows 21-40
+- Posting & Content: rows 42-186, stopping before the first BUCKET_*_NAME;
+  its header gives the last row read (Rows 42-152), as the manual sections do
+
+Skip rules: a row with no field name is dropped, whether or not column B
+has a value (empty rows and orphan values). A field with an empty value is
+kept as "FIELD:", like PAGE_2_CONTENT_STRATEGY. Values are written as
+Python prints them (1, 2.8, 1.0, True), as in the existing sections.
+
+Brands come from the Checklist table in AffiliateCC.md. Handles are matched
+without '@', case or trailing '_'/'.', since the folder name may differ from
+the @handle (daisycabral / @daisycabral_). Unmatched handles get "Unknown
+Brand". A report is complete when its last field is TOTAL_UNIQUE_MENTIONS
+(the manual pre-check). Incomplete or missing reports are left out of the
+Markdown and listed with their error in the sidecar.
+
+Workbooks are read in a process pool, one handle per task. --append-to adds
+the sections of handles not already in AffiliateCC.md.
+
+Usage:
+    python extract_competitor_reports.py --root .../statesidegrowers/competitors --output competitors.md
+    python extract_competitor_reports.py --root .../competitors daisycabral shopbyjake --append-to AffiliateCC.md
+    python extract_competitor_reports.py --bench 300
+"""
+
+import json
+import os
+import re
+import time
+
+SECTIONS = [('Content Strategy', 8, 19), ('Performance Buckets', 21, 40), ('Posting & Content', 42, 186)]
+STOP_FIELD = re.compile(r'^BUCKET_.+_NAME$')    # Posting & Content ends before these
+LAST_FIELD = 'TOTAL_UNIQUE_MENTIONS'
+VARIANTS = ['top_contrastive', 'top_top']
+REPORT_SUFFIX = '_analysis_data.xlsx'
+UNKNOWN_BRAND = 'Unknown Brand'
+AFFILIATE_CC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AffiliateCC.md')
+
+
+def report_path(root, handle):
+    """(path, variant) of the handle's workbook, or (None, None)."""
+    for variant in VARIANTS:
+        path = os.path.join(root, handle, variant, 'reports', 'competitor', handle + REPORT_SUFFIX)
+        if os.path.exists(path):
+            return path, variant
+    return None, None
+
+
+def find_handles(root):
+    """Every folder under root that has a report, sorted."""
+    return sorted(name for name in os.listdir(root)
+                  if os.path.isdir(os.path.join(root, name)) and report_path(root, name)[0])
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    # One line per field: newlines inside a cell would break the FIELD: value format
+    return ' '.join(str(value).split())
+
+
+# ============================================================================
+# BRANDS
+# ============================================================================
+
+def handle_key(handle):
+    return handle.strip().lstrip('@').lower().rstrip('_.')
+
+
+def load_brands(path=AFFILIATE_CC):
+    """handle key -> brand from the '## Checklist' table of AffiliateCC.md."""
+    brands = {}
+    in_checklist = False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                in_checklist = line.strip().lower().startswith('## checklist')
+                continue
+            cells = [cell.strip() for cell in line.split('|')]
+            if in_checklist and len(cells) > 2 and cells[1].startswith('@'):
+                brands[handle_key(cells[1])] = cells[2]
+    return brands
+
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+def extract_report(root, handle):
+    """
+    One handle's report: {'handle', 'path', 'variant', 'sections':
+    [{'name', 'rows', 'fields': [[field, value], ...]}], 'complete',
+    'error'}. Never raises, so one bad workbook does not stop the batch.
+    """
+    from openpyxl import load_workbook
+
+    result = {'handle': handle, 'path': None, 'variant': None, 'sections': [], 'complete': False, 'error': None}
+    path, variant = report_path(root, handle)
+    if path is None:
+        result['error'] = f"no {handle}{REPORT_SUFFIX} under {' or '.join(VARIANTS)}"
+        return result
+    result['path'], result['variant'] = path, variant
+    sections = [{'name': name, 'rows': f"{first}-{last}", 'fields': []} for name, first, last in SECTIONS]
+    stopped = False
+    last_row = None
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(min_row=SECTIONS[0][1], max_row=SECTIONS[-1][2], max_col=2,
+                                             values_only=True)
+            for number, row in enumerate(rows, SECTIONS[0][1]):
+                field = row[0] if row else None
+                value = row[1] if len(row) > 1 else None
+                if field is None or not str(field).strip():
+                    continue
+                field = str(field).strip()
+                for section, (_, first, last) in zip(sections, SECTIONS):
+                    if first <= number <= last:
+                        break
+                else:
+                    continue
+                if section is sections[-1]:
+                    if stopped or STOP_FIELD.match(field):
+                        stopped = True
+                        continue
+                section['fields'].append([field, format_value(value)])
+                if section is sections[-1]:
+                    last_row = number
+        finally:
+            workbook.close()
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    if last_row:
+        # Like the manual sections: Posting & Content ends at the last row read, not at 186
+        sections[-1]['rows'] = f"{SECTIONS[-1][1]}-{last_row}"
+    result['sections'] = sections
+    last = next((s['fields'][-1][0] for s in reversed(sections) if s['fields']), None)
+    result['complete'] = last == LAST_FIELD
+    if not result['complete']:
+        result['error'] = f"last field is {last}, expected {LAST_FIELD}"
+    return result
+
+
+def _extract(task):
+    return extract_report(*task)
+
+
+def extract_all(root, handles, workers=None):
+    """extract_report for every handle on a process pool, in the order given."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(root, handle) for handle in handles]
+    if workers == 1:
+        return list(map(_extract, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+        return list(pool.map(_extract, tasks, chunksize=chunksize))
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def render_markdown(report, brand):
+    lines = [f"# {report['handle']} - {brand}", '']
+    for section in report['sections']:
+        lines.append(f"## {section['name']} (Rows {section['rows']})")
+        lines.extend(f"{field}: {value}".rstrip() for field, value in section['fields'])
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def existing_handles(path):
+    """Handle keys that already have an H1 section ('# handle - Brand') in a Markdown file."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {handle_key(m.group(1)) for m in re.finditer(r'^# (\S+) - ', f.read(), re.MULTILINE)}
+
+
+def newline_style(path):
+    """Line ending to write a Markdown file with: keep an existing file's, CRLF (like the opswork docs) for new ones."""
+    if not os.path.exists(path):
+        return '\r\n'
+    with open(path, 'rb') as f:
+        return '\r\n' if b'\r\n' in f.read() else '\n'
+
+
+def write_outputs(reports, brands, output=None, sidecar=None, append_to=None):
+    """Write the complete reports as Markdown (and/or append them) and every report to the JSON sidecar."""
+    complete = [r for r in reports if r['complete']]
+    for report in reports:
+        report['brand'] = brands.get(handle_key(report['handle']), UNKNOWN_BRAND)
+    written = []
+    if output:
+        with open(output, 'w', encoding='utf-8', newline=newline_style(output)) as f:
+            f.write('\n'.join(render_markdown(r, r['brand']) for r in complete))
+        written = [r['handle'] for r in complete]
+    if append_to:
+        present = existing_handles(append_to)
+        new = [r for r in complete if handle_key(r['handle']) not in present]
+        if new:
+            with open(append_to, 'a', encoding='utf-8', newline=newline_style(append_to)) as f:
+                f.write('\n' + '\n'.join(render_markdown(r, r['brand']) for r in new))
+        written = [r['handle'] for r in new]
+    if sidecar:
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            json.dump([{'handle': r['handle'], 'brand': r['brand'], 'path': r['path'], 'variant': r['variant'],
+                        'complete': r['complete'], 'error': r['error'],
+                        'sections': [{'name': s['name'], 'rows': s['rows'], 'fields': dict(s['fields'])}
+                                     for s in r['sections']]}
+                       for r in reports], f, indent=1, ensure_ascii=False)
+    return written
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def parse_sections(path=AFFILIATE_CC):
+    """The handle sections already in AffiliateCC.md: [(handle, [[fields of each section], ...])]."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    handles = []
+    for block in re.split(r'^# (?=\S+ - )', text, flags=re.MULTILINE)[1:]:
+        handle = block.split(' - ', 1)[0]
+        sections = [[line.split(':', 1) for line in part.splitlines()[1:] if re.match(r'^[A-Z0-9_]+:', line)]
+                    for part in re.split(r'^## ', block, flags=re.MULTILINE)[1:]]
+        if len(sections) == len(SECTIONS):
+            handles.append((handle, [[[k, v.strip()] for k, v in fields] for fields in sections]))
+    return handles
+
+
+def _cell(value):
+    """
+    A Markdown value as the workbook holds it: whole numbers and booleans
+    as such, the rest as text. Decimals stay text: a float 1.0 would be
+    stored as 1, and the existing sections show 1.0.
+    """
+    if value in ('True', 'False'):
+        return value == 'True'
+    if re.fullmatch(r'-?\d+', value):
+        return int(value)
+    return value or None
+
+
+def write_synthetic_report(path, sections, rng):
+    """A workbook with sections' fields at their rows, plus blank rows, orphan values and BUCKET_*_NAME rows."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    rows = [['REPORT_TITLE', 'Competitor analysis']] + [[None, None]] * (SECTIONS[0][1] - 2)
+    for (_, first, last), fields in zip(SECTIONS, sections):
+        block = []
+        spare = last - first + 1 - len(fields)
+        for field, value in fields:
+            if spare > 0 and rng.random() < 0.05:
+                block.append([None, None] if rng.random() < 0.5 else [None, 'orphan'])
+                spare -= 1
+            block.append([field, _cell(value)])
+        if last == SECTIONS[-1][2]:
+            block += [[f"BUCKET_{i}_NAME", f"{i * 10}-{i * 10 + 10}s"] for i in range(1, 4)][:spare]
+        rows += block + [[None, None]] * (last - first + 1 - len(block)) + [[None, None]]
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def run_benchmark(n_reports, workers):
+    """Extract n synthetic reports built from AffiliateCC.md's sections, serially and on the pool."""
+    import random
+    import tempfile
+
+    samples = parse_sections()
+    if not samples:
+        raise SystemExit(f"No handle sections in {AFFILIATE_CC} to build reports from")
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        expected = {}
+        for i in range(n_reports):
+            handle = f"competitor{i:04d}"
+            sample, sections = samples[i % len(samples)]
+            directory = os.path.join(root, handle, VARIANTS[i % 2], 'reports', 'competitor')
+            os.makedirs(directory)
+            write_synthetic_report(os.path.join(directory, handle + REPORT_SUFFIX), sections, rng)
+            expected[handle] = sections
+        print(f"Wrote {n_reports} reports ({len(samples)} field layouts from AffiliateCC.md) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        handles = find_handles(root)
+        for label, n_workers in [('serial', 1), (f"pool ({workers or os.cpu_count()} workers)", workers)]:
+            start = time.perf_counter()
+            reports = extract_all(root, handles, n_workers)
+            elapsed = time.perf_counter() - start
+            print(f"{label:20s} {elapsed:6.2f}s  {len(reports) / elapsed:7.1f} reports/s")
+        lost = [r['handle'] for r in reports
+                if not r['complete'] or [s['fields'] for s in r['sections']] != expected[r['handle']]]
+        fields = sum(len(s['fields']) for r in reports for s in r['sections'])
+        print(f"{fields:,} fields, {len(reports) - len(lost)} of {len(reports)} reports match their source sections")
+        return not lost
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Extract competitor analysis workbooks into AffiliateCC.md sections')
+    parser.add_argument('handles', nargs='*', help='competitor folders to extract (default: every one under --root)')
+    parser.add_argument('--root', help='folder holding one sub-folder per competitor handle')
+    parser.add_argument('--output', help='write the Markdown sections here')
+    parser.add_argument('--json', help='JSON sidecar (default: --output or --append-to with .json)')
+    parser.add_argument('--append-to', help='append sections for handles not yet in this file (e.g. AffiliateCC.md)')
+    parser.add_argument('--brands', default=AFFILIATE_CC, help='Markdown file with the ## Checklist brand table')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--bench', type=int, metavar='N', help='extract N synthetic reports and time it')
+    args = parser.parse_args()
+
+    if args.bench:
+        sys.exit(0 if run_benchmark(args.bench, args.workers) else 1)
+    if not args.root:
+        parser.error('pass --root or --bench')
+    if not (args.output or args.append_to):
+        parser.error('pass --output and/or --append-to')
+
+    start = time.perf_counter()
+    handles = args.handles or find_handles(args.root)
+    reports = extract_all(args.root, handles, args.workers)
+    sidecar = args.json or os.path.splitext(args.output or args.append_to)[0] + '.json'
+    brands = load_brands(args.brands)
+    written = write_outputs(reports, brands, args.output, sidecar, args.append_to)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in reports if not r['complete']]
+    print(f"{len(reports)} reports in {elapsed:.2f}s: {len(reports) - len(failed)} complete, {len(failed)} not")
+    for report in reports:
+        fields = sum(len(s['fields']) for s in report['sections'])
+        status = 'ok' if report['complete'] else report['error']
+        print(f"  {report['handle']:30s} {report['brand']:24s} {report['variant'] or '-':16s} {fields:>4d}  {status}")
+    target = ' and '.join(p for p in (args.output, args.append_to) if p)
+    print(f"{len(written)} sections written to {target}; sidecar {sidecar}")
+    sys.exit(1 if failed else 0)